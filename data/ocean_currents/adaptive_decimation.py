@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+import numpy as np
+
+from currents_engine import update_statistics
+
+# Default interpolation-error bound, in m/s of the velocity vector
+DEFAULT_MAX_ERROR = 0.05
+
+# Coarsest block is 2 ** MAX_LEVEL cells on a side (32: about 2.7 degrees on GLO12)
+MAX_LEVEL = 5
+
+# Bisection steps when searching the tolerance that meets a point budget
+BUDGET_ITERATIONS = 40
+
+
+def upsample_bilinear(coarse, stride, shape):
+    """
+    Bilinearly interpolate a field known at every stride-th row and column
+    back onto the full grid.
+
+    NaN anchors (land) are left out and the weights of the remaining ones
+    renormalized, so cells next to the coast are interpolated from the ocean
+    anchors only. Cells past the last anchor row/column take the last one.
+
+    Args:
+        coarse (numpy.ndarray): Values at the anchors, i.e. field[::stride, ::stride]
+        stride (int): Anchor spacing in cells
+        shape (tuple): (nrows, ncols) of the full grid to fill
+
+    Returns:
+        numpy.ndarray: float64 array of the given shape; NaN where no anchor
+                       around a cell is valid
+    """
+    coarse = np.asarray(coarse, dtype=np.float64)
+    valid = np.isfinite(coarse)
+    values = np.where(valid, coarse, 0.0)
+
+    def axis_weights(n, n_anchors):
+        position = np.arange(n)
+        lower = np.minimum(position // stride, n_anchors - 1)
+        upper = np.minimum(lower + 1, n_anchors - 1)
+        weight = np.where(upper > lower, (position - lower * stride) / stride, 0.0)
+        return lower, upper, weight
+
+    r0, r1, wr = axis_weights(shape[0], coarse.shape[0])
+    c0, c1, wc = axis_weights(shape[1], coarse.shape[1])
+    total = np.zeros(shape)
+    weight_sum = np.zeros(shape)
+    for rows, row_weight in ((r0, 1.0 - wr), (r1, wr)):
+        for cols, col_weight in ((c0, 1.0 - wc), (c1, wc)):
+            weight = row_weight[:, None] * col_weight[None, :] * valid[np.ix_(rows, cols)]
+            total += weight * values[np.ix_(rows, cols)]
+            weight_sum += weight
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight_sum > 0, total / weight_sum, np.nan)
+
+
+def _block_reduce(values, stride, reduce):
+    """
+    Reduce a 2-D array over stride x stride blocks (the last blocks may be
+    partial; they are padded with zeros).
+    """
+    n_rows = -(-values.shape[0] // stride) * stride
+    n_cols = -(-values.shape[1] // stride) * stride
+    padded = np.zeros((n_rows, n_cols), dtype=values.dtype)
+    padded[:values.shape[0], :values.shape[1]] = values
+    return reduce(padded.reshape(n_rows // stride, stride, n_cols // stride, stride), axis=(1, 3))
+
+
+def block_errors(u, v, n_rows=None, max_level=MAX_LEVEL):
+    """
+    Interpolation error of representing each block by its anchors, for every
+    level of the block quadtree.
+
+    A level-l block is 2**l cells on a side; its anchor is its first
+    (top-left) cell. The error of a block is the largest difference, as a
+    vector magnitude, between the full-resolution u/v of its valid cells and
+    the bilinear interpolation from the level's anchor grid. Blocks whose
+    anchor is land while the block still has ocean cells get an infinite
+    error, so they are always split.
+
+    Args:
+        u (numpy.ndarray): Eastward velocity (rows, ncols), NaN on land
+        v (numpy.ndarray): Northward velocity, same shape
+        n_rows (int): Rows the errors are computed for; rows after them are
+            only a halo providing the next anchor row (default: all rows)
+        max_level (int): Coarsest level
+
+    Returns:
+        dict: Level -> (block errors, anchor valid) float32/bool arrays of
+              ceil(n_rows / 2**l) x ceil(ncols / 2**l) blocks, for levels 1..max_level
+    """
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    n_rows = u.shape[0] if n_rows is None else n_rows
+    shape = (n_rows, u.shape[1])
+    valid = np.isfinite(u[:n_rows]) & np.isfinite(v[:n_rows])
+    levels = {}
+    for level in range(1, max_level + 1):
+        stride = 2 ** level
+        u_fit = upsample_bilinear(u[::stride, ::stride], stride, shape)
+        v_fit = upsample_bilinear(v[::stride, ::stride], stride, shape)
+        error = np.hypot(u[:n_rows] - u_fit, v[:n_rows] - v_fit)
+        # Ocean cells the anchors cannot reach at all must be refined
+        error = np.where(valid, np.where(np.isnan(error), np.inf, error), 0.0)
+        errors = _block_reduce(error, stride, np.max)
+        anchor_valid = valid[::stride, ::stride]
+        has_valid = _block_reduce(valid, stride, np.any)
+        errors[has_valid & ~anchor_valid] = np.inf
+        levels[level] = (errors.astype(np.float32), anchor_valid)
+    return levels
+
+
+def _upsample2(blocks, shape):
+    """
+    Repeat each block flag over its four children, cropped to the child shape.
+    """
+    return np.repeat(np.repeat(blocks, 2, axis=0), 2, axis=1)[:shape[0], :shape[1]]
+
+
+class DecimationPlan:
+    """
+    Block-quadtree errors of a whole slab, from which the points to keep
+    are selected for any error tolerance.
+
+    For a tolerance, the coarsest blocks are split while their error exceeds
+    it; every block that is not split keeps its anchor point. Quiet open
+    ocean is therefore covered by one point per 2**max_level cells, while
+    fronts, boundary currents and eddies keep every cell.
+    """
+
+    def __init__(self, levels, valid, max_level=MAX_LEVEL):
+        """
+        Args:
+            levels (dict): Output of block_errors for the whole slab
+            valid (numpy.ndarray): Full-resolution boolean validity mask
+            max_level (int): Coarsest level
+        """
+        self.levels = levels
+        self.valid = valid
+        self.max_level = max_level
+
+    def keep_levels(self, tolerance):
+        """
+        Blocks kept at each level for an error tolerance.
+
+        Returns:
+            dict: Level -> boolean block array of the blocks whose anchor is
+                  kept (level 0 is the full-resolution cell mask)
+        """
+        exists = np.ones(self.levels[self.max_level][0].shape, dtype=bool)
+        keep = {}
+        for level in range(self.max_level, 0, -1):
+            errors = self.levels[level][0]
+            split = exists & (errors > tolerance)
+            keep[level] = exists & ~split
+            child_shape = self.levels[level - 1][0].shape if level > 1 else self.valid.shape
+            exists = _upsample2(split, child_shape)
+        keep[0] = exists
+        return keep
+
+    def count(self, tolerance):
+        """
+        Number of valid points kept for an error tolerance.
+        """
+        keep = self.keep_levels(tolerance)
+        total = int(np.count_nonzero(keep[0] & self.valid))
+        for level in range(1, self.max_level + 1):
+            total += int(np.count_nonzero(keep[level] & self.levels[level][1]))
+        return total
+
+    def tolerance_for_budget(self, point_budget):
+        """
+        Smallest error tolerance that keeps at most point_budget points
+        (bisection on the tolerance; the count falls as it grows).
+        """
+        finite = [errors[np.isfinite(errors)] for errors, _ in self.levels.values()]
+        high = max([float(e.max()) for e in finite if e.size] + [0.0])
+        if self.count(high) > point_budget:
+            # Even the coarsest blocks everywhere exceed the budget
+            return high
+        low = 0.0
+        for _ in range(BUDGET_ITERATIONS):
+            middle = 0.5 * (low + high)
+            if self.count(middle) > point_budget:
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def keep_mask(self, keep, start, stop):
+        """
+        Full-resolution mask of the kept points of rows start..stop (start a
+        multiple of 2**max_level).
+        """
+        mask = keep[0][start:stop].copy()
+        for level in range(1, self.max_level + 1):
+            stride = 2 ** level
+            blocks = keep[level][start // stride:-(-stop // stride)]
+            mask[::stride, ::stride] |= blocks[:len(range(0, stop - start, stride))]
+        return mask & self.valid[start:stop]
+
+
+def _band_windows(n_rows, band_rows, max_level):
+    """
+    Band boundaries aligned to the coarsest block size.
+    """
+    block = 2 ** max_level
+    band_rows = n_rows if band_rows is None else band_rows
+    band_rows = -(-band_rows // block) * block
+    for start in range(0, n_rows, band_rows):
+        yield start, min(start + band_rows, n_rows)
+
+
+def _read_rows(data, coord_dims, start, stop):
+    order = (coord_dims['lat'], coord_dims['lon'])
+    return data.isel({coord_dims['lat']: slice(start, stop)}).transpose(*order).values
+
+
+def plan_decimation(u_data, v_data, n_rows, coord_dims, band_rows=None, max_level=MAX_LEVEL, statistics=None):
+    """
+    Read the full-resolution slab once, in bands, and build its DecimationPlan.
+
+    Each band is read with one halo row (the next band's first anchor row).
+
+    Args:
+        u_data (xarray.DataArray): 2-D eastward current slice
+        v_data (xarray.DataArray): 2-D northward current slice
+        n_rows (int): Number of latitude rows
+        coord_dims (dict): Output of identify_coord_dims
+        band_rows (int): Rows per band (rounded up to the coarsest block); if None, one band
+        max_level (int): Coarsest level
+        statistics (tuple): Optional (u, v) running-statistics accumulators
+            (see new_statistics) to fold the full-resolution slab into
+
+    Returns:
+        DecimationPlan
+    """
+    parts = {level: [] for level in range(1, max_level + 1)}
+    valid_parts = []
+    for start, stop in _band_windows(n_rows, band_rows, max_level):
+        read_stop = min(stop + 1, n_rows)
+        u = _read_rows(u_data, coord_dims, start, read_stop)
+        v = _read_rows(v_data, coord_dims, start, read_stop)
+        if statistics is not None:
+            update_statistics(statistics[0], u[:stop - start])
+            update_statistics(statistics[1], v[:stop - start])
+        for level, arrays in block_errors(u, v, stop - start, max_level).items():
+            parts[level].append(arrays)
+        valid_parts.append(np.isfinite(u[:stop - start]) & np.isfinite(v[:stop - start]))
+    levels = {level: (np.concatenate([p[0] for p in arrays]), np.concatenate([p[1] for p in arrays]))
+              for level, arrays in parts.items()}
+    return DecimationPlan(levels, np.concatenate(valid_parts), max_level)
+
+
+def iter_decimated_bands(u_data, v_data, lats, lons, coord_dims, plan, keep, band_rows=None):
+    """
+    Read the slab again in bands and return only the kept points.
+
+    Yields tuples shaped like iter_ocean_bands, so the points feed
+    compute_currents_at directly.
+
+    Yields:
+        tuple: (u, v, lats, lons, rows, cols) with u/v 1-D at the kept
+               cells, lats/lons of the whole band and the cells'
+               band-relative rows/cols in row-major order
+    """
+    for start, stop in _band_windows(len(lats), band_rows, plan.max_level):
+        rows, cols = np.nonzero(plan.keep_mask(keep, start, stop))
+        if len(rows) == 0:
+            empty = np.empty(0, dtype=np.float32)
+            yield empty, empty, lats[start:stop], lons, rows, cols
+            continue
+        # Only the rows that hold kept points are read
+        row0, row1 = int(rows[0]), int(rows[-1]) + 1
+        u = _read_rows(u_data, coord_dims, start + row0, start + row1)
+        v = _read_rows(v_data, coord_dims, start + row0, start + row1)
+        yield u[rows - row0, cols], v[rows - row0, cols], lats[start:stop], lons, rows, cols
+
+
+def decimation_summary(plan, keep, tolerance):
+    """
+    Points kept per block size, for logs and the statistics sidecar.
+    """
+    by_level = {1: int(np.count_nonzero(keep[0] & plan.valid))}
+    for level in range(1, plan.max_level + 1):
+        by_level[2 ** level] = int(np.count_nonzero(keep[level] & plan.levels[level][1]))
+    return {"tolerance": float(tolerance), "max_block": 2 ** plan.max_level,
+            "points_by_block_size": {str(size): count for size, count in by_level.items()}}
@@ -1,103 +1,156 @@
 #!/usr/bin/env python
-import xarray as xr
+import argparse
 import os
+import time
 
-def analyze_netcdf(file_path):
+from chunked_io import DEFAULT_MEMORY_BUDGET_MB, fused_statistics
+from slab_store import open_source
+from instrumentation import run_metrics
+from netcdf_inspect import inspect_directory, print_inspection, report_netcdf, write_inspection_json
+
+def analyze_netcdf(file_path, chunked=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, metrics=None,
+                   fast=False, json_path=None):
     """
     Analyze a NetCDF file and print its structure, variables, dimensions,
     and some basic statistics about the data.
     
     Args:
         file_path (str): Path to the NetCDF file
+        chunked (bool): Open the file lazily with dask chunks and compute the
+                        statistics out-of-core in one fused pass per variable
+        memory_budget_mb (float): Peak memory budget for chunked mode, in MiB
+        metrics (RunMetrics): Metrics of an enclosing run to add to; by default
+                              the call is instrumented as its own run
+        fast (bool): Describe the file from its metadata only
+                     (see netcdf_inspect.report_netcdf)
+        json_path (str): In fast mode, write the report as JSON here
+                         ('-' for stdout, instead of the text report)
+    
+    Returns:
+        dict: The inspection report in fast mode, otherwise None
     """
     if not os.path.exists(file_path):
         print(f"Error: File not found: {file_path}")
         return
     
-    try:
-        # Open the NetCDF file
-        ds = xr.open_dataset(file_path)
-        
-        # Print general information
-        print("=" * 80)
-        print(f"NetCDF File: {file_path}")
-        print("=" * 80)
+    with run_metrics('analyze_netcdf', metrics) as metrics:
+        metrics.set_info(input=file_path, chunked=chunked, fast=fast)
+        if fast:
+            with metrics.stage('inspect'):
+                return report_netcdf(file_path, json_path)
         
-        # Print dimensions
-        print("\nDimensions:")
-        print("-" * 40)
-        for dim_name, dim_size in ds.dims.items():
-            print(f"{dim_name}: {dim_size}")
-        
-        # Print variables
-        print("\nVariables:")
-        print("-" * 40)
-        for var_name, var in ds.variables.items():
-            dims = ", ".join([str(d) for d in var.dims])
-            print(f"{var_name}: {var.dtype}, Dimensions: ({dims})")
+        try:
+            # Open the NetCDF file (or its slab store)
+            with metrics.stage('open'):
+                ds, num_workers, source_path = open_source(file_path, chunked, memory_budget_mb)
+            describe_start = time.perf_counter()
             
-            # Print variable attributes if they exist
-            if var.attrs:
-                print("  Attributes:")
-                for attr_name, attr_value in var.attrs.items():
-                    print(f"    {attr_name}: {attr_value}")
-        
-        # Print global attributes
-        print("\nGlobal Attributes:")
-        print("-" * 40)
-        for attr_name, attr_value in ds.attrs.items():
-            print(f"{attr_name}: {attr_value}")
-        
-        # For ocean current data, check for common variable names
-        current_vars = ['uo', 'vo', 'u', 'v', 'water_u', 'water_v']
-        found_current_vars = []
-        
-        for var in current_vars:
-            if var in ds.variables:
-                found_current_vars.append(var)
-                print(f"\nFound current variable: {var}")
-                print(f"  Shape: {ds[var].shape}")
-                
-                # Get some statistics if it's a numeric variable
-                if ds[var].dtype.kind in 'iufc':  # integer, unsigned int, float, complex
-                    try:
-                        print(f"  Min: {ds[var].min().values}")
-                        print(f"  Max: {ds[var].max().values}")
-                        print(f"  Mean: {ds[var].mean().values}")
-                    except Exception as e:
-                        print(f"  Error computing statistics: {str(e)}")
-        
-        if not found_current_vars:
-            print("\nNo standard ocean current variables found in this dataset.")
-            print("Looking for variables with 'current' or 'velocity' in their name or attributes...")
+            # Print general information
+            print("=" * 80)
+            print(f"NetCDF File: {file_path}")
+            if source_path != file_path:
+                print(f"Slab store: {source_path}")
+            print("=" * 80)
             
+            # Print dimensions
+            print("\nDimensions:")
+            print("-" * 40)
+            for dim_name, dim_size in ds.dims.items():
+                print(f"{dim_name}: {dim_size}")
+            
+            # Print variables
+            print("\nVariables:")
+            print("-" * 40)
             for var_name, var in ds.variables.items():
-                if 'current' in var_name.lower() or 'velocity' in var_name.lower():
-                    print(f"\nPotential current variable: {var_name}")
-                    print(f"  Shape: {var.shape}")
-                    print(f"  Dimensions: {var.dims}")
+                dims = ", ".join([str(d) for d in var.dims])
+                print(f"{var_name}: {var.dtype}, Dimensions: ({dims})")
+                
+                # Print variable attributes if they exist
+                if var.attrs:
+                    print("  Attributes:")
+                    for attr_name, attr_value in var.attrs.items():
+                        print(f"    {attr_name}: {attr_value}")
+            
+            # Print global attributes
+            print("\nGlobal Attributes:")
+            print("-" * 40)
+            for attr_name, attr_value in ds.attrs.items():
+                print(f"{attr_name}: {attr_value}")
+            
+            # For ocean current data, check for common variable names
+            current_vars = ['uo', 'vo', 'u', 'v', 'water_u', 'water_v']
+            found_current_vars = []
+            
+            for var in current_vars:
+                if var in ds.variables:
+                    found_current_vars.append(var)
+                    print(f"\nFound current variable: {var}")
+                    print(f"  Shape: {ds[var].shape}")
                     
-                    # Get some attributes if they exist
-                    if var.attrs:
-                        print("  Attributes:")
-                        for attr_name, attr_value in var.attrs.items():
-                            print(f"    {attr_name}: {attr_value}")
+                    # Get some statistics if it's a numeric variable
+                    if ds[var].dtype.kind in 'iufc':  # integer, unsigned int, float, complex
+                        try:
+                            if chunked:
+                                stats = fused_statistics(ds[var], num_workers)
+                                print(f"  Min: {stats['min']}")
+                                print(f"  Max: {stats['max']}")
+                                print(f"  Mean: {stats['mean']}")
+                            else:
+                                print(f"  Min: {ds[var].min().values}")
+                                print(f"  Max: {ds[var].max().values}")
+                                print(f"  Mean: {ds[var].mean().values}")
+                        except Exception as e:
+                            print(f"  Error computing statistics: {str(e)}")
+            
+            if not found_current_vars:
+                print("\nNo standard ocean current variables found in this dataset.")
+                print("Looking for variables with 'current' or 'velocity' in their name or attributes...")
+                
+                for var_name, var in ds.variables.items():
+                    if 'current' in var_name.lower() or 'velocity' in var_name.lower():
+                        print(f"\nPotential current variable: {var_name}")
+                        print(f"  Shape: {var.shape}")
+                        print(f"  Dimensions: {var.dims}")
+                        
+                        # Get some attributes if they exist
+                        if var.attrs:
+                            print("  Attributes:")
+                            for attr_name, attr_value in var.attrs.items():
+                                print(f"    {attr_name}: {attr_value}")
+            
+            metrics.add_time('describe', time.perf_counter() - describe_start)
+            print("\nAnalysis complete.")
         
-        print("\nAnalysis complete.")
-    
-    except Exception as e:
-        print(f"Error analyzing NetCDF file: {str(e)}")
-    finally:
-        try:
-            ds.close()
-        except:
-            pass
+        except Exception as e:
+            metrics.fail(e)
+            print(f"Error analyzing NetCDF file: {str(e)}")
+        finally:
+            try:
+                ds.close()
+            except:
+                pass
 
 if __name__ == "__main__":
     # Get the directory of the script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # Path to your NetCDF file
-    netcdf_file = os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc")
+    parser = argparse.ArgumentParser(description="Describe a NetCDF file (or a directory of them)")
+    parser.add_argument("path", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--fast", action="store_true",
+                        help="Metadata only, statistics from attributes or a chunk sample")
+    parser.add_argument("--json", default=None, help="Fast mode: write the report as JSON ('-' for stdout)")
+    parser.add_argument("--chunked", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for a directory (fast mode)")
+    args = parser.parse_args()
     
-    analyze_netcdf(netcdf_file)
\ No newline at end of file
+    if os.path.isdir(args.path):
+        # A directory of downloads is always inspected in fast mode, in parallel
+        reports = inspect_directory(args.path, workers=args.workers)
+        if args.json != '-':
+            for report in reports:
+                print_inspection(report)
+        if args.json:
+            write_inspection_json(reports, args.json)
+    else:
+        analyze_netcdf(args.path, chunked=args.chunked, fast=args.fast or bool(args.json), json_path=args.json)
\ No newline at end of file
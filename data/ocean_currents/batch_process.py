@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+import xarray as xr
+import pandas as pd
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from currents_engine import (
+    find_current_variables,
+    identify_coord_dims,
+    select_slice,
+    compute_currents_at,
+)
+from streaming_writer import CurrentsRecordWriter
+from ocean_index import ocean_index_for, iter_ocean_bands
+from input_validation import validate_netcdf
+from process_currents_full import process_dataset
+
+
+def plan_slices(netcdf_file, time_indices=None, depth_indices=None):
+    """
+    List the (time_index, depth_index) pairs to process for a NetCDF file.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        time_indices (list): Time indices to process. If None, every time step
+        depth_indices (list): Depth indices to process. If None, every depth level
+
+    Returns:
+        list: (time_index, depth_index) tuples, time-major
+    """
+    with xr.open_dataset(netcdf_file) as ds:
+        u_var, v_var = find_current_variables(ds)
+        if u_var is None or v_var is None:
+            raise ValueError(f"No ocean current velocity variables in {netcdf_file}")
+        coord_dims = identify_coord_dims(ds, u_var)
+        n_time = ds.sizes[coord_dims['time']] if 'time' in coord_dims else 1
+        n_depth = ds.sizes[coord_dims['depth']] if 'depth' in coord_dims else 1
+
+    if time_indices is None:
+        time_indices = range(n_time)
+    if depth_indices is None:
+        depth_indices = range(n_depth)
+
+    for index in time_indices:
+        if not 0 <= index < n_time:
+            raise ValueError(f"Time index {index} is out of range (0-{n_time - 1})")
+    for index in depth_indices:
+        if not 0 <= index < n_depth:
+            raise ValueError(f"Depth index {index} is out of range (0-{n_depth - 1})")
+
+    return [(t, d) for t in time_indices for d in depth_indices]
+
+
+def shard_slices(slices, n_shards):
+    """
+    Split the slice list into contiguous shards of near-equal size.
+
+    Contiguous runs keep each worker reading neighbouring time steps, which
+    share NetCDF chunks.
+
+    Args:
+        slices (list): Output of plan_slices
+        n_shards (int): Number of shards wanted
+
+    Returns:
+        list: Non-empty lists of slices
+    """
+    n_shards = max(1, min(n_shards, len(slices)))
+    size, extra = divmod(len(slices), n_shards)
+    shards = []
+    start = 0
+    for shard_index in range(n_shards):
+        end = start + size + (1 if shard_index < extra else 0)
+        shards.append(slices[start:end])
+        start = end
+    return shards
+
+
+def slice_file_name(time_label, depth_index):
+    """
+    Name of the output file for one (time, depth) slice.
+    """
+    return f"currents_{time_label}_d{depth_index:02d}.json"
+
+
+def process_shard(netcdf_file, output_dir, slices, sample_factor):
+    """
+    Worker: open the dataset once and write one JSON output per slice.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_dir (str): Directory receiving the per-slice JSON files
+        slices (list): (time_index, depth_index) pairs handled by this worker
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+
+    Returns:
+        list: Manifest entries, one per slice written
+    """
+    entries = []
+    with xr.open_dataset(netcdf_file) as ds:
+        u_var, v_var = find_current_variables(ds)
+        coord_dims = identify_coord_dims(ds, u_var)
+        lats = ds[coord_dims['lat']].values
+        lons = ds[coord_dims['lon']].values
+        times = ds[coord_dims['time']].values if 'time' in coord_dims else None
+        depths = ds[coord_dims['depth']].values if 'depth' in coord_dims else None
+        indexes = {}
+
+        for time_index, depth_index in slices:
+            u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+            v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
+            # The ocean index of a depth level is loaded once and reused for all its time steps
+            if depth_index not in indexes:
+                indexes[depth_index], _ = ocean_index_for(ds, u_var, v_var, coord_dims, depth_index, time_index,
+                                                          source=netcdf_file)
+            band = next(iter_ocean_bands(u_data, v_data, lats, lons, coord_dims, indexes[depth_index], sample_factor))
+            fields = compute_currents_at(*band)
+
+            if times is not None:
+                timestamp = pd.to_datetime(str(times[time_index]))
+                time_str = timestamp.strftime('%Y-%m-%dT%H:%M:%S')
+                time_label = timestamp.strftime('%Y%m%dT%H%M')
+            else:
+                time_str = None
+                time_label = f"t{time_index:03d}"
+
+            file_name = slice_file_name(time_label, depth_index)
+            with CurrentsRecordWriter(os.path.join(output_dir, file_name)) as writer:
+                writer.write(fields)
+
+            entries.append({
+                "file": file_name,
+                "time": time_str,
+                "time_index": int(time_index),
+                "depth": float(depths[depth_index]) if depths is not None else None,
+                "depth_index": int(depth_index),
+                "points": writer.count,
+            })
+    return entries
+
+
+def process_forecast_run(netcdf_file, output_dir, time_indices=None, depth_indices=None,
+                         sample_factor=8, max_workers=None):
+    """
+    Process every requested (time, depth) slice of a forecast run in parallel
+    and write a manifest indexing the outputs.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_dir (str): Directory for the per-slice JSON files and manifest.json
+        time_indices (list): Time indices to process. If None, every time step
+        depth_indices (list): Depth indices to process. If None, every depth level
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        max_workers (int): Number of worker processes. If None, one per CPU
+
+    Returns:
+        dict: The manifest that was written
+    """
+    if not os.path.exists(netcdf_file):
+        raise FileNotFoundError(f"NetCDF file not found: {netcdf_file}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    slices = plan_slices(netcdf_file, time_indices, depth_indices)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    shards = shard_slices(slices, max_workers)
+
+    print(f"Processing {len(slices)} slices from {netcdf_file} with {len(shards)} worker(s)")
+    start = time.perf_counter()
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [
+            executor.submit(process_shard, netcdf_file, output_dir, shard, sample_factor)
+            for shard in shards
+        ]
+        for future in as_completed(futures):
+            shard_entries = future.result()
+            entries.extend(shard_entries)
+            print(f"  Finished shard with {len(shard_entries)} slice(s)")
+
+    entries.sort(key=lambda entry: (entry["time_index"], entry["depth_index"]))
+    manifest = {
+        "source": os.path.basename(netcdf_file),
+        "generated": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "sample_factor": sample_factor,
+        "slices": entries,
+    }
+    write_json_atomic(os.path.join(output_dir, "manifest.json"), manifest)
+
+    print(f"Wrote {len(entries)} slices and manifest.json to {output_dir} in {time.perf_counter() - start:.1f} s")
+    return manifest
+
+
+def write_json_atomic(path, document):
+    """
+    Write a JSON document under a temporary name and rename it into place.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def collect_inputs(paths, pattern="*.nc"):
+    """
+    Expand directories to the matching files inside them.
+
+    Args:
+        paths (list): Files and directories
+        pattern (str): Glob pattern of the files taken from a directory
+
+    Returns:
+        list: File paths, directories expanded in file name order
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def quarantine_file(netcdf_file, quarantine_dir, report):
+    """
+    Set a failed input aside: link to it from the quarantine directory and
+    write its report next to the link. The input itself is left in place.
+
+    The link name carries a hash of the source directory, so inputs of the
+    same name from different directories never overwrite each other.
+
+    Args:
+        netcdf_file (str): Input that failed validation or processing
+        quarantine_dir (str): Directory receiving the link and <name>.report.json
+        report (dict): Validation report, with any processing error added
+
+    Returns:
+        str: Path of the quarantine entry (the link)
+    """
+    os.makedirs(quarantine_dir, exist_ok=True)
+    source = os.path.abspath(netcdf_file)
+    stem, ext = os.path.splitext(os.path.basename(source))
+    tag = hashlib.sha1(os.path.dirname(source).encode('utf-8')).hexdigest()[:8]
+    link = os.path.join(quarantine_dir, f"{stem}.{tag}{ext}")
+    tmp_link = f"{link}.{os.getpid()}.tmp"
+    try:
+        os.symlink(source, tmp_link)
+        os.replace(tmp_link, link)
+    except OSError:
+        # No symlinks on this filesystem; the report still names the input
+        pass
+    write_json_atomic(link + ".report.json", dict(report, file=source))
+    return link
+
+
+def process_validated_file(netcdf_file, output_dir, quarantine_dir, params):
+    """
+    Worker: validate one file, then process it or quarantine it.
+
+    Processing errors are caught once per file, never per cell. Outputs are
+    renamed into place only when complete, so a failing file publishes
+    nothing and leaves earlier outputs of the same name untouched.
+
+    Args:
+        netcdf_file (str): Input NetCDF file
+        output_dir (str): Directory receiving <name>_processed.json and .bin
+        quarantine_dir (str): Directory receiving failed inputs and their reports
+        params (dict): sample_factor, depth_layer, time_index and binary_encoding
+
+    Returns:
+        dict: Batch report entry of the file
+    """
+    start = time.perf_counter()
+    report = validate_netcdf(netcdf_file, time_index=params["time_index"], depth_index=params["depth_layer"],
+                             sample_factor=params["sample_factor"])
+    entry = {"file": os.path.basename(netcdf_file), "warnings": report["warnings"]}
+    if report["valid"] and report["layer"] != 'currents':
+        report["valid"] = False
+        report["errors"].append(f"Expected ocean currents, found a {report['layer']} file")
+    if report["valid"]:
+        output_json = os.path.join(output_dir, os.path.splitext(entry["file"])[0] + "_processed.json")
+        try:
+            with xr.open_dataset(netcdf_file) as ds:
+                _, summary = process_dataset(ds, netcdf_file, output_json, **params)
+            entry.update(status="processed", points=summary["points"], outputs=summary["outputs"])
+        except Exception as e:
+            report["valid"] = False
+            report["errors"].append(f"Processing failed: {type(e).__name__}: {e}")
+            report["traceback"] = traceback.format_exc()
+    if not report["valid"]:
+        entry.update(status="quarantined", errors=report["errors"],
+                     quarantined=quarantine_file(netcdf_file, quarantine_dir, report))
+    entry["seconds"] = time.perf_counter() - start
+    return entry
+
+
+def _process_validated(args):
+    return process_validated_file(*args)
+
+
+def _run_pool(tasks, indices, workers):
+    """
+    Run the given tasks in one shared worker pool.
+
+    A worker that dies breaks the pool and fails every unfinished task with
+    BrokenProcessPool. The pool hands tasks out in submission order, so the
+    ones that were running are the first workers + 1 unfinished ones (one
+    call is queued ahead); only those are suspects.
+
+    Returns:
+        tuple: (entries, errors) by task index, the unfinished indices and
+               the suspects among them
+    """
+    entries, errors, broken = {}, {}, []
+    with ProcessPoolExecutor(max_workers=min(workers, len(indices))) as executor:
+        futures = {executor.submit(_process_validated, tasks[i]): i for i in indices}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                entries[i] = future.result()
+            except BrokenProcessPool:
+                broken.append(i)
+            except Exception as e:
+                errors[i] = e
+    unfinished = [i for i in indices if i in broken]
+    return entries, errors, unfinished, unfinished[:workers + 1]
+
+
+def _process_isolated(task):
+    """
+    Run one file in a worker of its own, so a crash takes only that file down.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_process_validated, task).result()
+
+
+def _worker_failed(netcdf_file, quarantine_dir, error):
+    """
+    Batch report entry of a file whose worker died or raised.
+    """
+    errors = [f"Worker failed: {type(error).__name__}: {error}"]
+    report = {"valid": False, "layer": None, "errors": errors, "warnings": [], "grid": {}, "variables": {},
+              "file": os.path.abspath(netcdf_file)}
+    return {"file": os.path.basename(netcdf_file), "warnings": [], "status": "quarantined", "errors": errors,
+            "quarantined": quarantine_file(netcdf_file, quarantine_dir, report), "seconds": None}
+
+
+def process_validated_batch(netcdf_files, output_dir, quarantine_dir=None, sample_factor=8, depth_layer=0,
+                            time_index=0, binary_encoding='float32', max_workers=None):
+    """
+    Process many files, setting aside the ones that fail instead of stopping.
+
+    Each file is checked up front with whole-array tests (dtype, coordinate
+    monotonicity, NaN fraction, value ranges) and processed only if it
+    passes. Failing files are linked from the quarantine directory with a
+    report (the inputs stay where they are); the rest of the batch carries
+    on, and a crashing worker only costs a pool restart. A batch_report.json in the
+    output directory lists the outcome of every file.
+
+    Args:
+        netcdf_files (list): Input files (directories are expanded to *.nc)
+        output_dir (str): Directory for the processed outputs and batch_report.json
+        quarantine_dir (str): Directory for failed inputs (default: <output_dir>/quarantine)
+        sample_factor, depth_layer, time_index, binary_encoding: See process_dataset
+        max_workers (int): Number of worker processes. If None, one per CPU
+
+    Returns:
+        dict: The batch report that was written
+    """
+    files = collect_inputs(netcdf_files)
+    if not files:
+        raise ValueError(f"No input files in {netcdf_files}")
+    quarantine_dir = quarantine_dir or os.path.join(output_dir, "quarantine")
+    os.makedirs(output_dir, exist_ok=True)
+    params = {"sample_factor": sample_factor, "depth_layer": depth_layer, "time_index": time_index,
+              "binary_encoding": binary_encoding}
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(files)))
+
+    print(f"Validating and processing {len(files)} file(s) with {workers} worker(s)")
+    start = time.perf_counter()
+    tasks = [(path, output_dir, quarantine_dir, params) for path in files]
+    # Files always run in worker processes, so a crash (segfault, OOM kill)
+    # costs one pool rather than the batch. Unfinished files go back into a
+    # fresh shared pool; a file that was running during two crashes is run
+    # on its own, and quarantined if it crashes there too
+    entries = [None] * len(tasks)
+    crashes = [0] * len(tasks)
+    pending = list(range(len(tasks)))
+    while pending:
+        isolated = [i for i in pending if crashes[i] >= 2]
+        shared = [i for i in pending if crashes[i] < 2]
+        pending = []
+        if shared:
+            done, errors, unfinished, suspects = _run_pool(tasks, shared, workers)
+            for i, entry in done.items():
+                entries[i] = entry
+            for i, error in errors.items():
+                entries[i] = _worker_failed(files[i], quarantine_dir, error)
+            for i in suspects:
+                crashes[i] += 1
+            if unfinished:
+                print(f"  Worker pool broke; resubmitting {len(unfinished)} unfinished file(s)")
+            pending = unfinished
+        for i in isolated:
+            try:
+                entries[i] = _process_isolated(tasks[i])
+            except Exception as e:
+                entries[i] = _worker_failed(files[i], quarantine_dir, e)
+
+    processed = [entry for entry in entries if entry["status"] == "processed"]
+    quarantined = [entry for entry in entries if entry["status"] == "quarantined"]
+    report = {
+        "generated": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "params": params,
+        "processed": len(processed),
+        "quarantined": len(quarantined),
+        "seconds": time.perf_counter() - start,
+        "files": entries,
+    }
+    write_json_atomic(os.path.join(output_dir, "batch_report.json"), report)
+
+    print(f"Processed {len(processed)} file(s), quarantined {len(quarantined)} in {report['seconds']:.1f} s")
+    for entry in quarantined:
+        print(f"  {entry['file']} -> {entry['quarantined']}")
+        for message in entry["errors"]:
+            print(f"    {message}")
+    return report
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Process every time step and depth of a forecast run, "
+                                                 "or (--validated) one slice of each of many files")
+    parser.add_argument("netcdf_files", nargs="*",
+                        default=[os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc")],
+                        help="NetCDF file; with --validated, any number of files and directories")
+    parser.add_argument("--output-dir",
+                        default=os.path.join(script_dir, "..", "..", "public", "data", "ocean_currents", "slices"))
+    parser.add_argument("--times", type=int, nargs="*", help="Time indices (default: all)")
+    parser.add_argument("--depths", type=int, nargs="*", help="Depth indices (default: all)")
+    parser.add_argument("--sample-factor", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--validated", action="store_true",
+                        help="Validate each file first and quarantine failing ones (first time/depth only)")
+    parser.add_argument("--quarantine-dir", default=None, help="Default: <output-dir>/quarantine")
+    args = parser.parse_args()
+
+    if args.validated:
+        report = process_validated_batch(args.netcdf_files, args.output_dir, args.quarantine_dir,
+                                         sample_factor=args.sample_factor,
+                                         time_index=args.times[0] if args.times else 0,
+                                         depth_layer=args.depths[0] if args.depths else 0,
+                                         max_workers=args.workers)
+        raise SystemExit(1 if report["quarantined"] else 0)
+    if len(args.netcdf_files) != 1:
+        parser.error("Processing a forecast run takes one file; use --validated for batches")
+    process_forecast_run(args.netcdf_files[0], args.output_dir, args.times, args.depths,
+                         sample_factor=args.sample_factor, max_workers=args.workers)
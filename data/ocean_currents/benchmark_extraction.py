@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import math
+import os
+import sys
+import tempfile
+import time
+
+from currents_engine import (
+    find_current_variables,
+    identify_coord_dims,
+    select_slice,
+    extract_slab,
+    compute_currents,
+    build_records,
+)
+from synthetic_data import write_synthetic_currents
+
+
+def extract_points_loop(u_data, v_data, lats, lons, sample_factor):
+    """
+    Reference implementation: the original per-point loop of process_ocean_currents.
+    """
+    processed_data = []
+    for i in range(0, len(lats), sample_factor):
+        for j in range(0, len(lons), sample_factor):
+            u = float(u_data[i, j].values)
+            v = float(v_data[i, j].values)
+            if math.isnan(u) or math.isnan(v):
+                continue
+            speed = math.sqrt(u**2 + v**2)
+            direction = math.degrees(math.atan2(v, u))
+            if direction < 0:
+                direction += 360
+            lat = float(lats[i])
+            lon = float(lons[j])
+            if lat < -90 or lat > 90 or lon < -180 or lon > 180:
+                continue
+            processed_data.append({
+                "lat": lat,
+                "lon": lon,
+                "u": u,
+                "v": v,
+                "speed": speed,
+                "direction": direction,
+                "type": "current"
+            })
+    return processed_data
+
+
+def extract_points_vectorized(u_data, v_data, lats, lons, coord_dims, sample_factor):
+    """
+    Vectorized engine used by process_ocean_currents.
+    """
+    u, v, sampled_lats, sampled_lons = extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor)
+    return build_records(compute_currents(u, v, sampled_lats, sampled_lons))
+
+
+def records_match(expected, actual, rtol=1e-12):
+    """
+    Compare two record lists field by field.
+
+    Vectorized arctan2/sqrt may differ from the scalar math module in the last
+    bit, so numeric fields are compared with a tight relative tolerance.
+    """
+    if len(expected) != len(actual):
+        return False
+    if not expected:
+        return True
+    if any(a["type"] != b["type"] for a, b in zip(expected, actual)):
+        return False
+    for key in ("lat", "lon", "u", "v", "speed", "direction"):
+        a = np.array([record[key] for record in expected])
+        b = np.array([record[key] for record in actual])
+        if not np.allclose(a, b, rtol=rtol, atol=0):
+            return False
+    return True
+
+
+def run_benchmark(netcdf_file, sample_factor=8):
+    """
+    Time the per-point loop against the vectorized engine on one slice and
+    check that both produce the same records.
+
+    Args:
+        netcdf_file (str): Path to a NetCDF file with u/v current variables
+        sample_factor (int): Stride applied to both lat and lon
+
+    Returns:
+        dict: Timings in seconds, point count and whether the outputs match
+    """
+    ds = xr.open_dataset(netcdf_file)
+    try:
+        u_var, v_var = find_current_variables(ds)
+        coord_dims = identify_coord_dims(ds, u_var)
+        u_data = select_slice(ds[u_var], coord_dims).load()
+        v_data = select_slice(ds[v_var], coord_dims).load()
+        lats = ds[coord_dims['lat']].values
+        lons = ds[coord_dims['lon']].values
+
+        start = time.perf_counter()
+        loop_records = extract_points_loop(u_data, v_data, lats, lons, sample_factor)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector_records = extract_points_vectorized(u_data, v_data, lats, lons, coord_dims, sample_factor)
+        vector_seconds = time.perf_counter() - start
+    finally:
+        ds.close()
+
+    return {
+        "points": len(vector_records),
+        "loop_seconds": loop_seconds,
+        "vectorized_seconds": vector_seconds,
+        "speedup": loop_seconds / vector_seconds if vector_seconds > 0 else float("inf"),
+        "match": records_match(loop_records, vector_records),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: benchmark_extraction.py [netcdf_file] [sample_factor]
+    sample_factor = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    if len(sys.argv) > 1:
+        netcdf_file = sys.argv[1]
+    else:
+        # No input given: benchmark on a synthetic 1/12 deg grid (about 1/4 of GLO12)
+        netcdf_file = os.path.join(tempfile.mkdtemp(), "synthetic_currents.nc")
+        write_synthetic_currents(netcdf_file, n_lat=1080, n_lon=2160)
+
+    print(f"Benchmarking extraction on {netcdf_file} (sample_factor={sample_factor})")
+    result = run_benchmark(netcdf_file, sample_factor)
+    print(f"Points extracted:   {result['points']}")
+    print(f"Per-point loop:     {result['loop_seconds']:.3f} s")
+    print(f"Vectorized engine:  {result['vectorized_seconds']:.3f} s")
+    print(f"Speedup:            {result['speedup']:.1f}x")
+    print(f"Records match:      {result['match']}")
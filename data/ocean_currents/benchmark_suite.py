@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+import numpy as np
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from synthetic_data import make_synthetic_currents
+
+# Dataset shapes (time, depth, lat, lon). 'glo12' is the full grid of the
+# oceancurrents.py subset at 1/12 deg; 'large' and 'medium' are a half and a
+# quarter of it per side.
+SIZES = {
+    'small': (1, 1, 180, 360),
+    'medium': (4, 2, 432, 892),
+    'large': (4, 1, 864, 1784),
+    'glo12': (1, 1, 1725, 3568),
+}
+
+DEFAULT_SIZES = ('small', 'medium', 'large')
+DEFAULT_SAMPLE_FACTORS = (1, 5, 8)
+DEFAULT_REPEATS = 3
+
+# Slowdown (relative to the baseline) above which a case is reported as a
+# regression, provided it is also larger than MIN_REGRESSION_SECONDS (timer
+# and process start-up noise dominates the smallest cases)
+DEFAULT_THRESHOLD = 0.10
+MIN_REGRESSION_SECONDS = 0.25
+
+# Packing used by the Copernicus GLO12 files: int16 with scale/offset, zlib
+# level 1 (netcdf_compression_level=1) and per-slab chunks
+PACKED_ENCODING = {
+    "dtype": "int16",
+    "scale_factor": 0.000610370188951492,
+    "add_offset": 0.0,
+    "_FillValue": -32767,
+    "zlib": True,
+    "complevel": 1,
+}
+
+
+def parse_size(text):
+    """
+    Size preset name or explicit 'T,D,LAT,LON' shape.
+    """
+    if text in SIZES:
+        return text, SIZES[text]
+    shape = tuple(int(part) for part in text.split(','))
+    if len(shape) != 4:
+        raise ValueError(f"Size must be one of {sorted(SIZES)} or T,D,LAT,LON, got {text!r}")
+    return text, shape
+
+
+def write_benchmark_file(path, shape, packed=True, seed=0):
+    """
+    Write a synthetic GLO12-shaped currents file.
+
+    Args:
+        path (str): Output NetCDF path
+        shape (tuple): (time, depth, lat, lon)
+        packed (bool): Store uo/vo as packed int16 like the Copernicus files
+            (otherwise plain float32)
+        seed (int): Random seed
+
+    Returns:
+        int: File size in bytes
+    """
+    n_time, n_depth, n_lat, n_lon = shape
+    ds = make_synthetic_currents(n_time=n_time, n_depth=n_depth, n_lat=n_lat, n_lon=n_lon, seed=seed)
+    encoding = {}
+    for name in ("uo", "vo"):
+        chunks = (1, 1, min(n_lat, 512), min(n_lon, 512))
+        encoding[name] = dict(PACKED_ENCODING, chunksizes=chunks) if packed else {"chunksizes": chunks}
+    ds.to_netcdf(path, encoding=encoding)
+    return os.path.getsize(path)
+
+
+def run_case(case, netcdf_file, sample_factor, output_dir):
+    """
+    Run one benchmark case in this process (called in a fresh child process
+    so peak RSS belongs to the case alone).
+
+    Returns:
+        dict: 'wall_seconds', 'peak_rss_mb', 'output_bytes' and 'points'
+    """
+    from process_currents_full import analyze_netcdf, process_ocean_currents
+
+    output_json = os.path.join(output_dir, f"{case}_sf{sample_factor}.json")
+    outputs = []
+    points = None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if case == 'analyze':
+            analyze_netcdf(netcdf_file)
+        elif case == 'process':
+            points = process_ocean_currents(netcdf_file, output_json, sample_factor=sample_factor, return_data=False)
+            outputs = [output_json, os.path.splitext(output_json)[0] + ".bin"]
+        else:
+            raise ValueError(f"Unknown benchmark case {case!r}")
+        wall_seconds = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    output_bytes = sum(os.path.getsize(path) for path in outputs if os.path.exists(path))
+    for path in outputs:
+        if os.path.exists(path):
+            os.remove(path)
+    return {"wall_seconds": wall_seconds, "peak_rss_mb": peak_mb, "output_bytes": output_bytes, "points": points}
+
+
+def run_case_subprocess(case, netcdf_file, sample_factor, output_dir):
+    """
+    Run run_case in a child interpreter and return its result.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", case, netcdf_file,
+               str(sample_factor), output_dir]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark case {case} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_suite(sizes=DEFAULT_SIZES, sample_factors=DEFAULT_SAMPLE_FACTORS, repeats=DEFAULT_REPEATS,
+              packed=True, work_dir=None):
+    """
+    Benchmark analyze_netcdf and process_ocean_currents across dataset sizes
+    and sample factors.
+
+    Each (case, size, sample_factor) is run `repeats` times in fresh child
+    processes; the fastest wall time and the largest peak RSS are kept.
+    analyze_netcdf does not depend on sample_factor and runs once per size.
+
+    Args:
+        sizes (list): Size preset names or 'T,D,LAT,LON' strings
+        sample_factors (list): sample_factor values for process_ocean_currents
+        repeats (int): Runs per case
+        packed (bool): Write int16-packed inputs like the Copernicus files
+        work_dir (str): Directory for the synthetic inputs (default: a temp dir)
+
+    Returns:
+        dict: Results document (see write_results)
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="aquanova_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for size_name in sizes:
+        label, shape = parse_size(size_name)
+        netcdf_file = os.path.join(work_dir, f"synthetic_{'x'.join(map(str, shape))}{'_packed' if packed else ''}.nc")
+        if not os.path.exists(netcdf_file):
+            write_benchmark_file(netcdf_file, shape, packed)
+        input_bytes = os.path.getsize(netcdf_file)
+        cells = int(np.prod(shape))
+
+        cases = [('analyze', None)] + [('process', factor) for factor in sample_factors]
+        for case, sample_factor in cases:
+            runs = [run_case_subprocess(case, netcdf_file, sample_factor or 1, work_dir) for _ in range(repeats)]
+            entry = {
+                "case": case,
+                "size": label,
+                "shape": list(shape),
+                "cells": cells,
+                "input_bytes": input_bytes,
+                "sample_factor": sample_factor,
+                "wall_seconds": min(run["wall_seconds"] for run in runs),
+                "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+                "output_bytes": runs[0]["output_bytes"],
+                "points": runs[0]["points"],
+            }
+            results.append(entry)
+            print(f"{case:<8} {label:<12} sf={sample_factor or '-':<3} {entry['wall_seconds']:8.3f} s "
+                  f"{entry['peak_rss_mb']:8.1f} MiB {entry['output_bytes'] / 2 ** 20:8.2f} MiB out "
+                  f"({entry['wall_seconds'] / cells * 1e9:.1f} ns/cell)")
+
+    return {
+        "created": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "packed_inputs": packed,
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def write_results(document, path):
+    """
+    Write a results document as JSON.
+    """
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+def case_key(entry):
+    return (entry["case"], tuple(entry["shape"]), entry["sample_factor"])
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two results documents case by case.
+
+    Args:
+        baseline (dict): Earlier results document
+        current (dict): New results document
+        threshold (float): Relative slowdown (or RSS growth) counted as a regression
+
+    Returns:
+        list: One dict per case present in both, with the baseline/current
+              values, their ratios and a 'regression' flag
+    """
+    before = {case_key(entry): entry for entry in baseline["results"]}
+    rows = []
+    for entry in current["results"]:
+        old = before.get(case_key(entry))
+        if old is None:
+            continue
+        time_ratio = entry["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else float("inf")
+        rss_ratio = entry["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] else float("inf")
+        rows.append({
+            "case": entry["case"],
+            "size": entry["size"],
+            "sample_factor": entry["sample_factor"],
+            "baseline_seconds": old["wall_seconds"],
+            "current_seconds": entry["wall_seconds"],
+            "time_ratio": time_ratio,
+            "rss_ratio": rss_ratio,
+            "output_changed": entry["output_bytes"] != old["output_bytes"],
+            "regression": ((time_ratio > 1 + threshold
+                            and entry["wall_seconds"] - old["wall_seconds"] > MIN_REGRESSION_SECONDS)
+                           or rss_ratio > 1 + threshold),
+        })
+    return rows
+
+
+def print_comparison(rows):
+    """
+    Print a comparison table and return the number of regressions.
+    """
+    print(f"{'case':<8} {'size':<12} {'sf':>3} {'baseline':>10} {'current':>10} {'time':>7} {'rss':>7}")
+    for row in rows:
+        flags = []
+        if row["regression"]:
+            flags.append("REGRESSION")
+        if row["output_changed"]:
+            flags.append("output size changed")
+        print(f"{row['case']:<8} {row['size']:<12} {str(row['sample_factor'] or '-'):>3} "
+              f"{row['baseline_seconds']:9.3f}s {row['current_seconds']:9.3f}s "
+              f"{row['time_ratio']:6.2f}x {row['rss_ratio']:6.2f}x  {' '.join(flags)}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{len(rows)} cases compared, {regressions} regression(s)")
+    return regressions
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run-case":
+        # Internal: one case in a fresh process, result as JSON on stdout
+        _, _, case, netcdf_file, sample_factor, output_dir = sys.argv
+        print(json.dumps(run_case(case, netcdf_file, int(sample_factor), output_dir)))
+        sys.exit(0)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Benchmark the NetCDF pipeline on synthetic GLO12-shaped data")
+    parser.add_argument("--sizes", nargs="*", default=list(DEFAULT_SIZES),
+                        help=f"Presets {sorted(SIZES)} or T,D,LAT,LON shapes")
+    parser.add_argument("--sample-factors", type=int, nargs="*", default=list(DEFAULT_SAMPLE_FACTORS))
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--float32", action="store_true", help="Write plain float32 inputs instead of packed int16")
+    parser.add_argument("--work-dir", default=None, help="Where synthetic inputs are kept (reused across runs)")
+    parser.add_argument("--output", default=os.path.join(script_dir, "benchmark_results.json"))
+    parser.add_argument("--baseline", default=None, help="Results file to compare against")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Only compare two existing results files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        sys.exit(1 if print_comparison(compare_results(baseline, current, args.threshold)) else 0)
+
+    document = run_suite(args.sizes, args.sample_factors, args.repeats, packed=not args.float32,
+                         work_dir=args.work_dir)
+    write_results(document, args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.exit(1 if print_comparison(compare_results(baseline, document, args.threshold)) else 0)
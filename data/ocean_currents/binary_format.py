@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+import numpy as np
+import io
+import json
+import os
+
+# File layout
+# -----------
+#   bytes 0-3   magic b"AQNV"
+#   bytes 4-7   uint32 (little endian) format version
+#   bytes 8-11  uint32 (little endian) length of the JSON header in bytes
+#   bytes 12-   UTF-8 JSON header, zero padded so the data section starts on
+#               a DATA_ALIGNMENT boundary
+#   data        one C-ordered (nlat, nlon) array per variable, then the
+#               uint8 validity mask; every block starts on a DATA_ALIGNMENT
+#               boundary so it can be viewed in place with np.memmap or a JS
+#               Float32Array/Int16Array/Uint8Array without copying
+#
+# The header holds the regular grid definition (origin, step, shape), and for
+# every variable its dtype, byte offset and, for quantized int16 data, the
+# scale/add_offset/fill needed to decode it.
+
+MAGIC = b"AQNV"
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 16
+PREFIX_SIZE = 12
+
+ENCODINGS = ('float32', 'int16')
+INT16_FILL = -32768
+
+
+def _align(offset):
+    return (offset + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+
+
+def regular_axis(values, name, rtol=1e-3):
+    """
+    Return (origin, step) of an evenly spaced coordinate axis.
+
+    Args:
+        values (numpy.ndarray): Coordinate values
+        name (str): Axis name, used in the error message
+        rtol (float): Allowed relative deviation of any spacing from the mean
+
+    Returns:
+        tuple: (origin, step) as floats
+
+    Raises:
+        ValueError: If the axis is not evenly spaced
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2:
+        return float(values[0]) if values.size else 0.0, 0.0
+    steps = np.diff(values)
+    step = (values[-1] - values[0]) / (values.size - 1)
+    if not np.allclose(steps, step, rtol=rtol, atol=0):
+        raise ValueError(f"{name} axis is not evenly spaced; cannot describe it with origin/step")
+    return float(values[0]), float(step)
+
+
+def quantize_int16(values, valid):
+    """
+    Linearly quantize a float array to int16 over its valid range.
+
+    Args:
+        values (numpy.ndarray): Float values
+        valid (numpy.ndarray): Boolean mask of cells to encode
+
+    Returns:
+        tuple: (int16 array, scale, add_offset); invalid cells hold INT16_FILL
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if np.any(valid):
+        low = float(values[valid].min())
+        high = float(values[valid].max())
+    else:
+        low = high = 0.0
+    # -32767..32767 carries data, -32768 is reserved for the fill value
+    add_offset = (high + low) / 2.0
+    scale = (high - low) / 65534.0 or 1.0
+    quantized = np.full(values.shape, INT16_FILL, dtype='<i2')
+    quantized[valid] = np.round((values[valid] - add_offset) / scale).astype('<i2')
+    return quantized, scale, add_offset
+
+
+def encode_grid_binary(lats, lons, variables, valid=None, encoding='float32', attrs=None):
+    """
+    Encode 2-D fields on a regular lat/lon grid in the columnar binary format.
+
+    Args:
+        lats (numpy.ndarray): Latitude of each row (evenly spaced)
+        lons (numpy.ndarray): Longitude of each column (evenly spaced)
+        variables (dict): Variable name -> 2-D array shaped (len(lats), len(lons))
+        valid (numpy.ndarray): Boolean validity mask. If None, cells where every
+            variable is finite
+        encoding (str): 'float32' or 'int16' (quantized with scale/add_offset)
+        attrs (dict): Extra JSON-serializable metadata stored in the header
+
+    Returns:
+        bytes: The encoded file contents
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+
+    lat0, dlat = regular_axis(lats, "Latitude")
+    lon0, dlon = regular_axis(lons, "Longitude")
+    shape = (len(lats), len(lons))
+
+    arrays = {name: np.asarray(values) for name, values in variables.items()}
+    for name, values in arrays.items():
+        if values.shape != shape:
+            raise ValueError(f"Variable {name} has shape {values.shape}, expected {shape}")
+    if valid is None:
+        valid = np.ones(shape, dtype=bool)
+        for values in arrays.values():
+            valid &= np.isfinite(values)
+    valid = np.asarray(valid, dtype=bool)
+
+    # Encode every block first so the header can record exact offsets
+    blocks = []
+    variable_headers = []
+    for name, values in arrays.items():
+        if encoding == 'int16':
+            data, scale, add_offset = quantize_int16(values, valid)
+            entry = {"name": name, "dtype": "int16", "scale": scale,
+                     "add_offset": add_offset, "fill": INT16_FILL}
+        else:
+            data = np.where(valid, values, np.nan).astype('<f4')
+            entry = {"name": name, "dtype": "float32"}
+        blocks.append(np.ascontiguousarray(data))
+        variable_headers.append(entry)
+    blocks.append(valid.astype(np.uint8))
+
+    header, header_bytes, _ = _layout(lat0, dlat, lon0, dlon, shape, variable_headers,
+                                      [block.nbytes for block in blocks], attrs)
+
+    f = io.BytesIO()
+    f.write(_prefix(header_bytes))
+    for entry, block in zip(variable_headers + [header["mask"]], blocks):
+        f.write(b"\0" * (entry["offset"] - f.tell()))
+        f.write(block.tobytes())
+    return f.getvalue()
+
+
+def _layout(lat0, dlat, lon0, dlon, shape, variable_headers, block_nbytes, attrs):
+    """
+    Build the header and assign every block its aligned byte offset.
+
+    Returns:
+        tuple: (header dict, encoded header bytes, total file size)
+    """
+    header = {
+        "version": FORMAT_VERSION,
+        "grid": {"lat0": lat0, "dlat": dlat, "nlat": shape[0],
+                 "lon0": lon0, "dlon": dlon, "nlon": shape[1]},
+        "variables": variable_headers,
+        "mask": {"dtype": "uint8"},
+        "attrs": attrs or {},
+    }
+
+    # Offsets depend on the header length, which depends on the offsets'
+    # digits; iterate until the layout is stable (at most a couple of passes)
+    header_bytes = b""
+    while True:
+        offset = _align(PREFIX_SIZE + len(header_bytes))
+        data_start = offset
+        for entry, nbytes in zip(variable_headers + [header["mask"]], block_nbytes):
+            entry["offset"] = offset
+            end = offset + nbytes
+            offset = _align(end)
+        candidate = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        if _align(PREFIX_SIZE + len(candidate)) == data_start:
+            header_bytes = candidate
+            break
+        header_bytes = candidate
+    return header, header_bytes, end
+
+
+def _prefix(header_bytes):
+    """
+    Magic, version, header length and the header itself.
+    """
+    return MAGIC + np.array([FORMAT_VERSION, len(header_bytes)], dtype='<u4').tobytes() + header_bytes
+
+
+def create_grid_binary(path, lats, lons, names, attrs=None):
+    """
+    Preallocate a float32 binary grid file and map its blocks for writing.
+
+    Lets a producer fill the file band by band without holding the whole
+    grid in memory. Every row of every variable and of the mask must be
+    written before the file is used; unwritten cells read as 0 / invalid.
+
+    Args:
+        path (str): Output file path
+        lats (numpy.ndarray): Latitude of each row (evenly spaced)
+        lons (numpy.ndarray): Longitude of each column (evenly spaced)
+        names (list): Variable names, in block order
+        attrs (dict): Extra JSON-serializable metadata stored in the header
+
+    Returns:
+        tuple: (header, arrays) where arrays maps each name and 'mask' to a
+               writable (nlat, nlon) np.memmap
+    """
+    lat0, dlat = regular_axis(lats, "Latitude")
+    lon0, dlon = regular_axis(lons, "Longitude")
+    shape = (len(lats), len(lons))
+    cells = shape[0] * shape[1]
+    variable_headers = [{"name": name, "dtype": "float32"} for name in names]
+    header, header_bytes, total = _layout(lat0, dlat, lon0, dlon, shape, variable_headers,
+                                          [cells * 4] * len(names) + [cells], attrs)
+
+    with open(path, 'wb') as f:
+        f.write(_prefix(header_bytes))
+        # Extending the file zero-fills the padding, as encode_grid_binary does
+        f.truncate(total)
+
+    arrays = {}
+    for entry in header["variables"]:
+        arrays[entry["name"]] = np.memmap(path, dtype='<f4', mode='r+', offset=entry["offset"], shape=shape)
+    arrays["mask"] = np.memmap(path, dtype=np.uint8, mode='r+', offset=header["mask"]["offset"], shape=shape)
+    return header, arrays
+
+
+def write_grid_binary(path, lats, lons, variables, valid=None, encoding='float32', attrs=None):
+    """
+    Write 2-D fields on a regular lat/lon grid in the columnar binary format.
+
+    The file is written under a temporary name and renamed into place.
+
+    Args:
+        path (str): Output file path
+        lats, lons, variables, valid, encoding, attrs: See encode_grid_binary
+
+    Returns:
+        int: Number of bytes written
+    """
+    data = encode_grid_binary(lats, lons, variables, valid=valid, encoding=encoding, attrs=attrs)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(data)
+
+
+def write_currents_binary(path, u, v, lats, lons, encoding='float32', attrs=None):
+    """
+    Write a sampled u/v slab in the columnar binary format.
+
+    Cells are valid where u and v are both present and the coordinates lie
+    inside the standard lat/lon range, matching the JSON records.
+
+    Args:
+        path (str): Output file path
+        u (numpy.ndarray): 2-D eastward current, shaped (len(lats), len(lons))
+        v (numpy.ndarray): 2-D northward current, same shape as u
+        lats (numpy.ndarray): Latitude of each row
+        lons (numpy.ndarray): Longitude of each column
+        encoding (str): 'float32' or 'int16'
+        attrs (dict): Extra metadata stored in the header
+
+    Returns:
+        int: Number of bytes written
+    """
+    valid = currents_valid_mask(u, v, lats, lons)
+    attrs = dict(attrs or {}, type="current")
+    return write_grid_binary(path, lats, lons, {"u": u, "v": v}, valid=valid,
+                             encoding=encoding, attrs=attrs)
+
+
+def currents_valid_mask(u, v, lats, lons):
+    """
+    Cells kept by compute_currents: u and v present and coordinates inside
+    the standard lat/lon range.
+
+    Returns:
+        numpy.ndarray: Boolean mask shaped like u
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    valid = ~(np.isnan(u) | np.isnan(v))
+    valid &= ((lats >= -90) & (lats <= 90))[:, None]
+    valid &= ((lons >= -180) & (lons <= 180))[None, :]
+    return valid
+
+
+class CurrentsBinaryWriter:
+    """
+    Write a sampled u/v slab in the columnar binary format band by band.
+
+    float32 bands go straight into a preallocated, memory-mapped file, so the
+    slab is never held in memory. Quantized encodings need the global value
+    range, so their (sampled) bands are kept and encoded by close(). The file
+    is written under a temporary name that close() renames into place.
+
+    Usage:
+        writer = CurrentsBinaryWriter(path, lats, lons)
+        for band_u, band_v, band_lats, band_lons in bands:
+            writer.write(band_u, band_v, band_lats, band_lons)
+        writer.close()
+    """
+
+    def __init__(self, path, lats, lons, encoding='float32', attrs=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+        self.path = path
+        self.lats = lats
+        self.lons = lons
+        self.encoding = encoding
+        self.attrs = dict(attrs or {}, type="current")
+        self.row = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._arrays = None
+        self._u_parts, self._v_parts = [], []
+        if encoding == 'float32':
+            _, self._arrays = create_grid_binary(self._tmp_path, lats, lons, ['u', 'v'], attrs=self.attrs)
+        else:
+            # Quantized encodings are written at the end; make sure the grid can be stored at all
+            regular_axis(lats, "Latitude")
+            regular_axis(lons, "Longitude")
+
+    def write(self, u, v, lats, lons):
+        """
+        Append the next band of rows.
+
+        Args:
+            u (numpy.ndarray): Eastward current, shaped (len(lats), len(lons))
+            v (numpy.ndarray): Northward current, same shape as u
+            lats (numpy.ndarray): Latitude of each row of the band
+            lons (numpy.ndarray): Longitude of each column
+        """
+        if self._arrays is not None:
+            rows = slice(self.row, self.row + len(lats))
+            valid = currents_valid_mask(u, v, lats, lons)
+            self._arrays['u'][rows] = np.where(valid, u, np.nan)
+            self._arrays['v'][rows] = np.where(valid, v, np.nan)
+            self._arrays['mask'][rows] = valid
+        else:
+            self._u_parts.append(u)
+            self._v_parts.append(v)
+        self.row += len(lats)
+
+    def close(self):
+        """
+        Finish the file and move it into place.
+
+        Returns:
+            int: Number of bytes written
+        """
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                array.flush()
+            self._arrays = None
+            os.replace(self._tmp_path, self.path)
+            return os.path.getsize(self.path)
+        u, v = np.concatenate(self._u_parts), np.concatenate(self._v_parts)
+        self._u_parts, self._v_parts = [], []
+        return write_currents_binary(self.path, u, v, self.lats, self.lons, encoding=self.encoding,
+                                     attrs=self.attrs)
+
+    def abort(self):
+        """
+        Discard everything written; an existing output is left untouched.
+        """
+        self._arrays = None
+        self._u_parts, self._v_parts = [], []
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def read_grid_header(path):
+    """
+    Read only the JSON header of a binary grid file.
+
+    Args:
+        path (str): Binary file path
+
+    Returns:
+        dict: Parsed header
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(PREFIX_SIZE)
+        if prefix[:4] != MAGIC:
+            raise ValueError(f"{path} is not an AquaNova binary grid file")
+        version, header_length = np.frombuffer(prefix[4:], dtype='<u4')
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} uses format version {version}, newer than supported {FORMAT_VERSION}")
+        return json.loads(f.read(int(header_length)).decode('utf-8'))
+
+
+def read_grid_binary(path, decode=False):
+    """
+    Open a binary grid file with zero-copy memory-mapped arrays.
+
+    Args:
+        path (str): Binary file path
+        decode (bool): If True, return int16 variables decoded to float32
+            (this copies); float32 variables are always returned as views
+
+    Returns:
+        tuple: (header, arrays) where arrays maps variable names and 'mask'
+               to (nlat, nlon) arrays
+    """
+    header = read_grid_header(path)
+    shape = (header["grid"]["nlat"], header["grid"]["nlon"])
+    arrays = {}
+    for entry in header["variables"]:
+        dtype = '<f4' if entry["dtype"] == "float32" else '<i2'
+        data = np.memmap(path, dtype=dtype, mode='r', offset=entry["offset"], shape=shape)
+        if decode and entry["dtype"] == "int16":
+            decoded = data.astype(np.float32) * np.float32(entry["scale"]) + np.float32(entry["add_offset"])
+            decoded[data == entry["fill"]] = np.nan
+            data = decoded
+        arrays[entry["name"]] = data
+    arrays["mask"] = np.memmap(path, dtype=np.uint8, mode='r', offset=header["mask"]["offset"], shape=shape)
+    return header, arrays
+
+
+def grid_coordinates(header):
+    """
+    Rebuild the latitude and longitude axes described by a header.
+
+    Args:
+        header (dict): Binary grid header
+
+    Returns:
+        tuple: (lats, lons) as float64 arrays
+    """
+    grid = header["grid"]
+    lats = grid["lat0"] + grid["dlat"] * np.arange(grid["nlat"])
+    lons = grid["lon0"] + grid["dlon"] * np.arange(grid["nlon"])
+    return lats, lons
+
+
+def binary_path_for(output_json):
+    """
+    Path of the binary file written alongside a JSON output.
+    """
+    if output_json.endswith('.gz'):
+        output_json = output_json[:-3]
+    return os.path.splitext(output_json)[0] + ".bin"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import os
+
+# Default peak-memory budget for chunked (out-of-core) processing
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# Rough number of live copies of a chunk while it is decoded and reduced
+# (raw read, float64 promotion, reduction temporaries)
+WORKING_COPIES = 4
+
+
+def require_dask():
+    """
+    Import dask, with an actionable message when it is not installed.
+    """
+    try:
+        import dask
+    except ImportError:
+        raise ImportError("Chunked mode needs dask: pip install dask")
+    return dask
+
+
+def disk_chunk_sizes(ds, var_name):
+    """
+    On-disk chunk shape of a variable.
+
+    Args:
+        ds (xarray.Dataset): Dataset opened without dask chunks
+        var_name (str): Variable name
+
+    Returns:
+        dict: Dimension name -> chunk length; empty if the variable is stored
+              contiguously
+    """
+    encoding = ds[var_name].encoding
+    preferred = encoding.get('preferred_chunks')
+    if preferred:
+        return dict(preferred)
+    chunksizes = encoding.get('chunksizes')
+    if chunksizes:
+        return dict(zip(ds[var_name].dims, chunksizes))
+    return {}
+
+
+def plan_chunks(ds, var_names, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Choose dask chunks aligned to the on-disk chunking and sized so that all
+    worker threads together stay inside the memory budget.
+
+    Chunks start from the disk chunk shape (or one 2-D slab per time/depth
+    step when the file is contiguous). Oversized chunks are split along
+    latitude in multiples of the disk chunk; small ones are grown along the
+    leading (time) dimension so the task graph stays small.
+
+    Args:
+        ds (xarray.Dataset): Dataset opened without dask chunks
+        var_names (list): Variables that will be read together
+        memory_budget_mb (float): Peak memory budget in MiB
+
+    Returns:
+        tuple: (chunks dict for xr.open_dataset, number of worker threads)
+    """
+    reference = var_names[0]
+    dims = ds[reference].dims
+    sizes = dict(zip(dims, ds[reference].shape))
+    itemsize = ds[reference].dtype.itemsize
+    disk = disk_chunk_sizes(ds, reference)
+
+    if disk:
+        chunks = {dim: min(disk.get(dim, sizes[dim]), sizes[dim]) for dim in dims}
+    else:
+        # Contiguous file: one (lat, lon) slab per leading index
+        chunks = {dim: (1 if position < len(dims) - 2 else sizes[dim]) for position, dim in enumerate(dims)}
+
+    budget = memory_budget_mb * 2 ** 20
+    per_chunk_cost = len(var_names) * WORKING_COPIES * itemsize
+    workers = max(1, min(os.cpu_count() or 1, 8))
+    target = budget / workers / per_chunk_cost
+
+    def n_cells():
+        return int(np.prod(list(chunks.values())))
+
+    # Split along the second-to-last (latitude) dimension, keeping disk alignment
+    if len(dims) >= 2:
+        lat_dim = dims[-2]
+        step = disk.get(lat_dim, 1)
+        while n_cells() > target and chunks[lat_dim] > step:
+            chunks[lat_dim] = max(step, (chunks[lat_dim] // 2) // step * step)
+
+    # Grow along the first dimension while there is room
+    if len(dims) > 2:
+        lead_dim = dims[0]
+        step = disk.get(lead_dim, 1)
+        while chunks[lead_dim] + step <= sizes[lead_dim] and n_cells() / chunks[lead_dim] * (chunks[lead_dim] + step) <= target:
+            chunks[lead_dim] += step
+
+    # A single chunk may still exceed the budget (e.g. one huge disk chunk);
+    # fall back to fewer threads rather than blowing the budget
+    workers = int(max(1, min(workers, budget // max(1, n_cells() * per_chunk_cost))))
+    return chunks, workers
+
+
+def open_chunked_dataset(netcdf_file, var_names=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, engine=None):
+    """
+    Open a NetCDF file lazily with dask chunks aligned to its disk chunking.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        var_names (list): Variables whose chunking drives the plan. If None,
+            the largest data variable is used
+        memory_budget_mb (float): Peak memory budget in MiB
+        engine (str): xarray backend (e.g. 'zarr' for a slab store); default
+            picks it from the file
+
+    Returns:
+        tuple: (xarray.Dataset backed by dask arrays, number of worker threads)
+    """
+    require_dask()
+    with xr.open_dataset(netcdf_file, engine=engine, chunks=None) as probe:
+        if not var_names:
+            var_names = [max(probe.data_vars, key=lambda name: probe[name].size)]
+        chunks, workers = plan_chunks(probe, var_names, memory_budget_mb)
+    return xr.open_dataset(netcdf_file, engine=engine, chunks=chunks), workers
+
+
+def fused_statistics(data_array, num_workers=1):
+    """
+    Compute min, max and mean of a (possibly dask-backed) array in one pass.
+
+    The three reductions are handed to dask together, so each chunk is read
+    and decoded once and feeds all of them.
+
+    Args:
+        data_array (xarray.DataArray): Variable to summarize
+        num_workers (int): Threads used by the dask scheduler
+
+    Returns:
+        dict: 'min', 'max' and 'mean' as floats
+    """
+    dask = require_dask()
+    minimum, maximum, mean = dask.compute(
+        data_array.min(), data_array.max(), data_array.mean(),
+        scheduler='threads', num_workers=num_workers,
+    )
+    return {'min': float(minimum), 'max': float(maximum), 'mean': float(mean)}
+
+
+def band_rows_for_budget(n_lon, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, n_vars=2):
+    """
+    Number of full-width source rows that fit in the memory budget.
+
+    Args:
+        n_lon (int): Number of longitude columns in a row
+        memory_budget_mb (float): Peak memory budget in MiB
+        n_vars (int): Number of variables read per row
+
+    Returns:
+        int: Rows per band (at least 1)
+    """
+    bytes_per_row = n_lon * n_vars * WORKING_COPIES * 8
+    return max(1, int(memory_budget_mb * 2 ** 20 // bytes_per_row))
@@ -0,0 +1,495 @@
+#!/usr/bin/env python
+import numpy as np
+import argparse
+import json
+import math
+
+from binary_format import read_grid_binary, grid_coordinates, regular_axis
+from currents_engine import current_direction
+
+# Indian EEZ bounding box, as in src/utils/dataUtils.js
+INDIAN_EEZ_BOUNDS = {
+    'north': 37.0,
+    'south': 6.0,
+    'east': 97.0,
+    'west': 68.0,
+}
+
+# Mean Earth radius in kilometers (as used by calculateDistance in dataUtils.js)
+EARTH_RADIUS_KM = 6371.0
+
+# Neighbours blended by inverse-distance weighting for scattered fields
+SCATTER_NEIGHBOURS = 4
+
+
+def require_scipy():
+    """
+    Import scipy.spatial, with an actionable message when it is not installed.
+    """
+    try:
+        from scipy import spatial
+    except ImportError:
+        raise ImportError("KD-tree lookups need scipy: pip install scipy")
+    return spatial
+
+
+def to_unit_vectors(lats, lons):
+    """
+    Convert latitude/longitude in degrees to points on the unit sphere, so
+    Euclidean (chord) distances are monotonic in great-circle distance and
+    the dateline needs no special handling.
+
+    Returns:
+        numpy.ndarray: (n, 3) array
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64)).ravel()
+    lon = np.radians(np.asarray(lons, dtype=np.float64)).ravel()
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_for_km(distance_km):
+    """
+    Unit-sphere chord length corresponding to a great-circle distance.
+    """
+    return 2.0 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2.0)
+
+
+def current_fields(lats, lons, u, v):
+    """
+    Assemble query results in the layout of compute_currents (lat, lon, u, v,
+    speed, direction), with NaN where no current is available.
+    """
+    speed = np.sqrt(u ** 2 + v ** 2)
+    direction = current_direction(u, v)
+    return {
+        'lat': np.asarray(lats, dtype=np.float64),
+        'lon': np.asarray(lons, dtype=np.float64),
+        'u': u,
+        'v': v,
+        'speed': speed,
+        'direction': direction,
+    }
+
+
+class CurrentField:
+    """
+    A processed u/v current field that answers point, area and trajectory
+    queries on whole arrays of query points at once.
+
+    Fields on a regular lat/lon grid are looked up in O(1) per point from
+    the grid origin and step and bilinearly interpolated; query points whose
+    interpolation cell touches a masked (land) corner take the nearest valid
+    cell within max_gap_km instead. Scattered fields (irregular axes or bare
+    point lists) are answered from a KD-tree by inverse-distance weighting of
+    the nearest points. KD-trees need scipy and are only built on first use.
+
+    Usage:
+        field = CurrentField.from_binary('ocean_currents_processed.bin')
+        result = field.sample(lats, lons)   # dict of arrays like compute_currents
+    """
+
+    def __init__(self, lats, lons, u, v):
+        """
+        Args:
+            lats (numpy.ndarray): Latitude axis (nlat,)
+            lons (numpy.ndarray): Longitude axis (nlon,)
+            u (numpy.ndarray): Eastward velocity (nlat, nlon), NaN where invalid
+            v (numpy.ndarray): Northward velocity (nlat, nlon), NaN where invalid
+        """
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.u = np.asarray(u, dtype=np.float64)
+        self.v = np.asarray(v, dtype=np.float64)
+        self.valid = np.isfinite(self.u) & np.isfinite(self.v)
+        self._tree = None
+        self._tree_index = None
+        try:
+            self.lat0, self.dlat = regular_axis(self.lats, "latitude")
+            self.lon0, self.dlon = regular_axis(self.lons, "longitude")
+            self.regular = self.dlat != 0 and self.dlon != 0
+        except ValueError:
+            self.regular = False
+        # A global grid wraps around in longitude
+        self.periodic = self.regular and abs(abs(self.dlon) * len(self.lons) - 360.0) < abs(self.dlon) * 1e-3
+        # Default gap bridged next to land: one grid diagonal
+        if self.regular:
+            self.max_gap_km = math.radians(math.hypot(self.dlat, self.dlon)) * EARTH_RADIUS_KM
+        else:
+            self.max_gap_km = None
+
+    @classmethod
+    def from_binary(cls, path):
+        """
+        Load a field from an AquaNova binary grid file (e.g. written by
+        process_ocean_currents next to its JSON output).
+        """
+        header, arrays = read_grid_binary(path, decode=True)
+        lats, lons = grid_coordinates(header)
+        valid = arrays['mask'].astype(bool)
+        u = np.where(valid, arrays['u'], np.nan)
+        v = np.where(valid, arrays['v'], np.nan)
+        return cls(lats, lons, u, v)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a field from processed records (dicts with lat, lon, u, v), as
+        written to the JSON output of process_ocean_currents.
+
+        Records lying on a regular lattice are placed back on it, with NaN
+        for the points that were skipped; anything else becomes a scattered
+        field answered from the KD-tree.
+
+        Args:
+            records (list or str): Records, or the path of a JSON/NDJSON file of them
+        """
+        if isinstance(records, str):
+            with open(records) as f:
+                text = f.read()
+            if text.lstrip().startswith('['):
+                records = json.loads(text)
+            else:
+                records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        lats = np.array([r['lat'] for r in records], dtype=np.float64)
+        lons = np.array([r['lon'] for r in records], dtype=np.float64)
+        u = np.array([r['u'] for r in records], dtype=np.float64)
+        v = np.array([r['v'] for r in records], dtype=np.float64)
+        return cls.from_points(lats, lons, u, v)
+
+    @classmethod
+    def from_points(cls, lats, lons, u, v):
+        """
+        Build a field from 1-D arrays of point coordinates and velocities.
+
+        See from_records.
+        """
+        lat_axis, rows = np.unique(lats, return_inverse=True)
+        lon_axis, cols = np.unique(lons, return_inverse=True)
+        try:
+            regular_axis(lat_axis, "latitude")
+            regular_axis(lon_axis, "longitude")
+            lattice = len(lat_axis) > 1 and len(lon_axis) > 1
+        except ValueError:
+            lattice = False
+        # Only worth a grid if the points cover a decent share of it
+        if lattice and len(lats) >= 0.1 * len(lat_axis) * len(lon_axis):
+            grid_u = np.full((len(lat_axis), len(lon_axis)), np.nan)
+            grid_v = np.full_like(grid_u, np.nan)
+            grid_u[rows, cols] = u
+            grid_v[rows, cols] = v
+            return cls(lat_axis, lon_axis, grid_u, grid_v)
+        return ScatteredCurrentField(lats, lons, u, v)
+
+    def _nearest_tree(self):
+        if self._tree is None:
+            spatial = require_scipy()
+            rows, cols = np.nonzero(self.valid)
+            self._tree = spatial.cKDTree(to_unit_vectors(self.lats[rows], self.lons[cols]))
+            self._tree_index = (rows, cols)
+        return self._tree, self._tree_index
+
+    def _grid_position(self, lats, lons):
+        """
+        Fractional (row, col) of query points on the regular grid.
+        """
+        rows = (lats - self.lat0) / self.dlat
+        lons = np.asarray(lons, dtype=np.float64)
+        if self.periodic:
+            lons = self.lon0 + np.mod(lons - self.lon0, 360.0)
+        cols = (lons - self.lon0) / self.dlon
+        return rows, cols
+
+    def nearest(self, lats, lons, max_distance_km=None):
+        """
+        Nearest valid grid cell to each query point.
+
+        Args:
+            lats (array-like): Query latitudes
+            lons (array-like): Query longitudes
+            max_distance_km (float): Points farther than this from any valid
+                cell get NaN; None means unlimited
+
+        Returns:
+            dict: Arrays like compute_currents plus 'distance_km'; lat/lon
+                  are the query positions
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        u = np.full(lats.shape, np.nan)
+        v = np.full(lats.shape, np.nan)
+        distance_km = np.full(lats.shape, np.inf)
+        if self.valid.any() and lats.size:
+            tree, (rows, cols) = self._nearest_tree()
+            upper = chord_for_km(max_distance_km) if max_distance_km is not None else np.inf
+            chord, index = tree.query(to_unit_vectors(lats, lons), distance_upper_bound=upper)
+            found = np.isfinite(chord)
+            hit = index[found]
+            u.ravel()[found] = self.u[rows[hit], cols[hit]]
+            v.ravel()[found] = self.v[rows[hit], cols[hit]]
+            distance_km.ravel()[found] = 2.0 * np.arcsin(np.minimum(chord[found] / 2.0, 1.0)) * EARTH_RADIUS_KM
+        fields = current_fields(lats, lons, u, v)
+        fields['distance_km'] = distance_km
+        return fields
+
+    def sample(self, lats, lons):
+        """
+        Velocity at arbitrary points by bilinear interpolation.
+
+        Points outside the grid get NaN. Points next to land, where one of
+        the four surrounding cells is masked, take the nearest valid cell
+        within max_gap_km (NaN beyond it, i.e. on land).
+
+        Args:
+            lats (array-like): Query latitudes
+            lons (array-like): Query longitudes (any shape, matching lats)
+
+        Returns:
+            dict: Arrays like compute_currents (lat, lon, u, v, speed, direction)
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if not self.regular:
+            return self.nearest(lats, lons, self.max_gap_km)
+
+        nlat, nlon = self.u.shape
+        rows, cols = self._grid_position(lats, lons)
+        max_col = nlon if self.periodic else nlon - 1
+        inside = (rows >= 0) & (rows <= nlat - 1) & (cols >= 0) & (cols <= max_col)
+
+        # Lower-left corner, kept one short of the edge so the upper corner exists
+        r0 = np.clip(np.floor(np.where(inside, rows, 0)).astype(np.intp), 0, max(nlat - 2, 0))
+        c0 = np.clip(np.floor(np.where(inside, cols, 0)).astype(np.intp), 0, max(max_col - 1, 0))
+        fr = np.where(inside, rows, 0) - r0
+        fc = np.where(inside, cols, 0) - c0
+        r1 = np.minimum(r0 + 1, nlat - 1)
+        c1 = (c0 + 1) % nlon if self.periodic else np.minimum(c0 + 1, nlon - 1)
+
+        def bilinear(values):
+            return ((1 - fr) * (1 - fc) * values[r0, c0] + (1 - fr) * fc * values[r0, c1]
+                    + fr * (1 - fc) * values[r1, c0] + fr * fc * values[r1, c1])
+
+        u = np.where(inside, bilinear(self.u), np.nan)
+        v = np.where(inside, bilinear(self.v), np.nan)
+
+        # Cells touching the coast: fall back to the nearest valid cell
+        coastal = inside & ~(np.isfinite(u) & np.isfinite(v))
+        if coastal.any():
+            nearest = self.nearest(lats[coastal], lons[coastal], self.max_gap_km)
+            u[coastal] = nearest['u']
+            v[coastal] = nearest['v']
+        return current_fields(lats, lons, u, v)
+
+    def bbox(self, south, north, west, east):
+        """
+        Cut out the part of the field inside a bounding box.
+
+        On a regular grid the index window is computed directly from the
+        grid origin and step, so only the window is copied.
+
+        Args:
+            south, north (float): Latitude bounds in degrees
+            west, east (float): Longitude bounds in degrees
+
+        Returns:
+            CurrentField: The sub-field
+        """
+        if self.regular:
+            rows = np.sort(np.array([(south - self.lat0) / self.dlat, (north - self.lat0) / self.dlat]))
+            cols = np.sort(np.array([(west - self.lon0) / self.dlon, (east - self.lon0) / self.dlon]))
+            r_start = max(0, int(math.ceil(rows[0] - 1e-9)))
+            r_stop = min(len(self.lats), int(math.floor(rows[1] + 1e-9)) + 1)
+            c_start = max(0, int(math.ceil(cols[0] - 1e-9)))
+            c_stop = min(len(self.lons), int(math.floor(cols[1] + 1e-9)) + 1)
+            window = (slice(r_start, max(r_start, r_stop)), slice(c_start, max(c_start, c_stop)))
+            return CurrentField(self.lats[window[0]], self.lons[window[1]], self.u[window], self.v[window])
+        lat_keep = (self.lats >= south) & (self.lats <= north)
+        lon_keep = (self.lons >= west) & (self.lons <= east)
+        return CurrentField(self.lats[lat_keep], self.lons[lon_keep],
+                            self.u[np.ix_(lat_keep, lon_keep)], self.v[np.ix_(lat_keep, lon_keep)])
+
+    def points(self):
+        """
+        The valid cells as flat arrays like compute_currents, row-major.
+        """
+        rows, cols = np.nonzero(self.valid)
+        return current_fields(self.lats[rows], self.lons[cols], self.u[rows, cols], self.v[rows, cols])
+
+    def sample_trajectory(self, lats, lons, spacing_km=None):
+        """
+        Sample the field along a polyline.
+
+        Args:
+            lats (array-like): Vertex latitudes of the track
+            lons (array-like): Vertex longitudes of the track
+            spacing_km (float): If given, each segment is subdivided so samples
+                are at most this far apart; otherwise only the vertices are sampled
+
+        Returns:
+            dict: Arrays like compute_currents plus 'distance_km', the
+                  along-track distance of every sample
+        """
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        segment_km = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:])
+        if spacing_km and len(lats) > 1:
+            steps = np.maximum(1, np.ceil(segment_km / spacing_km)).astype(np.intp)
+            # Fractional position of every sample along its segment
+            segment = np.repeat(np.arange(len(steps)), steps)
+            offset = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+            fraction = offset / steps[segment]
+            sample_lats = np.append(lats[segment] + fraction * (lats[segment + 1] - lats[segment]), lats[-1])
+            dlon = (lons[1:] - lons[:-1] + 180.0) % 360.0 - 180.0
+            sample_lons = np.append(lons[segment] + fraction * dlon[segment], lons[-1])
+            along = np.append(np.concatenate(([0.0], np.cumsum(segment_km)))[segment]
+                              + fraction * segment_km[segment], segment_km.sum())
+        else:
+            sample_lats, sample_lons = lats, lons
+            along = np.concatenate(([0.0], np.cumsum(segment_km)))
+        fields = self.sample(sample_lats, sample_lons)
+        fields['distance_km'] = along
+        return fields
+
+
+class ScatteredCurrentField(CurrentField):
+    """
+    Current field given as scattered points rather than a grid, answered from
+    a KD-tree by inverse-distance weighting of the nearest points.
+    """
+
+    def __init__(self, lats, lons, u, v, neighbours=SCATTER_NEIGHBOURS, max_gap_km=None):
+        """
+        Args:
+            lats, lons, u, v (numpy.ndarray): 1-D arrays, one entry per point
+            neighbours (int): Points blended per query
+            max_gap_km (float): Queries with no point within this distance get
+                NaN; defaults to three times the median point spacing
+        """
+        self.lats = np.asarray(lats, dtype=np.float64).ravel()
+        self.lons = np.asarray(lons, dtype=np.float64).ravel()
+        self.u = np.asarray(u, dtype=np.float64).ravel()
+        self.v = np.asarray(v, dtype=np.float64).ravel()
+        self.valid = np.isfinite(self.u) & np.isfinite(self.v)
+        self.regular = False
+        self.periodic = False
+        self.neighbours = neighbours
+        self._tree = None
+        self.max_gap_km = max_gap_km
+        if max_gap_km is None and self.valid.sum() > 1:
+            tree, _ = self._nearest_tree()
+            chord, _ = tree.query(tree.data, k=2)
+            self.max_gap_km = 3.0 * float(np.median(chord[:, 1])) * EARTH_RADIUS_KM
+
+    def _nearest_tree(self):
+        if self._tree is None:
+            spatial = require_scipy()
+            keep = np.nonzero(self.valid)[0]
+            self._tree = spatial.cKDTree(to_unit_vectors(self.lats[keep], self.lons[keep]))
+            self._tree_index = keep
+        return self._tree, self._tree_index
+
+    def nearest(self, lats, lons, max_distance_km=None):
+        """
+        Nearest valid point to each query point. See CurrentField.nearest.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        u = np.full(lats.shape, np.nan)
+        v = np.full(lats.shape, np.nan)
+        distance_km = np.full(lats.shape, np.inf)
+        if self.valid.any() and lats.size:
+            tree, keep = self._nearest_tree()
+            upper = chord_for_km(max_distance_km) if max_distance_km is not None else np.inf
+            chord, index = tree.query(to_unit_vectors(lats, lons), distance_upper_bound=upper)
+            found = np.isfinite(chord)
+            u.ravel()[found] = self.u[keep[index[found]]]
+            v.ravel()[found] = self.v[keep[index[found]]]
+            distance_km.ravel()[found] = 2.0 * np.arcsin(np.minimum(chord[found] / 2.0, 1.0)) * EARTH_RADIUS_KM
+        fields = current_fields(lats, lons, u, v)
+        fields['distance_km'] = distance_km
+        return fields
+
+    def sample(self, lats, lons):
+        """
+        Velocity at arbitrary points by inverse-distance weighting of the
+        nearest points; NaN where no point lies within max_gap_km.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        u = np.full(lats.shape, np.nan)
+        v = np.full(lats.shape, np.nan)
+        n_valid = int(self.valid.sum())
+        if n_valid and lats.size:
+            tree, keep = self._nearest_tree()
+            k = min(self.neighbours, n_valid)
+            upper = chord_for_km(self.max_gap_km) if self.max_gap_km is not None else np.inf
+            chord, index = tree.query(to_unit_vectors(lats, lons), k=k, distance_upper_bound=upper)
+            chord = chord.reshape(-1, k)
+            index = index.reshape(-1, k)
+            found = np.isfinite(chord)
+            # Exact hits take the point value; otherwise weight by 1/d^2
+            weights = np.where(found, 1.0 / np.maximum(chord, 1e-12) ** 2, 0.0)
+            safe_index = keep[np.where(found, index, 0)]
+            total = weights.sum(axis=1)
+            any_found = total > 0
+            with np.errstate(invalid='ignore', divide='ignore'):
+                u.ravel()[:] = np.where(any_found, (weights * self.u[safe_index]).sum(axis=1) / total, np.nan)
+                v.ravel()[:] = np.where(any_found, (weights * self.v[safe_index]).sum(axis=1) / total, np.nan)
+        return current_fields(lats, lons, u, v)
+
+    def bbox(self, south, north, west, east):
+        """
+        Points inside a bounding box, as a new ScatteredCurrentField.
+        """
+        keep = (self.lats >= south) & (self.lats <= north) & (self.lons >= west) & (self.lons <= east)
+        return ScatteredCurrentField(self.lats[keep], self.lons[keep], self.u[keep], self.v[keep],
+                                     self.neighbours, self.max_gap_km)
+
+    def points(self):
+        """
+        The valid points as flat arrays like compute_currents.
+        """
+        return current_fields(self.lats[self.valid], self.lons[self.valid],
+                              self.u[self.valid], self.v[self.valid])
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers, vectorized over array arguments.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def load_field(path):
+    """
+    Load a CurrentField from a binary grid (.bin) or processed JSON/NDJSON file.
+    """
+    if path.endswith('.bin'):
+        return CurrentField.from_binary(path)
+    return CurrentField.from_records(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a processed ocean currents field")
+    parser.add_argument("field", help="Processed .bin or .json file")
+    parser.add_argument("--point", nargs=2, type=float, action="append", metavar=("LAT", "LON"),
+                        help="Point to sample (repeatable)")
+    parser.add_argument("--eez", action="store_true", help="Summarize the field inside the Indian EEZ box")
+    args = parser.parse_args()
+
+    field = load_field(args.field)
+    if args.point:
+        lats, lons = np.array(args.point).T
+        result = field.sample(lats, lons)
+        for i in range(len(lats)):
+            print(f"({lats[i]:.4f}, {lons[i]:.4f}): u={result['u'][i]:.4f} v={result['v'][i]:.4f} "
+                  f"speed={result['speed'][i]:.4f} m/s direction={result['direction'][i]:.1f} deg")
+    if args.eez:
+        points = field.bbox(**INDIAN_EEZ_BOUNDS).points()
+        if len(points['lat']) == 0:
+            print("Indian EEZ: no valid points in this field")
+        else:
+            print(f"Indian EEZ: {len(points['lat'])} points, mean speed {points['speed'].mean():.4f} m/s, "
+                  f"max speed {points['speed'].max():.4f} m/s")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+import numpy as np
+import math
+
+# Common variable names for ocean currents
+U_NAMES = ['uo', 'u', 'water_u', 'eastward_sea_water_velocity']
+V_NAMES = ['vo', 'v', 'water_v', 'northward_sea_water_velocity']
+
+# Common variable names for sea water temperature
+TEMPERATURE_NAMES = ['thetao', 'temperature', 'sea_water_potential_temperature', 'temp']
+
+
+def find_variable(ds, names):
+    """
+    Return the first of the candidate variable names present in the dataset.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        names (list): Candidate variable names, in order of preference
+
+    Returns:
+        str: Matching variable name, or None if none of them exist
+    """
+    for name in names:
+        if name in ds.variables:
+            return name
+    return None
+
+
+def find_current_variables(ds):
+    """
+    Find the eastward (u) and northward (v) current variables of a dataset.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+
+    Returns:
+        tuple: (u_var, v_var); either entry is None if it was not found
+    """
+    return find_variable(ds, U_NAMES), find_variable(ds, V_NAMES)
+
+
+def detect_layer(ds):
+    """
+    Decide which layer a dataset holds: currents (u/v) or temperature.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+
+    Returns:
+        str: 'currents', 'temperature', or None if neither is present
+    """
+    u_var, v_var = find_current_variables(ds)
+    if u_var is not None and v_var is not None:
+        return 'currents'
+    if find_variable(ds, TEMPERATURE_NAMES) is not None:
+        return 'temperature'
+    return None
+
+
+def identify_coord_dims(ds, var_name):
+    """
+    Map the dimensions of a variable onto lat/lon/depth/time roles.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        var_name (str): Variable whose dimensions should be classified
+
+    Returns:
+        dict: Role name ('lat', 'lon', 'depth', 'time') -> dimension name
+    """
+    coord_dims = {}
+    for dim in ds[var_name].dims:
+        if dim in ds.coords:
+            if any(lat_name in dim.lower() for lat_name in ['lat', 'latitude']):
+                coord_dims['lat'] = dim
+            elif any(lon_name in dim.lower() for lon_name in ['lon', 'longitude']):
+                coord_dims['lon'] = dim
+            elif any(dep_name in dim.lower() for dep_name in ['depth', 'deptht', 'z']):
+                coord_dims['depth'] = dim
+            elif any(time_name in dim.lower() for time_name in ['time', 't']):
+                coord_dims['time'] = dim
+    return coord_dims
+
+
+def select_slice(data_array, coord_dims, time_index=0, depth_index=0):
+    """
+    Select one (time, depth) 2-D lat/lon slice of a variable.
+
+    Args:
+        data_array (xarray.DataArray): Variable to slice
+        coord_dims (dict): Output of identify_coord_dims
+        time_index (int): Index along the time dimension, if present
+        depth_index (int): Index along the depth dimension, if present
+
+    Returns:
+        xarray.DataArray: Lazy 2-D (lat, lon) view of the variable
+    """
+    selection = {}
+    if 'time' in coord_dims:
+        selection[coord_dims['time']] = time_index
+    if 'depth' in coord_dims:
+        selection[coord_dims['depth']] = depth_index
+    if selection:
+        data_array = data_array.isel(selection)
+    return data_array
+
+
+def extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor=1):
+    """
+    Read the strided u/v slab once as NumPy arrays.
+
+    Args:
+        u_data (xarray.DataArray): 2-D eastward current slice
+        v_data (xarray.DataArray): 2-D northward current slice
+        lats (numpy.ndarray): Full latitude coordinate values
+        lons (numpy.ndarray): Full longitude coordinate values
+        coord_dims (dict): Output of identify_coord_dims
+        sample_factor (int): Stride applied along both lat and lon
+
+    Returns:
+        tuple: (u, v, lats, lons) with u/v shaped (len(lats), len(lons))
+    """
+    stride = {
+        coord_dims['lat']: slice(None, None, sample_factor),
+        coord_dims['lon']: slice(None, None, sample_factor),
+    }
+    order = (coord_dims['lat'], coord_dims['lon'])
+    u = u_data.isel(stride).transpose(*order).values
+    v = v_data.isel(stride).transpose(*order).values
+    return u, v, lats[::sample_factor], lons[::sample_factor]
+
+
+def iter_slab_bands(u_data, v_data, lats, lons, coord_dims, sample_factor=1, band_rows=None):
+    """
+    Read the strided u/v slab as a sequence of latitude bands.
+
+    Band boundaries fall on multiples of sample_factor (band_rows is rounded
+    up to one), so concatenating the bands gives exactly the slab
+    extract_slab would return in one read, but only one band is held in
+    memory at a time.
+
+    Args:
+        u_data, v_data, lats, lons, coord_dims, sample_factor: See extract_slab
+        band_rows (int): Source (unsampled) rows per band. If None, one band
+
+    Yields:
+        tuple: (u, v, lats, lons) for each band
+    """
+    n_rows = len(lats)
+    if band_rows is None:
+        band_rows = n_rows
+    band_rows = -(-band_rows // sample_factor) * sample_factor
+    for start in range(0, n_rows, band_rows):
+        rows = {coord_dims['lat']: slice(start, start + band_rows)}
+        yield extract_slab(u_data.isel(rows), v_data.isel(rows), lats[start:start + band_rows],
+                           lons, coord_dims, sample_factor)
+
+
+def compute_currents(u, v, lats, lons):
+    """
+    Derive speed and direction for every valid cell of a u/v slab.
+
+    Cells where u or v is NaN, or whose coordinates fall outside the
+    standard lat/lon range, are dropped. The surviving points are returned
+    in row-major (lat, then lon) order.
+
+    Args:
+        u (numpy.ndarray): 2-D eastward current, shaped (len(lats), len(lons))
+        v (numpy.ndarray): 2-D northward current, same shape as u
+        lats (numpy.ndarray): Latitude of each row
+        lons (numpy.ndarray): Longitude of each column
+
+    Returns:
+        dict: Flat float64 arrays 'lat', 'lon', 'u', 'v', 'speed' and
+              'direction', plus 'skipped_nan' and 'skipped_range' counts
+    """
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+
+    # Check for NaN or masked values
+    valid = ~(np.isnan(u) | np.isnan(v))
+
+    # Skip points outside standard lat/lon range
+    lat_ok = (lats >= -90) & (lats <= 90)
+    lon_ok = (lons >= -180) & (lons <= 180)
+    in_range = lat_ok[:, None] & lon_ok[None, :]
+
+    keep = valid & in_range
+    rows, cols = np.nonzero(keep)
+    return _current_fields(lats[rows], lons[cols], u[rows, cols], v[rows, cols],
+                           int(np.count_nonzero(~valid)), int(np.count_nonzero(valid & ~in_range)))
+
+
+def compute_currents_at(u, v, lats, lons, rows, cols, n_cells=None):
+    """
+    compute_currents for selected cells of a slab only (e.g. the ocean
+    cells of an OceanIndex), given their values and positions.
+
+    Cells of the slab that are not listed count as NaN, so for the same slab
+    the result is identical to compute_currents on the dense arrays.
+
+    Args:
+        u (numpy.ndarray): 1-D eastward current at the listed cells
+        v (numpy.ndarray): 1-D northward current at the listed cells
+        lats (numpy.ndarray): Latitude of each row of the slab
+        lons (numpy.ndarray): Longitude of each column of the slab
+        rows, cols (numpy.ndarray): Row/column of each listed cell, row-major
+        n_cells (int): Total cells of the slab; defaults to len(lats) * len(lons)
+
+    Returns:
+        dict: Same layout as compute_currents
+    """
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if n_cells is None:
+        n_cells = len(lats) * len(lons)
+
+    valid = ~(np.isnan(u) | np.isnan(v))
+    in_range = ((lats >= -90) & (lats <= 90))[rows] & ((lons >= -180) & (lons <= 180))[cols]
+    keep = valid & in_range
+    return _current_fields(lats[rows[keep]], lons[cols[keep]], u[keep], v[keep],
+                           int(n_cells - np.count_nonzero(valid)), int(np.count_nonzero(valid & ~in_range)))
+
+
+def current_direction(u, v):
+    """
+    Direction the current flows towards, in degrees 0-360 counterclockwise
+    from east (NaN where u or v is NaN).
+    """
+    # Same conversion constant as math.degrees
+    direction = np.arctan2(v, u) * (180.0 / math.pi)
+    return np.where(direction < 0, direction + 360, direction)
+
+
+def _current_fields(lats, lons, u, v, skipped_nan, skipped_range):
+    # Calculate speed and direction
+    speed = np.sqrt(u ** 2 + v ** 2)
+    direction = current_direction(u, v)
+
+    return {
+        'lat': lats,
+        'lon': lons,
+        'u': u,
+        'v': v,
+        'speed': speed,
+        'direction': direction,
+        'skipped_nan': skipped_nan,
+        'skipped_range': skipped_range,
+    }
+
+
+def build_records(fields):
+    """
+    Turn the arrays returned by compute_currents into JSON-ready records.
+
+    Args:
+        fields (dict): Output of compute_currents
+
+    Returns:
+        list: List of dictionaries, one per data point
+    """
+    columns = ('lat', 'lon', 'u', 'v', 'speed', 'direction')
+    values = [fields[name].tolist() for name in columns]
+    return [
+        {
+            "lat": lat,
+            "lon": lon,
+            "u": u,
+            "v": v,
+            "speed": speed,
+            "direction": direction,
+            "type": "current"
+        }
+        for lat, lon, u, v, speed, direction in zip(*values)
+    ]
+
+
+def new_statistics():
+    """
+    Empty running-statistics accumulator for update_statistics.
+    """
+    return {'min': math.inf, 'max': -math.inf, 'sum': 0.0, 'count': 0, 'nan_count': 0}
+
+
+def update_statistics(stats, values, missing=0):
+    """
+    Fold a block of values into a running-statistics accumulator in place.
+
+    Args:
+        stats (dict): Accumulator from new_statistics
+        values (numpy.ndarray): Block of values; NaNs are counted, not summarized
+        missing (int): Further cells of the block that were not read (e.g.
+                       land left out by an ocean index); counted as NaN
+    """
+    values = np.asarray(values)
+    finite = values[~np.isnan(values)]
+    stats['nan_count'] += int(values.size - finite.size) + missing
+    if finite.size:
+        stats['min'] = min(stats['min'], float(finite.min()))
+        stats['max'] = max(stats['max'], float(finite.max()))
+        stats['sum'] += float(finite.sum(dtype=np.float64))
+        stats['count'] += int(finite.size)
+
+
+def finalize_statistics(stats):
+    """
+    Turn a running-statistics accumulator into min/max/mean/count values.
+
+    Args:
+        stats (dict): Accumulator from new_statistics
+
+    Returns:
+        dict: 'min', 'max', 'mean' (None when there were no valid values),
+              'count' and 'nan_count'
+    """
+    if stats['count'] == 0:
+        return {'min': None, 'max': None, 'mean': None, 'count': 0, 'nan_count': stats['nan_count']}
+    return {
+        'min': stats['min'],
+        'max': stats['max'],
+        'mean': stats['sum'] / stats['count'],
+        'count': stats['count'],
+        'nan_count': stats['nan_count'],
+    }
@@ -0,0 +1,810 @@
+#!/usr/bin/env python
+import numpy as np
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from binary_format import encode_grid_binary, grid_coordinates, read_grid_binary, read_grid_header
+from currents_engine import compute_currents
+from streaming_writer import CURRENT_COLUMNS, record_template
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Decoded slabs kept in memory; everything else is read through memory maps
+DEFAULT_CACHE_MB = 256
+
+# Accesses after which a memory-mapped slab is copied into the in-memory LRU
+HOT_HITS = 2
+
+# Slabs whose access counts are remembered; the least recently read are forgotten
+MAX_TRACKED_SLABS = 1024
+
+# Encoded responses kept for repeated identical requests (same view, many clients)
+DEFAULT_RESPONSE_CACHE_MB = 64
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+# Points a single /query may return; coarser views must ask for a stride
+MAX_QUERY_POINTS = 2000000
+
+# Seconds between rescans of the data directories for new or changed slabs
+CATALOG_REFRESH_SECONDS = 5.0
+
+# Request head limit (request line plus headers)
+MAX_HEAD_BYTES = 16384
+
+# Request bodies are read and discarded; anything larger closes the connection
+MAX_BODY_BYTES = 65536
+
+# Current slabs store u/v; the record columns follow the processed JSON output
+CURRENT_VARIABLES = ('u', 'v')
+
+TILE_PATH = re.compile(r'^/tiles/([\w.-]+)/(\d+)/(\d+)/(\d+)\.bin$')
+
+STATUS_TEXT = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+               404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """
+    A request the service answers with a 4xx status and a JSON error body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """
+    Least-recently-used mapping bounded by the total size of its values.
+
+    sizeof(value) gives the bytes a value counts for; inserting past
+    max_bytes evicts the oldest entries. A value larger than the whole
+    budget is not cached at all. Safe to share between the executor threads.
+    """
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+class SlabCache:
+    """
+    Access to slab arrays: hot slabs from memory, the rest memory-mapped.
+
+    A slab is opened with read_grid_binary (zero-copy memory maps, so only
+    the pages of the requested window are read). Once it has been accessed
+    HOT_HITS times its arrays are copied into an LRU bounded by max_bytes,
+    so the slabs every client is looking at stay resident while older
+    ones cost nothing but their page cache. Access counts are kept for
+    the max_tracked most recently read slabs only, so a long-running
+    service over rolling data does not accumulate counts of old files.
+    Safe to share between the executor threads.
+    """
+
+    def __init__(self, max_bytes, hot_hits=HOT_HITS, max_tracked=MAX_TRACKED_SLABS):
+        self.hot = LRUCache(max_bytes, sizeof=lambda slab: sum(a.nbytes for a in slab[1].values()))
+        self.hot_hits = hot_hits
+        self.max_tracked = max_tracked
+        self.accesses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, version):
+        """
+        Header and arrays of a slab file.
+
+        Args:
+            path (str): Slab file
+            version (tuple): File identity (size, mtime); a new version
+                replaces whatever was cached for the path
+
+        Returns:
+            tuple: (header, arrays) as returned by read_grid_binary (undecoded)
+        """
+        key = (path, version)
+        slab = self.hot.get(key)
+        if slab is not None:
+            return slab
+        header, arrays = read_grid_binary(path)
+        with self._lock:
+            count = self.accesses.pop(key, 0) + 1
+            hot = count >= self.hot_hits
+            if not hot:
+                self.accesses[key] = count
+                while len(self.accesses) > self.max_tracked:
+                    self.accesses.popitem(last=False)
+        if hot:
+            slab = (header, {name: np.array(values) for name, values in arrays.items()})
+            self.hot.put(key, slab)
+            return slab
+        return header, arrays
+
+
+def file_version(path):
+    """
+    (size, mtime_ns) of a file: changes whenever the file is rewritten.
+    """
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def slab_layer(header):
+    """
+    Layer a slab belongs to, from its attrs or, failing that, its variables.
+    """
+    attrs = header.get("attrs", {})
+    if attrs.get("layer"):
+        return attrs["layer"]
+    if attrs.get("type") == "current":
+        return "currents"
+    names = [entry["name"] for entry in header["variables"]]
+    if all(name in names for name in CURRENT_VARIABLES):
+        return "currents"
+    if "thetao" in names:
+        return "temperature"
+    return attrs.get("type")
+
+
+class SlabCatalog:
+    """
+    Every binary slab under the data directories, by layer, time and depth.
+
+    Headers are read once per file version; refresh() rescans the
+    directories (skipping tile pyramids, which are served as files) and
+    rereads only files that are new or changed.
+    """
+
+    def __init__(self, data_dirs, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        self.data_dirs = [os.path.abspath(d) for d in data_dirs]
+        self.refresh_seconds = refresh_seconds
+        self.slabs = {}
+        self.last_scan = None
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.last_scan is not None and now - self.last_scan < self.refresh_seconds:
+            return
+        self.last_scan = now
+        found = {}
+        for data_dir in self.data_dirs:
+            for root, dirs, files in os.walk(data_dir):
+                if "pyramid.json" in files:
+                    dirs[:] = []
+                    continue
+                for name in files:
+                    if name.endswith(".bin"):
+                        path = os.path.join(root, name)
+                        found[path] = file_version(path)
+
+        slabs = {}
+        for path, version in found.items():
+            entry = self.slabs.get(path)
+            if entry is None or entry["version"] != version:
+                try:
+                    entry = self._describe(path, version)
+                except (OSError, ValueError, KeyError):
+                    # Half-written or foreign .bin files are simply not served
+                    continue
+            if entry is not None:
+                slabs[path] = entry
+        self.slabs = slabs
+
+    def _describe(self, path, version):
+        header = read_grid_header(path)
+        layer = slab_layer(header)
+        if layer is None:
+            return None
+        attrs = header.get("attrs", {})
+        return {
+            "path": path,
+            "version": version,
+            "layer": layer,
+            "time": attrs.get("time"),
+            "depth": attrs.get("depth"),
+            "region": attrs.get("region"),
+            "variables": [entry["name"] for entry in header["variables"]],
+            "grid": header["grid"],
+            "header": header,
+        }
+
+    def layers(self):
+        """
+        Summary of every layer: times, depths, variables, grids and the
+        regional cutouts available next to the global slabs.
+        """
+        layers = {}
+        for entry in self.slabs.values():
+            layer = layers.setdefault(entry["layer"], {"times": set(), "depths": set(), "variables": set(),
+                                                      "regions": set(), "slabs": 0, "grids": []})
+            layer["slabs"] += 1
+            if entry["region"] is not None:
+                layer["regions"].add(entry["region"])
+            if entry["time"] is not None:
+                layer["times"].add(entry["time"])
+            if entry["depth"] is not None:
+                layer["depths"].add(entry["depth"])
+            layer["variables"].update(entry["variables"])
+            if entry["grid"] not in layer["grids"]:
+                layer["grids"].append(entry["grid"])
+        return {name: {"slabs": layer["slabs"], "times": sorted(layer["times"]),
+                       "depths": sorted(layer["depths"]), "variables": sorted(layer["variables"]),
+                       "regions": sorted(layer["regions"]), "grids": layer["grids"]}
+                for name, layer in sorted(layers.items())}
+
+    def select(self, layer, time_range=None, depth_range=None, region=None):
+        """
+        Slabs of a layer inside a time and depth range, oldest first.
+
+        Args:
+            layer (str): Layer name
+            time_range (tuple): (start, end) ISO strings, inclusive; 'latest'
+                as start selects the newest time only; None for all times
+            depth_range (tuple): (min, max) in metres, inclusive; None for all depths
+            region (str): Regional cutout to read; None for the global slabs
+
+        Returns:
+            list: Catalog entries
+        """
+        entries = [e for e in self.slabs.values() if e["layer"] == layer and e["region"] == region]
+        if depth_range is not None:
+            entries = [e for e in entries if e["depth"] is not None
+                       and depth_range[0] <= e["depth"] <= depth_range[1]]
+        if time_range is not None:
+            if time_range[0] == "latest":
+                times = [e["time"] for e in entries if e["time"] is not None]
+                time_range = (max(times), max(times)) if times else None
+            if time_range is None:
+                return []
+            start, end = time_range
+            entries = [e for e in entries if e["time"] is not None
+                       and (start is None or _time_key(e["time"]) >= _time_key(start))
+                       and (end is None or _time_key(e["time"]) <= _time_key(end))]
+        return sorted(entries, key=lambda e: (_time_key(e["time"] or ""), e["depth"] or 0.0, e["path"]))
+
+
+def _time_key(value):
+    # '2025-09-01', '2025-09-01T00:00' and '2025-09-01T00:00:00' compare consistently
+    return value.replace(' ', 'T').rstrip('Z')[:19].ljust(19, '\x00')
+
+
+def parse_bbox(value):
+    """
+    Parse 'west,south,east,north' (degrees). west > east crosses the antimeridian.
+
+    Returns:
+        tuple: (west, south, east, north), or None when value is empty
+    """
+    if not value:
+        return None
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        raise RequestError(400, f"bbox must be west,south,east,north, got {value!r}")
+    if south > north:
+        raise RequestError(400, "bbox south must not exceed north")
+    return west, south, east, north
+
+
+def parse_range(value, convert=str):
+    """
+    Parse 'start/end' (either side may be empty for an open end) or a single value.
+
+    Returns:
+        tuple: (start, end), or None when value is empty
+    """
+    if not value:
+        return None
+    parts = value.split('/')
+    if len(parts) > 2:
+        raise RequestError(400, f"Invalid range {value!r}; expected start/end")
+    try:
+        start = convert(parts[0]) if parts[0] else None
+        end = convert(parts[-1]) if parts[-1] else None
+    except ValueError:
+        raise RequestError(400, f"Invalid range {value!r}")
+    return start, end
+
+
+def parse_depth_range(value, tolerance=0.01):
+    depth_range = parse_range(value, float)
+    if depth_range is None:
+        return None
+    low, high = depth_range
+    low = -np.inf if low is None else low
+    high = np.inf if high is None else high
+    # Depths are stored as float32 coordinate values; a single depth matches within tolerance
+    return low - tolerance, high + tolerance
+
+
+def select_window(header, bbox=None, stride=1):
+    """
+    Rows and columns of a slab inside a bbox, at a stride.
+
+    Args:
+        header (dict): Binary grid header
+        bbox (tuple): (west, south, east, north) or None for the whole grid
+        stride (int): Keep every stride-th row and column of the window
+
+    Returns:
+        tuple: (rows, cols) index arrays plus (lats, lons) at those rows/cols
+    """
+    lats, lons = grid_coordinates(header)
+    if bbox is None:
+        rows = np.arange(len(lats))
+        cols = np.arange(len(lons))
+    else:
+        west, south, east, north = bbox
+        rows = np.flatnonzero((lats >= south) & (lats <= north))
+        if west <= east:
+            cols = np.flatnonzero((lons >= west) & (lons <= east))
+        else:
+            # Antimeridian crossing: the eastern part first, then the western part
+            cols = np.concatenate([np.flatnonzero(lons >= west), np.flatnonzero(lons <= east)])
+    rows = rows[::stride]
+    cols = cols[::stride]
+    return rows, cols, lats[rows], lons[cols]
+
+
+def read_window(header, arrays, rows, cols):
+    """
+    Values of every variable, and the mask, in a row/column window.
+
+    int16 variables are decoded to float32 with NaN at the fill value, so
+    callers see the same values whatever the slab encoding.
+
+    Returns:
+        tuple: (fields dict of float32 arrays, mask bool array)
+    """
+    if len(rows) == 0 or len(cols) == 0:
+        shape = (len(rows), len(cols))
+        return ({entry["name"]: np.empty(shape, dtype=np.float32) for entry in header["variables"]},
+                np.zeros(shape, dtype=bool))
+    # The rows of a window are contiguous (before striding): slice them, then pick columns
+    row_step = int(rows[1] - rows[0]) if len(rows) > 1 else 1
+    row_slice = slice(int(rows[0]), int(rows[-1]) + 1, row_step)
+
+    def window(values):
+        return np.asarray(values[row_slice])[:, cols]
+
+    mask = window(arrays["mask"]).astype(bool)
+    fields = {}
+    for entry in header["variables"]:
+        values = window(arrays[entry["name"]])
+        if entry["dtype"] == "int16":
+            decoded = values.astype(np.float32) * np.float32(entry["scale"]) + np.float32(entry["add_offset"])
+            decoded[values == entry["fill"]] = np.nan
+            values = decoded
+        fields[entry["name"]] = np.where(mask, values, np.nan).astype(np.float32)
+    return fields, mask
+
+
+def window_records(layer, fields, mask, lats, lons):
+    """
+    Valid points of a window as record columns, plus the record template.
+
+    Current windows get the processed-output columns (speed, direction);
+    other layers list their variables as stored.
+
+    Returns:
+        tuple: (columns dict of 1-D arrays, template, number of points)
+    """
+    if layer == "currents" and all(name in fields for name in CURRENT_VARIABLES):
+        columns = compute_currents(fields['u'], fields['v'], lats, lons)
+        return columns, record_template(CURRENT_COLUMNS, "current"), len(columns['lat'])
+    rows, cols = np.nonzero(mask)
+    columns = {"lat": lats[rows], "lon": lons[cols]}
+    names = sorted(fields)
+    for name in names:
+        columns[name] = fields[name][rows, cols].astype(np.float64)
+    record_type = "temperature" if layer == "temperature" else layer
+    return columns, record_template(("lat", "lon") + tuple(names), record_type), len(rows)
+
+
+class DataService:
+    """
+    Answers the HTTP endpoints over a SlabCatalog and the tile pyramids.
+
+    Endpoints (GET or HEAD):
+        /catalog                      Layers with their times, depths, variables and grids
+        /query?layer=&bbox=&time=&depth=&stride=
+                                      Points of every matching slab inside the bbox, as JSON
+        /slab?layer=&time=&depth=&bbox=&stride=&encoding=
+                                      One slab (or its bbox window) in the binary grid format
+                                      (/query and /slab read a regional cutout with &region=)
+        /tiles/<layer>/<z>/<x>/<y>.bin
+                                      Tiles of public/data/tiles/<layer>, as written
+        /stats                        Cache statistics
+
+    Every response carries an ETag derived from the source file versions and
+    the request, so If-None-Match revalidation costs no reading at all, and
+    is gzip-compressed when the client accepts it.
+    """
+
+    def __init__(self, data_dirs, tiles_dir=None, cache_mb=DEFAULT_CACHE_MB,
+                 response_cache_mb=DEFAULT_RESPONSE_CACHE_MB, max_points=MAX_QUERY_POINTS):
+        self.catalog = SlabCatalog(data_dirs)
+        self.tiles_dir = tiles_dir
+        self.slabs = SlabCache(int(cache_mb * 2 ** 20))
+        self.responses = LRUCache(int(response_cache_mb * 2 ** 20), sizeof=lambda r: len(r[1]))
+        self.max_points = max_points
+
+    # Routing -------------------------------------------------------------
+
+    async def respond(self, method, target, headers):
+        """
+        Produce the response to one request.
+
+        Returns:
+            tuple: (status, headers dict, body bytes)
+        """
+        if method == "OPTIONS":
+            return 204, {"Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+                         "Access-Control-Allow-Headers": "If-None-Match"}, b""
+        if method not in ("GET", "HEAD"):
+            raise RequestError(405, f"Method {method} not allowed")
+
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+
+        tile = TILE_PATH.match(path)
+        if tile:
+            return self.tile_response(headers, *tile.groups())
+        if path in ("/", "/catalog"):
+            await loop.run_in_executor(None, self.catalog.refresh)
+            return self.json_response(headers, {"layers": self.catalog.layers()}, max_age=5)
+        if path == "/stats":
+            return self.json_response(headers, {"slab_cache": self.slabs.hot.stats(),
+                                                "response_cache": self.responses.stats(),
+                                                "slabs": len(self.catalog.slabs)})
+        if path in ("/query", "/slab"):
+            await loop.run_in_executor(None, self.catalog.refresh)
+            entries, request_key = self.resolve(path, params)
+            etag = make_etag(request_key, [(e["path"], e["version"]) for e in entries])
+            if etag_matches(headers, etag):
+                return 304, {"ETag": etag}, b""
+            cached = self.responses.get(etag)
+            if cached is None:
+                build = self.build_query if path == "/query" else self.build_slab
+                cached = await loop.run_in_executor(None, build, entries, params)
+                self.responses.put(etag, cached)
+            content_type, body = cached
+            return self.body_response(headers, body, content_type, etag)
+        raise RequestError(404, f"No such endpoint: {path}")
+
+    def resolve(self, path, params):
+        """
+        Catalog entries a /query or /slab request reads, and its normalized key.
+        """
+        layer = params.get("layer", "currents")
+        region = params.get("region") or None
+        time_range = parse_range(params.get("time"))
+        depth_range = parse_depth_range(params.get("depth"))
+        bbox = parse_bbox(params.get("bbox"))
+        stride = _positive_int(params.get("stride", "1"), "stride")
+        if path == "/slab" and time_range is None:
+            time_range = ("latest", "latest")
+        entries = self.catalog.select(layer, time_range, depth_range, region)
+        if not entries:
+            raise RequestError(404, f"No {layer} slabs{f' of region {region}' if region else ''} "
+                                    "match the requested time/depth")
+        if path == "/slab" and len(entries) > 1:
+            raise RequestError(400, f"/slab serves one slab but {len(entries)} match; "
+                                    "narrow the time/depth or use /query")
+        request_key = json.dumps([path, layer, region, bbox, stride, params.get("encoding", "float32")])
+        return entries, request_key
+
+    # Builders (run in the executor) -------------------------------------
+
+    def build_query(self, entries, params):
+        """
+        JSON document with the points of each slab inside the bbox.
+        """
+        bbox = parse_bbox(params.get("bbox"))
+        stride = _positive_int(params.get("stride", "1"), "stride")
+        total = 0
+        windows = []
+        for entry in entries:
+            header = entry["header"]
+            rows, cols, lats, lons = select_window(header, bbox, stride)
+            total += len(rows) * len(cols)
+            if total > self.max_points:
+                raise RequestError(413, f"Query covers more than {self.max_points} cells; "
+                                        "use a smaller bbox, time range or a larger stride")
+            windows.append((entry, rows, cols, lats, lons))
+
+        parts = []
+        for entry, rows, cols, lats, lons in windows:
+            header, arrays = self.slabs.get(entry["path"], entry["version"])
+            fields, mask = read_window(header, arrays, rows, cols)
+            columns, template, count = window_records(entry["layer"], fields, mask, lats, lons)
+            names = re.findall(r'"(\w+)": %r', template)
+            records = ', '.join(template % row for row in zip(*[columns[name].tolist() for name in names]))
+            meta = json.dumps({"time": entry["time"], "depth": entry["depth"], "count": count})
+            parts.append(meta[:-1] + ', "records": [' + records + ']}')
+        document = ('{"layer": ' + json.dumps(entries[0]["layer"]) + ', "bbox": ' + json.dumps(bbox)
+                    + ', "stride": ' + str(stride) + ', "slabs": [' + ', '.join(parts) + ']}')
+        return "application/json", document.encode('utf-8')
+
+    def build_slab(self, entries, params):
+        """
+        One slab in the binary grid format: the file itself for a full-grid
+        request in its stored encoding, otherwise the re-encoded window.
+        """
+        entry = entries[0]
+        bbox = parse_bbox(params.get("bbox"))
+        stride = _positive_int(params.get("stride", "1"), "stride")
+        encoding = params.get("encoding")
+        header = entry["header"]
+        stored = header["variables"][0]["dtype"] if header["variables"] else "float32"
+        if bbox is None and stride == 1 and encoding in (None, stored):
+            with open(entry["path"], 'rb') as f:
+                return "application/octet-stream", f.read()
+
+        if bbox is not None and bbox[0] > bbox[2]:
+            raise RequestError(400, "/slab windows cannot cross the antimeridian; request the two halves")
+        rows, cols, lats, lons = select_window(header, bbox, stride)
+        if len(rows) < 1 or len(cols) < 1:
+            raise RequestError(404, "The bbox does not overlap the slab grid")
+        header, arrays = self.slabs.get(entry["path"], entry["version"])
+        fields, mask = read_window(header, arrays, rows, cols)
+        attrs = dict(header.get("attrs", {}), bbox=bbox, stride=stride)
+        data = encode_grid_binary(lats, lons, fields, valid=mask, encoding=encoding or stored, attrs=attrs)
+        return "application/octet-stream", data
+
+    # Responses ------------------------------------------------------------
+
+    def tile_response(self, headers, layer, z, x, y):
+        if self.tiles_dir is None:
+            raise RequestError(404, "No tile directory configured")
+        if layer in ('.', '..'):
+            raise RequestError(400, f"Invalid tile layer {layer!r}")
+        path = os.path.join(self.tiles_dir, layer, z, x, f"{y}.bin")
+        # The layer comes from the (percent-decoded) URL; never serve outside tiles_dir
+        root = os.path.realpath(self.tiles_dir)
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise RequestError(400, f"Invalid tile layer {layer!r}")
+        if not os.path.isfile(path):
+            # Tiles with no ocean cells are never written
+            raise RequestError(404, f"No tile {layer}/{z}/{x}/{y}")
+        etag = make_etag(f"tile:{layer}/{z}/{x}/{y}", [(path, file_version(path))])
+        if etag_matches(headers, etag):
+            return 304, {"ETag": etag}, b""
+        with open(path, 'rb') as f:
+            body = f.read()
+        return self.body_response(headers, body, "application/octet-stream", etag)
+
+    def json_response(self, headers, document, max_age=0):
+        body = json.dumps(document, default=_json_default).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        if etag_matches(headers, etag):
+            return 304, {"ETag": etag}, b""
+        status, response_headers, body = self.body_response(headers, body, "application/json", etag)
+        response_headers["Cache-Control"] = f"max-age={max_age}"
+        return status, response_headers, body
+
+    def body_response(self, headers, body, content_type, etag):
+        response_headers = {"Content-Type": content_type, "ETag": etag, "Vary": "Accept-Encoding",
+                            "Cache-Control": "no-cache"}
+        if accepts_gzip(headers) and len(body) >= GZIP_MIN_BYTES:
+            key = (etag, "gzip")
+            compressed = self.responses.get(key)
+            if compressed is None:
+                compressed = ("gzip", gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+                self.responses.put(key, compressed)
+            body = compressed[1]
+            response_headers["Content-Encoding"] = "gzip"
+        return 200, response_headers, body
+
+    # Connection handling ---------------------------------------------------
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of one connection (HTTP/1.1 keep-alive).
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 431, {}, _error_body("Request head too large"), "GET", False)
+                    break
+                lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.send(writer, 400, {}, _error_body("Malformed request line"), "GET", False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                # Request bodies are not used; skip any so the next request parses
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.send(writer, 400, {}, _error_body("Invalid Content-Length"), method, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.send(writer, 413, {}, _error_body("Request body too large"), method, False)
+                    break
+                if length:
+                    await reader.readexactly(length)
+
+                try:
+                    status, response_headers, body = await self.respond(method, target, headers)
+                except RequestError as e:
+                    status, response_headers, body = e.status, {}, _error_body(str(e))
+                except Exception as e:
+                    print(f"Error serving {target}: {e!r}")
+                    status, response_headers, body = 500, {}, _error_body("Internal error")
+                if not response_headers.get("Content-Type") and status >= 400:
+                    response_headers["Content-Type"] = "application/json"
+
+                keep_alive = version.upper() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.send(writer, status, response_headers, body, method, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, headers, body, method, keep_alive):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 "Access-Control-Allow-Origin: *",
+                 "Access-Control-Expose-Headers: ETag",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        if method != "HEAD" and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+
+def make_etag(request_key, sources):
+    """
+    Strong validator from the normalized request and the versions of the
+    files it reads; it changes exactly when the response would.
+    """
+    digest = hashlib.sha1(request_key.encode('utf-8'))
+    for path, version in sources:
+        digest.update(f"{path}:{version[0]}:{version[1]}".encode('utf-8'))
+    return '"' + digest.hexdigest()[:20] + '"'
+
+
+def etag_matches(headers, etag):
+    candidates = headers.get("if-none-match")
+    if not candidates:
+        return False
+    return candidates.strip() == '*' or etag in [c.strip().removeprefix('W/') for c in candidates.split(',')]
+
+
+def accepts_gzip(headers):
+    for item in headers.get("accept-encoding", "").split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() == "gzip":
+            return params.replace(' ', '') != "q=0"
+    return False
+
+
+def _positive_int(value, name):
+    try:
+        number = int(value)
+    except ValueError:
+        raise RequestError(400, f"{name} must be an integer")
+    if number < 1:
+        raise RequestError(400, f"{name} must be at least 1")
+    return number
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _error_body(message):
+    return json.dumps({"error": message}).encode('utf-8')
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Run the HTTP server until cancelled.
+    """
+    service.catalog.refresh(force=True)
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEAD_BYTES)
+    print(f"Serving {len(service.catalog.slabs)} slab(s) from {', '.join(service.catalog.data_dirs)}")
+    if service.tiles_dir:
+        print(f"Serving tiles from {service.tiles_dir}")
+    print(f"Listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run_data_service(data_dirs, tiles_dir=None, host=DEFAULT_HOST, port=DEFAULT_PORT, cache_mb=DEFAULT_CACHE_MB,
+                     response_cache_mb=DEFAULT_RESPONSE_CACHE_MB):
+    """
+    Serve the processed outputs over HTTP for the map frontend.
+
+    Args:
+        data_dirs (list): Directories scanned (recursively) for binary slabs
+        tiles_dir (str): Root of the tile pyramids (<tiles_dir>/<layer>/pyramid.json)
+        host (str): Interface to listen on
+        port (int): TCP port
+        cache_mb (float): Memory budget of the hot-slab LRU
+        response_cache_mb (float): Memory budget of the encoded-response LRU
+    """
+    service = DataService(data_dirs, tiles_dir, cache_mb=cache_mb, response_cache_mb=response_cache_mb)
+    try:
+        asyncio.run(serve(service, host, port))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    public_data = os.path.join(script_dir, "..", "..", "public", "data")
+
+    parser = argparse.ArgumentParser(description="Serve processed ocean fields over HTTP")
+    parser.add_argument("--data-dir", nargs="*", default=[public_data])
+    parser.add_argument("--tiles-dir", default=os.path.join(public_data, "tiles"))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB)
+    parser.add_argument("--response-cache-mb", type=float, default=DEFAULT_RESPONSE_CACHE_MB)
+    args = parser.parse_args()
+
+    run_data_service(args.data_dir, args.tiles_dir, host=args.host, port=args.port, cache_mb=args.cache_mb,
+                     response_cache_mb=args.response_cache_mb)
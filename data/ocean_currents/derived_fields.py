@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+import time
+
+from currents_engine import TEMPERATURE_NAMES, find_current_variables, find_variable, identify_coord_dims, select_slice
+from binary_format import write_grid_binary, binary_path_for
+from streaming_writer import CurrentsRecordWriter
+from chunked_io import DEFAULT_MEMORY_BUDGET_MB, band_rows_for_budget
+from slab_store import open_source
+from current_query import EARTH_RADIUS_KM
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000.0
+
+# Means, anomalies and eddy statistics are taken over the last this many days
+# of the input (the length of the forecast window the fetch scripts download)
+WINDOW_DAYS = 20
+
+# Rows nearer a pole than this have no usable zonal metric and are left NaN
+MIN_COS_LAT = 1e-6
+
+# Full-resolution float64 arrays alive per source row while deriving a band
+# (u, v, u cos(lat), v cos(lat), four derivatives, two results)
+DERIVE_ARRAYS = 10
+
+
+def periodic_longitudes(lons):
+    """
+    True when evenly spaced longitudes wrap around the globe, so zonal
+    differences can cross the dateline/seam.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lons) < 2:
+        return False
+    steps = np.diff(lons)
+    if not np.allclose(steps, steps[0], rtol=1e-3):
+        return False
+    return abs(abs(steps[0]) * len(lons) - 360.0) < abs(steps[0]) * 1e-3
+
+
+def lon_derivative(field, lons, periodic=False):
+    """
+    Derivative of a (lat, lon) field per radian of longitude.
+
+    Second-order central differences inside the grid (and across the seam
+    of a periodic grid), first-order one-sided at open edges; any NaN
+    neighbour (land) gives NaN.
+    """
+    field = np.asarray(field, dtype=np.float64)
+    if field.shape[1] < 2:
+        return np.full(field.shape, np.nan)
+    lam = np.radians(np.asarray(lons, dtype=np.float64))
+    if periodic:
+        lam = np.concatenate([[lam[-1] - 2 * np.pi], lam, [lam[0] + 2 * np.pi]])
+        padded = np.concatenate([field[:, -1:], field, field[:, :1]], axis=1)
+        return np.gradient(padded, lam, axis=1)[:, 1:-1]
+    return np.gradient(field, lam, axis=1)
+
+
+def lat_derivative(field, lats):
+    """
+    Derivative of a (lat, lon) field per radian of latitude (see lon_derivative).
+    """
+    field = np.asarray(field, dtype=np.float64)
+    if field.shape[0] < 2:
+        return np.full(field.shape, np.nan)
+    return np.gradient(field, np.radians(np.asarray(lats, dtype=np.float64)), axis=0)
+
+
+def _zonal_metric(lats):
+    """
+    1 / (R cos(lat)) per row, NaN at the poles, and cos(lat) itself.
+    """
+    cos_lat = np.cos(np.radians(np.asarray(lats, dtype=np.float64)))[:, None]
+    with np.errstate(divide='ignore'):
+        metric = np.where(cos_lat > MIN_COS_LAT, 1.0 / (EARTH_RADIUS_M * cos_lat), np.nan)
+    return metric, cos_lat
+
+
+def relative_vorticity(u, v, lats, lons, periodic=None):
+    """
+    Vertical component of relative vorticity on the sphere,
+    (dv/dlambda - d(u cos(lat))/dphi) / (R cos(lat)), in 1/s.
+
+    Args:
+        u (numpy.ndarray): Eastward velocity (nlat, nlon) in m/s, NaN on land
+        v (numpy.ndarray): Northward velocity, same shape
+        lats (numpy.ndarray): Latitude of each row
+        lons (numpy.ndarray): Longitude of each column
+        periodic (bool): Longitudes wrap around; detected when None
+
+    Returns:
+        numpy.ndarray: float64 (nlat, nlon)
+    """
+    if periodic is None:
+        periodic = periodic_longitudes(lons)
+    metric, cos_lat = _zonal_metric(lats)
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    return (lon_derivative(v, lons, periodic) - lat_derivative(u * cos_lat, lats)) * metric
+
+
+def divergence(u, v, lats, lons, periodic=None):
+    """
+    Horizontal divergence on the sphere,
+    (du/dlambda + d(v cos(lat))/dphi) / (R cos(lat)), in 1/s.
+
+    Args:
+        See relative_vorticity
+
+    Returns:
+        numpy.ndarray: float64 (nlat, nlon)
+    """
+    if periodic is None:
+        periodic = periodic_longitudes(lons)
+    metric, cos_lat = _zonal_metric(lats)
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    return (lon_derivative(u, lons, periodic) + lat_derivative(v * cos_lat, lats)) * metric
+
+
+def eddy_kinetic_energy(u, v, u_mean, v_mean):
+    """
+    Eddy kinetic energy per unit mass, 0.5 (u'^2 + v'^2), in m^2/s^2, where
+    the primes are departures from the time mean.
+    """
+    return 0.5 * ((u - u_mean) ** 2 + (v - v_mean) ** 2)
+
+
+def window_time_indices(times, window_days=WINDOW_DAYS, end_index=None):
+    """
+    Indices of the time steps in the window_days ending at a time step.
+
+    Args:
+        times (array-like): Time coordinate values
+        window_days (float): Window length in days
+        end_index (int): Last step of the window (default: the last step)
+
+    Returns:
+        list: Time indices, ascending
+    """
+    times = pd.to_datetime(np.asarray(times))
+    end = times[-1 if end_index is None else end_index]
+    keep = (times <= end) & (times >= end - pd.Timedelta(days=window_days))
+    return np.flatnonzero(keep).tolist()
+
+
+class RunningMean:
+    """
+    Per-cell, NaN-aware running means of several fields over time steps.
+
+    Fields are added a band of rows at a time and only sums and counts are
+    kept, so a window of any length streams through in constant memory.
+    """
+
+    def __init__(self, shape, names):
+        self.sums = {name: np.zeros(shape, dtype=np.float64) for name in names}
+        self.counts = {name: np.zeros(shape, dtype=np.int32) for name in names}
+
+    def add(self, name, values, rows=slice(None)):
+        """
+        Fold one time step of a field (or of a band of its rows) into the mean.
+        """
+        finite = np.isfinite(values)
+        self.sums[name][rows] += np.where(finite, values, 0.0)
+        self.counts[name][rows] += finite
+
+    def mean(self, name):
+        """
+        Mean over the steps added so far; NaN where no step had a value.
+        """
+        counts = self.counts[name]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self.sums[name] / counts, np.nan)
+
+
+def derive_currents(u, v, lats, lons, periodic):
+    """
+    Per-step current fields of one band: velocities, vorticity and divergence.
+    """
+    return {
+        "u": np.asarray(u, dtype=np.float64),
+        "v": np.asarray(v, dtype=np.float64),
+        "vorticity": relative_vorticity(u, v, lats, lons, periodic),
+        "divergence": divergence(u, v, lats, lons, periodic),
+    }
+
+
+def derive_temperature(thetao, lats, lons, periodic):
+    """
+    Per-step temperature fields of one band.
+    """
+    return {"thetao": np.asarray(thetao, dtype=np.float64)}
+
+
+def iter_derived_bands(ds, var_names, derive, coord_dims, time_index, depth_index=0, sample_factor=1,
+                       band_rows=None, halo=1):
+    """
+    Read one time step in latitude bands and derive fields on each.
+
+    Derivatives are taken at full resolution; each band is read with halo
+    extra rows on either side so they match a whole-slab computation, and
+    the results are then strided by sample_factor.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        var_names (list): Variables passed to derive, in order
+        derive (callable): derive(*arrays, lats, lons, periodic) -> dict of 2-D fields
+        coord_dims (dict): Output of identify_coord_dims
+        time_index, depth_index (int): Slab to read
+        sample_factor (int): Output stride along lat and lon
+        band_rows (int): Source rows per band (rounded up to a multiple of
+            sample_factor); if None, one band
+        halo (int): Extra rows read above and below each band
+
+    Yields:
+        tuple: (output row slice, dict of fields at output resolution)
+    """
+    lats = ds[coord_dims['lat']].values
+    lons = ds[coord_dims['lon']].values
+    periodic = periodic_longitudes(lons)
+    n_rows = len(lats)
+    band_rows = n_rows if band_rows is None else band_rows
+    band_rows = -(-band_rows // sample_factor) * sample_factor
+    order = (coord_dims['lat'], coord_dims['lon'])
+    slices = [select_slice(ds[name], coord_dims, time_index, depth_index) for name in var_names]
+
+    for start in range(0, n_rows, band_rows):
+        stop = min(start + band_rows, n_rows)
+        read_start, read_stop = max(0, start - halo), min(n_rows, stop + halo)
+        rows = {coord_dims['lat']: slice(read_start, read_stop)}
+        arrays = [data.isel(rows).transpose(*order).values for data in slices]
+        fields = derive(*arrays, lats[read_start:read_stop], lons, periodic)
+        inner = slice(start - read_start, stop - read_start, sample_factor)
+        out_start = start // sample_factor
+        out_rows = slice(out_start, out_start + len(range(start, stop, sample_factor)))
+        yield out_rows, {name: values[inner, ::sample_factor] for name, values in fields.items()}
+
+
+def write_derived_outputs(path, lats, lons, variables, output_format='json', binary_encoding='float32',
+                          attrs=None, record_type="derived"):
+    """
+    Write derived 2-D fields as point records (JSON/NDJSON) and, optionally,
+    a binary grid file next to them, like process_ocean_currents does.
+
+    Records are written for the cells where every variable is finite and the
+    coordinates are inside the standard lat/lon range, in row-major order.
+
+    Args:
+        path (str): Record output path (.json/.ndjson, optionally .gz)
+        lats, lons (numpy.ndarray): Output grid coordinates
+        variables (dict): Name -> (nlat, nlon) array
+        output_format (str): 'json' or 'ndjson'
+        binary_encoding (str): 'float32', 'int16', or None for no binary file
+        attrs (dict): Metadata stored in the binary header
+        record_type (str): Value of each record's 'type' field
+
+    Returns:
+        dict: 'records' written, 'json' and 'binary' paths (binary None if
+              not written)
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    valid = ((lats >= -90) & (lats <= 90))[:, None] & ((lons >= -180) & (lons <= 180))[None, :]
+    for values in variables.values():
+        valid &= np.isfinite(values)
+
+    rows, cols = np.nonzero(valid)
+    fields = {"lat": lats[rows], "lon": lons[cols]}
+    for name, values in variables.items():
+        fields[name] = np.asarray(values, dtype=np.float64)[rows, cols]
+    with CurrentsRecordWriter(path, output_format, columns=("lat", "lon") + tuple(variables),
+                              record_type=record_type) as writer:
+        writer.write(fields)
+
+    output_binary = None
+    if binary_encoding:
+        output_binary = binary_path_for(path)
+        try:
+            write_grid_binary(output_binary, lats, lons, variables, valid=valid, encoding=binary_encoding,
+                              attrs=attrs)
+        except ValueError as e:
+            print(f"Skipping binary output: {e}")
+            output_binary = None
+    return {"records": writer.count, "json": path, "binary": output_binary}
+
+
+# Per product: per-step fields averaged over the window (and those whose
+# squares are averaged too, for eddy statistics), derivation and halo rows
+PRODUCTS = {
+    "currents": {"fields": ("u", "v", "vorticity", "divergence"), "squares": ("u", "v"),
+                 "derive": derive_currents, "halo": 1},
+    "temperature": {"fields": ("thetao",), "squares": (), "derive": derive_temperature, "halo": 0},
+}
+
+
+def product_variables(ds, product):
+    """
+    The dataset variables a product is derived from, or None if missing.
+    """
+    if product == "currents":
+        u_var, v_var = find_current_variables(ds)
+        return [u_var, v_var] if u_var is not None and v_var is not None else None
+    t_var = find_variable(ds, TEMPERATURE_NAMES)
+    return [t_var] if t_var is not None else None
+
+
+def window_means(ds, product, var_names, coord_dims, time_indices, depth_index=0, sample_factor=1,
+                 band_rows=None):
+    """
+    Stream a product's per-step fields over the window into running means.
+
+    Returns:
+        RunningMean: Means of the product's fields (and of the squares of
+                     its 'squares' fields, named '<field>_sq')
+    """
+    spec = PRODUCTS[product]
+    shape = (len(range(0, ds.sizes[coord_dims['lat']], sample_factor)),
+             len(range(0, ds.sizes[coord_dims['lon']], sample_factor)))
+    means = RunningMean(shape, list(spec["fields"]) + [f"{name}_sq" for name in spec["squares"]])
+    for time_index in time_indices:
+        for out_rows, fields in iter_derived_bands(ds, var_names, spec["derive"], coord_dims, time_index,
+                                                   depth_index, sample_factor, band_rows, spec["halo"]):
+            for name in spec["fields"]:
+                means.add(name, fields[name], out_rows)
+            for name in spec["squares"]:
+                means.add(f"{name}_sq", fields[name] ** 2, out_rows)
+    return means
+
+
+def mean_variables(product, means):
+    """
+    Output variables of a product's window-mean file.
+    """
+    if product == "currents":
+        u_mean, v_mean = means.mean("u"), means.mean("v")
+        # Mean EKE from the streamed first and second moments: 0.5 (var(u) + var(v))
+        eke = 0.5 * (np.maximum(means.mean("u_sq") - u_mean ** 2, 0.0)
+                     + np.maximum(means.mean("v_sq") - v_mean ** 2, 0.0))
+        return {"u_mean": u_mean, "v_mean": v_mean, "vorticity_mean": means.mean("vorticity"),
+                "divergence_mean": means.mean("divergence"), "eke_mean": eke}
+    return {"thetao_mean": means.mean("thetao")}
+
+
+def snapshot_variables(product, fields, reference, out_rows):
+    """
+    Output variables of one time step of a product, for one band of rows.
+
+    Args:
+        product (str): Product name
+        fields (dict): Per-step fields of the band (from iter_derived_bands)
+        reference (dict): Window means of the fields over the whole output grid
+        out_rows (slice): Output rows of the band
+    """
+    if product == "currents":
+        u_mean, v_mean = reference["u"][out_rows], reference["v"][out_rows]
+        return {"vorticity": fields["vorticity"], "divergence": fields["divergence"],
+                "u_anomaly": fields["u"] - u_mean, "v_anomaly": fields["v"] - v_mean,
+                "eke": eddy_kinetic_energy(fields["u"], fields["v"], u_mean, v_mean)}
+    return {"thetao": fields["thetao"], "thetao_anomaly": fields["thetao"] - reference["thetao"][out_rows]}
+
+
+def derive_product(netcdf_file, product, output_dir, depth_index=0, window_days=WINDOW_DAYS,
+                   snapshot_indices=None, sample_factor=1, output_format='json', binary_encoding='float32',
+                   chunked=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Derive one product ('currents' or 'temperature') from a NetCDF file.
+
+    Pass 1 streams every time step of the window, band by band, into
+    running means; pass 2 re-reads only the snapshot steps and expresses
+    them relative to those means. Writes <product>_mean and
+    <product>_<time> outputs (records plus binary grid) to output_dir.
+
+    Args:
+        netcdf_file (str): NetCDF file (its slab store is used when current)
+        product (str): 'currents' (vorticity, divergence, EKE, velocity
+            anomalies) or 'temperature' (temperature anomalies)
+        output_dir (str): Directory receiving the outputs
+        depth_index (int): Depth level
+        window_days (float): Length of the averaging window, ending at the last step
+        snapshot_indices (list): Time steps written relative to the window
+            mean (default: the last step)
+        sample_factor (int): Output stride (derivatives use the full grid)
+        output_format (str): 'json' or 'ndjson'
+        binary_encoding (str): 'float32', 'int16', or None
+        chunked (bool): Open lazily with dask and read bands sized to the budget
+        memory_budget_mb (float): Peak memory budget for chunked mode, in MiB
+
+    Returns:
+        dict: Manifest entry for the product
+    """
+    ds, _, source_path = open_source(netcdf_file, chunked, memory_budget_mb)
+    try:
+        var_names = product_variables(ds, product)
+        if var_names is None:
+            raise ValueError(f"No {product} variables in {netcdf_file}")
+        coord_dims = identify_coord_dims(ds, var_names[0])
+        if 'depth' not in coord_dims:
+            depth_index = 0
+        if 'time' in coord_dims:
+            times = ds[coord_dims['time']].values
+            window = window_time_indices(times, window_days)
+            labels = [pd.to_datetime(str(t)) for t in times]
+        else:
+            window, labels = [0], None
+        if snapshot_indices is None:
+            snapshot_indices = [window[-1]]
+
+        lats = ds[coord_dims['lat']].values
+        lons = ds[coord_dims['lon']].values
+        out_lats, out_lons = lats[::sample_factor], lons[::sample_factor]
+        band_rows = band_rows_for_budget(len(lons), memory_budget_mb, DERIVE_ARRAYS) if chunked else None
+        print(f"{product}: {len(window)} steps in the {window_days}-day window, "
+              f"{len(out_lats)}x{len(out_lons)} output grid")
+
+        start = time.perf_counter()
+        means = window_means(ds, product, var_names, coord_dims, window, depth_index, sample_factor, band_rows)
+        attrs = {"source": os.path.basename(netcdf_file), "product": product, "sample_factor": sample_factor,
+                 "depth_index": depth_index, "window_days": window_days}
+        if labels is not None:
+            attrs["window"] = [labels[window[0]].isoformat(), labels[window[-1]].isoformat()]
+        mean_path = os.path.join(output_dir, f"{product}_mean.{output_format}")
+        mean_output = write_derived_outputs(mean_path, out_lats, out_lons, mean_variables(product, means),
+                                            output_format, binary_encoding, dict(attrs, type=f"{product}_mean"),
+                                            record_type=f"{product}_mean")
+        print(f"  window mean -> {mean_path} ({mean_output['records']} points, "
+              f"{time.perf_counter() - start:.1f} s)")
+
+        reference = {name: means.mean(name) for name in PRODUCTS[product]["fields"]}
+        entry = {"product": product, "source": os.path.basename(source_path), "variables": var_names,
+                 "window": attrs.get("window"), "window_steps": len(window), "mean": mean_output,
+                 "snapshots": []}
+        for time_index in snapshot_indices:
+            start = time.perf_counter()
+            variables = None
+            for out_rows, fields in iter_derived_bands(ds, var_names, PRODUCTS[product]["derive"], coord_dims,
+                                                       time_index, depth_index, sample_factor, band_rows,
+                                                       PRODUCTS[product]["halo"]):
+                band = snapshot_variables(product, fields, reference, out_rows)
+                if variables is None:
+                    variables = {name: np.full((len(out_lats), len(out_lons)), np.nan) for name in band}
+                for name, values in band.items():
+                    variables[name][out_rows] = values
+            label = labels[time_index].strftime('%Y%m%dT%H%M') if labels is not None else f"t{time_index:03d}"
+            path = os.path.join(output_dir, f"{product}_{label}.{output_format}")
+            step_attrs = dict(attrs, type=f"{product}_anomaly", time_index=int(time_index))
+            if labels is not None:
+                step_attrs["time"] = labels[time_index].isoformat()
+            output = write_derived_outputs(path, out_lats, out_lons, variables, output_format, binary_encoding,
+                                           step_attrs, record_type=f"{product}_anomaly")
+            output.update(time_index=int(time_index), time=step_attrs.get("time"))
+            entry["snapshots"].append(output)
+            print(f"  step {time_index} -> {path} ({output['records']} points, "
+                  f"{time.perf_counter() - start:.1f} s)")
+        return entry
+    finally:
+        ds.close()
+
+
+def compute_derived_fields(output_dir, currents_file=None, temperature_file=None, **kwargs):
+    """
+    Derive the current and/or temperature products and write a manifest
+    (derived_fields.json) listing every output.
+
+    Args:
+        output_dir (str): Directory receiving the outputs
+        currents_file (str): NetCDF file with uo/vo, or None
+        temperature_file (str): NetCDF file with thetao, or None. When not
+            given, a thetao variable in the currents file is used if present
+        **kwargs: Passed through to derive_product
+
+    Returns:
+        dict: The manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if temperature_file is None and currents_file is not None:
+        with xr.open_dataset(currents_file) as ds:
+            if find_variable(ds, TEMPERATURE_NAMES) is not None:
+                temperature_file = currents_file
+
+    manifest = {"window_days": kwargs.get("window_days", WINDOW_DAYS), "products": []}
+    for product, netcdf_file in (("currents", currents_file), ("temperature", temperature_file)):
+        if netcdf_file is not None:
+            manifest["products"].append(derive_product(netcdf_file, product, output_dir, **kwargs))
+    if not manifest["products"]:
+        raise ValueError("Need a currents and/or a temperature file")
+
+    with open(os.path.join(output_dir, "derived_fields.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Derive vorticity, divergence, EKE and anomalies")
+    parser.add_argument("--currents",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--temperature", default=None, help="NetCDF file with thetao")
+    parser.add_argument("--output-dir",
+                        default=os.path.join(script_dir, "..", "..", "public", "data", "ocean_currents", "derived"))
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--window-days", type=float, default=WINDOW_DAYS)
+    parser.add_argument("--snapshots", type=int, nargs="*", default=None,
+                        help="Time indices written as anomalies (default: the last)")
+    parser.add_argument("--sample-factor", type=int, default=8)
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json")
+    parser.add_argument("--binary-encoding", choices=("float32", "int16", "none"), default="float32")
+    parser.add_argument("--chunked", action="store_true", help="Stream bands sized to the memory budget")
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB)
+    args = parser.parse_args()
+
+    compute_derived_fields(args.output_dir, currents_file=args.currents, temperature_file=args.temperature,
+                           depth_index=args.depth_index, window_days=args.window_days,
+                           snapshot_indices=args.snapshots, sample_factor=args.sample_factor,
+                           output_format=args.format,
+                           binary_encoding=None if args.binary_encoding == "none" else args.binary_encoding,
+                           chunked=args.chunked, memory_budget_mb=args.memory_budget_mb)
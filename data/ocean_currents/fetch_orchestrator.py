@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chunked_io import require_dask
+from synthetic_data import make_synthetic_currents, make_synthetic_temperature
+
+# The subsets requested by oceancurrents.py and data/temperature/temperaturedatasets.py
+DATASETS = {
+    'currents': {
+        "dataset_id": "cmems_mod_glo_phy-cur_anfc_0.083deg_PT6H-i",
+        "variables": ["uo", "vo"],
+        "minimum_longitude": -148.165518,
+        "maximum_longitude": 149.072357,
+        "minimum_latitude": -63.279561,
+        "maximum_latitude": 80.471717,
+        "start_datetime": "2025-09-01T00:00:00",
+        "end_datetime": "2025-09-20T00:00:00",
+        "minimum_depth": 0.49402499198913574,
+        "maximum_depth": 0.49402499198913574,
+    },
+    'temperature': {
+        "dataset_id": "cmems_mod_glo_phy-thetao_anfc_0.083deg_PT6H-i",
+        "dataset_version": "202406",
+        "variables": ["thetao"],
+        "minimum_longitude": -148.165518,
+        "maximum_longitude": 149.072357,
+        "minimum_latitude": -63.279561,
+        "maximum_latitude": 80.471717,
+        "start_datetime": "2025-09-01T00:00:00",
+        "end_datetime": "2025-09-20T00:00:00",
+        "minimum_depth": 0.49402499198913574,
+        "maximum_depth": 0.49402499198913574,
+        "coordinates_selection_method": "strict-inside",
+        "netcdf_compression_level": 1,
+    },
+}
+
+# Default sharding: 2-day windows, 2 x 2 spatial blocks, 4 concurrent downloads
+DEFAULT_SHARD_DAYS = 2
+DEFAULT_LAT_SPLITS = 2
+DEFAULT_LON_SPLITS = 2
+DEFAULT_WORKERS = 4
+DEFAULT_ATTEMPTS = 3
+
+# Shard upper bounds are pulled in by this much so a grid point that sits
+# exactly on a boundary is fetched by one shard only. Coordinates are float32
+# (about 1.5e-5 degrees apart near 180), so anything finer rounds back onto
+# the boundary; 1e-4 degrees is still far below any model grid spacing
+BOUNDARY_EPSILON_DEG = 1e-4
+BOUNDARY_EPSILON = pd.Timedelta(seconds=1)
+
+# Chunking of the merged store: one (time, depth) step per chunk, 256 x 256 cells
+STORE_CHUNK_CELLS = 256
+
+# Synthetic datasets already built in this process, by request and seed
+_SYNTHETIC_DATASETS = {}
+
+
+def split_range(low, high, parts):
+    """
+    Split [low, high] into `parts` contiguous pieces.
+    """
+    edges = np.linspace(low, high, parts + 1)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def plan_shards(request, shard_days=DEFAULT_SHARD_DAYS, lat_splits=DEFAULT_LAT_SPLITS,
+                lon_splits=DEFAULT_LON_SPLITS):
+    """
+    Split a subset request into time x latitude x longitude shards.
+
+    Every shard covers a half-open box (upper bounds pulled in by a small
+    epsilon, except the last shard along each axis), so each grid point and
+    time step is fetched exactly once.
+
+    Args:
+        request (dict): copernicusmarine.subset keyword arguments
+        shard_days (float): Length of each time shard in days
+        lat_splits (int): Number of latitude bands
+        lon_splits (int): Number of longitude bands
+
+    Returns:
+        list: Shard dicts with an 'id' and the subset arguments of the shard
+    """
+    start = pd.Timestamp(request["start_datetime"])
+    end = pd.Timestamp(request["end_datetime"])
+    n_time = max(1, int(math.ceil((end - start) / pd.Timedelta(days=shard_days))))
+    time_edges = [start + i * pd.Timedelta(days=shard_days) for i in range(n_time)] + [end]
+    lat_ranges = split_range(request["minimum_latitude"], request["maximum_latitude"], lat_splits)
+    lon_ranges = split_range(request["minimum_longitude"], request["maximum_longitude"], lon_splits)
+
+    shards = []
+    for t in range(n_time):
+        t_end = time_edges[t + 1] if t == n_time - 1 else time_edges[t + 1] - BOUNDARY_EPSILON
+        for i, (lat_low, lat_high) in enumerate(lat_ranges):
+            if i < lat_splits - 1:
+                lat_high -= BOUNDARY_EPSILON_DEG
+            for j, (lon_low, lon_high) in enumerate(lon_ranges):
+                if j < lon_splits - 1:
+                    lon_high -= BOUNDARY_EPSILON_DEG
+                shard = dict(request)
+                shard.update({
+                    "id": f"t{t:03d}_y{i:02d}_x{j:02d}",
+                    "start_datetime": time_edges[t].strftime('%Y-%m-%dT%H:%M:%S'),
+                    "end_datetime": t_end.strftime('%Y-%m-%dT%H:%M:%S'),
+                    "minimum_latitude": float(lat_low),
+                    "maximum_latitude": float(lat_high),
+                    "minimum_longitude": float(lon_low),
+                    "maximum_longitude": float(lon_high),
+                })
+                shards.append(shard)
+    return shards
+
+
+def require_copernicusmarine():
+    """
+    Import the Copernicus Marine toolbox, with an actionable message when it
+    is not installed.
+    """
+    try:
+        import copernicusmarine
+    except ImportError:
+        raise ImportError("Downloading needs the Copernicus Marine toolbox: pip install copernicusmarine")
+    return copernicusmarine
+
+
+class CopernicusClient:
+    """
+    Fetches shards with copernicusmarine.subset (needs the copernicusmarine
+    package and stored credentials, as for oceancurrents.py).
+
+    Clients are sent to worker processes, so they only hold picklable state.
+    """
+
+    def __init__(self, **subset_options):
+        """
+        Args:
+            **subset_options: Extra keyword arguments for every subset call
+        """
+        require_copernicusmarine()
+        self.subset_options = dict({"disable_progress_bar": True}, **subset_options)
+
+    def fetch(self, shard, output_path):
+        copernicusmarine = require_copernicusmarine()
+        arguments = {key: value for key, value in shard.items() if key != "id"}
+        arguments.update(self.subset_options)
+        copernicusmarine.subset(
+            output_directory=os.path.dirname(output_path),
+            output_filename=os.path.basename(output_path),
+            overwrite=True,
+            **arguments,
+        )
+
+
+class SyntheticClient:
+    """
+    Local stand-in for CopernicusClient that serves shards cut from one
+    deterministic synthetic dataset (see synthetic_data.py) covering the
+    whole request, so a merged download can be checked against it.
+
+    The dataset is deterministic, so each worker process builds it once and
+    reuses it for every shard it serves.
+    """
+
+    def __init__(self, request, step=1.0, seed=0, fail_shards=()):
+        """
+        Args:
+            request (dict): The full (unsharded) subset request
+            step (float): Grid spacing of the synthetic data in degrees
+            seed (int): Random seed of the synthetic data
+            fail_shards (iterable): Shard ids whose fetch raises, to exercise
+                retries and resume
+        """
+        self.request = request
+        self.step = step
+        self.seed = seed
+        self.fail_shards = set(fail_shards)
+
+    def dataset(self):
+        """
+        The synthetic dataset covering the whole request (built on first use).
+        """
+        key = (json.dumps(self.request, sort_keys=True), self.step, self.seed)
+        if key not in _SYNTHETIC_DATASETS:
+            request = self.request
+            times = pd.date_range(request["start_datetime"], request["end_datetime"], freq="6h")
+            n_lat = int((request["maximum_latitude"] - request["minimum_latitude"]) // self.step) + 1
+            n_lon = int((request["maximum_longitude"] - request["minimum_longitude"]) // self.step) + 1
+            options = dict(n_time=len(times), n_depth=1, n_lat=n_lat, n_lon=n_lon, step=self.step,
+                           lat_origin=request["minimum_latitude"], lon_origin=request["minimum_longitude"],
+                           seed=self.seed, start=times[0])
+            if "thetao" in request["variables"]:
+                _SYNTHETIC_DATASETS[key] = make_synthetic_temperature(**options)
+            else:
+                _SYNTHETIC_DATASETS[key] = make_synthetic_currents(**options)
+        return _SYNTHETIC_DATASETS[key]
+
+    def fetch(self, shard, output_path):
+        if shard["id"] in self.fail_shards:
+            raise IOError(f"Simulated transfer failure for shard {shard['id']}")
+        subset = self.dataset()[shard["variables"]].sel(
+            time=slice(shard["start_datetime"], shard["end_datetime"]),
+            latitude=slice(shard["minimum_latitude"], shard["maximum_latitude"]),
+            longitude=slice(shard["minimum_longitude"], shard["maximum_longitude"]),
+        )
+        subset.to_netcdf(output_path)
+
+
+class ResumeJournal:
+    """
+    JSON file recording the shards that finished downloading, so a rerun
+    only fetches what is missing. The journal remembers the request it was
+    made for and starts afresh when the request or sharding changes.
+    """
+
+    def __init__(self, path, request_key):
+        self.path = path
+        self.request_key = request_key
+        self.completed = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("request") == request_key:
+                self.completed = data.get("completed", {})
+
+    def is_done(self, shard_id, shard_path):
+        return shard_id in self.completed and os.path.exists(shard_path)
+
+    def mark_done(self, shard_id, shard_path):
+        self.completed[shard_id] = {"file": os.path.basename(shard_path), "bytes": os.path.getsize(shard_path)}
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"request": self.request_key, "completed": self.completed}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_shard(client, shard, shard_path, attempts=DEFAULT_ATTEMPTS):
+    """
+    Download one shard, retrying with exponential backoff.
+
+    The file is written under a temporary name and renamed when complete, so
+    an interrupted transfer never looks like a finished shard.
+
+    Returns:
+        float: Seconds taken by the successful attempt
+    """
+    part_path = shard_path + ".part"
+    for attempt in range(1, attempts + 1):
+        start = time.perf_counter()
+        try:
+            client.fetch(shard, part_path)
+            os.replace(part_path, shard_path)
+            return time.perf_counter() - start
+        except Exception as e:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            if attempt == attempts:
+                raise
+            delay = 2 ** (attempt - 1)
+            print(f"  Shard {shard['id']} failed ({e}); retrying in {delay} s")
+            time.sleep(delay)
+
+
+def merge_shards(shard_paths, output_path, chunk_cells=STORE_CHUNK_CELLS):
+    """
+    Merge downloaded shards into one chunked, compressed NetCDF4 store.
+
+    Shards are combined lazily by their coordinates (time, latitude,
+    longitude) and written chunk by chunk, so the merged grid never has to
+    fit in memory.
+
+    Args:
+        shard_paths (list): Shard NetCDF files
+        output_path (str): Merged NetCDF file
+        chunk_cells (int): Latitude/longitude chunk length of the store
+
+    Returns:
+        str: output_path
+    """
+    require_dask()
+    with xr.open_mfdataset(shard_paths, combine='by_coords') as merged:
+        encoding = {}
+        for name, variable in merged.data_vars.items():
+            chunks = tuple(1 if dim not in ('latitude', 'longitude') else min(chunk_cells, size)
+                           for dim, size in zip(variable.dims, variable.shape))
+            encoding[name] = {"zlib": True, "complevel": 1, "chunksizes": chunks}
+        tmp_path = output_path + ".tmp"
+        merged.to_netcdf(tmp_path, encoding=encoding)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def fetch_dataset(request, work_dir, output_path, client=None, shard_days=DEFAULT_SHARD_DAYS,
+                  lat_splits=DEFAULT_LAT_SPLITS, lon_splits=DEFAULT_LON_SPLITS,
+                  max_workers=DEFAULT_WORKERS, attempts=DEFAULT_ATTEMPTS):
+    """
+    Download a subset request as concurrent shards and merge them.
+
+    Shards are fetched in a bounded pool of worker processes (the NetCDF/HDF5
+    writers used by the clients are not thread-safe).
+
+    Completed shards are recorded in <work_dir>/journal.json and skipped on
+    the next run, so an interrupted or partly failed fetch resumes instead of
+    starting over. The merge only happens once every shard is present.
+
+    Args:
+        request (dict): copernicusmarine.subset keyword arguments (see DATASETS)
+        work_dir (str): Directory for shard files and the journal
+        output_path (str): Merged NetCDF file
+        client: Object with fetch(shard, output_path); defaults to CopernicusClient
+        shard_days (float): Length of each time shard in days
+        lat_splits (int): Number of latitude bands
+        lon_splits (int): Number of longitude bands
+        max_workers (int): Concurrent downloads
+        attempts (int): Tries per shard before giving up
+
+    Returns:
+        dict: Counts of 'shards', 'fetched', 'skipped' and 'failed', the
+              'seconds' spent fetching and the merged 'output' (None if
+              shards failed)
+    """
+    if client is None:
+        client = CopernicusClient()
+    os.makedirs(work_dir, exist_ok=True)
+    shards = plan_shards(request, shard_days, lat_splits, lon_splits)
+    request_key = json.dumps({"request": request, "shard_days": shard_days,
+                              "lat_splits": lat_splits, "lon_splits": lon_splits}, sort_keys=True)
+    journal = ResumeJournal(os.path.join(work_dir, "journal.json"), request_key)
+    shard_paths = {shard["id"]: os.path.join(work_dir, f"shard_{shard['id']}.nc") for shard in shards}
+
+    pending = [shard for shard in shards if not journal.is_done(shard["id"], shard_paths[shard["id"]])]
+    summary = {"shards": len(shards), "fetched": 0, "skipped": len(shards) - len(pending), "failed": 0}
+    print(f"{len(shards)} shards, {summary['skipped']} already complete, fetching {len(pending)} "
+          f"with {max_workers} workers")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_shard, client, shard, shard_paths[shard["id"]], attempts): shard
+                   for shard in pending}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"  Shard {shard['id']} failed: {e}")
+                continue
+            # The journal is only written by this (parent) process
+            journal.mark_done(shard["id"], shard_paths[shard["id"]])
+            summary["fetched"] += 1
+            print(f"  Shard {shard['id']} done in {seconds:.1f} s")
+    summary["seconds"] = time.perf_counter() - start
+
+    if summary["failed"]:
+        print(f"{summary['failed']} shard(s) failed; rerun to resume")
+        summary["output"] = None
+        return summary
+
+    print(f"Merging {len(shards)} shards into {output_path}")
+    merge_shards([shard_paths[shard["id"]] for shard in shards], output_path)
+    summary["output"] = output_path
+    return summary
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Sharded, resumable Copernicus Marine download")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="currents")
+    parser.add_argument("--work-dir", default=os.path.join(script_dir, ".fetch"))
+    parser.add_argument("--output", default=None, help="Merged NetCDF file")
+    parser.add_argument("--shard-days", type=float, default=DEFAULT_SHARD_DAYS)
+    parser.add_argument("--lat-splits", type=int, default=DEFAULT_LAT_SPLITS)
+    parser.add_argument("--lon-splits", type=int, default=DEFAULT_LON_SPLITS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Serve synthetic data locally instead of contacting Copernicus")
+    args = parser.parse_args()
+
+    request = DATASETS[args.dataset]
+    output = args.output or os.path.join(script_dir, f"{args.dataset}_merged.nc")
+    client = SyntheticClient(request) if args.synthetic else None
+    fetch_dataset(request, os.path.join(args.work_dir, args.dataset), output, client=client,
+                  shard_days=args.shard_days, lat_splits=args.lat_splits, lon_splits=args.lon_splits,
+                  max_workers=args.workers)
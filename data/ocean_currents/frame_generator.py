@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from currents_engine import detect_layer
+from tile_pyramid import load_layer_fields
+from timeseries_format import (
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_KEYFRAME_INTERVAL,
+    DEFAULT_PRECISION,
+    TimeSeriesWriter,
+    merge_timeseries,
+    quantization_params,
+    step_times,
+)
+
+INTERPOLATION_METHODS = ('linear', 'cubic')
+DEFAULT_FRAME_INTERVAL = '1h'
+
+# Fewer frames than this are rendered in one process; more are split into
+# keyframe-aligned segments rendered in parallel worker processes
+PARALLEL_MIN_FRAMES = 48
+
+# Cubic frames can overshoot the source values between steps; the quantized
+# range is widened by this fraction of the source range on each side
+CUBIC_RANGE_MARGIN = 0.125
+
+
+def frame_schedule(source_times, frame_interval=DEFAULT_FRAME_INTERVAL, start=None, end=None):
+    """
+    Valid times of the output frames, every frame_interval across the source steps.
+
+    Args:
+        source_times (list): Valid times of the source steps, ascending
+        frame_interval (str): Spacing of the frames (anything pandas.Timedelta parses)
+        start, end (str): Limit the frames to this span (clipped to the source span)
+
+    Returns:
+        pandas.DatetimeIndex: Frame times
+    """
+    first, last = pd.Timestamp(source_times[0]), pd.Timestamp(source_times[-1])
+    start = max(first, pd.Timestamp(start)) if start is not None else first
+    end = min(last, pd.Timestamp(end)) if end is not None else last
+    if start > end:
+        raise ValueError(f"No frames between {start} and {end} (source steps cover {first} to {last})")
+    return pd.date_range(start, end, freq=pd.Timedelta(frame_interval))
+
+
+def interpolation_weights(source_seconds, frame_seconds, method='linear'):
+    """
+    Weights of the source steps in every frame, for all frames at once.
+
+    'linear' blends the two steps around a frame. 'cubic' is a Catmull-Rom
+    (cubic Hermite) spline whose tangents are central differences over the
+    possibly uneven step spacing, one-sided at the ends of the run; it uses
+    up to four steps and passes through every source step exactly.
+
+    Args:
+        source_seconds (numpy.ndarray): Source step times, ascending, in seconds
+        frame_seconds (numpy.ndarray): Frame times in seconds, inside the source span
+        method (str): 'linear' or 'cubic'
+
+    Returns:
+        numpy.ndarray: (n_frames, n_sources) weights; each row sums to 1
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"Unknown interpolation {method!r}; expected one of {INTERPOLATION_METHODS}")
+    t = np.asarray(source_seconds, dtype=np.float64)
+    f = np.asarray(frame_seconds, dtype=np.float64)
+    n = len(t)
+    if n < 2:
+        raise ValueError("Interpolating frames needs at least two source steps")
+    i = np.clip(np.searchsorted(t, f, side='right') - 1, 0, n - 2)
+    span = t[i + 1] - t[i]
+    s = (f - t[i]) / span
+    frames = np.arange(len(f))
+    weights = np.zeros((len(f), n))
+    if method == 'linear':
+        np.add.at(weights, (frames, i), 1.0 - s)
+        np.add.at(weights, (frames, i + 1), s)
+        return weights
+
+    # Hermite basis; the tangents m_i = (p[i+1] - p[prev]) / (t[i+1] - t[prev]) and
+    # m_i+1 = (p[next] - p[i]) / (t[next] - t[i]) are themselves weights on the steps
+    h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+    h10 = s ** 3 - 2 * s ** 2 + s
+    h01 = -2 * s ** 3 + 3 * s ** 2
+    h11 = s ** 3 - s ** 2
+    prev = np.maximum(i - 1, 0)
+    after = np.minimum(i + 2, n - 1)
+    a = h10 * span / (t[i + 1] - t[prev])
+    b = h11 * span / (t[after] - t[i])
+    for columns, values in ((i, h00 - b), (i + 1, h01 + a), (prev, -a), (after, b)):
+        np.add.at(weights, (frames, columns), values)
+    return weights
+
+
+class SourceWindow:
+    """
+    The source steps the current frame needs, read on demand.
+
+    Frames are rendered in time order, so a step older than the first one a
+    frame needs is never needed again and is dropped: at most two (linear)
+    or four (cubic) steps are held at any time.
+    """
+
+    def __init__(self, ds, layer, depth_index=0, sample_factor=1):
+        self.ds = ds
+        self.layer = layer
+        self.depth_index = depth_index
+        self.sample_factor = sample_factor
+        self.steps = {}
+        self.reads = 0
+        self.lats = self.lons = None
+
+    def fields(self, time_index):
+        if time_index not in self.steps:
+            fields, self.lats, self.lons = load_layer_fields(self.ds, self.layer, time_index, self.depth_index,
+                                                             self.sample_factor)
+            self.steps[time_index] = fields
+            self.reads += 1
+        return self.steps[time_index]
+
+    def frame(self, weights, keep_from=None):
+        """
+        Weighted sum of the steps with nonzero weight, one variable at a time.
+
+        Args:
+            weights (numpy.ndarray): One row of interpolation_weights
+            keep_from (int): Earliest step any later frame needs (default: the
+                earliest this frame needs)
+
+        Returns:
+            dict: Variable name -> 2-D array (NaN where any contributing step is NaN)
+        """
+        needed = np.flatnonzero(weights)
+        keep_from = needed[0] if keep_from is None else keep_from
+        for time_index in [k for k in self.steps if k < keep_from]:
+            del self.steps[time_index]
+        result = None
+        for time_index in needed:
+            fields = self.fields(int(time_index))
+            if result is None:
+                result = {name: values * weights[time_index] for name, values in fields.items()}
+            else:
+                for name, values in fields.items():
+                    result[name] += values * weights[time_index]
+        return result
+
+
+def _source_ranges(args):
+    """
+    Value range of every variable over some source steps (worker entry point).
+    """
+    netcdf_file, layer, time_indices, depth_index, sample_factor = args
+    ranges = {}
+    with xr.open_dataset(netcdf_file) as ds:
+        window = SourceWindow(ds, layer, depth_index, sample_factor)
+        for time_index in time_indices:
+            for name, values in window.fields(time_index).items():
+                low, high = ranges.get(name, (np.inf, -np.inf))
+                ranges[name] = (min(low, float(np.nanmin(values))), max(high, float(np.nanmax(values))))
+            window.steps.clear()
+    return ranges
+
+
+def _render_frames(args):
+    """
+    Render a run of frames into one time-series file (worker entry point).
+
+    Returns:
+        tuple: (frames written, source steps read)
+    """
+    (netcdf_file, layer, depth_index, sample_factor, weights, frame_times,
+     quantization, keyframe_interval, level, attrs, path) = args
+    # A frame that falls exactly on a source step needs only that step, while the
+    # next (cubic) frame still needs the one before it: look ahead before dropping steps
+    first_needed = (weights != 0).argmax(axis=1)
+    keep_from = np.minimum.accumulate(first_needed[::-1])[::-1]
+    with xr.open_dataset(netcdf_file) as ds:
+        window = SourceWindow(ds, layer, depth_index, sample_factor)
+        writer = None
+        try:
+            for row, frame_time, first in zip(weights, frame_times, keep_from):
+                fields = window.frame(row, first)
+                if writer is None:
+                    writer = TimeSeriesWriter(path, window.lats, window.lons, quantization, keyframe_interval,
+                                              level, attrs)
+                writer.write_step(frame_time, fields)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.close()
+    return len(frame_times), window.reads
+
+
+def generate_frames(netcdf_file, output_path, frame_interval=DEFAULT_FRAME_INTERVAL, method='linear',
+                    depth_index=0, sample_factor=1, start=None, end=None,
+                    keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, level=DEFAULT_COMPRESSION_LEVEL,
+                    precision=None, workers=None):
+    """
+    Interpolate animation frames between the time steps of a run.
+
+    Frames of currents (u/v) or temperature (thetao) are rendered every
+    frame_interval across the run and streamed to a time-series file (see
+    timeseries_format), so consecutive, nearly identical frames are stored
+    as small deltas. Only the two (linear) or four (cubic) source steps
+    around the current frame are held in memory. With many frames the run
+    is split into keyframe-aligned segments that worker processes render
+    into part files, which are then joined without re-encoding.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_path (str): Time-series file to write
+        frame_interval (str): Spacing of the frames, e.g. '1h' or '30min'
+        method (str): 'linear' or 'cubic' interpolation in time
+        depth_index (int): Index of the depth level to animate
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        start, end (str): Only render frames inside this span
+        keyframe_interval (int): Frames per keyframe group
+        level (int): zlib compression level
+        precision (dict): Coarsest quantization step per variable
+            (default: DEFAULT_PRECISION)
+        workers (int): Worker processes (default: one per CPU); 1 renders in
+            this process
+
+    Returns:
+        dict: Layer, frame and source step counts, bytes written, workers and seconds
+    """
+    if not os.path.exists(netcdf_file):
+        raise FileNotFoundError(f"NetCDF file not found: {netcdf_file}")
+    precision = DEFAULT_PRECISION if precision is None else precision
+    run_start = time.perf_counter()
+
+    with xr.open_dataset(netcdf_file) as ds:
+        layer = detect_layer(ds)
+        if layer is None:
+            raise ValueError("Could not find current or temperature variables in the dataset")
+        source_times = step_times(ds, layer)
+    if source_times[0] is None or len(source_times) < 2:
+        raise ValueError(f"{netcdf_file} has fewer than two time steps to interpolate between")
+
+    frames = frame_schedule(source_times, frame_interval, start, end)
+    source_seconds = pd.DatetimeIndex(source_times).asi8 / 1e9
+    weights = interpolation_weights(source_seconds, frames.asi8 / 1e9, method)
+    used = np.flatnonzero(weights.any(axis=0))
+    frame_times = [t.strftime('%Y-%m-%dT%H:%M:%S') for t in frames]
+    print(f"Rendering {len(frames)} {method} {layer} frame(s) every {frame_interval} "
+          f"from {len(used)} source step(s) of {os.path.basename(netcdf_file)}")
+
+    # Split the frames into segments of whole keyframe groups, one per worker
+    workers = max(1, workers or os.cpu_count() or 1)
+    if len(frames) < PARALLEL_MIN_FRAMES:
+        workers = 1
+    groups = -(-len(frames) // keyframe_interval)
+    segment = -(-groups // workers) * keyframe_interval
+    bounds = [(first, min(first + segment, len(frames))) for first in range(0, len(frames), segment)]
+    workers = len(bounds)
+
+    # One scan of the source steps fixes the quantization of every frame
+    groups_of_steps = [used[k::workers] for k in range(workers)]
+    range_tasks = [(netcdf_file, layer, [int(k) for k in indices], depth_index, sample_factor)
+                   for indices in groups_of_steps if len(indices)]
+    if workers == 1:
+        partial_ranges = [_source_ranges(task) for task in range_tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partial_ranges = list(executor.map(_source_ranges, range_tasks))
+    quantization = {}
+    for name in partial_ranges[0]:
+        low = min(ranges[name][0] for ranges in partial_ranges)
+        high = max(ranges[name][1] for ranges in partial_ranges)
+        if method == 'cubic':
+            margin = (high - low) * CUBIC_RANGE_MARGIN
+            low, high = low - margin, high + margin
+        quantization[name] = quantization_params(low, high, precision.get(name))
+
+    attrs = {"layer": layer, "source": os.path.basename(netcdf_file), "depth_index": depth_index,
+             "sample_factor": sample_factor, "interpolation": method, "frame_interval": frame_interval,
+             "source_times": [source_times[k] for k in used]}
+    render_args = (netcdf_file, layer, depth_index, sample_factor)
+    encode_args = (quantization, keyframe_interval, level, attrs)
+    if workers == 1:
+        _, reads = _render_frames(render_args + (weights, frame_times) + encode_args + (output_path,))
+    else:
+        # Parts go next to the output so the final join stays on one file system
+        part_dir = tempfile.mkdtemp(prefix=".frames-", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            parts = [os.path.join(part_dir, f"part{n:04d}.aqts") for n in range(workers)]
+            tasks = [render_args + (weights[first:last], frame_times[first:last]) + encode_args + (part,)
+                     for (first, last), part in zip(bounds, parts)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_render_frames, tasks))
+            reads = sum(result[1] for result in results)
+            merge_timeseries(parts, output_path)
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
+
+    seconds = time.perf_counter() - run_start
+    n_bytes = os.path.getsize(output_path)
+    print(f"Frames saved to {output_path} ({n_bytes} bytes, {len(frames)} frames, "
+          f"{workers} worker(s), {seconds:.2f} s)")
+    return {"layer": layer, "frames": len(frames), "source_steps": len(used), "source_reads": reads,
+            "method": method, "frame_interval": frame_interval, "bytes": n_bytes, "workers": workers,
+            "seconds": seconds}
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Interpolate animation frames between the time steps of a run")
+    parser.add_argument("netcdf_file", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--output", default=None, help="Default: <netcdf_file without .nc>_frames.aqts")
+    parser.add_argument("--interval", default=DEFAULT_FRAME_INTERVAL, help="Frame spacing, e.g. 1h or 30min")
+    parser.add_argument("--method", choices=INTERPOLATION_METHODS, default="linear")
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--sample-factor", type=int, default=1)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    parser.add_argument("--level", type=int, default=DEFAULT_COMPRESSION_LEVEL)
+    parser.add_argument("--workers", type=int, default=None, help="Default: one per CPU")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.netcdf_file)[0] + "_frames.aqts"
+    generate_frames(args.netcdf_file, output, frame_interval=args.interval, method=args.method,
+                    depth_index=args.depth_index, sample_factor=args.sample_factor, start=args.start,
+                    end=args.end, keyframe_interval=args.keyframe_interval, level=args.level,
+                    workers=args.workers)
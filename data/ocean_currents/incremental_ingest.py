@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+import xarray as xr
+import pandas as pd
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    detect_layer,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+)
+from binary_format import write_grid_binary
+from processing_cache import file_fingerprint
+from tile_pyramid import load_layer_fields
+
+# Days of valid times kept in the store, counted back from the newest step
+DEFAULT_WINDOW_DAYS = 20
+
+# Layout version of index.json; an index of another version is rebuilt
+STORE_FORMAT = 2
+
+# Forecast run date embedded in GLO12 file names, e.g. ..._fcst_R20250923.nc
+RUN_PATTERN = re.compile(r'_R(\d{8})(?:\D|$)')
+
+
+def forecast_run(netcdf_file):
+    """
+    Identify the forecast run a file belongs to.
+
+    Uses the R<YYYYMMDD> tag of GLO12 file names. Files without one (e.g.
+    plain subsets) fall back to their modification time, so a newer
+    download supersedes an older one.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+
+    Returns:
+        str: Sortable ISO timestamp of the run
+    """
+    match = RUN_PATTERN.search(os.path.basename(netcdf_file))
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d').strftime('%Y-%m-%dT%H:%M:%S')
+    mtime = datetime.fromtimestamp(os.path.getmtime(netcdf_file), tz=timezone.utc)
+    return mtime.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class TimeIndexedStore:
+    """
+    Directory of per-valid-time binary slabs, one subdirectory per layer and
+    depth level, indexed by index.json.
+
+    The index maps layer -> depth -> valid time -> the forecast run, source
+    file and slab file that currently provide that step; depths are keyed
+    by depth_key, so files holding different depth levels never overwrite
+    each other. ingest_state in the same file remembers the fingerprint of
+    every (input, depth index) already ingested.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.index_path = os.path.join(store_dir, "index.json")
+        os.makedirs(store_dir, exist_ok=True)
+        data = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data.get("format") != STORE_FORMAT:
+                # Older layout without depth levels: ingest everything again
+                data = {}
+        self.layers = data.get("layers", {})
+        self.ingest_state = data.get("ingest_state", {})
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"format": STORE_FORMAT, "layers": self.layers, "ingest_state": self.ingest_state}, f,
+                      indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def needs_step(self, layer, depth, valid_time, run, source):
+        """
+        Whether a step from the given run/source should be (re)written.
+
+        A step is needed when it is missing, when the stored copy comes from
+        an older forecast run, or when it comes from this same source file
+        (which has changed, otherwise it would not be re-scanned).
+        """
+        entry = self.layers.get(layer, {}).get(depth, {}).get(valid_time)
+        if entry is None:
+            return True
+        if entry["run"] < run:
+            return True
+        return entry["run"] == run and entry["source"] == source
+
+    def slab_path(self, layer, depth, valid_time):
+        label = valid_time.replace('-', '').replace(':', '')[:13]
+        return os.path.join(self.store_dir, layer, depth, f"{label}.bin")
+
+    def put_step(self, layer, depth, valid_time, run, source, slab_file):
+        self.layers.setdefault(layer, {}).setdefault(depth, {})[valid_time] = {
+            "run": run,
+            "source": source,
+            "file": os.path.relpath(slab_file, self.store_dir),
+        }
+
+    def prune(self, window_days):
+        """
+        Drop steps older than window_days before the newest step of each
+        layer and depth.
+
+        Returns:
+            int: Number of steps removed
+        """
+        removed = 0
+        for depths in self.layers.values():
+            for steps in depths.values():
+                if not steps:
+                    continue
+                cutoff = pd.Timestamp(max(steps)) - pd.Timedelta(days=window_days)
+                for valid_time in [t for t in steps if pd.Timestamp(t) < cutoff]:
+                    path = os.path.join(self.store_dir, steps.pop(valid_time)["file"])
+                    if os.path.exists(path):
+                        os.remove(path)
+                    removed += 1
+        return removed
+
+
+def depth_key(depth):
+    """
+    Store key of a depth level, from its depth in metres (None for files
+    without a depth axis).
+    """
+    return "surface" if depth is None else f"{depth:g}m"
+
+
+def scan_inputs(input_dirs):
+    """
+    List the NetCDF files in the input directories, oldest run first, so
+    newer runs are applied last and win for overlapping valid times.
+    """
+    files = []
+    for input_dir in input_dirs:
+        files.extend(glob.glob(os.path.join(input_dir, "*.nc")))
+    return sorted(files, key=lambda path: (forecast_run(path), path))
+
+
+def ingest_file(store, netcdf_file, sample_factor=8, depth_index=0):
+    """
+    Write the new or superseding time steps of one NetCDF file to the store.
+
+    Args:
+        store (TimeIndexedStore): Destination store
+        netcdf_file (str): Path to the NetCDF file
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        depth_index (int): Index of the depth level to store
+
+    Returns:
+        int: Number of time steps written
+    """
+    run = forecast_run(netcdf_file)
+    source = os.path.basename(netcdf_file)
+    written = 0
+    with xr.open_dataset(netcdf_file) as ds:
+        layer = detect_layer(ds)
+        if layer is None:
+            print(f"  Skipping {source}: no current or temperature variables")
+            return 0
+        reference = find_current_variables(ds)[0] if layer == 'currents' else find_variable(ds, TEMPERATURE_NAMES)
+        coord_dims = identify_coord_dims(ds, reference)
+        if 'time' in coord_dims:
+            times = pd.to_datetime(ds[coord_dims['time']].values)
+        else:
+            times = [pd.Timestamp(run)]
+        attrs = {"layer": layer, "run": run, "source": source}
+        if 'depth' in coord_dims:
+            attrs["depth"] = float(ds[coord_dims['depth']].values[depth_index])
+        depth = depth_key(attrs.get("depth"))
+
+        for time_index, timestamp in enumerate(times):
+            valid_time = timestamp.strftime('%Y-%m-%dT%H:%M:%S')
+            if not store.needs_step(layer, depth, valid_time, run, source):
+                continue
+            fields, lats, lons = load_layer_fields(ds, layer, time_index, depth_index, sample_factor)
+            slab_file = store.slab_path(layer, depth, valid_time)
+            os.makedirs(os.path.dirname(slab_file), exist_ok=True)
+            write_grid_binary(slab_file, lats, lons, fields,
+                              attrs=dict(attrs, time=valid_time))
+            store.put_step(layer, depth, valid_time, run, source, slab_file)
+            written += 1
+    print(f"  {source}: {layer} at {depth}, run {run[:10]}, {written} new/updated step(s)")
+    return written
+
+
+def ingest(input_dirs, store_dir, sample_factor=8, depth_index=0, window_days=DEFAULT_WINDOW_DAYS):
+    """
+    Bring the time-indexed store up to date with the NetCDF files in input_dirs.
+
+    Only files that are new or whose fingerprint changed since the last run
+    are opened, and of those only the time steps that are missing from the
+    store or held from an older forecast run are processed. Steps outside
+    the rolling window are pruned afterwards.
+
+    Args:
+        input_dirs (list): Directories scanned for *.nc files
+        store_dir (str): Root directory of the time-indexed store
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        depth_index (int): Index of the depth level to store
+        window_days (float): Length of the rolling window in days
+
+    Returns:
+        dict: Counts of 'files' ingested, 'steps' written and 'pruned' steps
+    """
+    store = TimeIndexedStore(store_dir)
+    params = {"sample_factor": sample_factor, "depth_index": depth_index}
+    summary = {"files": 0, "steps": 0, "pruned": 0}
+
+    for netcdf_file in scan_inputs(input_dirs):
+        # Each depth level of a file is ingested (and remembered) separately
+        state_key = f"{os.path.abspath(netcdf_file)}#depth={depth_index}"
+        fingerprint = dict(file_fingerprint(netcdf_file), params=params)
+        if store.ingest_state.get(state_key) == fingerprint:
+            continue
+        summary["steps"] += ingest_file(store, netcdf_file, sample_factor, depth_index)
+        summary["files"] += 1
+        store.ingest_state[state_key] = fingerprint
+        # Save after every file so an interrupted run resumes where it stopped
+        store.save()
+
+    summary["pruned"] = store.prune(window_days)
+    store.save()
+    print(f"Ingested {summary['files']} file(s), wrote {summary['steps']} step(s), pruned {summary['pruned']}")
+    return summary
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description="Incrementally ingest new forecast runs")
+    parser.add_argument("--inputs", nargs="*",
+                        default=[script_dir, os.path.join(data_dir, "temperature")])
+    parser.add_argument("--store-dir",
+                        default=os.path.join(data_dir, "..", "public", "data", "timeseries"))
+    parser.add_argument("--sample-factor", type=int, default=8)
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--window-days", type=float, default=DEFAULT_WINDOW_DAYS)
+    args = parser.parse_args()
+
+    ingest(args.inputs, args.store_dir, sample_factor=args.sample_factor,
+           depth_index=args.depth_index, window_days=args.window_days)
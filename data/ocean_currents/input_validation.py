@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import argparse
+import json
+import os
+
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    detect_layer,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+    select_slice,
+)
+
+# Physically plausible values per output variable; anything outside is a
+# decoding problem (unapplied scale_factor, fill values read as data, ...)
+VALUE_RANGES = {'u': (-10.0, 10.0), 'v': (-10.0, 10.0), 'thetao': (-5.0, 45.0)}
+
+# Above this fraction of missing cells the slab is rejected (land alone
+# covers about a third of a global grid)
+MAX_NAN_FRACTION = 0.95
+
+COORDINATE_RANGES = {'lat': (-90.0, 90.0), 'lon': (-180.0, 360.0)}
+
+
+def _check_axis(ds, coord_dims, axis, errors, warnings):
+    """
+    Check one coordinate axis: present, 1-D, finite, strictly monotonic, in range.
+    """
+    if axis not in coord_dims:
+        errors.append(f"No {axis} coordinate")
+        return None
+    values = np.asarray(ds[coord_dims[axis]].values)
+    if values.ndim != 1:
+        errors.append(f"{axis} coordinate {coord_dims[axis]} is {values.ndim}-D; expected 1-D")
+        return None
+    values = values.astype(np.float64)
+    if not np.isfinite(values).all():
+        errors.append(f"{axis} coordinate has {int((~np.isfinite(values)).sum())} non-finite values")
+        return None
+    steps = np.diff(values)
+    if len(values) > 1 and not ((steps > 0).all() or (steps < 0).all()):
+        errors.append(f"{axis} coordinate is not strictly monotonic")
+    low, high = COORDINATE_RANGES[axis]
+    if values.min() < low or values.max() > high:
+        errors.append(f"{axis} coordinate spans {values.min():g}..{values.max():g}, outside {low:g}..{high:g}")
+    elif axis == 'lon' and values.max() > 180:
+        warnings.append("Longitudes east of 180 (0..360 convention) are dropped from the processed output")
+    return {"size": len(values), "min": float(values.min()), "max": float(values.max()),
+            "ascending": bool(len(values) < 2 or steps[0] > 0)}
+
+
+def validate_dataset(ds, time_index=0, depth_index=0, sample_factor=1, max_nan_fraction=MAX_NAN_FRACTION):
+    """
+    Check that a dataset can be processed, with whole-array tests only.
+
+    Variables, dtypes and coordinates are checked from metadata; the NaN
+    fraction and value range are measured on the (time, depth) slab that
+    would be processed, read at the output's sample factor.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        time_index (int): Time step that will be processed
+        depth_index (int): Depth level that will be processed
+        sample_factor (int): Stride the slab is read with
+        max_nan_fraction (float): Largest acceptable fraction of missing cells
+
+    Returns:
+        dict: 'valid', 'layer', 'errors' and 'warnings' (lists of messages)
+              and the measured 'grid' and per-variable 'variables'
+    """
+    errors, warnings = [], []
+    report = {"valid": False, "layer": None, "errors": errors, "warnings": warnings, "grid": {}, "variables": {}}
+    layer = detect_layer(ds)
+    if layer is None:
+        errors.append(f"No current (u/v) or temperature variables; found {sorted(ds.data_vars)}")
+        return report
+    report["layer"] = layer
+    if layer == 'currents':
+        u_var, v_var = find_current_variables(ds)
+        variables = {'u': u_var, 'v': v_var}
+    else:
+        variables = {'thetao': find_variable(ds, TEMPERATURE_NAMES)}
+
+    coord_dims = identify_coord_dims(ds, next(iter(variables.values())))
+    for name, var in variables.items():
+        dtype = ds[var].dtype
+        if dtype.kind != 'f':
+            errors.append(f"{var} has dtype {dtype}; expected floating point (packed data not decoded?)")
+        if identify_coord_dims(ds, var) != coord_dims:
+            errors.append(f"{var} is not on the same dimensions as {next(iter(variables.values()))}")
+    for axis in ('lat', 'lon'):
+        report["grid"][axis] = _check_axis(ds, coord_dims, axis, errors, warnings)
+    for axis, index in (('time', time_index), ('depth', depth_index)):
+        if axis not in coord_dims:
+            continue
+        size = ds.sizes[coord_dims[axis]]
+        if not 0 <= index < size:
+            errors.append(f"{axis} index {index} is out of range (0-{size - 1})")
+        if axis == 'time' and size > 1:
+            times = ds[coord_dims['time']].values
+            if not (times[1:] > times[:-1]).all():
+                errors.append("time coordinate is not strictly increasing")
+        report["grid"][axis] = {"size": int(size)}
+    if errors:
+        return report
+
+    order = (coord_dims['lat'], coord_dims['lon'])
+    stride = {dim: slice(None, None, sample_factor) for dim in order}
+    for name, var in variables.items():
+        values = select_slice(ds[var], coord_dims, time_index, depth_index).isel(stride).transpose(*order).values
+        missing = np.isnan(values)
+        infinite = np.isinf(values)
+        finite = values[~(missing | infinite)]
+        stats = {"cells": int(values.size), "nan_fraction": float(missing.mean()) if values.size else 1.0}
+        if infinite.any():
+            errors.append(f"{var} has {int(infinite.sum())} infinite values")
+        if finite.size == 0:
+            errors.append(f"{var} has no valid values at time {time_index}, depth {depth_index}")
+        else:
+            stats.update(min=float(finite.min()), max=float(finite.max()))
+            if stats["nan_fraction"] > max_nan_fraction:
+                errors.append(f"{var} is {stats['nan_fraction']:.1%} missing (limit {max_nan_fraction:.0%})")
+            low, high = VALUE_RANGES[name]
+            outside = int(((finite < low) | (finite > high)).sum())
+            if outside:
+                errors.append(f"{var} has {outside} values outside {low:g}..{high:g} "
+                              f"(range {stats['min']:g}..{stats['max']:g})")
+        report["variables"][var] = stats
+    report["valid"] = not errors
+    return report
+
+
+def validate_netcdf(netcdf_file, **kwargs):
+    """
+    Open and validate a NetCDF file; a file that cannot be opened is invalid.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        **kwargs: Passed through to validate_dataset
+
+    Returns:
+        dict: validate_dataset's report plus 'file'
+    """
+    try:
+        with xr.open_dataset(netcdf_file) as ds:
+            report = validate_dataset(ds, **kwargs)
+    except Exception as e:
+        report = {"valid": False, "layer": None, "errors": [f"Cannot read file: {type(e).__name__}: {e}"],
+                  "warnings": [], "grid": {}, "variables": {}}
+    return dict(report, file=os.path.abspath(netcdf_file))
+
+
+def print_validation(report):
+    """
+    Print a validation report in human-readable form.
+    """
+    status = "OK" if report["valid"] else "INVALID"
+    print(f"{os.path.basename(report['file'])}: {status} ({report['layer'] or 'unknown layer'})")
+    for message in report["errors"]:
+        print(f"  error:   {message}")
+    for message in report["warnings"]:
+        print(f"  warning: {message}")
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Check NetCDF files before processing")
+    parser.add_argument("netcdf_files", nargs="*",
+                        default=[os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc")])
+    parser.add_argument("--time-index", type=int, default=0)
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--sample-factor", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = [validate_netcdf(path, time_index=args.time_index, depth_index=args.depth_index,
+                               sample_factor=args.sample_factor) for path in args.netcdf_files]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_validation(report)
+    raise SystemExit(0 if all(report["valid"] for report in reports) else 1)
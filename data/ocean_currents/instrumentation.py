@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Environment switches, so the scripts can be instrumented without code changes:
+#   AQUANOVA_METRICS  directory (or .json path) for the per-run metrics file
+#   AQUANOVA_LOG      file receiving structured JSON log lines ('-' for stderr)
+#   AQUANOVA_PROFILE  '1' to run cProfile and tracemalloc and dump the profiles
+METRICS_ENV = "AQUANOVA_METRICS"
+LOG_ENV = "AQUANOVA_LOG"
+PROFILE_ENV = "AQUANOVA_PROFILE"
+
+# Allocation sites listed in the tracemalloc report
+TRACEMALLOC_TOP = 25
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class RunMetrics:
+    """
+    Per-run stage timings, counters and structured log events.
+
+    Stages accumulate wall time under a name (a stage entered twice adds
+    up); counters hold points processed/skipped, bytes written and the like.
+    Events are written as JSON lines to the log file when one is configured.
+    finish() adds the peak memory and writes everything to the metrics file.
+
+    Usage:
+        with run_metrics('process_ocean_currents') as metrics:
+            with metrics.stage('open'):
+                ds = xr.open_dataset(path)
+            metrics.count('points', n)
+    """
+
+    def __init__(self, name, metrics_path=None, log_path=None, profile=False):
+        """
+        Args:
+            name (str): Run name (usually the entry point function)
+            metrics_path (str): Metrics file, or a directory to put it in
+            log_path (str): JSON-lines log file, or '-' for stderr
+            profile (bool): Collect cProfile and tracemalloc profiles
+        """
+        self.name = name
+        self.run_id = f"{name}_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{os.getpid()}"
+        self.metrics_path = metrics_path
+        self.log_path = log_path
+        self.profile = profile
+        self.stages = {}
+        self.counters = {}
+        self.info = {}
+        self.status = "ok"
+        self._start = None
+        self._profiler = None
+        self._log = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.log_path == '-':
+            self._log = sys.stderr
+        elif self.log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            self._log = open(self.log_path, 'a')
+        if self.profile:
+            tracemalloc.start()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.event("run_started")
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of work and add it to the named stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_info(self, **fields):
+        """
+        Attach descriptive fields (input file, parameters, ...) to the run.
+        """
+        self.info.update(fields)
+
+    def event(self, event, level="info", **fields):
+        """
+        Emit one structured log line (if a log is configured).
+        """
+        if self._log is None:
+            return
+        record = {
+            "time": datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            "run": self.run_id,
+            "level": level,
+            "event": event,
+        }
+        record.update(fields)
+        self._log.write(json.dumps(record, default=str) + "\n")
+        self._log.flush()
+
+    def fail(self, error):
+        """
+        Mark the run as failed (for errors that are reported and swallowed).
+        """
+        self.status = "error"
+        self.event("error", level="error", error=repr(error))
+
+    def record_summary(self, summary):
+        """
+        Fold the summary returned by process_dataset into the run.
+        """
+        for stage, seconds in summary.get("timings", {}).items():
+            self.add_time(stage, seconds)
+        for name in ("points", "skipped_nan", "skipped_range"):
+            self.count(name, summary.get(name, 0))
+        for path in summary.get("outputs", {}).values():
+            if path and os.path.exists(path):
+                self.count("bytes_written", os.path.getsize(path))
+
+    def finish(self, status=None):
+        """
+        Stop profiling, write the metrics (and profiles) and return them.
+
+        Args:
+            status (str): Final status; defaults to 'error' if fail() was
+                called and 'ok' otherwise
+
+        Returns:
+            dict: The metrics document
+        """
+        status = status or self.status
+        document = {
+            "run": self.run_id,
+            "name": self.name,
+            "status": status,
+            "wall_seconds": time.perf_counter() - self._start,
+            "stages": self.stages,
+            "counters": self.counters,
+            "peak_rss_mb": peak_rss_mb(),
+            "info": self.info,
+        }
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            document["tracemalloc_peak_mb"] = traced_peak / 2 ** 20
+            document["profiles"] = self._dump_profiles(snapshot)
+
+        path = self._metrics_file()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=2, default=str)
+            document["metrics_file"] = path
+
+        self.event("run_finished", status=status, wall_seconds=document["wall_seconds"],
+                   peak_rss_mb=document["peak_rss_mb"], counters=self.counters)
+        if self._log is not None and self._log is not sys.stderr:
+            self._log.close()
+        self._log = None
+        return document
+
+    def _metrics_file(self):
+        if not self.metrics_path:
+            return None
+        if self.metrics_path.endswith('.json'):
+            return self.metrics_path
+        return os.path.join(self.metrics_path, f"{self.run_id}.json")
+
+    def _dump_profiles(self, snapshot):
+        if self.metrics_path and not self.metrics_path.endswith('.json'):
+            profile_dir = self.metrics_path
+        elif self.metrics_path:
+            profile_dir = os.path.dirname(os.path.abspath(self.metrics_path))
+        else:
+            profile_dir = os.getcwd()
+        os.makedirs(profile_dir, exist_ok=True)
+
+        cprofile_path = os.path.join(profile_dir, f"{self.run_id}.prof")
+        self._profiler.dump_stats(cprofile_path)
+
+        tracemalloc_path = os.path.join(profile_dir, f"{self.run_id}_tracemalloc.txt")
+        with open(tracemalloc_path, 'w') as f:
+            for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+        return {"cprofile": cprofile_path, "tracemalloc": tracemalloc_path}
+
+
+@contextmanager
+def run_metrics(name, metrics=None, metrics_path=None, log_path=None, profile=None):
+    """
+    Instrument one run of an entry point.
+
+    When an enclosing run's metrics are passed in, they are reused, so a
+    nested entry point (e.g. process_ocean_currents called from run_script)
+    adds to the outer run instead of starting its own. Otherwise a new
+    RunMetrics is created, configured from the arguments or the
+    AQUANOVA_METRICS / AQUANOVA_LOG / AQUANOVA_PROFILE environment variables,
+    and finished when the block exits (with status 'error' on an exception).
+
+    Yields:
+        RunMetrics
+    """
+    if metrics is not None:
+        yield metrics
+        return
+
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "") not in ("", "0")
+    metrics = RunMetrics(name,
+                         metrics_path=metrics_path or os.environ.get(METRICS_ENV),
+                         log_path=log_path or os.environ.get(LOG_ENV),
+                         profile=profile).start()
+    try:
+        yield metrics
+    except BaseException as e:
+        metrics.fail(e)
+        raise
+    finally:
+        metrics.finish()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import argparse
+import glob
+import json
+import os
+import time
+
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+    select_slice,
+    new_statistics,
+    update_statistics,
+    finalize_statistics,
+)
+from binary_format import write_grid_binary
+
+# Variables of every joint slab, in block order
+JOINT_VARIABLES = ('u', 'v', 'thetao')
+
+# Largest offset, in grid cells, at which a temperature cell still counts as
+# co-located with a current cell (same 1/12 degree grid: offsets are ~0)
+COLOCATION_TOLERANCE = 0.25
+
+# Largest depth difference, in metres, between the two products' levels
+DEPTH_TOLERANCE = 0.5
+
+
+def nearest_indices(source, target, tolerance):
+    """
+    Index of the source coordinate value nearest to each target value.
+
+    Args:
+        source (numpy.ndarray): Coordinate axis to pick from (monotonic)
+        target (numpy.ndarray): Values to locate
+        tolerance (float): Largest accepted distance
+
+    Returns:
+        numpy.ndarray: int64 indices into source, -1 where nothing is within tolerance
+    """
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    order = np.argsort(source)
+    sorted_source = source[order]
+    right = np.clip(np.searchsorted(sorted_source, target), 1, len(source) - 1) if len(source) > 1 else \
+        np.zeros(len(target), dtype=np.int64)
+    left = np.maximum(right - 1, 0)
+    pick = np.where(np.abs(sorted_source[left] - target) <= np.abs(sorted_source[right] - target), left, right)
+    indices = order[pick].astype(np.int64)
+    indices[np.abs(source[indices] - target) > tolerance] = -1
+    return indices
+
+
+def _axis_step(values):
+    values = np.asarray(values, dtype=np.float64)
+    return float(np.abs(np.diff(values)).mean()) if values.size > 1 else 1.0
+
+
+def shared_grid(current_lats, current_lons, temperature_lats, temperature_lons, sample_factor=1):
+    """
+    The grid the joint product is written on: the current grid, cropped to
+    where the temperature grid also has cells and strided by sample_factor.
+
+    Args:
+        current_lats, current_lons (numpy.ndarray): Current coordinate axes
+        temperature_lats, temperature_lons (numpy.ndarray): Temperature coordinate axes
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+
+    Returns:
+        dict: 'lats'/'lons' of the shared grid, the current 'rows'/'cols'
+              slices and the temperature 'lat_index'/'lon_index' arrays
+              (-1 where the temperature grid has no co-located cell)
+    """
+    lat_tolerance = COLOCATION_TOLERANCE * _axis_step(current_lats)
+    lon_tolerance = COLOCATION_TOLERANCE * _axis_step(current_lons)
+    lat_index = nearest_indices(temperature_lats, current_lats, lat_tolerance)
+    lon_index = nearest_indices(temperature_lons, current_lons, lon_tolerance)
+    rows = np.flatnonzero(lat_index >= 0)
+    cols = np.flatnonzero(lon_index >= 0)
+    if len(rows) == 0 or len(cols) == 0:
+        raise ValueError("The current and temperature grids do not overlap")
+    row_slice = slice(int(rows[0]), int(rows[-1]) + 1, sample_factor)
+    col_slice = slice(int(cols[0]), int(cols[-1]) + 1, sample_factor)
+    return {
+        "lats": np.asarray(current_lats, dtype=np.float64)[row_slice],
+        "lons": np.asarray(current_lons, dtype=np.float64)[col_slice],
+        "rows": row_slice,
+        "cols": col_slice,
+        "lat_index": lat_index[row_slice],
+        "lon_index": lon_index[col_slice],
+    }
+
+
+def shared_times(current_ds, current_dims, temperature_ds, temperature_dims):
+    """
+    Valid times present in both products.
+
+    Returns:
+        list: (timestamp, current time index, temperature time index) tuples,
+              in time order; a product without a time axis matches every step
+    """
+    def times_of(ds, coord_dims):
+        if 'time' not in coord_dims:
+            return None
+        return pd.to_datetime(ds[coord_dims['time']].values)
+
+    current_times = times_of(current_ds, current_dims)
+    temperature_times = times_of(temperature_ds, temperature_dims)
+    if current_times is None and temperature_times is None:
+        return [(None, 0, 0)]
+    if current_times is None:
+        return [(t, 0, i) for i, t in enumerate(temperature_times)]
+    if temperature_times is None:
+        return [(t, i, 0) for i, t in enumerate(current_times)]
+    temperature_position = {t: i for i, t in enumerate(temperature_times)}
+    return [(t, i, temperature_position[t]) for i, t in enumerate(current_times) if t in temperature_position]
+
+
+def matching_depth_index(current_ds, current_dims, temperature_ds, temperature_dims, depth_index):
+    """
+    Temperature depth level matching the current depth level depth_index.
+
+    Returns:
+        tuple: (temperature depth index, depth in metres or None)
+    """
+    if 'depth' not in current_dims:
+        return 0, None
+    depth = float(current_ds[current_dims['depth']].values[depth_index])
+    if 'depth' not in temperature_dims:
+        return 0, depth
+    index = int(nearest_indices(temperature_ds[temperature_dims['depth']].values, [depth], DEPTH_TOLERANCE)[0])
+    if index < 0:
+        raise ValueError(f"The temperature file has no depth level at {depth:.3f} m")
+    return index, depth
+
+
+def read_joint_step(sources, grid, current_time, temperature_time, depth_index, temperature_depth_index):
+    """
+    Read u, v and thetao of one step on the shared grid.
+
+    Current windows are read as strided slices; temperature is read over
+    the bounding box of its co-located cells and gathered with one take
+    per axis (an identity gather when both products share the grid).
+
+    Returns:
+        dict: 'u', 'v', 'thetao' float32 arrays shaped like the shared grid
+    """
+    u_data, v_data, t_data, current_dims, temperature_dims = sources
+    window = {current_dims['lat']: grid["rows"], current_dims['lon']: grid["cols"]}
+    order = (current_dims['lat'], current_dims['lon'])
+    u = select_slice(u_data, current_dims, current_time, depth_index).isel(window).transpose(*order).values
+    v = select_slice(v_data, current_dims, current_time, depth_index).isel(window).transpose(*order).values
+
+    lat_index, lon_index = grid["lat_index"], grid["lon_index"]
+    rows = lat_index[lat_index >= 0]
+    cols = lon_index[lon_index >= 0]
+    row0, col0 = int(rows.min()), int(cols.min())
+    t_window = {temperature_dims['lat']: slice(row0, int(rows.max()) + 1),
+                temperature_dims['lon']: slice(col0, int(cols.max()) + 1)}
+    t_order = (temperature_dims['lat'], temperature_dims['lon'])
+    box = select_slice(t_data, temperature_dims, temperature_time, temperature_depth_index)
+    box = box.isel(t_window).transpose(*t_order).values
+    thetao = np.take(np.take(box, np.maximum(lat_index - row0, 0), axis=0), np.maximum(lon_index - col0, 0), axis=1)
+    thetao = np.where((lat_index >= 0)[:, None] & (lon_index >= 0)[None, :], thetao, np.nan)
+    return {"u": u.astype(np.float32), "v": v.astype(np.float32), "thetao": thetao.astype(np.float32)}
+
+
+def joint_step_path(output_dir, timestamp, position):
+    label = timestamp.strftime('%Y%m%dT%H%M') if timestamp is not None else f"t{position:03d}"
+    return os.path.join(output_dir, f"joint_{label}.bin")
+
+
+def process_joint_product(currents_file, temperature_file, output_dir, sample_factor=8, depth_index=0,
+                          encoding='float32', time_indices=None):
+    """
+    Co-locate currents and temperature and write one u/v/thetao slab per step.
+
+    Variables are discovered as process_ocean_currents does. The output
+    grid is the current grid where temperature is also available, the time
+    axis is the valid times common to both files, and every slab has one
+    land mask: the cells where u, v and thetao are all present. Each step
+    is a single binary grid file holding all three variables, so a client
+    gets every layer of a region in one read (and, through data_service, one
+    request for layer 'joint'). joint_product.json lists the steps and the
+    running statistics of each variable.
+
+    Args:
+        currents_file (str): NetCDF file with uo/vo (may also hold thetao)
+        temperature_file (str): NetCDF file with thetao, or None to use the currents file
+        output_dir (str): Directory receiving the slabs and the manifest
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        depth_index (int): Index of the current depth level (temperature uses
+            the level at the same depth)
+        encoding (str): 'float32' or 'int16'
+        time_indices (list): Positions in the shared time axis to write (default: all)
+
+    Returns:
+        dict: The manifest
+    """
+    for path in (currents_file, temperature_file):
+        if path is not None and not os.path.exists(path):
+            raise FileNotFoundError(f"NetCDF file not found: {path}")
+    temperature_file = temperature_file or currents_file
+    os.makedirs(output_dir, exist_ok=True)
+
+    current_ds = xr.open_dataset(currents_file)
+    temperature_ds = current_ds if temperature_file == currents_file else xr.open_dataset(temperature_file)
+    try:
+        u_var, v_var = find_current_variables(current_ds)
+        if u_var is None or v_var is None:
+            raise ValueError("Could not find ocean current velocity variables in the currents file")
+        t_var = find_variable(temperature_ds, TEMPERATURE_NAMES)
+        if t_var is None:
+            raise ValueError("Could not find a sea water temperature variable in the temperature file")
+        current_dims = identify_coord_dims(current_ds, u_var)
+        temperature_dims = identify_coord_dims(temperature_ds, t_var)
+        print(f"Joint product of {u_var}/{v_var} ({os.path.basename(currents_file)}) "
+              f"and {t_var} ({os.path.basename(temperature_file)})")
+
+        grid = shared_grid(current_ds[current_dims['lat']].values, current_ds[current_dims['lon']].values,
+                           temperature_ds[temperature_dims['lat']].values,
+                           temperature_ds[temperature_dims['lon']].values, sample_factor)
+        steps = shared_times(current_ds, current_dims, temperature_ds, temperature_dims)
+        if not steps:
+            raise ValueError("The current and temperature files have no valid time in common")
+        temperature_depth_index, depth = matching_depth_index(current_ds, current_dims, temperature_ds,
+                                                              temperature_dims, depth_index)
+        print(f"Shared grid {len(grid['lats'])}x{len(grid['lons'])}, {len(steps)} common time step(s)")
+
+        sources = (current_ds[u_var], current_ds[v_var], temperature_ds[t_var], current_dims, temperature_dims)
+        attrs = {"layer": "joint", "sources": [os.path.basename(currents_file), os.path.basename(temperature_file)],
+                 "sample_factor": sample_factor, "depth_index": depth_index}
+        if depth is not None:
+            attrs["depth"] = depth
+        statistics = {name: new_statistics() for name in JOINT_VARIABLES}
+        manifest_steps = []
+        for position in (range(len(steps)) if time_indices is None else time_indices):
+            timestamp, current_time, temperature_time = steps[position]
+            start = time.perf_counter()
+            fields = read_joint_step(sources, grid, current_time, temperature_time, depth_index,
+                                     temperature_depth_index)
+            valid = np.isfinite(fields['u']) & np.isfinite(fields['v']) & np.isfinite(fields['thetao'])
+            for name, values in fields.items():
+                update_statistics(statistics[name], values[valid], missing=int(valid.size - valid.sum()))
+
+            path = joint_step_path(output_dir, timestamp, position)
+            step_attrs = dict(attrs, time=timestamp.strftime('%Y-%m-%dT%H:%M:%S')) if timestamp is not None else attrs
+            # Write under a temporary name so the data service never serves a partial slab
+            tmp_path = path + ".tmp"
+            n_bytes = write_grid_binary(tmp_path, grid["lats"], grid["lons"], fields, valid=valid,
+                                        encoding=encoding, attrs=step_attrs)
+            os.replace(tmp_path, path)
+            manifest_steps.append({"time": step_attrs.get("time"), "file": os.path.basename(path),
+                                   "valid_cells": int(valid.sum()), "bytes": n_bytes})
+            print(f"  {step_attrs.get('time', position)} -> {os.path.basename(path)} "
+                  f"({int(valid.sum())} ocean cells, {time.perf_counter() - start:.2f} s)")
+    finally:
+        if temperature_ds is not current_ds:
+            temperature_ds.close()
+        current_ds.close()
+
+    manifest = {
+        "variables": list(JOINT_VARIABLES),
+        "sources": {"currents": os.path.basename(currents_file), "temperature": os.path.basename(temperature_file),
+                    "variables": {"u": u_var, "v": v_var, "thetao": t_var}},
+        "grid": {"nlat": len(grid["lats"]), "nlon": len(grid["lons"]),
+                 "lat": [float(grid["lats"][0]), float(grid["lats"][-1])],
+                 "lon": [float(grid["lons"][0]), float(grid["lons"][-1])]},
+        "depth": depth,
+        "sample_factor": sample_factor,
+        "encoding": encoding,
+        "steps": manifest_steps,
+        "statistics": {name: finalize_statistics(stats) for name, stats in statistics.items()},
+    }
+    with open(os.path.join(output_dir, "joint_product.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(manifest_steps)} joint slab(s) to {output_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    temperature_files = sorted(glob.glob(os.path.join(script_dir, "..", "temperature", "*.nc")))
+
+    parser = argparse.ArgumentParser(description="Co-locate currents and temperature on one grid")
+    parser.add_argument("--currents",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--temperature", default=temperature_files[0] if temperature_files else None,
+                        help="NetCDF file with thetao (default: first file in data/temperature)")
+    parser.add_argument("--output-dir",
+                        default=os.path.join(script_dir, "..", "..", "public", "data", "joint"))
+    parser.add_argument("--sample-factor", type=int, default=8)
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--encoding", choices=["float32", "int16"], default="float32")
+    parser.add_argument("--time-indices", type=int, nargs="*", default=None)
+    args = parser.parse_args()
+
+    process_joint_product(args.currents, args.temperature, args.output_dir, sample_factor=args.sample_factor,
+                          depth_index=args.depth_index, encoding=args.encoding, time_indices=args.time_indices)
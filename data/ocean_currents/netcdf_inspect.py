@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from chunked_io import disk_chunk_sizes
+from currents_engine import TEMPERATURE_NAMES, find_variable
+
+# Variables describe_dataset reports as currents
+CURRENT_VARIABLE_NAMES = ['uo', 'vo', 'u', 'v', 'water_u', 'water_v']
+
+# Where statistics come from: 'auto' uses declared attributes when present
+# and a chunk sample otherwise
+STATS_MODES = ('auto', 'attributes', 'sample', 'none')
+
+# Chunks read per variable when sampling, and the cap on cells read per variable
+DEFAULT_SAMPLE_CHUNKS = 8
+MAX_SAMPLE_CELLS = 2 ** 22
+
+# Sampling block along the last two dimensions of contiguous (unchunked) variables
+CONTIGUOUS_BLOCK = 256
+
+# Attribute pairs that declare a variable's value range
+RANGE_ATTRIBUTES = (('valid_min', 'valid_max'), ('actual_min', 'actual_max'))
+
+
+def _plain(value):
+    """
+    JSON-friendly version of an attribute or coordinate value.
+    """
+    if isinstance(value, np.ndarray):
+        return _plain(value.item()) if value.ndim == 0 else [_plain(v) for v in value.tolist()]
+    if isinstance(value, (np.datetime64, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return _plain(value.item())
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def declared_range(attrs):
+    """
+    Value range declared by a variable's attributes.
+
+    Returns:
+        dict: 'min', 'max' and the 'attributes' they came from, or None
+    """
+    for low_name, high_name in RANGE_ATTRIBUTES:
+        if low_name in attrs and high_name in attrs:
+            return {"min": float(attrs[low_name]), "max": float(attrs[high_name]),
+                    "attributes": f"{low_name}/{high_name}"}
+    for name in ('actual_range', 'valid_range'):
+        if name in attrs and np.size(attrs[name]) == 2:
+            low, high = np.ravel(attrs[name])
+            return {"min": float(low), "max": float(high), "attributes": name}
+    return None
+
+
+def sample_windows(data_array, chunks, sample_chunks, rng):
+    """
+    Index windows of randomly chosen distinct chunks of a variable.
+
+    Contiguous variables are split into one CONTIGUOUS_BLOCK-square block
+    per leading index. Chunks larger than the per-chunk share of
+    MAX_SAMPLE_CELLS are read through a random sub-window.
+
+    Args:
+        data_array (xarray.DataArray): Lazily opened variable
+        chunks (dict): Output of disk_chunk_sizes
+        sample_chunks (int): Chunks to pick
+        rng (numpy.random.Generator): Random source
+
+    Returns:
+        tuple: (list of isel dicts, total number of chunks)
+    """
+    dims = data_array.dims
+    sizes = dict(zip(dims, data_array.shape))
+    if not chunks:
+        chunks = {dim: (1 if position < len(dims) - 2 else CONTIGUOUS_BLOCK) for position, dim in enumerate(dims)}
+    chunk = [max(1, min(chunks.get(dim, sizes[dim]), sizes[dim])) for dim in dims]
+    grid = [-(-sizes[dim] // length) for dim, length in zip(dims, chunk)]
+    n_chunks = int(np.prod(grid))
+    k = min(sample_chunks, n_chunks)
+
+    # Shrink the read window along the last two dimensions to fit the cell budget
+    window = list(chunk)
+    per_chunk = MAX_SAMPLE_CELLS // max(k, 1)
+    while np.prod(window) > per_chunk and len(window) >= 2 and (window[-1] > 1 or window[-2] > 1):
+        axis = -1 if window[-1] >= window[-2] else -2
+        window[axis] = max(1, window[axis] // 2)
+
+    picks = rng.choice(n_chunks, size=k, replace=False) if k < n_chunks else np.arange(n_chunks)
+    windows = []
+    for flat in picks:
+        selection = {}
+        for dim, index, length, width in zip(dims, np.unravel_index(int(flat), grid), chunk, window):
+            start = int(index) * length
+            stop = min(start + length, sizes[dim])
+            offset = int(rng.integers(0, max(1, stop - start - width + 1)))
+            selection[dim] = slice(start + offset, min(start + offset + width, stop))
+        windows.append(selection)
+    return windows, n_chunks
+
+
+def sample_statistics(ds, var_name, sample_chunks=DEFAULT_SAMPLE_CHUNKS, seed=0):
+    """
+    Estimate min/max/mean of a variable from a random sample of its chunks.
+
+    Windows follow the on-disk chunking, so each costs at most one chunk
+    read. The mean is the ratio estimator over the sampled chunks and its
+    standard error comes from the spread of the chunk sums (cluster
+    sampling with the finite-population correction), which accounts for
+    cells inside a chunk being correlated. The sampled min/max bound the
+    true range from inside.
+
+    Args:
+        ds (xarray.Dataset): Dataset opened without dask chunks
+        var_name (str): Variable to sample
+        sample_chunks (int): Chunks to read
+        seed (int): Random seed, so repeated inspections agree
+
+    Returns:
+        dict: Estimates, the mean's standard error and the sample coverage
+    """
+    data_array = ds[var_name]
+    rng = np.random.default_rng(seed)
+    windows, n_chunks = sample_windows(data_array, disk_chunk_sizes(ds, var_name), sample_chunks, rng)
+
+    sums = np.zeros(len(windows))
+    counts = np.zeros(len(windows))
+    n_cells = 0
+    sum_squares = 0.0
+    low, high = np.inf, -np.inf
+    for i, window in enumerate(windows):
+        values = np.asarray(data_array.isel(window).values, dtype=np.float64)
+        valid = values[np.isfinite(values)]
+        n_cells += values.size
+        counts[i] = valid.size
+        sums[i] = valid.sum()
+        sum_squares += float(np.dot(valid, valid))
+        if valid.size:
+            low = min(low, float(valid.min()))
+            high = max(high, float(valid.max()))
+
+    k = len(windows)
+    n_valid = counts.sum()
+    stats = {
+        "source": "sample",
+        "chunks_sampled": k,
+        "chunks_total": n_chunks,
+        "cells_sampled": int(n_cells),
+        "coverage": n_cells / max(1, data_array.size),
+        "valid_fraction": float(n_valid / max(1, n_cells)),
+        "min": low if n_valid else None,
+        "max": high if n_valid else None,
+        "mean": None,
+        "mean_stderr": None,
+        "std": None,
+    }
+    if n_valid:
+        mean = float(sums.sum() / n_valid)
+        stats["mean"] = mean
+        stats["std"] = math.sqrt(max(0.0, sum_squares / n_valid - mean ** 2))
+        if n_cells == data_array.size:
+            # The sample is the whole variable
+            stats["mean_stderr"] = 0.0
+        elif k > 1:
+            residuals = (sums - mean * counts) / counts.mean()
+            correction = 1.0 - k / n_chunks
+            stats["mean_stderr"] = math.sqrt(max(0.0, correction) * float(np.sum(residuals ** 2)) / (k * (k - 1)))
+    return stats
+
+
+def _coordinate_summary(values):
+    summary = {"size": int(values.size), "dtype": str(values.dtype)}
+    if values.size and values.dtype.kind in 'iufM':
+        summary["first"] = _plain(values[0])
+        summary["last"] = _plain(values[-1])
+        if values.dtype.kind != 'M':
+            summary["min"] = _plain(np.nanmin(values))
+            summary["max"] = _plain(np.nanmax(values))
+        if values.size > 1:
+            steps = np.diff(values)
+            step = steps[0]
+            summary["step"] = _plain(step / np.timedelta64(1, 'h')) if values.dtype.kind == 'M' else _plain(step)
+            if values.dtype.kind == 'M':
+                summary["step_units"] = "hours"
+            summary["regular"] = bool(np.all(steps == step)) if values.dtype.kind in 'iuM' else \
+                bool(np.allclose(steps, step, rtol=1e-3, atol=0))
+    return summary
+
+
+def inspect_netcdf(file_path, stats='auto', sample_chunks=DEFAULT_SAMPLE_CHUNKS, seed=0):
+    """
+    Describe a NetCDF file from its header, coordinates and attributes,
+    without reading its data variables.
+
+    Statistics of the current (and temperature) variables come, depending
+    on stats, from their declared range attributes or from a bounded random
+    sample of chunks with standard errors (see sample_statistics). 'auto'
+    uses the attributes when a variable has them and samples otherwise.
+
+    Args:
+        file_path (str): Path to the NetCDF file
+        stats (str): One of STATS_MODES
+        sample_chunks (int): Chunks read per variable when sampling
+        seed (int): Random seed of the chunk sample
+
+    Returns:
+        dict: JSON-serializable description of the file
+    """
+    if stats not in STATS_MODES:
+        raise ValueError(f"Unknown stats mode {stats!r}; expected one of {STATS_MODES}")
+    start = time.perf_counter()
+    report = {"file": os.path.abspath(file_path), "size_bytes": os.path.getsize(file_path)}
+
+    with xr.open_dataset(file_path, cache=False) as ds:
+        report["dimensions"] = {str(name): int(size) for name, size in ds.sizes.items()}
+        # Coordinate variables are small and already loaded as indexes
+        report["coordinates"] = {str(name): dict(_coordinate_summary(coord.values),
+                                                 attributes={k: _plain(v) for k, v in coord.attrs.items()})
+                                 for name, coord in ds.coords.items()}
+        report["variables"] = {}
+        for name, var in ds.data_vars.items():
+            chunks = disk_chunk_sizes(ds, name)
+            report["variables"][str(name)] = {
+                "dtype": str(var.dtype),
+                "dimensions": [str(d) for d in var.dims],
+                "shape": [int(n) for n in var.shape],
+                "chunks": [int(chunks[d]) for d in var.dims] if chunks else None,
+                "compression": _plain(var.encoding.get('zlib', False)),
+                "attributes": {k: _plain(v) for k, v in var.attrs.items()},
+            }
+        report["global_attributes"] = {k: _plain(v) for k, v in ds.attrs.items()}
+
+        current_vars = [name for name in CURRENT_VARIABLE_NAMES if name in ds.data_vars]
+        temperature_var = find_variable(ds, TEMPERATURE_NAMES)
+        report["current_variables"] = current_vars
+        report["temperature_variable"] = temperature_var
+
+        report["statistics"] = {}
+        if stats != 'none':
+            for name in current_vars + ([temperature_var] if temperature_var else []):
+                if ds[name].dtype.kind not in 'iuf':
+                    continue
+                declared = declared_range(ds[name].attrs)
+                if stats == 'sample' or (stats == 'auto' and declared is None):
+                    report["statistics"][name] = sample_statistics(ds, name, sample_chunks, seed)
+                elif declared is not None:
+                    report["statistics"][name] = dict(declared, source="attributes")
+
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _inspect_or_error(args):
+    file_path, kwargs = args
+    try:
+        return inspect_netcdf(file_path, **kwargs)
+    except Exception as e:
+        return {"file": os.path.abspath(file_path), "error": f"{type(e).__name__}: {e}"}
+
+
+def inspect_directory(directory, pattern="*.nc", workers=None, **kwargs):
+    """
+    Inspect every matching file of a directory in parallel worker processes.
+
+    Processes rather than threads, since the HDF5 library serializes calls
+    within one process. A file that cannot be read gets an 'error' entry
+    instead of stopping the scan.
+
+    Args:
+        directory (str): Directory of downloads
+        pattern (str): Glob pattern of the files to inspect
+        workers (int): Worker processes (default: one per CPU, at most one per file)
+        **kwargs: Passed through to inspect_netcdf
+
+    Returns:
+        list: One report per file, in file name order
+    """
+    files = sorted(glob.glob(os.path.join(directory, pattern)))
+    if not files:
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    if workers == 1:
+        return [_inspect_or_error((path, kwargs)) for path in files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_inspect_or_error, [(path, kwargs) for path in files]))
+
+
+def _format_value(value):
+    return "n/a" if value is None else f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def print_inspection(report):
+    """
+    Print an inspect_netcdf report in the layout of analyze_netcdf.
+    """
+    print("=" * 80)
+    print(f"NetCDF File: {report['file']}")
+    print("=" * 80)
+    if "error" in report:
+        print(f"Error: {report['error']}")
+        return
+    print(f"Size: {report['size_bytes'] / 2 ** 20:.1f} MiB, inspected in {report['seconds']:.3f} s")
+
+    print("\nDimensions:")
+    print("-" * 40)
+    for name, size in report["dimensions"].items():
+        print(f"{name}: {size}")
+
+    print("\nCoordinates:")
+    print("-" * 40)
+    for name, coord in report["coordinates"].items():
+        extent = f" {coord['first']} .. {coord['last']}" if "first" in coord else ""
+        step = f", step {_format_value(coord['step'])}{' ' + coord.get('step_units', '')}" if "step" in coord else ""
+        print(f"{name}: {coord['dtype']} x {coord['size']}{extent}{step}")
+
+    print("\nVariables:")
+    print("-" * 40)
+    for name, var in report["variables"].items():
+        chunks = f", chunks {tuple(var['chunks'])}" if var["chunks"] else ", contiguous"
+        print(f"{name}: {var['dtype']}, Dimensions: ({', '.join(var['dimensions'])}){chunks}")
+        for attr_name, attr_value in var["attributes"].items():
+            print(f"    {attr_name}: {attr_value}")
+
+    print("\nGlobal Attributes:")
+    print("-" * 40)
+    for name, value in report["global_attributes"].items():
+        print(f"{name}: {value}")
+
+    if not report["current_variables"]:
+        print("\nNo standard ocean current variables found in this dataset.")
+    for name, stats in report["statistics"].items():
+        print(f"\nStatistics of {name} ({stats['source']}):")
+        if stats["source"] == "attributes":
+            print(f"  Declared range: {_format_value(stats['min'])} .. {_format_value(stats['max'])}"
+                  f" ({stats['attributes']})")
+            continue
+        print(f"  Sampled {stats['chunks_sampled']} of {stats['chunks_total']} chunks "
+              f"({stats['coverage']:.2%} of cells, {stats['valid_fraction']:.1%} valid)")
+        print(f"  Min (sampled): {_format_value(stats['min'])}")
+        print(f"  Max (sampled): {_format_value(stats['max'])}")
+        stderr = f" +/- {_format_value(stats['mean_stderr'])}" if stats["mean_stderr"] is not None else ""
+        print(f"  Mean: {_format_value(stats['mean'])}{stderr}")
+        print(f"  Std: {_format_value(stats['std'])}")
+
+
+def write_inspection_json(reports, json_path):
+    """
+    Write one report (or a list of them) as JSON; '-' writes to stdout.
+    """
+    text = json.dumps(reports, indent=2)
+    if json_path == '-':
+        print(text)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, 'w') as f:
+        f.write(text)
+
+
+def report_netcdf(file_path, json_path=None, **kwargs):
+    """
+    Inspect one file and print the report, or write it as JSON instead.
+
+    This is the fast mode of analyze_netcdf. With json_path '-' only the
+    JSON goes to stdout, so the output can be piped straight into a parser.
+
+    Args:
+        file_path (str): Path to the NetCDF file
+        json_path (str): Write the report as JSON here ('-' for stdout)
+        **kwargs: Passed through to inspect_netcdf
+
+    Returns:
+        dict: The inspection report
+    """
+    report = inspect_netcdf(file_path, **kwargs)
+    if json_path != '-':
+        print_inspection(report)
+    if json_path:
+        write_inspection_json(report, json_path)
+    return report
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Quickly describe NetCDF files from their metadata")
+    parser.add_argument("path", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"),
+                        help="NetCDF file or directory of files")
+    parser.add_argument("--stats", choices=STATS_MODES, default="auto")
+    parser.add_argument("--sample-chunks", type=int, default=DEFAULT_SAMPLE_CHUNKS)
+    parser.add_argument("--pattern", default="*.nc")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", default=None, help="Write the report(s) as JSON to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    options = {"stats": args.stats, "sample_chunks": args.sample_chunks}
+    if os.path.isdir(args.path):
+        reports = inspect_directory(args.path, args.pattern, args.workers, **options)
+    else:
+        reports = inspect_netcdf(args.path, **options)
+    if args.json != '-':
+        for report in (reports if isinstance(reports, list) else [reports]):
+            print_inspection(report)
+    if args.json:
+        write_inspection_json(reports, args.json)
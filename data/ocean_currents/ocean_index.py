@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+import hashlib
+import os
+
+import numpy as np
+
+from currents_engine import iter_slab_bands, select_slice
+from processing_cache import file_fingerprint
+
+# Bump when the layout of index files or the signature changes
+INDEX_FORMAT = 2
+
+# Indexes are kept next to the processing cache, one file per grid and depth level
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ocean_index")
+
+
+def grid_signature(ds, u_var, v_var, coord_dims, source=None):
+    """
+    Hash of everything that defines which cells of a grid are ocean: the
+    source file, the current variables and the lat/lon/depth coordinate values.
+
+    Files on the same grid can still differ in which cells hold data (land
+    masks, regional subsets filled with NaN), so the index is tied to the
+    fingerprint of the file it was built from and shared only by the time
+    steps of that file. Any change to the file or the grid gives a new
+    signature, so a stale index is never looked up again.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        u_var (str): Eastward current variable
+        v_var (str): Northward current variable
+        coord_dims (dict): Output of identify_coord_dims
+        source (str): File the dataset was opened from (default: the
+            dataset's own source, if xarray recorded one)
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256(f"format:{INDEX_FORMAT}:{u_var}:{v_var}".encode())
+    source = source or ds.encoding.get("source")
+    if source is not None and os.path.isfile(source):
+        fingerprint = file_fingerprint(source)
+        digest.update(f"source:{fingerprint['size']}:{fingerprint['mtime_ns']}:"
+                      f"{fingerprint['header_sha256']}".encode())
+    for role in ('lat', 'lon', 'depth'):
+        if role not in coord_dims:
+            continue
+        values = np.ascontiguousarray(ds[coord_dims[role]].values)
+        digest.update(f"{role}:{values.dtype.str}:{values.shape}".encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def index_path_for(signature, depth_index, index_dir=None):
+    """
+    Path of the index file of one grid and depth level (in DEFAULT_INDEX_DIR
+    unless index_dir is given).
+    """
+    return os.path.join(index_dir or DEFAULT_INDEX_DIR, f"{signature[:32]}_d{depth_index:03d}.npz")
+
+
+class OceanIndex:
+    """
+    The ocean cells of one grid at one depth level.
+
+    Ocean cells are those where both u and v are present; everything else
+    (land, ice shelves, below the sea floor) is left out of extraction. The
+    index holds the full-resolution mask as a packed bitmask plus the sorted
+    flat (row-major) indices of the ocean cells; strided views for a
+    sample factor are derived on demand and kept.
+    """
+
+    def __init__(self, shape, packed, flat, signature=None, depth_index=0):
+        """
+        Args:
+            shape (tuple): (nlat, nlon) of the full-resolution grid
+            packed (numpy.ndarray): np.packbits of the row-major ocean mask
+            flat (numpy.ndarray): Sorted flat indices of the ocean cells
+            signature (str): grid_signature of the grid the index belongs to
+            depth_index (int): Depth level the index describes
+        """
+        self.shape = tuple(int(n) for n in shape)
+        self.packed = packed
+        self.flat = flat
+        self.signature = signature
+        self.depth_index = depth_index
+        self._mask = None
+        self._sampled = {1: flat}
+        self._plans = {}
+
+    @classmethod
+    def from_mask(cls, mask, signature=None, depth_index=0):
+        """
+        Build an index from a boolean (nlat, nlon) ocean mask.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        flat = np.flatnonzero(mask)
+        flat = flat.astype(np.int32 if mask.size < 2 ** 31 else np.int64)
+        return cls(mask.shape, np.packbits(mask.ravel()), flat, signature, depth_index)
+
+    @property
+    def mask(self):
+        """
+        Full-resolution boolean ocean mask.
+        """
+        if self._mask is None:
+            cells = self.shape[0] * self.shape[1]
+            self._mask = np.unpackbits(self.packed, count=cells).view(bool).reshape(self.shape)
+        return self._mask
+
+    @property
+    def n_ocean(self):
+        return len(self.flat)
+
+    @property
+    def n_land(self):
+        return self.shape[0] * self.shape[1] - len(self.flat)
+
+    def sampled(self, sample_factor=1):
+        """
+        Ocean cells of the grid strided by sample_factor along lat and lon.
+
+        Returns:
+            tuple: ((nlat, nlon) of the strided grid, sorted flat indices of
+                   its ocean cells)
+        """
+        shape = tuple(-(-n // sample_factor) for n in self.shape)
+        if sample_factor not in self._sampled:
+            mask = self.mask[::sample_factor, ::sample_factor]
+            self._sampled[sample_factor] = np.flatnonzero(mask).astype(self.flat.dtype)
+        return shape, self._sampled[sample_factor]
+
+    def band_plan(self, sample_factor, band_rows):
+        """
+        Where the ocean cells of each band of the strided grid are, worked
+        out once per (sample_factor, band_rows) and reused for every time
+        step read through the index.
+
+        Args:
+            sample_factor (int): Stride along lat and lon
+            band_rows (int): Source rows per band, a multiple of sample_factor
+
+        Returns:
+            list: One dict per band: 'start' (first source row), 'rows' and
+                  'cols' (band-relative positions of the ocean cells),
+                  'box' ((row0, row1, col0, col1) bounding box of the cells in
+                  strided coordinates, or None for an all-land band) and
+                  'cells' (flat positions of the cells inside the box)
+        """
+        key = (sample_factor, band_rows)
+        if key in self._plans:
+            return self._plans[key]
+        (n_sampled_rows, n_cols), flat = self.sampled(sample_factor)
+        rows_per_band = band_rows // sample_factor
+        plan = []
+        for first_row in range(0, n_sampled_rows, rows_per_band):
+            lo, hi = np.searchsorted(flat, [first_row * n_cols, (first_row + rows_per_band) * n_cols])
+            rows, cols = np.divmod(flat[lo:hi] - first_row * n_cols, n_cols)
+            band = {"start": first_row * sample_factor, "rows": rows, "cols": cols, "box": None, "cells": None}
+            if len(rows):
+                row0, row1 = int(rows[0]), int(rows[-1]) + 1
+                col0, col1 = int(cols.min()), int(cols.max()) + 1
+                band["box"] = (row0, row1, col0, col1)
+                band["cells"] = (rows - row0) * (col1 - col0) + (cols - col0)
+            plan.append(band)
+        self._plans[key] = plan
+        return plan
+
+    def save(self, path):
+        """
+        Write the index atomically (temporary file, then rename).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Parallel workers may build the same index; each writes its own temporary file
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, shape=np.array(self.shape), packed=self.packed, flat=self.flat,
+                 signature=np.array(self.signature or ""), depth_index=np.array(self.depth_index))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by save().
+        """
+        with np.load(path) as data:
+            return cls(tuple(data['shape']), data['packed'], data['flat'],
+                       str(data['signature']) or None, int(data['depth_index']))
+
+
+def build_ocean_index(u_data, v_data, lats, lons, coord_dims, signature=None, depth_index=0,
+                      band_rows=None):
+    """
+    Scan one full-resolution u/v slab for the cells where both are present.
+
+    Args:
+        u_data (xarray.DataArray): 2-D eastward current slice
+        v_data (xarray.DataArray): 2-D northward current slice
+        lats, lons (numpy.ndarray): Full coordinate values
+        coord_dims (dict): Output of identify_coord_dims
+        signature (str): grid_signature to record in the index
+        depth_index (int): Depth level of the slab
+        band_rows (int): Rows read at a time (bounds memory); if None, one read
+
+    Returns:
+        OceanIndex
+    """
+    mask = np.empty((len(lats), len(lons)), dtype=bool)
+    row = 0
+    for u, v, band_lats, _ in iter_slab_bands(u_data, v_data, lats, lons, coord_dims, 1, band_rows):
+        mask[row:row + len(band_lats)] = ~(np.isnan(u) | np.isnan(v))
+        row += len(band_lats)
+    return OceanIndex.from_mask(mask, signature, depth_index)
+
+
+def ocean_index_for(ds, u_var, v_var, coord_dims, depth_index=0, time_index=0,
+                    index_dir=None, band_rows=None, source=None):
+    """
+    Load the ocean index of a dataset's grid and depth level, building and
+    saving it first if there is none yet.
+
+    The land/sea pattern is taken from the given time step and reused for
+    every other time step of the same file and grid.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        u_var, v_var (str): Current variables
+        coord_dims (dict): Output of identify_coord_dims
+        depth_index (int): Depth level
+        time_index (int): Time step scanned when the index has to be built
+        index_dir (str): Directory holding index files (default: DEFAULT_INDEX_DIR)
+        band_rows (int): Rows read at a time while building
+        source (str): File the dataset was opened from (see grid_signature)
+
+    Returns:
+        tuple: (OceanIndex, True if it was built by this call)
+    """
+    signature = grid_signature(ds, u_var, v_var, coord_dims, source)
+    path = index_path_for(signature, depth_index, index_dir)
+    if os.path.exists(path):
+        try:
+            index = OceanIndex.load(path)
+            if index.signature == signature and index.depth_index == depth_index:
+                return index, False
+        except (OSError, ValueError, KeyError):
+            # A damaged index only costs a rebuild
+            pass
+
+    lats = ds[coord_dims['lat']].values
+    lons = ds[coord_dims['lon']].values
+    u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+    v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
+    index = build_ocean_index(u_data, v_data, lats, lons, coord_dims, signature, depth_index, band_rows)
+    index.save(path)
+    return index, True
+
+
+def iter_ocean_bands(u_data, v_data, lats, lons, coord_dims, index, sample_factor=1, band_rows=None):
+    """
+    Read only the ocean cells of the strided u/v slab, band by band.
+
+    Bands follow iter_slab_bands, but each band reads just the bounding box
+    of its ocean cells (all-land bands are not read at all) and returns the
+    values of the ocean cells alone.
+
+    Args:
+        u_data, v_data, lats, lons, coord_dims, sample_factor, band_rows: See iter_slab_bands
+        index (OceanIndex): Ocean index of the grid and depth level
+
+    Yields:
+        tuple: (u, v, lats, lons, rows, cols) where u and v are 1-D values at
+               the band's ocean cells, lats/lons the coordinates of the whole
+               strided band and rows/cols the ocean cells' band-relative
+               positions, in row-major order
+    """
+    if band_rows is None:
+        band_rows = len(lats)
+    band_rows = -(-band_rows // sample_factor) * sample_factor
+    sampled_lons = lons[::sample_factor]
+    order = (coord_dims['lat'], coord_dims['lon'])
+
+    for band in index.band_plan(sample_factor, band_rows):
+        start = band["start"]
+        band_lats = lats[start:start + band_rows:sample_factor]
+        if band["box"] is None:
+            empty = np.empty(0, dtype=np.float32)
+            yield empty, empty, band_lats, sampled_lons, band["rows"], band["cols"]
+            continue
+
+        # Read the bounding box of the band's ocean cells at the sampling stride
+        row0, row1, col0, col1 = band["box"]
+        window = {
+            coord_dims['lat']: slice(start + row0 * sample_factor, start + row1 * sample_factor, sample_factor),
+            coord_dims['lon']: slice(col0 * sample_factor, col1 * sample_factor, sample_factor),
+        }
+        u = u_data.isel(window).transpose(*order).values
+        v = v_data.isel(window).transpose(*order).values
+        # np.take on the raveled box is much cheaper than 2-D fancy indexing
+        yield (np.take(u.ravel(), band["cells"]), np.take(v.ravel(), band["cells"]), band_lats, sampled_lons,
+               band["rows"], band["cols"])
+
+
+def scatter_cells(values, rows, cols, shape, fill=np.nan):
+    """
+    Place per-cell values back on a dense (nlat, nlon) band, filling the rest.
+
+    Returns:
+        numpy.ndarray: Dense array with the dtype of values
+    """
+    values = np.asarray(values)
+    dense = np.full(shape, fill, dtype=values.dtype if values.dtype.kind == 'f' else np.float32)
+    dense[rows, cols] = values
+    return dense
@@ -3,9 +3,19 @@ import xarray as xr
 import numpy as np
 import json
 import os
-import math
+import pandas as pd
 from datetime import datetime
 
+from currents_engine import (
+    find_current_variables,
+    identify_coord_dims,
+    select_slice,
+    extract_slab,
+    compute_currents,
+    build_records,
+)
+from processing_cache import ProcessingCache, cache_key
+
 def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth_layer=0):
     """
     Process ocean current data from a NetCDF file and convert to JSON format
@@ -34,23 +44,7 @@ def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth
         print(f"Successfully opened NetCDF file: {netcdf_file}")
         
         # Try to find the ocean current variables (typically 'uo' for eastward and 'vo' for northward currents)
-        u_var = None
-        v_var = None
-        
-        # Common variable names for ocean currents
-        u_names = ['uo', 'u', 'water_u', 'eastward_sea_water_velocity']
-        v_names = ['vo', 'v', 'water_v', 'northward_sea_water_velocity']
-        
-        # Find u and v variables
-        for name in u_names:
-            if name in ds.variables:
-                u_var = name
-                break
-        
-        for name in v_names:
-            if name in ds.variables:
-                v_var = name
-                break
+        u_var, v_var = find_current_variables(ds)
         
         if u_var is None or v_var is None:
             print("Error: Could not find ocean current velocity variables in the dataset.")
@@ -61,20 +55,7 @@ def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth
         print(f"Found current variables: {u_var} and {v_var}")
         
         # Identify coordinate dimensions
-        dims = ds[u_var].dims
-        coord_dims = {}
-        
-        # Look for latitude and longitude dimensions
-        for dim in dims:
-            if dim in ds.coords:
-                if any(lat_name in dim.lower() for lat_name in ['lat', 'latitude']):
-                    coord_dims['lat'] = dim
-                elif any(lon_name in dim.lower() for lon_name in ['lon', 'longitude']):
-                    coord_dims['lon'] = dim
-                elif any(dep_name in dim.lower() for dep_name in ['depth', 'deptht', 'z']):
-                    coord_dims['depth'] = dim
-                elif any(time_name in dim.lower() for time_name in ['time', 't']):
-                    coord_dims['time'] = dim
+        coord_dims = identify_coord_dims(ds, u_var)
         
         print(f"Identified coordinates: {coord_dims}")
         
@@ -96,77 +77,28 @@ def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth
                 print(f"Requested depth layer index {depth_layer} is out of range. Using index 0 instead.")
         
         # Extract the data for the selected time and depth
-        data_slice = {}
-        if 'time' in coord_dims and 'depth' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['time']: time_index, coord_dims['depth']: depth_index})
-            v_data = ds[v_var].isel({coord_dims['time']: time_index, coord_dims['depth']: depth_index})
-        elif 'time' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['time']: time_index})
-            v_data = ds[v_var].isel({coord_dims['time']: time_index})
-        elif 'depth' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['depth']: depth_index})
-            v_data = ds[v_var].isel({coord_dims['depth']: depth_index})
-        else:
-            u_data = ds[u_var]
-            v_data = ds[v_var]
+        u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+        v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
         
         # Get lat and lon values
         lats = ds[coord_dims['lat']].values
         lons = ds[coord_dims['lon']].values
         
-        # Create processed data list
-        processed_data = []
-        
-        # Determine indices to sample (to reduce data volume)
-        lat_indices = range(0, len(lats), sample_factor)
-        lon_indices = range(0, len(lons), sample_factor)
+        # Read the sampled slab in one go (to reduce data volume) and process it as whole arrays
+        u, v, sampled_lats, sampled_lons = extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor)
         
-        print(f"Processing {len(lat_indices)}x{len(lon_indices)} points from original {len(lats)}x{len(lons)} grid")
+        print(f"Processing {len(sampled_lats)}x{len(sampled_lons)} points from original {len(lats)}x{len(lons)} grid")
         
-        # Process the data
-        for i in lat_indices:
-            for j in lon_indices:
-                try:
-                    # Get values
-                    u = float(u_data[i, j].values)
-                    v = float(v_data[i, j].values)
-                    
-                    # Check for NaN or masked values
-                    if math.isnan(u) or math.isnan(v):
-                        continue
-                    
-                    # Calculate speed and direction
-                    speed = math.sqrt(u**2 + v**2)
-                    direction = math.degrees(math.atan2(v, u))
-                    if direction < 0:
-                        direction += 360
-                    
-                    # Create data point
-                    lat = float(lats[i])
-                    lon = float(lons[j])
-                    
-                    # Skip points outside standard lat/lon range
-                    if lat < -90 or lat > 90 or lon < -180 or lon > 180:
-                        continue
-                    
-                    data_point = {
-                        "lat": lat,
-                        "lon": lon,
-                        "u": u,
-                        "v": v,
-                        "speed": speed,
-                        "direction": direction,
-                        "type": "current"
-                    }
-                    processed_data.append(data_point)
-                except Exception as e:
-                    print(f"Error processing point ({i},{j}): {e}")
+        fields = compute_currents(u, v, sampled_lats, sampled_lons)
+        processed_data = build_records(fields)
         
         print(f"Processed {len(processed_data)} data points")
         
-        # Save to JSON file
-        with open(output_json, 'w') as f:
+        # Save to JSON file (under a temporary name first, so a failed write never leaves a truncated file)
+        tmp_path = f"{output_json}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(processed_data, f)
+        os.replace(tmp_path, output_json)
         
         print(f"Data saved to {output_json}")
         return processed_data
@@ -191,4 +123,12 @@ if __name__ == "__main__":
     output_json = os.path.join(script_dir, "ocean_currents_processed.json")
     
     # Process with a sampling factor of 8 (to reduce data volume for web visualization)
-    process_ocean_currents(netcdf_file, output_json, sample_factor=8)
\ No newline at end of file
+    params = {"sample_factor": 8}
+    
+    # Reuse the previous output when neither the input nor the parameters changed
+    cache = ProcessingCache(os.path.join(script_dir, ".cache"))
+    key = cache_key(netcdf_file, dict(params, pipeline="process_currents")) if os.path.exists(netcdf_file) else None
+    if key and cache.restore(key, {"json": output_json}):
+        print(f"Input file and parameters unchanged; restored {output_json} from cache.")
+    elif process_ocean_currents(netcdf_file, output_json, **params) and key:
+        cache.store(key, {"json": output_json})
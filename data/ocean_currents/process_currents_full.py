@@ -4,12 +4,46 @@ import numpy as np
 import json
 import os
 import sys
-import math
+import time
 from datetime import datetime
 
 # Add pandas import missing from the original script
 import pandas as pd
 
+from currents_engine import (
+    find_current_variables,
+    identify_coord_dims,
+    select_slice,
+    iter_slab_bands,
+    compute_currents,
+    compute_currents_at,
+    build_records,
+    new_statistics,
+    update_statistics,
+    finalize_statistics,
+)
+from binary_format import CurrentsBinaryWriter, binary_path_for
+from streaming_writer import CurrentsRecordWriter
+from chunked_io import (
+    DEFAULT_MEMORY_BUDGET_MB,
+    fused_statistics,
+    band_rows_for_budget,
+)
+from processing_cache import ProcessingCache, cache_key
+from slab_store import open_source
+from ocean_index import OceanIndex, ocean_index_for, iter_ocean_bands, scatter_cells
+from adaptive_decimation import (
+    DEFAULT_MAX_ERROR,
+    MAX_LEVEL,
+    plan_decimation,
+    iter_decimated_bands,
+    decimation_summary,
+)
+from instrumentation import run_metrics
+from netcdf_inspect import report_netcdf
+from input_validation import validate_netcdf, print_validation
+from regions import HOT_REGIONS, resolve_region, region_window, polygon_mask, region_attrs
+
 def run_script():
     """
     Main function to run both the analysis and processing of the NetCDF file
@@ -25,123 +59,198 @@ def run_script():
         print("Please ensure the file exists in the correct location.")
         sys.exit(1)
     
-    # First analyze the file structure
-    print("Step 1: Analyzing NetCDF file structure...")
-    try:
-        analyze_netcdf(netcdf_file)
-    except Exception as e:
-        print(f"Error during analysis: {str(e)}")
-    
-    # Then process the data
-    print("\nStep 2: Processing ocean currents data...")
     output_json = os.path.join(script_dir, "..", "..", "public", "data", "ocean_currents", "ocean_currents_processed.json")
     
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(output_json), exist_ok=True)
     
-    try:
-        process_ocean_currents(netcdf_file, output_json, sample_factor=8)
-    except Exception as e:
-        print(f"Error during processing: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    
-    print("\nDone!")
+    params = {"sample_factor": 8, "depth_layer": 0, "time_index": 0, "binary_encoding": "float32"}
+    with run_metrics('run_script') as metrics:
+        metrics.set_info(input=netcdf_file, output=output_json, params=params)
+        
+        # Skip regeneration entirely when neither the input nor the parameters changed
+        outputs = {"json": output_json, "binary": binary_path_for(output_json), "stats": stats_path_for(output_json)}
+        cache = ProcessingCache(os.path.join(script_dir, ".cache"))
+        with metrics.stage('cache_lookup'):
+            key = cache_key(netcdf_file, dict(params, pipeline="run_pipeline"))
+            hit = cache.restore(key, outputs)
+        if hit:
+            metrics.count('cache_hits')
+            metrics.event("cache_hit", key=key)
+            print("Input file and parameters unchanged; restored processed outputs from cache.")
+        else:
+            # Check the input with whole-array tests before any output is touched
+            with metrics.stage('validate'):
+                report = validate_netcdf(netcdf_file, time_index=params["time_index"],
+                                         depth_index=params["depth_layer"], sample_factor=params["sample_factor"])
+            print_validation(report)
+            if not report["valid"]:
+                metrics.fail(ValueError("; ".join(report["errors"])))
+                sys.exit(1)
+            
+            # Analyze and process the file in a single pass over one open dataset. Outputs are
+            # renamed into place only when complete, so a failure leaves the previous ones intact
+            try:
+                run_pipeline(netcdf_file, output_json, metrics=metrics, **params)
+                with metrics.stage('cache_store'):
+                    cache.store(key, outputs)
+            except Exception as e:
+                metrics.fail(e)
+                print(f"Error during processing: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                sys.exit(1)
+        
+        # Keep the hot regions at full resolution next to the global coarse product
+        print("\nPrecomputing regional products...")
+        with metrics.stage('regions'):
+            precompute_regions(netcdf_file, os.path.dirname(output_json), depth_layer=params["depth_layer"],
+                               time_index=params["time_index"], binary_encoding=params["binary_encoding"],
+                               cache=cache, metrics=metrics)
+        
+        print("\nDone!")
 
-def analyze_netcdf(file_path):
+def analyze_netcdf(file_path, chunked=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, metrics=None,
+                   fast=False, json_path=None):
     """
     Analyze a NetCDF file and print its structure, variables, dimensions,
     and some basic statistics about the data.
     
     Args:
         file_path (str): Path to the NetCDF file
+        chunked (bool): Open the file lazily with dask chunks and compute the
+                        statistics out-of-core in one fused pass per variable
+        memory_budget_mb (float): Peak memory budget for chunked mode, in MiB
+        metrics (RunMetrics): Metrics of an enclosing run to add to; by default
+                              the call is instrumented as its own run
+        fast (bool): Describe the file from its metadata only
+                     (see netcdf_inspect.report_netcdf)
+        json_path (str): In fast mode, write the report as JSON here
+                         ('-' for stdout, instead of the text report)
+    
+    Returns:
+        dict: The inspection report in fast mode, otherwise None
     """
     if not os.path.exists(file_path):
         print(f"Error: File not found: {file_path}")
         return
     
-    try:
-        # Open the NetCDF file
-        ds = xr.open_dataset(file_path)
+    with run_metrics('analyze_netcdf', metrics) as metrics:
+        metrics.set_info(input=file_path, chunked=chunked, fast=fast)
+        if fast:
+            with metrics.stage('inspect'):
+                return report_netcdf(file_path, json_path)
         
-        # Print general information
-        print("=" * 80)
-        print(f"NetCDF File: {file_path}")
-        print("=" * 80)
-        
-        # Print dimensions
-        print("\nDimensions:")
-        print("-" * 40)
-        for dim_name, dim_size in ds.dims.items():
-            print(f"{dim_name}: {dim_size}")
-        
-        # Print variables
-        print("\nVariables:")
-        print("-" * 40)
-        for var_name, var in ds.variables.items():
-            dims = ", ".join([str(d) for d in var.dims])
-            print(f"{var_name}: {var.dtype}, Dimensions: ({dims})")
+        try:
+            # Open the NetCDF file (or its slab store)
+            with metrics.stage('open'):
+                ds, num_workers, source_path = open_source(file_path, chunked, memory_budget_mb)
+            if source_path != file_path:
+                print(f"Reading slab store: {source_path}")
             
-            # Print variable attributes if they exist
-            if var.attrs:
-                print("  Attributes:")
-                for attr_name, attr_value in var.attrs.items():
-                    print(f"    {attr_name}: {attr_value}")
+            with metrics.stage('describe'):
+                describe_dataset(ds, file_path, compute_stats=True, chunked=chunked, num_workers=num_workers)
         
-        # Print global attributes
-        print("\nGlobal Attributes:")
-        print("-" * 40)
-        for attr_name, attr_value in ds.attrs.items():
-            print(f"{attr_name}: {attr_value}")
-        
-        # For ocean current data, check for common variable names
-        current_vars = ['uo', 'vo', 'u', 'v', 'water_u', 'water_v']
-        found_current_vars = []
+        except Exception as e:
+            metrics.fail(e)
+            print(f"Error analyzing NetCDF file: {str(e)}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            try:
+                ds.close()
+            except:
+                pass
+
+def describe_dataset(ds, file_path, compute_stats=True, chunked=False, num_workers=1):
+    """
+    Print the structure, variables, dimensions and attributes of an already
+    opened dataset, optionally with basic statistics of the current variables.
+    
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        file_path (str): Path the dataset was opened from (for display)
+        compute_stats (bool): Compute min/max/mean of the current variables.
+                              run_pipeline turns this off and collects them
+                              while extracting the slab instead
+        chunked (bool): The dataset is dask-backed; use a fused statistics pass
+        num_workers (int): Threads for the fused statistics pass
+    """
+    # Print general information
+    print("=" * 80)
+    print(f"NetCDF File: {file_path}")
+    print("=" * 80)
+    
+    # Print dimensions
+    print("\nDimensions:")
+    print("-" * 40)
+    for dim_name, dim_size in ds.dims.items():
+        print(f"{dim_name}: {dim_size}")
+    
+    # Print variables
+    print("\nVariables:")
+    print("-" * 40)
+    for var_name, var in ds.variables.items():
+        dims = ", ".join([str(d) for d in var.dims])
+        print(f"{var_name}: {var.dtype}, Dimensions: ({dims})")
         
-        for var in current_vars:
-            if var in ds.variables:
-                found_current_vars.append(var)
-                print(f"\nFound current variable: {var}")
-                print(f"  Shape: {ds[var].shape}")
-                
-                # Get some statistics if it's a numeric variable
-                if ds[var].dtype.kind in 'iufc':  # integer, unsigned int, float, complex
-                    try:
+        # Print variable attributes if they exist
+        if var.attrs:
+            print("  Attributes:")
+            for attr_name, attr_value in var.attrs.items():
+                print(f"    {attr_name}: {attr_value}")
+    
+    # Print global attributes
+    print("\nGlobal Attributes:")
+    print("-" * 40)
+    for attr_name, attr_value in ds.attrs.items():
+        print(f"{attr_name}: {attr_value}")
+    
+    # For ocean current data, check for common variable names
+    current_vars = ['uo', 'vo', 'u', 'v', 'water_u', 'water_v']
+    found_current_vars = []
+    
+    for var in current_vars:
+        if var in ds.variables:
+            found_current_vars.append(var)
+            print(f"\nFound current variable: {var}")
+            print(f"  Shape: {ds[var].shape}")
+            
+            # Get some statistics if it's a numeric variable
+            if compute_stats and ds[var].dtype.kind in 'iufc':  # integer, unsigned int, float, complex
+                try:
+                    if chunked:
+                        stats = fused_statistics(ds[var], num_workers)
+                        print(f"  Min: {stats['min']}")
+                        print(f"  Max: {stats['max']}")
+                        print(f"  Mean: {stats['mean']}")
+                    else:
                         print(f"  Min: {ds[var].min().values}")
                         print(f"  Max: {ds[var].max().values}")
                         print(f"  Mean: {ds[var].mean().values}")
-                    except Exception as e:
-                        print(f"  Error computing statistics: {str(e)}")
-        
-        if not found_current_vars:
-            print("\nNo standard ocean current variables found in this dataset.")
-            print("Looking for variables with 'current' or 'velocity' in their name or attributes...")
-            
-            for var_name, var in ds.variables.items():
-                if 'current' in var_name.lower() or 'velocity' in var_name.lower():
-                    print(f"\nPotential current variable: {var_name}")
-                    print(f"  Shape: {var.shape}")
-                    print(f"  Dimensions: {var.dims}")
-                    
-                    # Get some attributes if they exist
-                    if var.attrs:
-                        print("  Attributes:")
-                        for attr_name, attr_value in var.attrs.items():
-                            print(f"    {attr_name}: {attr_value}")
+                except Exception as e:
+                    print(f"  Error computing statistics: {str(e)}")
+    
+    if not found_current_vars:
+        print("\nNo standard ocean current variables found in this dataset.")
+        print("Looking for variables with 'current' or 'velocity' in their name or attributes...")
         
-        print("\nAnalysis complete.")
+        for var_name, var in ds.variables.items():
+            if 'current' in var_name.lower() or 'velocity' in var_name.lower():
+                print(f"\nPotential current variable: {var_name}")
+                print(f"  Shape: {var.shape}")
+                print(f"  Dimensions: {var.dims}")
+                
+                # Get some attributes if they exist
+                if var.attrs:
+                    print("  Attributes:")
+                    for attr_name, attr_value in var.attrs.items():
+                        print(f"    {attr_name}: {attr_value}")
     
-    except Exception as e:
-        print(f"Error analyzing NetCDF file: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        try:
-            ds.close()
-        except:
-            pass
+    print("\nAnalysis complete.")
 
-def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth_layer=0):
+def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth_layer=0, return_data=True,
+                           metrics=None, **options):
     """
     Process ocean current data from a NetCDF file and convert to JSON format
     suitable for visualization in the AquaNova web application.
@@ -151,171 +260,496 @@ def process_ocean_currents(netcdf_file, output_json=None, sample_factor=5, depth
         output_json (str): Path for output JSON file. If None, uses the same name as input with .json extension
         sample_factor (int): Factor by which to sample data (to reduce data size)
         depth_layer (int): Index of depth layer to extract (0 is typically surface)
+        return_data (bool): Build and return the list of records. Pass False on large grids,
+                            where the list is what dominates memory, to get the point count instead
+        metrics (RunMetrics): Metrics of an enclosing run to add to; by default
+                              the call is instrumented as its own run
+        options: Further processing options (time_index, binary_encoding, chunked,
+                 memory_budget_mb, output_format, ocean_index, decimation, max_error,
+                 point_budget, region); see process_dataset
     
     Returns:
-        list: List of dictionaries containing processed current data
+        list or int: List of dictionaries containing processed current data, or the
+                     number of points written if return_data is False (an empty list / 0 on error)
     """
     if not os.path.exists(netcdf_file):
         print(f"Error: NetCDF file not found: {netcdf_file}")
-        return []
+        return [] if return_data else 0
+    
+    chunked = options.get('chunked', False)
+    with run_metrics('process_ocean_currents', metrics) as metrics:
+        metrics.set_info(input=netcdf_file, sample_factor=sample_factor, depth_layer=depth_layer,
+                         time_index=options.get('time_index', 0), chunked=chunked)
+        try:
+            # Open the NetCDF file (or its slab store)
+            with metrics.stage('open'):
+                ds, _, source_path = open_source(netcdf_file, chunked,
+                                                 options.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB))
+            print(f"Successfully opened NetCDF file: {netcdf_file}")
+            if source_path != netcdf_file:
+                print(f"Reading slab store: {source_path}")
+            
+            processed_data, summary = process_dataset(ds, netcdf_file, output_json, sample_factor=sample_factor,
+                                                      depth_layer=depth_layer, return_data=return_data, **options)
+            if summary is None:
+                metrics.fail(ValueError("No ocean current velocity variables"))
+                return [] if return_data else 0
+            metrics.record_summary(summary)
+            if return_data:
+                return processed_data
+            return summary["points"]
+        
+        except Exception as e:
+            metrics.fail(e)
+            print(f"Error processing NetCDF file: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return [] if return_data else 0
+        finally:
+            try:
+                ds.close()
+            except:
+                pass
+
+def narrow_to_region(ds, coord_dims, region):
+    """
+    Narrow a dataset lazily to a region's lat/lon index window, so only that
+    hyperslab is read from disk.
+    
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        coord_dims (dict): Coordinate names from identify_coord_dims
+        region (str or dict): Region name, GeoJSON path or profile dict
+    
+    Returns:
+        tuple: (ds, profile, region_cells) where region_cells is the boolean
+               (nlat, nlon) mask of the window's cells inside the region's
+               polygon, or None if the region is a plain bounding box
+    """
+    profile = resolve_region(region)
+    lat_window, lon_window = region_window(ds[coord_dims['lat']].values, ds[coord_dims['lon']].values,
+                                           profile['bounds'])
+    ds = ds.isel({coord_dims['lat']: lat_window, coord_dims['lon']: lon_window})
+    region_cells = None
+    if profile['polygon']:
+        region_cells = polygon_mask(ds[coord_dims['lat']].values, ds[coord_dims['lon']].values,
+                                    profile['polygon'])
+    columns = (f"{lon_window.start}:{lon_window.stop}" if isinstance(lon_window, slice)
+               else f"{len(lon_window)} across the antimeridian")
+    print(f"Region {profile['name']}: rows {lat_window.start}:{lat_window.stop}, columns {columns}"
+          + (f", {int(region_cells.sum())} cells inside its polygon" if region_cells is not None else ""))
+    return ds, profile, region_cells
+
+def open_binary_writer(output_json, binary_encoding, lats, lons, attrs):
+    """
+    Start the binary file written next to a JSON output.
+    
+    Returns:
+        CurrentsBinaryWriter: The writer, or None if the grid cannot be stored
+                              in the binary format (e.g. it is not regular)
+    """
+    try:
+        return CurrentsBinaryWriter(binary_path_for(output_json), lats, lons, encoding=binary_encoding,
+                                    attrs=attrs)
+    except ValueError as e:
+        print(f"Skipping binary output: {e}")
+        return None
+
+def process_dataset(ds, netcdf_file, output_json=None, sample_factor=5, depth_layer=0, time_index=0,
+                    binary_encoding='float32', chunked=False,
+                    memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, collect_stats=False,
+                    output_format='json', return_data=False, ocean_index=True, decimation='stride',
+                    max_error=DEFAULT_MAX_ERROR, point_budget=None, region=None):
+    """
+    Process the ocean currents of an already opened dataset and write the outputs.
+    
+    When collect_stats is set, the full-resolution slab is read once and
+    summarized (min/max/mean/count per variable) in the same pass that feeds
+    the sampled output, so no separate reduction over the file is needed.
+    
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        netcdf_file (str): Path the dataset was opened from
+        output_json (str): Path for output JSON file. If None, uses the same name as input
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        depth_layer (int): Index of depth layer to extract (0 is typically surface)
+        time_index (int): Index of the time step to extract (0 is the first step)
+        binary_encoding (str): Encoding of the compact binary file written next to the JSON
+                               ('float32' or 'int16'). If None, no binary file is written
+        chunked (bool): Stream the slab in latitude bands sized to the memory budget
+        memory_budget_mb (float): Peak memory budget for chunked mode, in MiB
+        collect_stats (bool): Summarize the full-resolution slab while extracting it
+        output_format (str): 'json' (a single array) or 'ndjson' (one record per line).
+                             Records are streamed to the file in batches; an output path
+                             ending in .gz is gzip-compressed
+        return_data (bool): Also build the list of records
+        ocean_index (bool): Read only the ocean cells listed in the persistent ocean index
+                            of the grid and depth level (built on first use)
+        decimation (str): 'stride' keeps every sample_factor-th row and column; 'adaptive'
+                          keeps points where the field varies and coarsens where it is
+                          smooth (see adaptive_decimation). Adaptive points are not on a
+                          regular grid, so no binary file is written
+        max_error (float): Adaptive mode: bilinear interpolation error bound in m/s
+        point_budget (int): Adaptive mode: keep at most this many points instead, with
+                            the smallest error bound that allows it
+        region (str or dict): Only process a region (a name from regions.REGIONS, a
+                              GeoJSON file or a profile dict): just its lat/lon window is
+                              read from disk and cells outside its polygon are dropped
+    
+    Returns:
+        tuple: (processed_data, summary) where processed_data is the list of
+               records if return_data is set (else None) and summary is a dict
+               describing the slice, point counts, stage timings, outputs and
+               (if collected) the slab statistics; ([], None) if no current
+               variables exist. With a region, grid and statistics describe
+               the region's window only
+    """
+    timings = {}
+    stage_start = time.perf_counter()
+    if decimation not in ('stride', 'adaptive'):
+        raise ValueError(f"Unknown decimation {decimation!r}; expected 'stride' or 'adaptive'")
+    adaptive = decimation == 'adaptive'
     
     if output_json is None:
         base_name = os.path.splitext(netcdf_file)[0]
-        output_json = f"{base_name}_processed.json"
+        output_json = f"{base_name}_processed.{output_format}"
+    
+    # Try to find the ocean current variables (typically 'uo' for eastward and 'vo' for northward currents)
+    u_var, v_var = find_current_variables(ds)
+    
+    if u_var is None or v_var is None:
+        print("Error: Could not find ocean current velocity variables in the dataset.")
+        print(f"Available variables: {list(ds.variables.keys())}")
+        return [], None
     
+    # Get the coordinate variables
+    print(f"Found current variables: {u_var} and {v_var}")
+    
+    # Identify coordinate dimensions
+    coord_dims = identify_coord_dims(ds, u_var)
+    
+    print(f"Identified coordinates: {coord_dims}")
+    
+    # Restrict to a region (the ocean index is then built for the window's own grid)
+    profile = region_cells = None
+    if region is not None:
+        ds, profile, region_cells = narrow_to_region(ds, coord_dims, region)
+    
+    # Get the requested time step if time dimension exists
+    time_str = None
+    if 'time' in coord_dims:
+        times = ds[coord_dims['time']].values
+        time_str = pd.to_datetime(str(times[time_index])).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"Processing data for time: {time_str}")
+    
+    # Choose depth layer
+    depth_index = depth_layer
+    depth = None
+    if 'depth' in coord_dims:
+        depths = ds[coord_dims['depth']].values
+        if depth_index < len(depths):
+            print(f"Processing depth layer: {depths[depth_index]} meters (index: {depth_index})")
+        else:
+            depth_index = 0
+            print(f"Requested depth layer index {depth_layer} is out of range. Using index 0 instead.")
+        depth = float(depths[depth_index])
+    
+    # Extract the data for the selected time and depth
+    u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+    v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
+    
+    # Get lat and lon values
+    lats = ds[coord_dims['lat']].values
+    lons = ds[coord_dims['lon']].values
+    sampled_lats, sampled_lons = lats[::sample_factor], lons[::sample_factor]
+    
+    if adaptive:
+        print(f"Processing adaptively decimated points from the {len(lats)}x{len(lons)} grid")
+    else:
+        print(f"Processing {len(sampled_lats)}x{len(sampled_lons)} points from original {len(lats)}x{len(lons)} grid")
+    
+    # Read the slab in latitude bands (a single band unless chunked) and process each as whole arrays.
+    # Band boundaries stay on multiples of sample_factor so striding inside a band matches the global grid.
+    band_rows = band_rows_for_budget(len(lons), memory_budget_mb) if chunked else len(lats)
+    band_rows = -(-band_rows // sample_factor) * sample_factor
+    read_factor = 1 if collect_stats else sample_factor
+    
+    # Land is the same at every time step: look up (or build once) which cells are ocean and read only those
+    index = None
+    if ocean_index and not adaptive:
+        index_start = time.perf_counter()
+        index, built = ocean_index_for(ds, u_var, v_var, coord_dims, depth_index, time_index, band_rows=band_rows,
+                                       source=netcdf_file)
+        timings['ocean_index'] = time.perf_counter() - index_start
+        print(f"{'Built' if built else 'Loaded'} ocean index: {index.n_ocean} ocean / {index.n_land} land cells")
+    if region_cells is not None:
+        # Cells outside the polygon are treated like land: skipped by the index, or NaN (and dropped) otherwise
+        if index is not None:
+            index = OceanIndex.from_mask(index.mask & region_cells, index.signature, index.depth_index)
+        else:
+            region_da = xr.DataArray(region_cells, dims=(coord_dims['lat'], coord_dims['lon']))
+            u_data = u_data.where(region_da)
+            v_data = v_data.where(region_da)
+    timings['prepare'] = time.perf_counter() - stage_start - timings.get('ocean_index', 0.0)
+    stage_start = time.perf_counter()
+    statistics = {u_var: new_statistics(), v_var: new_statistics()} if collect_stats else None
+    
+    # Adaptive decimation reads the full-resolution slab once to measure how well each block is represented
+    # by coarser points (collecting the statistics on the way), then re-reads the bands for the kept points
+    decimation_info = None
+    if adaptive:
+        plan_start = time.perf_counter()
+        plan = plan_decimation(u_data, v_data, len(lats), coord_dims, band_rows,
+                               statistics=(statistics[u_var], statistics[v_var]) if collect_stats else None)
+        tolerance = plan.tolerance_for_budget(point_budget) if point_budget is not None else max_error
+        keep = plan.keep_levels(tolerance)
+        decimation_info = decimation_summary(plan, keep, tolerance)
+        timings['decimation'] = time.perf_counter() - plan_start
+        print(f"Adaptive decimation: {plan.count(tolerance)} points at {tolerance:.4g} m/s error bound "
+              f"(blocks of up to {2 ** MAX_LEVEL} cells)")
+    
+    # Open the outputs up front so every band is written as soon as it is processed
+    # and neither the records nor the full slab have to be held in memory. Both are
+    # written under temporary names and only renamed into place once complete
+    attrs = {"source": os.path.basename(netcdf_file), "sample_factor": sample_factor}
+    if time_str is not None:
+        attrs["time"] = time_str
+    if depth is not None:
+        attrs["depth"] = depth
+    if profile is not None:
+        attrs["region"] = profile['name']
+    binary_writer = None
+    if binary_encoding and not adaptive:
+        binary_writer = open_binary_writer(output_json, binary_encoding, sampled_lats, sampled_lons, attrs)
+    
+    processed_data = [] if return_data else None
+    points = skipped_nan = skipped_range = 0
+    read_seconds = json_seconds = binary_seconds = 0.0
+    writer = CurrentsRecordWriter(output_json, output_format)
+    if adaptive:
+        bands = iter_decimated_bands(u_data, v_data, lats, lons, coord_dims, plan, keep, band_rows)
+    elif index is not None:
+        bands = iter_ocean_bands(u_data, v_data, lats, lons, coord_dims, index, read_factor, band_rows)
+    else:
+        bands = (band + (None, None)
+                 for band in iter_slab_bands(u_data, v_data, lats, lons, coord_dims, read_factor, band_rows))
     try:
-        # Open the NetCDF file
-        ds = xr.open_dataset(netcdf_file)
-        print(f"Successfully opened NetCDF file: {netcdf_file}")
-        
-        # Try to find the ocean current variables (typically 'uo' for eastward and 'vo' for northward currents)
-        u_var = None
-        v_var = None
-        
-        # Common variable names for ocean currents
-        u_names = ['uo', 'u', 'water_u', 'eastward_sea_water_velocity']
-        v_names = ['vo', 'v', 'water_v', 'northward_sea_water_velocity']
-        
-        # Find u and v variables
-        for name in u_names:
-            if name in ds.variables:
-                u_var = name
-                break
-        
-        for name in v_names:
-            if name in ds.variables:
-                v_var = name
+        while True:
+            # Reading a band covers the isel, the decode of the file's chunks and the transpose
+            read_start = time.perf_counter()
+            band = next(bands, None)
+            read_seconds += time.perf_counter() - read_start
+            if band is None:
                 break
-        
-        if u_var is None or v_var is None:
-            print("Error: Could not find ocean current velocity variables in the dataset.")
-            print(f"Available variables: {list(ds.variables.keys())}")
-            return []
-        
-        # Get the coordinate variables
-        print(f"Found current variables: {u_var} and {v_var}")
-        
-        # Identify coordinate dimensions
-        dims = ds[u_var].dims
-        coord_dims = {}
-        
-        # Look for latitude and longitude dimensions
-        for dim in dims:
-            if dim in ds.coords:
-                if any(lat_name in dim.lower() for lat_name in ['lat', 'latitude']):
-                    coord_dims['lat'] = dim
-                elif any(lon_name in dim.lower() for lon_name in ['lon', 'longitude']):
-                    coord_dims['lon'] = dim
-                elif any(dep_name in dim.lower() for dep_name in ['depth', 'deptht', 'z']):
-                    coord_dims['depth'] = dim
-                elif any(time_name in dim.lower() for time_name in ['time', 't']):
-                    coord_dims['time'] = dim
-        
-        print(f"Identified coordinates: {coord_dims}")
-        
-        # Get the first time step if time dimension exists
-        time_index = 0
-        if 'time' in coord_dims:
-            times = ds[coord_dims['time']].values
-            time_str = pd.to_datetime(str(times[time_index])).strftime('%Y-%m-%d %H:%M:%S')
-            print(f"Processing data for time: {time_str}")
-        
-        # Choose depth layer
-        depth_index = depth_layer
-        if 'depth' in coord_dims:
-            depths = ds[coord_dims['depth']].values
-            if depth_index < len(depths):
-                print(f"Processing depth layer: {depths[depth_index]} meters (index: {depth_index})")
+            # With an ocean index or adaptive decimation, band_u/band_v hold only the cells at (rows, cols)
+            band_u, band_v, band_lats, band_lons, rows, cols = band
+            if collect_stats and not adaptive:
+                land = 0 if rows is None else len(band_lats) * len(band_lons) - len(rows)
+                update_statistics(statistics[u_var], band_u, land)
+                update_statistics(statistics[v_var], band_v, land)
+                if rows is None:
+                    band_u = band_u[::sample_factor, ::sample_factor]
+                    band_v = band_v[::sample_factor, ::sample_factor]
+                else:
+                    sampled = (rows % sample_factor == 0) & (cols % sample_factor == 0)
+                    band_u, band_v = band_u[sampled], band_v[sampled]
+                    rows, cols = rows[sampled] // sample_factor, cols[sampled] // sample_factor
+                band_lats, band_lons = band_lats[::sample_factor], band_lons[::sample_factor]
+            if rows is None:
+                fields = compute_currents(band_u, band_v, band_lats, band_lons)
             else:
-                depth_index = 0
-                print(f"Requested depth layer index {depth_layer} is out of range. Using index 0 instead.")
-        
-        # Extract the data for the selected time and depth
-        data_slice = {}
-        if 'time' in coord_dims and 'depth' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['time']: time_index, coord_dims['depth']: depth_index})
-            v_data = ds[v_var].isel({coord_dims['time']: time_index, coord_dims['depth']: depth_index})
-        elif 'time' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['time']: time_index})
-            v_data = ds[v_var].isel({coord_dims['time']: time_index})
-        elif 'depth' in coord_dims:
-            u_data = ds[u_var].isel({coord_dims['depth']: depth_index})
-            v_data = ds[v_var].isel({coord_dims['depth']: depth_index})
-        else:
-            u_data = ds[u_var]
-            v_data = ds[v_var]
-        
-        # Get lat and lon values
-        lats = ds[coord_dims['lat']].values
-        lons = ds[coord_dims['lon']].values
-        
-        # Create processed data list
-        processed_data = []
-        
-        # Determine indices to sample (to reduce data volume)
-        lat_indices = range(0, len(lats), sample_factor)
-        lon_indices = range(0, len(lons), sample_factor)
-        
-        print(f"Processing {len(lat_indices)}x{len(lon_indices)} points from original {len(lats)}x{len(lons)} grid")
+                # Cells dropped by decimation are not counted as skipped
+                fields = compute_currents_at(band_u, band_v, band_lats, band_lons, rows, cols,
+                                             len(rows) if adaptive else None)
+            points += len(fields['lat'])
+            skipped_nan += fields['skipped_nan']
+            skipped_range += fields['skipped_range']
+            if processed_data is not None:
+                processed_data.extend(build_records(fields))
+            
+            write_start = time.perf_counter()
+            writer.write(fields)
+            json_seconds += time.perf_counter() - write_start
+            
+            if binary_writer is not None:
+                write_start = time.perf_counter()
+                if rows is not None:
+                    band_shape = (len(band_lats), len(band_lons))
+                    band_u = scatter_cells(band_u, rows, cols, band_shape)
+                    band_v = scatter_cells(band_v, rows, cols, band_shape)
+                binary_writer.write(band_u, band_v, band_lats, band_lons)
+                binary_seconds += time.perf_counter() - write_start
+        print(f"Processed {points} data points")
         
-        # Process the data
-        for i in lat_indices:
-            for j in lon_indices:
-                try:
-                    # Get values
-                    u = float(u_data[i, j].values)
-                    v = float(v_data[i, j].values)
-                    
-                    # Check for NaN or masked values
-                    if math.isnan(u) or math.isnan(v):
-                        continue
-                    
-                    # Calculate speed and direction
-                    speed = math.sqrt(u**2 + v**2)
-                    direction = math.degrees(math.atan2(v, u))
-                    if direction < 0:
-                        direction += 360
-                    
-                    # Create data point
-                    lat = float(lats[i])
-                    lon = float(lons[j])
-                    
-                    # Skip points outside standard lat/lon range
-                    if lat < -90 or lat > 90 or lon < -180 or lon > 180:
-                        continue
-                    
-                    data_point = {
-                        "lat": lat,
-                        "lon": lon,
-                        "u": u,
-                        "v": v,
-                        "speed": speed,
-                        "direction": direction,
-                        "type": "current"
-                    }
-                    processed_data.append(data_point)
-                except Exception as e:
-                    print(f"Error processing point ({i},{j}): {e}")
+        # Save the same slab as a compact columnar binary file alongside the JSON
+        if binary_writer is not None:
+            write_start = time.perf_counter()
+            n_bytes = binary_writer.close()
+            binary_seconds += time.perf_counter() - write_start
+            print(f"Binary data saved to {binary_writer.path} ({n_bytes} bytes, {binary_encoding})")
+        writer.close()
+    except BaseException:
+        # Leave any previous outputs in place rather than publishing partial ones
+        writer.abort()
+        if binary_writer is not None:
+            binary_writer.abort()
+        raise
+    print(f"Data saved to {output_json}")
+    
+    timings['read'] = read_seconds
+    timings['compute'] = time.perf_counter() - stage_start - read_seconds - json_seconds - binary_seconds
+    timings['write_json'] = json_seconds
+    if binary_writer is not None:
+        timings['write_binary'] = binary_seconds
+    
+    summary = {
+        "source": os.path.basename(netcdf_file),
+        "variables": {"u": u_var, "v": v_var},
+        "time": time_str,
+        "time_index": time_index,
+        "depth": depth,
+        "depth_index": depth_index,
+        "grid": {"nlat": len(lats), "nlon": len(lons), "sample_factor": None if adaptive else sample_factor},
+        "points": points,
+        "skipped_nan": skipped_nan,
+        "skipped_range": skipped_range,
+        "outputs": {"json": output_json, "binary": binary_writer.path if binary_writer is not None else None},
+        "timings": timings,
+    }
+    if decimation_info is not None:
+        summary["decimation"] = decimation_info
+    if profile is not None:
+        summary["region"] = region_attrs(profile)
+    if collect_stats:
+        summary["statistics"] = {name: finalize_statistics(values) for name, values in statistics.items()}
+    return processed_data, summary
+
+def stats_path_for(output_json):
+    """
+    Path of the statistics sidecar written next to a JSON output.
+    """
+    if output_json.endswith('.gz'):
+        output_json = output_json[:-3]
+    return os.path.splitext(output_json)[0] + "_stats.json"
+
+def run_pipeline(netcdf_file, output_json, sample_factor=8, depth_layer=0, time_index=0,
+                 binary_encoding='float32', chunked=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 metrics=None):
+    """
+    Describe and process a NetCDF file in one pass over a single open dataset.
+    
+    The dataset is opened once and its handle and coordinate arrays are shared
+    by the description and processing steps. Summary statistics are collected
+    while the processing slab is extracted and written, with the stage timings,
+    to a machine-readable sidecar (<output>_stats.json).
+    
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_json (str): Path for output JSON file
+        Other arguments: See process_dataset
+    
+    Returns:
+        dict: The summary written to the sidecar
+    """
+    with run_metrics('run_pipeline', metrics) as metrics:
+        metrics.set_info(input=netcdf_file, output=output_json, sample_factor=sample_factor)
+        timings = {}
+        stage_start = time.perf_counter()
+        ds, _, source_path = open_source(netcdf_file, chunked, memory_budget_mb)
+        if source_path != netcdf_file:
+            print(f"Reading slab store: {source_path}")
+        timings['open'] = time.perf_counter() - stage_start
         
-        print(f"Processed {len(processed_data)} data points")
+        try:
+            print("Step 1: Analyzing NetCDF file structure...")
+            stage_start = time.perf_counter()
+            describe_dataset(ds, netcdf_file, compute_stats=False)
+            timings['describe'] = time.perf_counter() - stage_start
+            
+            print("\nStep 2: Processing ocean currents data...")
+            _, summary = process_dataset(ds, netcdf_file, output_json, sample_factor=sample_factor,
+                                         depth_layer=depth_layer, time_index=time_index,
+                                         binary_encoding=binary_encoding, chunked=chunked,
+                                         memory_budget_mb=memory_budget_mb, collect_stats=True)
+        finally:
+            ds.close()
         
-        # Save to JSON file
-        with open(output_json, 'w') as f:
-            json.dump(processed_data, f)
+        if summary is None:
+            raise ValueError(f"No ocean current velocity variables in {netcdf_file}")
         
-        print(f"Data saved to {output_json}")
-        return processed_data
-    
-    except Exception as e:
-        print(f"Error processing NetCDF file: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
-    finally:
+        summary["timings"] = dict(timings, **summary["timings"])
+        stage_start = time.perf_counter()
+        stats_path = stats_path_for(output_json)
+        tmp_path = f"{stats_path}.{os.getpid()}.tmp"
         try:
-            ds.close()
-        except:
-            pass
+            with open(tmp_path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            os.replace(tmp_path, stats_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        summary["timings"]["write_stats"] = time.perf_counter() - stage_start
+        
+        print("\nStatistics:")
+        for name, values in summary["statistics"].items():
+            print(f"  {name}: min {values['min']}, max {values['max']}, mean {values['mean']} "
+                  f"({values['count']} values, {values['nan_count']} NaN)")
+        print("\nStage timings:")
+        for stage, seconds in summary["timings"].items():
+            print(f"  {stage:<14} {seconds:8.3f} s")
+        print(f"Statistics saved to {stats_path_for(output_json)}")
+        metrics.record_summary(summary)
+        return summary
+
+def region_output_path(output_dir, region):
+    """
+    Path of a region's JSON product (its binary file sits next to it).
+    """
+    return os.path.join(output_dir, f"ocean_currents_{resolve_region(region)['name']}.json")
+
+def precompute_regions(netcdf_file, output_dir, regions=HOT_REGIONS, sample_factor=None, depth_layer=0,
+                       time_index=0, binary_encoding='float32', cache=None, metrics=None):
+    """
+    Write regional cutouts of a NetCDF file next to its global product.
+    
+    Each region reads only its own hyperslab, at the region's sample_factor
+    (full resolution for the built-in profiles), to
+    <output_dir>/ocean_currents_<region>.json and .bin. With a cache, regions
+    whose input and parameters are unchanged are restored instead.
+    
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_dir (str): Directory of the global product
+        regions (iterable): Region names, GeoJSON paths or profile dicts
+        sample_factor (int): Override the regions' own sample factors
+        cache (ProcessingCache): Cache to restore from and store into
+        Other arguments: See process_dataset
+    
+    Returns:
+        dict: Number of points written (or restored: None) per region name
+    """
+    results = {}
+    for region in regions:
+        profile = resolve_region(region)
+        output_json = region_output_path(output_dir, profile)
+        params = {"sample_factor": sample_factor or profile['sample_factor'], "depth_layer": depth_layer,
+                  "time_index": time_index, "binary_encoding": binary_encoding}
+        outputs = {"json": output_json}
+        if binary_encoding:
+            outputs["binary"] = binary_path_for(output_json)
+        if cache is not None:
+            key = cache_key(netcdf_file, dict(params, pipeline="region", region=profile))
+            if cache.restore(key, outputs):
+                print(f"Region {profile['name']} unchanged; restored from cache.")
+                results[profile['name']] = None
+                continue
+        points = process_ocean_currents(netcdf_file, output_json, return_data=False, region=profile, metrics=metrics,
+                                        **params)
+        results[profile['name']] = points
+        if cache is not None and points:
+            cache.store(key, outputs)
+    return results
 
 if __name__ == "__main__":
     run_script()
\ No newline at end of file
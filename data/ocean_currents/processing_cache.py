@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+import ast
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): concurrent runs may then lose index updates
+    fcntl = None
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT = 1
+
+# Default size cap for the on-disk cache
+DEFAULT_MAX_BYTES = 2 * 2 ** 30
+
+# Bytes hashed from the start of the input file; covers the NetCDF/HDF5 header
+HEADER_BYTES = 64 * 1024
+
+# Entry points of the processing; every local module they import (directly
+# or through each other) determines the processed output as well
+ENTRY_MODULES = (
+    'process_currents.py',
+    'process_currents_full.py',
+)
+
+
+def code_modules(script_dir=None):
+    """
+    The processing entry points and every module of this directory they
+    import, so a new helper module is covered without being listed anywhere.
+
+    Args:
+        script_dir (str): Directory of the modules (default: this file's)
+
+    Returns:
+        list: Module file names, sorted
+    """
+    script_dir = script_dir or os.path.dirname(os.path.abspath(__file__))
+    found, pending = set(), list(ENTRY_MODULES)
+    while pending:
+        module = pending.pop()
+        path = os.path.join(script_dir, module)
+        if module in found or not os.path.exists(path):
+            continue
+        found.add(module)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(f"{name.split('.')[0]}.py" for name in names)
+    return sorted(found)
+
+
+def code_version():
+    """
+    Hash of the processing code, so cached outputs are invalidated whenever
+    the code that produced them changes.
+
+    Returns:
+        str: Hex digest
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256(f"format:{CACHE_FORMAT}".encode())
+    for module in code_modules(script_dir):
+        with open(os.path.join(script_dir, module), 'rb') as f:
+            digest.update(module.encode())
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, header_bytes=HEADER_BYTES):
+    """
+    Cheap identity of an input file: size, modification time and a checksum
+    of its header.
+
+    Args:
+        path (str): Input file
+        header_bytes (int): Number of leading bytes to checksum
+
+    Returns:
+        dict: 'size', 'mtime_ns' and 'header_sha256'
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        header = f.read(header_bytes)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "header_sha256": hashlib.sha256(header).hexdigest(),
+    }
+
+
+def cache_key(input_file, params):
+    """
+    Content-addressed key for processing an input file with given parameters.
+
+    Args:
+        input_file (str): Input NetCDF file
+        params (dict): JSON-serializable processing parameters
+
+    Returns:
+        str: Hex digest
+    """
+    material = {
+        "input": file_fingerprint(input_file),
+        "params": params,
+        "code": code_version(),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+
+class ProcessingCache:
+    """
+    Directory of processed outputs keyed by cache_key, with LRU eviction
+    under a total size cap.
+
+    Each entry is a subdirectory named after its key holding copies of the
+    output files. index.json records, per key, the stored file names, their
+    total size and when the entry was last used. Several runs may share a
+    cache: every change to the index is a read-modify-write of index.json
+    under an exclusive lock on index.lock, and files only ever appear under
+    their final names through os.replace.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "index.lock")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A damaged index only costs a rebuild; start afresh
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _locked_index(self):
+        """
+        Hold the cache lock with the index freshly read from disk; the index
+        is saved when the block completes.
+        """
+        with open(self.lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Closing the lock file releases the lock
+            self.index = self._load_index()
+            yield self.index
+            self._save_index()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def total_bytes(self):
+        """
+        Total size of all cached entries.
+        """
+        return sum(entry["size"] for entry in self.index.values())
+
+    def restore(self, key, outputs):
+        """
+        Copy a cached entry to the requested output paths.
+
+        Args:
+            key (str): Cache key
+            outputs (dict): Output role (e.g. 'json') -> destination path
+
+        Returns:
+            bool: True on a hit (every requested output was restored)
+        """
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry is None:
+                return False
+            entry_dir = self._entry_dir(key)
+            stored = entry["files"]
+            if any(role not in stored or not os.path.exists(os.path.join(entry_dir, stored[role]))
+                   for role in outputs):
+                # Incomplete entry (e.g. removed by hand); treat as a miss
+                self._remove(key)
+                return False
+
+            for role, destination in outputs.items():
+                os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+                # Copy next to the destination, then rename: an interrupted
+                # restore never leaves a truncated output behind
+                tmp_path = f"{destination}.{os.getpid()}.tmp"
+                try:
+                    shutil.copyfile(os.path.join(entry_dir, stored[role]), tmp_path)
+                    os.replace(tmp_path, destination)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            entry["last_used"] = time.time()
+        return True
+
+    def store(self, key, outputs):
+        """
+        Copy freshly produced outputs into the cache and evict old entries.
+
+        Args:
+            key (str): Cache key
+            outputs (dict): Output role -> path of a produced file; missing
+                files are skipped
+        """
+        entry_dir = self._entry_dir(key)
+        # Fill a private directory first, so the copies happen outside the lock
+        tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            files = {}
+            size = 0
+            for role, source in outputs.items():
+                if source is None or not os.path.exists(source):
+                    continue
+                name = f"{role}{os.path.splitext(source)[1]}"
+                shutil.copyfile(source, os.path.join(tmp_dir, name))
+                files[role] = name
+                size += os.path.getsize(source)
+
+            with self._locked_index() as index:
+                self._remove(key)
+                os.replace(tmp_dir, entry_dir)
+                index[key] = {"files": files, "size": size, "last_used": time.time()}
+                self.evict(keep=key)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits its size cap
+        (call with the index lock held; store does).
+
+        Args:
+            keep (str): Key that must not be evicted (the entry just stored)
+        """
+        by_age = sorted(self.index, key=lambda k: self.index[k]["last_used"])
+        total = self.total_bytes()
+        for key in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.index[key]["size"]
+            self._remove(key)
+
+    def _remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self.index.pop(key, None)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+import numpy as np
+import json
+import os
+
+# Named region profiles. bounds are in degrees; polygon, when given, is a
+# list of rings of [lon, lat] vertices and cells outside it are masked.
+# sample_factor is the default for the region's precomputed product.
+REGIONS = {
+    # Same box as INDIAN_EEZ_BOUNDS in src/utils/dataUtils.js
+    "indian_eez": {
+        "title": "Indian EEZ",
+        "bounds": {"south": 6.0, "north": 37.0, "west": 68.0, "east": 97.0},
+        "polygon": None,
+        "sample_factor": 1,
+    },
+    # Dataset ocean_currents_bay_bengal (5N-25N, 80E-100E); the polygon follows
+    # the IHO limits of the bay approximately, closing it from Dondra Head
+    # (Sri Lanka) to the northern tip of Sumatra and leaving out the Andaman Sea
+    "bay_of_bengal": {
+        "title": "Bay of Bengal",
+        "bounds": {"south": 5.0, "north": 25.0, "west": 80.0, "east": 100.0},
+        "polygon": [[[80.6, 5.9], [79.6, 8.0], [79.3, 10.3], [80.3, 13.5], [80.3, 15.8], [82.3, 17.0],
+                     [86.0, 20.0], [87.5, 21.8], [89.0, 22.6], [91.0, 22.8], [92.3, 21.0], [94.3, 16.0],
+                     [94.2, 13.8], [92.9, 13.5], [92.5, 10.5], [93.8, 7.0], [95.3, 5.6], [80.6, 5.9]]],
+        "sample_factor": 1,
+    },
+}
+
+# Regions whose full-resolution products are kept next to the global one
+HOT_REGIONS = ('indian_eez', 'bay_of_bengal')
+
+
+def polygon_bounds(rings):
+    """
+    Bounding box of a list of [lon, lat] rings.
+    """
+    vertices = np.concatenate([np.asarray(ring, dtype=np.float64) for ring in rings])
+    return {"south": float(vertices[:, 1].min()), "north": float(vertices[:, 1].max()),
+            "west": float(vertices[:, 0].min()), "east": float(vertices[:, 0].max())}
+
+
+def load_geojson_region(path, name=None):
+    """
+    Region profile from a GeoJSON file (Polygon or MultiPolygon geometry,
+    Feature or FeatureCollection; all polygons of the file are combined).
+
+    Args:
+        path (str): GeoJSON file
+        name (str): Region name (default: the file name without extension)
+
+    Returns:
+        dict: Region profile
+    """
+    with open(path) as f:
+        document = json.load(f)
+    features = document.get("features") or [document]
+    rings = []
+    for feature in features:
+        geometry = feature.get("geometry", feature)
+        if geometry["type"] == "Polygon":
+            rings.extend(geometry["coordinates"])
+        elif geometry["type"] == "MultiPolygon":
+            for polygon in geometry["coordinates"]:
+                rings.extend(polygon)
+        else:
+            raise ValueError(f"Unsupported geometry type {geometry['type']!r} in {path}")
+    if not rings:
+        raise ValueError(f"No polygons in {path}")
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    return {"name": name, "title": name, "bounds": polygon_bounds(rings), "polygon": rings, "sample_factor": 1}
+
+
+def resolve_region(region):
+    """
+    Turn a region name, profile dict or GeoJSON path into a full profile.
+
+    Args:
+        region (str or dict): Key of REGIONS, path to a GeoJSON file, or a
+            dict with 'bounds' and/or 'polygon' (and optionally 'name')
+
+    Returns:
+        dict: Profile with 'name', 'title', 'bounds', 'polygon' and 'sample_factor'
+    """
+    if isinstance(region, dict):
+        profile = dict(region)
+        if profile.get("polygon") and not profile.get("bounds"):
+            profile["bounds"] = polygon_bounds(profile["polygon"])
+        if not profile.get("bounds"):
+            raise ValueError("A region needs bounds or a polygon")
+        profile.setdefault("name", "custom")
+        profile.setdefault("title", profile["name"])
+        profile.setdefault("polygon", None)
+        profile.setdefault("sample_factor", 1)
+        return profile
+    if region in REGIONS:
+        return dict(REGIONS[region], name=region)
+    if isinstance(region, str) and os.path.exists(region):
+        return load_geojson_region(region)
+    raise ValueError(f"Unknown region {region!r}; expected one of {sorted(REGIONS)} or a GeoJSON file")
+
+
+def region_window(lats, lons, bounds):
+    """
+    Index window of the grid cells inside a bounding box.
+
+    Works on ascending or descending coordinate axes and on -180..180 or
+    0..360 longitudes. A box whose west edge is east of its east edge (or
+    whose east edge is past 180) crosses the antimeridian; on a grid whose
+    columns wrap there, the window is then the columns west of the seam
+    followed by those east of it. Either way the window can be handed to
+    isel so only that hyperslab is ever read from disk.
+
+    Args:
+        lats, lons (numpy.ndarray): Full coordinate axes
+        bounds (dict): 'south', 'north', 'west', 'east' in degrees
+
+    Returns:
+        tuple: (row slice, column slice), or (row slice, column index
+               array in eastward order) for a window split by the seam
+
+    Raises:
+        ValueError: If the box holds no cells
+    """
+    rows = np.flatnonzero((lats >= bounds["south"]) & (lats <= bounds["north"]))
+    # Eastward distance of every column from the west edge, so a box may cross the antimeridian
+    width = (bounds["east"] - bounds["west"]) % 360.0
+    if width == 0 and bounds["east"] != bounds["west"]:
+        width = 360.0
+    offset = (np.asarray(lons, dtype=np.float64) - bounds["west"]) % 360.0
+    cols = np.flatnonzero(offset <= width)
+    if len(rows) == 0 or len(cols) == 0:
+        raise ValueError(f"The region {bounds} does not overlap the grid "
+                         f"({lats.min():.2f}..{lats.max():.2f}N, {lons.min():.2f}..{lons.max():.2f}E)")
+    row_window = slice(int(rows[0]), int(rows[-1]) + 1)
+    cols = cols[np.argsort(offset[cols], kind='stable')]
+    if np.all(np.diff(cols) == 1):
+        return row_window, slice(int(cols[0]), int(cols[-1]) + 1)
+    if np.all(np.diff(cols) == -1):
+        # Descending longitudes: keep the grid's own column order
+        return row_window, slice(int(cols[-1]), int(cols[0]) + 1)
+    return row_window, cols
+
+
+def polygon_mask(lats, lons, rings):
+    """
+    Cells whose centre lies inside a polygon (even-odd rule over all rings,
+    so holes and multi-polygons work without special cases).
+
+    Args:
+        lats, lons (numpy.ndarray): Coordinate axes of the (windowed) grid
+        rings (list): Rings of [lon, lat] vertices
+
+    Returns:
+        numpy.ndarray: Boolean (len(lats), len(lons)) mask
+    """
+    lat = np.asarray(lats, dtype=np.float64)[:, None]
+    lons = np.asarray(lons, dtype=np.float64)
+    inside = np.zeros((lat.shape[0], len(lons)), dtype=bool)
+    # Rings crossing the antimeridian are given with longitudes past 180 (or
+    # before -180); test every cell at its shifted longitudes as well
+    for shift in (0.0, 360.0, -360.0):
+        inside |= _even_odd(lat, (lons + shift)[None, :], rings)
+    return inside
+
+
+def _even_odd(lat, lon, rings):
+    """
+    Even-odd point-in-polygon test of every (lat, lon) cell centre.
+    """
+    inside = np.zeros((lat.shape[0], lon.shape[1]), dtype=bool)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        for ax, ay, bx, by in zip(x1, y1, x2, y2):
+            if ay == by:
+                # Horizontal edges never cross a horizontal ray
+                continue
+            crosses = (ay > lat) != (by > lat)
+            x_cross = ax + (lat - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (lon < x_cross)
+    return inside
+
+
+def region_attrs(profile):
+    """
+    Region description stored in output headers and summaries.
+    """
+    return {"name": profile["name"], "bounds": profile["bounds"], "polygon": profile["polygon"] is not None}
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import warnings
+
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+    select_slice,
+    extract_slab,
+)
+from chunked_io import DEFAULT_MEMORY_BUDGET_MB, require_dask, open_chunked_dataset
+from processing_cache import file_fingerprint
+
+# Stores live next to their source file: foo.nc -> foo.zarr
+STORE_SUFFIX = ".zarr"
+
+# Target size of one chunk; a chunk is a band of full-width rows of one
+# (time, depth) slab, so reading a slab touches only that slab's chunks
+TARGET_CHUNK_BYTES = 8 * 2 ** 20
+
+# Blosc/LZ4 with byte shuffle: decompresses at memory speed
+CODEC = {"cname": "lz4", "clevel": 5}
+
+
+def require_zarr():
+    """
+    Import zarr, with an actionable message when it is not installed.
+    """
+    try:
+        import zarr
+    except ImportError:
+        raise ImportError("Slab stores need zarr: pip install zarr")
+    return zarr
+
+
+def store_path_for(netcdf_file):
+    """
+    Path of the slab store converted from a NetCDF file.
+    """
+    return os.path.splitext(netcdf_file)[0] + STORE_SUFFIX
+
+
+def slab_variables(ds):
+    """
+    The current and temperature variables of a dataset that the processing
+    code reads (uo/vo and thetao or their aliases).
+    """
+    names = [name for name in find_current_variables(ds) if name is not None]
+    t_var = find_variable(ds, TEMPERATURE_NAMES)
+    if t_var is not None:
+        names.append(t_var)
+    return names
+
+
+def compressor_encoding():
+    """
+    Zarr encoding entry selecting the Blosc/LZ4 codec for the installed zarr version.
+    """
+    zarr = require_zarr()
+    if int(zarr.__version__.split('.')[0]) >= 3:
+        from zarr.codecs import BloscCodec
+        return {"compressors": [BloscCodec(shuffle="shuffle", **CODEC)]}
+    from numcodecs import Blosc
+    return {"compressor": Blosc(shuffle=Blosc.SHUFFLE, **CODEC)}
+
+
+def slab_chunks(da, coord_dims, target_bytes=TARGET_CHUNK_BYTES):
+    """
+    Chunk shape for a variable: one step along time/depth, whole longitude
+    rows, and as many latitude rows as fit in target_bytes.
+
+    Returns:
+        dict: Dimension name -> chunk length
+    """
+    n_lat = da.sizes[coord_dims['lat']]
+    n_lon = da.sizes[coord_dims['lon']]
+    rows = int(max(1, min(n_lat, target_bytes // max(1, n_lon * da.dtype.itemsize))))
+    return {dim: rows if dim == coord_dims['lat'] else (n_lon if dim == coord_dims['lon'] else 1)
+            for dim in da.dims}
+
+
+def convert_to_store(netcdf_file, store_path=None, target_chunk_bytes=TARGET_CHUNK_BYTES):
+    """
+    Rewrite a downloaded NetCDF file as a Zarr store chunked for slab reads.
+
+    The full-resolution variables go to the store root, chunked per (time,
+    depth) slab in bands of whole rows and compressed with Blosc/LZ4. The
+    data is streamed one slab at a time, and the store is built under a
+    temporary name and renamed when complete. The fingerprint of the source
+    file is recorded so a stale store is never read.
+
+    Coarsened overviews are deliberately not stored: processing samples
+    every nth cell rather than averaging blocks, so reading block means
+    would change the output.
+
+    Args:
+        netcdf_file (str): Source NetCDF file
+        store_path (str): Destination store (default: next to the source)
+        target_chunk_bytes (int): Approximate uncompressed size of a chunk
+
+    Returns:
+        str: Path of the store
+    """
+    require_zarr()
+    require_dask()
+    store_path = store_path or store_path_for(netcdf_file)
+    tmp_path = store_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    with xr.open_dataset(netcdf_file) as source:
+        names = slab_variables(source)
+        if not names:
+            raise ValueError(f"No current or temperature variables in {netcdf_file}")
+        coord_dims = identify_coord_dims(source, names[0])
+        chunks = slab_chunks(source[names[0]], coord_dims, target_chunk_bytes)
+        ds = source[names].chunk(chunks)
+        for name in ds.variables:
+            ds[name].encoding = {}
+        ds.attrs["slab_store_source"] = json.dumps(
+            dict(file_fingerprint(netcdf_file), file=os.path.basename(netcdf_file)))
+
+        codec = compressor_encoding()
+        encoding = {name: dict(codec, chunks=tuple(chunks[dim] for dim in ds[name].dims)) for name in names}
+        ds.to_zarr(tmp_path, mode='w', encoding=encoding, consolidated=False)
+
+    zarr = require_zarr()
+    with warnings.catch_warnings():
+        # zarr 3 warns that consolidated metadata is not yet part of its spec
+        warnings.simplefilter("ignore")
+        zarr.consolidate_metadata(tmp_path)
+    shutil.rmtree(store_path, ignore_errors=True)
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def find_store(netcdf_file):
+    """
+    The slab store converted from a NetCDF file, if one exists and still
+    matches the file.
+
+    Returns:
+        str: Store path, or None
+    """
+    store_path = store_path_for(netcdf_file)
+    if not os.path.isdir(store_path):
+        return None
+    try:
+        require_zarr()
+        with xr.open_zarr(store_path) as store:
+            recorded = json.loads(store.attrs.get("slab_store_source", "{}"))
+    except Exception:
+        return None
+    if not os.path.exists(netcdf_file):
+        return store_path
+    current = dict(file_fingerprint(netcdf_file), file=os.path.basename(netcdf_file))
+    return store_path if recorded == current else None
+
+
+def open_source(netcdf_file, chunked=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Open a NetCDF file for processing, reading its slab store instead when a
+    current one exists.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        chunked (bool): Open lazily with dask chunks (see open_chunked_dataset)
+        memory_budget_mb (float): Peak memory budget for chunked mode, in MiB
+
+    Returns:
+        tuple: (xarray.Dataset, number of worker threads, path actually opened)
+    """
+    store_path = find_store(netcdf_file)
+    path = store_path or netcdf_file
+    engine = 'zarr' if store_path else None
+    if chunked:
+        ds, num_workers = open_chunked_dataset(path, memory_budget_mb=memory_budget_mb, engine=engine)
+    else:
+        ds = xr.open_dataset(path, engine=engine, chunks=None)
+        num_workers = 1
+    return ds, num_workers, path
+
+
+def bytes_read():
+    """
+    Bytes this process has read through read() system calls so far (Linux
+    /proc/self/io 'rchar'), or None where unavailable.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def time_slab_reads(path, engine=None, sample_factor=8, repeats=3):
+    """
+    Time extract_slab of every (time, depth) slab of the current variables.
+
+    Returns:
+        dict: Mean 'seconds' per slab and mean 'bytes' read per slab
+    """
+    ds = xr.open_dataset(path, engine=engine, chunks=None)
+    try:
+        u_var, v_var = find_current_variables(ds)
+        coord_dims = identify_coord_dims(ds, u_var)
+        lats = ds[coord_dims['lat']].values
+        lons = ds[coord_dims['lon']].values
+        n_time = ds.sizes[coord_dims['time']] if 'time' in coord_dims else 1
+        n_depth = ds.sizes[coord_dims['depth']] if 'depth' in coord_dims else 1
+        slabs = [(t, d) for t in range(n_time) for d in range(n_depth)]
+
+        seconds = []
+        read = []
+        for _ in range(repeats):
+            for time_index, depth_index in slabs:
+                before = bytes_read()
+                start = time.perf_counter()
+                u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+                v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
+                extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor)
+                seconds.append(time.perf_counter() - start)
+                after = bytes_read()
+                if before is not None and after is not None:
+                    read.append(after - before)
+    finally:
+        ds.close()
+    return {"seconds": float(np.mean(seconds)), "bytes": float(np.mean(read)) if read else None}
+
+
+def benchmark_store(netcdf_file, sample_factor=8, repeats=3):
+    """
+    Compare slab extraction from the NetCDF file and from its slab store.
+
+    Args:
+        netcdf_file (str): NetCDF file with a converted store
+        sample_factor (int): Stride used by extract_slab, as in processing
+        repeats (int): Passes over all slabs
+
+    Returns:
+        dict: 'netcdf' and 'store' results of time_slab_reads plus 'speedup'
+    """
+    store_path = find_store(netcdf_file)
+    if store_path is None:
+        raise FileNotFoundError(f"No current slab store for {netcdf_file}")
+    results = {
+        "netcdf": time_slab_reads(netcdf_file, None, sample_factor, repeats),
+        "store": time_slab_reads(store_path, 'zarr', sample_factor, repeats),
+    }
+    results["speedup"] = results["netcdf"]["seconds"] / results["store"]["seconds"]
+    return results
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description="Convert NetCDF downloads into slab-chunked Zarr stores")
+    parser.add_argument("inputs", nargs="*", help="NetCDF files or directories of them",
+                        default=[script_dir, os.path.join(data_dir, "temperature")])
+    parser.add_argument("--force", action="store_true", help="Rebuild stores that are still current")
+    parser.add_argument("--benchmark", action="store_true", help="Compare slab reads before/after")
+    args = parser.parse_args()
+
+    files = []
+    for item in args.inputs:
+        files.extend(sorted(glob.glob(os.path.join(item, "*.nc"))) if os.path.isdir(item) else [item])
+
+    for netcdf_file in files:
+        if find_store(netcdf_file) and not args.force:
+            print(f"{netcdf_file}: store is current")
+        else:
+            start = time.perf_counter()
+            store_path = convert_to_store(netcdf_file)
+            print(f"{netcdf_file} -> {store_path} in {time.perf_counter() - start:.1f} s")
+        if args.benchmark:
+            with xr.open_dataset(netcdf_file) as ds:
+                has_currents = None not in find_current_variables(ds)
+            if has_currents:
+                results = benchmark_store(netcdf_file)
+                for source in ("netcdf", "store"):
+                    entry = results[source]
+                    read = f"{entry['bytes'] / 2 ** 20:.1f} MiB" if entry['bytes'] is not None else "n/a"
+                    print(f"  {source:<7} {entry['seconds'] * 1000:8.1f} ms/slab, {read} read/slab")
+                print(f"  speedup {results['speedup']:.2f}x")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import numpy as np
+import gzip
+import math
+import os
+
+# Output formats for processed records
+OUTPUT_FORMATS = ('json', 'ndjson')
+
+# Records encoded per write; bounds the size of the text buffer
+DEFAULT_BATCH_ROWS = 100000
+
+# Columns of a current record, in output order
+CURRENT_COLUMNS = ('lat', 'lon', 'u', 'v', 'speed', 'direction')
+
+
+def record_template(columns, record_type):
+    """
+    %-format template of one record with the given columns, laid out exactly
+    as json.dump writes the equivalent dict.
+    """
+    fields = ', '.join(f'"{name}": %r' for name in columns)
+    return '{' + fields + f', "type": "{record_type}"' + '}'
+
+
+class _NonFinite(float):
+    """
+    A NaN or infinite value whose repr is the token json.dump writes for it.
+    """
+
+    def __repr__(self):
+        if self != self:
+            return 'NaN'
+        return 'Infinity' if self > 0 else '-Infinity'
+
+
+def _json_values(values):
+    """
+    List of a column's values, with non-finite floats wrapped in _NonFinite.
+    """
+    return [value if math.isfinite(value) else _NonFinite(value) for value in values.tolist()]
+
+
+class CurrentsRecordWriter:
+    """
+    Encode processed current points straight to a file in batches.
+
+    Accepts the column arrays produced by compute_currents, so the records
+    never exist as a list of dicts. Other point products (e.g. derived
+    fields) pass their own columns and record type. 'json' output is byte-for-byte what
+    json.dump(processed_data, f) writes; 'ndjson' writes one record per line.
+    Paths ending in .gz are gzip-compressed on the fly. Records go to a
+    temporary file that close() renames into place, so a failed run never
+    replaces an existing output with a truncated one.
+
+    Usage:
+        with CurrentsRecordWriter(path) as writer:
+            for band in bands:
+                writer.write(compute_currents(*band))
+    """
+
+    def __init__(self, path, output_format='json', batch_rows=DEFAULT_BATCH_ROWS, columns=CURRENT_COLUMNS,
+                 record_type="current"):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}; expected one of {OUTPUT_FORMATS}")
+        self.path = path
+        self.output_format = output_format
+        self.batch_rows = batch_rows
+        self.columns = tuple(columns)
+        self.template = record_template(self.columns, record_type)
+        self.count = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        if path.endswith('.gz'):
+            self._file = gzip.open(self._tmp_path, 'wt', encoding='utf-8', compresslevel=6)
+        else:
+            self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        if output_format == 'json':
+            self._file.write('[')
+
+    def write(self, fields):
+        """
+        Append the points of one compute_currents result.
+
+        Args:
+            fields (dict): Output of compute_currents (or arrays for the
+                writer's columns); NaN and infinite values are written as
+                json.dump writes them (NaN, Infinity, -Infinity)
+        """
+        columns = self.columns
+        total = len(fields['lat'])
+        separator = ', ' if self.output_format == 'json' else '\n'
+        for start in range(0, total, self.batch_rows):
+            stop = start + self.batch_rows
+            batch = [np.asarray(fields[name][start:stop]) for name in columns]
+            if all(np.isfinite(values).all() for values in batch):
+                rows = zip(*[values.tolist() for values in batch])
+            else:
+                rows = zip(*[_json_values(values) for values in batch])
+            text = separator.join(self.template % row for row in rows)
+            if not text:
+                continue
+            if self.output_format == 'json' and self.count:
+                self._file.write(', ')
+            self._file.write(text)
+            if self.output_format == 'ndjson':
+                self._file.write('\n')
+            self.count += min(stop, total) - start
+
+    def close(self):
+        """
+        Finish the document, close the file and move it into place.
+        """
+        if self._file is None:
+            return
+        if self.output_format == 'json':
+            self._file.write(']')
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """
+        Discard everything written; an existing output is left untouched.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
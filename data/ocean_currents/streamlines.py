@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import math
+import os
+
+from currents_engine import find_current_variables, identify_coord_dims, select_slice, extract_slab
+from current_query import CurrentField, EARTH_RADIUS_KM
+
+# Zoom levels written by default (Leaflet zooms the map is used at)
+DEFAULT_ZOOMS = (3, 4, 5, 6, 7)
+
+# Seed spacing and integration time at the coarsest zoom; both halve per zoom
+# level so lines keep the same on-screen density and length
+BASE_SEED_SPACING_DEG = 2.0
+BASE_DURATION_HOURS = 96.0
+
+# RK4 steps per line
+DEFAULT_STEPS = 24
+
+# Particles slower than this (m/s) are treated as stagnant and stopped
+MIN_SPEED = 0.01
+
+METERS_PER_DEGREE = math.radians(1.0) * EARTH_RADIUS_KM * 1000.0
+
+
+class FieldSequence:
+    """
+    One or more CurrentFields at increasing times, sampled with linear
+    interpolation in time (clamped to the first/last field). A single field
+    gives a steady flow, i.e. streamlines; several give time-varying
+    trajectories.
+    """
+
+    def __init__(self, fields, times=None):
+        """
+        Args:
+            fields (list): CurrentField objects on any grids
+            times (array-like): Time of each field in seconds (default 0, 1, ...)
+        """
+        self.fields = list(fields)
+        self.times = np.asarray(times if times is not None else np.arange(len(self.fields)), dtype=np.float64)
+        if len(self.fields) != len(self.times):
+            raise ValueError("Need one time per field")
+
+    def velocity(self, t, lats, lons):
+        """
+        (u, v) in m/s at time t for arrays of positions; NaN on land or
+        outside the fields.
+        """
+        if len(self.fields) == 1 or t <= self.times[0]:
+            result = self.fields[0].sample(lats, lons)
+            return result['u'], result['v']
+        if t >= self.times[-1]:
+            result = self.fields[-1].sample(lats, lons)
+            return result['u'], result['v']
+        upper = int(np.searchsorted(self.times, t, side='right'))
+        weight = (t - self.times[upper - 1]) / (self.times[upper] - self.times[upper - 1])
+        before = self.fields[upper - 1].sample(lats, lons)
+        after = self.fields[upper].sample(lats, lons)
+        u = (1 - weight) * before['u'] + weight * after['u']
+        v = (1 - weight) * before['v'] + weight * after['v']
+        return u, v
+
+
+def degree_rates(u, v, lats):
+    """
+    Convert velocities in m/s to rates of change of latitude/longitude in
+    degrees per second.
+    """
+    dlat = v / METERS_PER_DEGREE
+    dlon = u / (METERS_PER_DEGREE * np.maximum(np.cos(np.radians(lats)), 1e-6))
+    return dlat, dlon
+
+
+def integrate(flow, seed_lats, seed_lons, dt, n_steps, start_time=0.0, min_speed=MIN_SPEED):
+    """
+    Advect all seeds at once with classical 4th-order Runge-Kutta.
+
+    A particle stops (its remaining positions are NaN) as soon as any RK4
+    stage samples land or leaves the field, or when it becomes slower than
+    min_speed. Only live particles are evaluated at each step.
+
+    Args:
+        flow (FieldSequence or CurrentField): Velocity field(s)
+        seed_lats (array-like): Start latitudes
+        seed_lons (array-like): Start longitudes
+        dt (float): Step in seconds (negative integrates backwards)
+        n_steps (int): Number of steps
+        start_time (float): Time of the seeds, in the time base of flow
+        min_speed (float): Stop particles slower than this (m/s)
+
+    Returns:
+        tuple: (lats, lons) arrays shaped (n_steps + 1, n_seeds)
+    """
+    if isinstance(flow, CurrentField):
+        flow = FieldSequence([flow])
+    seed_lats = np.asarray(seed_lats, dtype=np.float64).ravel()
+    seed_lons = np.asarray(seed_lons, dtype=np.float64).ravel()
+    lats = np.full((n_steps + 1, len(seed_lats)), np.nan)
+    lons = np.full_like(lats, np.nan)
+    lats[0], lons[0] = seed_lats, seed_lons
+
+    alive = np.arange(len(seed_lats))
+    lat, lon = seed_lats.copy(), seed_lons.copy()
+    t = start_time
+
+    def rates(time, at_lat, at_lon):
+        u, v = flow.velocity(time, at_lat, at_lon)
+        return degree_rates(u, v, at_lat)
+
+    for step in range(1, n_steps + 1):
+        if alive.size == 0:
+            break
+        k1_lat, k1_lon = rates(t, lat, lon)
+        k2_lat, k2_lon = rates(t + dt / 2, lat + dt / 2 * k1_lat, lon + dt / 2 * k1_lon)
+        k3_lat, k3_lon = rates(t + dt / 2, lat + dt / 2 * k2_lat, lon + dt / 2 * k2_lon)
+        k4_lat, k4_lon = rates(t + dt, lat + dt * k3_lat, lon + dt * k3_lon)
+        lat = lat + dt / 6 * (k1_lat + 2 * k2_lat + 2 * k3_lat + k4_lat)
+        lon = lon + dt / 6 * (k1_lon + 2 * k2_lon + 2 * k3_lon + k4_lon)
+        lon = (lon + 180.0) % 360.0 - 180.0
+        t += dt
+
+        # k1 is the velocity at the start of the step; use it for the stagnation test
+        speed = np.hypot(k1_lat, k1_lon * np.cos(np.radians(lats[step - 1, alive]))) * METERS_PER_DEGREE
+        keep = np.isfinite(lat) & np.isfinite(lon) & (speed >= min_speed)
+        alive, lat, lon = alive[keep], lat[keep], lon[keep]
+        lats[step, alive] = lat
+        lons[step, alive] = lon
+    return lats, lons
+
+
+def seed_grid(field, spacing_deg, bounds=None):
+    """
+    Evenly spaced seeds over the valid (ocean) part of a field.
+
+    Args:
+        field (CurrentField): Field whose valid cells receive seeds
+        spacing_deg (float): Seed spacing in degrees
+        bounds (dict): Optional south/north/west/east box
+
+    Returns:
+        tuple: (lats, lons) 1-D arrays
+    """
+    south = bounds['south'] if bounds else float(np.min(field.lats))
+    north = bounds['north'] if bounds else float(np.max(field.lats))
+    west = bounds['west'] if bounds else float(np.min(field.lons))
+    east = bounds['east'] if bounds else float(np.max(field.lons))
+    # Offset by half a spacing so seeds sit inside cells rather than on the box edge
+    lat_axis = np.arange(south + spacing_deg / 2, north, spacing_deg)
+    lon_axis = np.arange(west + spacing_deg / 2, east, spacing_deg)
+    lats, lons = (a.ravel() for a in np.meshgrid(lat_axis, lon_axis, indexing='ij'))
+    speed = field.sample(lats, lons)['speed']
+    ocean = np.isfinite(speed) & (speed >= MIN_SPEED)
+    return lats[ocean], lons[ocean]
+
+
+def encode_polylines(lats, lons, precision):
+    """
+    Encode trajectories as compact integer polylines.
+
+    Positions are rounded to the given precision (degrees), consecutive
+    duplicates (sub-precision movement) are dropped, and each line is stored
+    as its first point followed by deltas, all in units of precision. Lines
+    that end up with fewer than two points are dropped.
+
+    Args:
+        lats (numpy.ndarray): (n_steps + 1, n_lines) latitudes, NaN after a line ends
+        lons (numpy.ndarray): Matching longitudes
+        precision (float): Coordinate quantum in degrees
+
+    Returns:
+        tuple: (list of flat [lat0, lon0, dlat1, dlon1, ...] integer lists,
+                indices of the kept lines)
+    """
+    q_lat = np.round(lats / precision)
+    q_lon = np.round(lons / precision)
+    valid = np.isfinite(q_lat) & np.isfinite(q_lon)
+    # A point is kept if it differs from the previous one along the line
+    moved = np.ones_like(valid)
+    moved[1:] = (q_lat[1:] != q_lat[:-1]) | (q_lon[1:] != q_lon[:-1])
+    keep = valid & moved
+
+    encoded, kept = [], []
+    for line in np.nonzero(keep.sum(axis=0) >= 2)[0]:
+        points = keep[:, line]
+        line_lat = q_lat[points, line].astype(np.int64)
+        line_lon = q_lon[points, line].astype(np.int64)
+        # Deltas across the dateline take the short way round
+        full_turn = int(round(360.0 / precision))
+        d_lon = np.diff(line_lon)
+        d_lon = (d_lon + full_turn // 2) % full_turn - full_turn // 2
+        flat = np.empty(2 * len(line_lat), dtype=np.int64)
+        flat[0::2] = np.concatenate(([line_lat[0]], np.diff(line_lat)))
+        flat[1::2] = np.concatenate(([line_lon[0]], d_lon))
+        encoded.append(flat.tolist())
+        kept.append(line)
+    return encoded, np.asarray(kept, dtype=np.intp)
+
+
+def zoom_precision(zoom):
+    """
+    Coordinate quantum for a zoom level: a quarter of a 256 px tile pixel.
+    """
+    return 360.0 / (256 * 2 ** zoom) / 4
+
+
+def build_zoom_level(flow, seed_field, zoom, min_zoom, n_steps=DEFAULT_STEPS, bounds=None, start_time=0.0):
+    """
+    Trace and encode the streamlines of one zoom level.
+
+    Returns:
+        dict: JSON-serializable level with 'zoom', 'precision', 'lines'
+              (encoded polylines) and per-line mean 'speed' (m/s)
+    """
+    scale = 2.0 ** (zoom - min_zoom)
+    spacing = BASE_SEED_SPACING_DEG / scale
+    duration = BASE_DURATION_HOURS * 3600.0 / scale
+    seed_lats, seed_lons = seed_grid(seed_field, spacing, bounds)
+    lats, lons = integrate(flow, seed_lats, seed_lons, duration / n_steps, n_steps, start_time)
+
+    precision = zoom_precision(zoom)
+    lines, kept = encode_polylines(lats, lons, precision)
+    # Mean speed along each line, from the distance travelled per step; like the
+    # polyline deltas, steps across the dateline take the short way round
+    d_lons = (np.diff(lons, axis=0) + 180.0) % 360.0 - 180.0
+    step_lengths = np.hypot(np.diff(lats, axis=0), d_lons * np.cos(np.radians(lats[:-1]))) * METERS_PER_DEGREE
+    with np.errstate(invalid='ignore'):
+        speed = np.nanmean(step_lengths[:, kept], axis=0) / (duration / n_steps) if len(kept) else np.array([])
+    return {
+        "zoom": zoom,
+        "precision": precision,
+        "seed_spacing": spacing,
+        "duration_hours": duration / 3600.0,
+        "lines": lines,
+        "speed": [round(float(s), 4) for s in speed],
+    }
+
+
+def load_current_fields(netcdf_file, time_indices=None, depth_index=0, sample_factor=1):
+    """
+    Read the u/v slabs of several time steps as CurrentFields.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        time_indices (list): Time steps to load (default: all)
+        depth_index (int): Depth level
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+
+    Returns:
+        tuple: (FieldSequence with times in seconds since the first step,
+                list of ISO time strings or None)
+    """
+    with xr.open_dataset(netcdf_file) as ds:
+        u_var, v_var = find_current_variables(ds)
+        if u_var is None or v_var is None:
+            raise ValueError("Could not find ocean current velocity variables in the dataset")
+        coord_dims = identify_coord_dims(ds, u_var)
+        lats = ds[coord_dims['lat']].values
+        lons = ds[coord_dims['lon']].values
+        if 'time' in coord_dims:
+            all_times = pd.to_datetime(ds[coord_dims['time']].values)
+            if time_indices is None:
+                time_indices = range(len(all_times))
+            timestamps = [all_times[i] for i in time_indices]
+        else:
+            time_indices, timestamps = [0], None
+
+        fields = []
+        for time_index in time_indices:
+            u_data = select_slice(ds[u_var], coord_dims, time_index, depth_index)
+            v_data = select_slice(ds[v_var], coord_dims, time_index, depth_index)
+            u, v, sampled_lats, sampled_lons = extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor)
+            fields.append(CurrentField(sampled_lats, sampled_lons, u, v))
+
+    if timestamps is None:
+        return FieldSequence(fields), None
+    seconds = [(ts - timestamps[0]).total_seconds() for ts in timestamps]
+    return FieldSequence(fields, seconds), [ts.strftime('%Y-%m-%dT%H:%M:%S') for ts in timestamps]
+
+
+def build_streamlines(netcdf_file, output_dir, zooms=DEFAULT_ZOOMS, time_indices=None, depth_index=0,
+                      sample_factor=1, n_steps=DEFAULT_STEPS, bounds=None):
+    """
+    Precompute streamline geometry for the map, one JSON file per zoom level.
+
+    With a single time step the lines are instantaneous streamlines; with
+    several, particles are advected through the time-varying field starting
+    at the first step.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_dir (str): Directory for streamlines_z<zoom>.json and streamlines.json
+        zooms (list): Zoom levels to build
+        time_indices (list): Time steps to advect through (default: the first only)
+        depth_index (int): Depth level
+        sample_factor (int): Factor by which to sample the grid before tracing
+        n_steps (int): RK4 steps per line
+        bounds (dict): Optional south/north/west/east box to seed
+
+    Returns:
+        dict: The manifest written to streamlines.json
+    """
+    if time_indices is None:
+        time_indices = [0]
+    flow, times = load_current_fields(netcdf_file, time_indices, depth_index, sample_factor)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {
+        "source": os.path.basename(netcdf_file),
+        "times": times,
+        "depth_index": depth_index,
+        "levels": [],
+    }
+    min_zoom = min(zooms)
+    for zoom in sorted(zooms):
+        level = build_zoom_level(flow, flow.fields[0], zoom, min_zoom, n_steps, bounds)
+        file_name = f"streamlines_z{zoom}.json"
+        with open(os.path.join(output_dir, file_name), 'w') as f:
+            # json.dumps uses the C encoder; json.dump would stream through the pure-Python one
+            f.write(json.dumps(level, separators=(',', ':')))
+        n_points = sum(len(line) // 2 for line in level["lines"])
+        print(f"Zoom {zoom}: {len(level['lines'])} lines, {n_points} points -> {file_name}")
+        manifest["levels"].append({"zoom": zoom, "file": file_name, "lines": len(level["lines"])})
+
+    with open(os.path.join(output_dir, "streamlines.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Precompute streamline geometry per zoom level")
+    parser.add_argument("netcdf_file", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--output-dir",
+                        default=os.path.join(script_dir, "..", "..", "public", "data", "ocean_currents", "streamlines"))
+    parser.add_argument("--zooms", type=int, nargs="*", default=list(DEFAULT_ZOOMS))
+    parser.add_argument("--time-indices", type=int, nargs="*", default=None)
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--sample-factor", type=int, default=1)
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS)
+    args = parser.parse_args()
+
+    build_streamlines(args.netcdf_file, args.output_dir, zooms=args.zooms, time_indices=args.time_indices,
+                      depth_index=args.depth_index, sample_factor=args.sample_factor, n_steps=args.steps)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import pandas as pd
+import os
+
+# Native GLO12 grid spacing in degrees (1/12 deg)
+GLO12_STEP = 1.0 / 12.0
+
+
+def make_synthetic_currents(n_time=1, n_depth=1, n_lat=180, n_lon=360,
+                            step=GLO12_STEP, lat_origin=-63.25, lon_origin=-148.0,
+                            land_fraction=0.3, seed=0, start="2025-09-01"):
+    """
+    Build an in-memory dataset shaped like the GLO12 uo/vo product.
+
+    The field is a smooth gyre pattern plus noise, stored as float32 with a
+    NaN land mask that is constant over time and depth (like the real model).
+
+    Args:
+        n_time (int): Number of 6-hourly time steps
+        n_depth (int): Number of depth levels
+        n_lat (int): Number of latitude rows
+        n_lon (int): Number of longitude columns
+        step (float): Grid spacing in degrees
+        lat_origin (float): Latitude of the first row
+        lon_origin (float): Longitude of the first column
+        land_fraction (float): Approximate fraction of cells masked as land
+        seed (int): Random seed, so repeated calls give identical data
+        start (str): Time of the first step
+
+    Returns:
+        xarray.Dataset: Dataset with 'uo' and 'vo' over (time, depth, latitude, longitude)
+    """
+    rng = np.random.default_rng(seed)
+    lats = (lat_origin + step * np.arange(n_lat)).astype(np.float32)
+    lons = (lon_origin + step * np.arange(n_lon)).astype(np.float32)
+    times = pd.date_range(start, periods=n_time, freq="6h")
+    depths = np.geomspace(0.494025, 5727.917, max(n_depth, 1))[:n_depth].astype(np.float32)
+
+    # Land mask: smooth blobs so the mask looks like coastlines rather than noise
+    lat_rad = np.radians(lats)[:, None]
+    lon_rad = np.radians(lons)[None, :]
+    blobs = np.sin(3 * lon_rad + 1.3) * np.cos(2 * lat_rad) + 0.3 * rng.standard_normal((n_lat, n_lon))
+    land = blobs > np.quantile(blobs, 1.0 - land_fraction) if land_fraction > 0 else np.zeros((n_lat, n_lon), bool)
+
+    shape = (n_time, n_depth, n_lat, n_lon)
+    phase = np.arange(n_time)[:, None, None, None] * 0.05
+    decay = np.exp(-depths / 500.0)[None, :, None, None]
+    u = (0.5 * np.cos(2 * lat_rad + phase) * np.sin(lon_rad) * decay
+         + 0.05 * rng.standard_normal(shape)).astype(np.float32)
+    v = (0.5 * np.sin(2 * lon_rad + phase) * np.cos(lat_rad) * decay
+         + 0.05 * rng.standard_normal(shape)).astype(np.float32)
+    u[:, :, land] = np.nan
+    v[:, :, land] = np.nan
+
+    dims = ("time", "depth", "latitude", "longitude")
+    velocity_attrs = {"units": "m s-1", "valid_min": -10.0, "valid_max": 10.0}
+    return xr.Dataset(
+        {
+            "uo": (dims, u, dict(velocity_attrs, standard_name="eastward_sea_water_velocity")),
+            "vo": (dims, v, dict(velocity_attrs, standard_name="northward_sea_water_velocity")),
+        },
+        coords={
+            "time": times,
+            "depth": ("depth", depths, {"units": "m", "positive": "down"}),
+            "latitude": ("latitude", lats, {"units": "degrees_north"}),
+            "longitude": ("longitude", lons, {"units": "degrees_east"}),
+        },
+        attrs={"title": "Synthetic GLO12-shaped currents", "source": "synthetic_data.py"},
+    )
+
+
+def write_synthetic_currents(path, **kwargs):
+    """
+    Write a synthetic GLO12-shaped currents file to disk.
+
+    Args:
+        path (str): Output NetCDF path
+        **kwargs: Passed through to make_synthetic_currents
+
+    Returns:
+        str: The path that was written
+    """
+    ds = make_synthetic_currents(**kwargs)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ds.to_netcdf(path)
+    return path
+
+
+def make_synthetic_temperature(n_time=1, n_depth=1, n_lat=180, n_lon=360,
+                               step=GLO12_STEP, lat_origin=-63.25, lon_origin=-148.0,
+                               land_fraction=0.3, seed=0, start="2025-09-01"):
+    """
+    Build an in-memory dataset shaped like the GLO12 thetao product.
+
+    Uses the same grid and land mask as make_synthetic_currents for the same
+    arguments, so currents and temperature files line up.
+
+    Args:
+        See make_synthetic_currents
+
+    Returns:
+        xarray.Dataset: Dataset with 'thetao' over (time, depth, latitude, longitude)
+    """
+    currents = make_synthetic_currents(n_time, n_depth, n_lat, n_lon, step, lat_origin,
+                                       lon_origin, land_fraction, seed, start)
+    rng = np.random.default_rng(seed + 1)
+    lats = currents["latitude"].values
+    depths = currents["depth"].values
+    land = np.isnan(currents["uo"].values[0, 0])
+
+    # Warm tropics, cold poles, cooling with depth and a slow diurnal drift
+    surface = 28.0 * np.cos(np.radians(lats))[:, None] ** 2 - 1.5
+    shape = (n_time, n_depth, n_lat, n_lon)
+    drift = 0.3 * np.sin(np.arange(n_time) * np.pi / 2)[:, None, None, None]
+    cooling = np.exp(-depths / 800.0)[None, :, None, None]
+    thetao = (surface[None, None] * cooling + drift + 0.1 * rng.standard_normal(shape)).astype(np.float32)
+    thetao[:, :, land] = np.nan
+
+    return xr.Dataset(
+        {
+            "thetao": (("time", "depth", "latitude", "longitude"), thetao,
+                       {"units": "degrees_C", "standard_name": "sea_water_potential_temperature",
+                        "valid_min": -10.0, "valid_max": 40.0}),
+        },
+        coords={name: currents[name] for name in ("time", "depth", "latitude", "longitude")},
+        attrs={"title": "Synthetic GLO12-shaped temperature", "source": "synthetic_data.py"},
+    )
+
+
+def write_synthetic_temperature(path, **kwargs):
+    """
+    Write a synthetic GLO12-shaped temperature file to disk.
+
+    Args:
+        path (str): Output NetCDF path
+        **kwargs: Passed through to make_synthetic_temperature
+
+    Returns:
+        str: The path that was written
+    """
+    ds = make_synthetic_temperature(**kwargs)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ds.to_netcdf(path)
+    return path
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The processing scripts are flat modules run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocean_index  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_index_dir(tmp_path, monkeypatch):
+    """
+    Keep ocean indexes built by a test out of the shared .cache directory.
+    """
+    monkeypatch.setattr(ocean_index, "DEFAULT_INDEX_DIR", str(tmp_path / "ocean_index"))
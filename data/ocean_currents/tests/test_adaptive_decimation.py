@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from adaptive_decimation import MAX_LEVEL, plan_decimation, upsample_bilinear
+
+COORD_DIMS = {'lat': 'latitude', 'lon': 'longitude'}
+
+
+def synthetic_front(n_rows=150, n_cols=200):
+    """
+    A sharp zonal jet across a slowly varying background, with a land block.
+    """
+    rows, cols = np.mgrid[0:n_rows, 0:n_cols].astype(np.float64)
+    u = 0.1 + 0.8 * np.tanh((rows - 70 - 10 * np.sin(cols / 25)) / 2.0)
+    v = 0.05 * np.sin(cols / 40) * np.cos(rows / 30)
+    u[100:130, 20:60] = np.nan
+    v[100:130, 20:60] = np.nan
+    return u, v
+
+
+def as_data_arrays(u, v):
+    dims = ('latitude', 'longitude')
+    return xr.DataArray(u, dims=dims), xr.DataArray(v, dims=dims)
+
+
+def reconstruct(u, v, plan, keep):
+    """
+    Fill every valid cell from the kept points only: cells of a kept level-l
+    block from the bilinear fit to the level's anchors, kept cells as is.
+    """
+    shape = u.shape
+    u_fit = np.where(keep[0] & plan.valid, u, np.nan)
+    v_fit = np.where(keep[0] & plan.valid, v, np.nan)
+    for level in range(1, plan.max_level + 1):
+        stride = 2 ** level
+        blocks = np.repeat(np.repeat(keep[level], stride, axis=0), stride, axis=1)[:shape[0], :shape[1]]
+        cells = blocks & plan.valid
+        u_fit[cells] = upsample_bilinear(u[::stride, ::stride], stride, shape)[cells]
+        v_fit[cells] = upsample_bilinear(v[::stride, ::stride], stride, shape)[cells]
+    return u_fit, v_fit
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.05, 0.2])
+def test_reconstruction_from_kept_points_stays_within_tolerance(tolerance):
+    u, v = synthetic_front()
+    plan = plan_decimation(*as_data_arrays(u, v), u.shape[0], COORD_DIMS, band_rows=40)
+    keep = plan.keep_levels(tolerance)
+
+    mask = plan.keep_mask(keep, 0, u.shape[0])
+    assert np.count_nonzero(mask) == plan.count(tolerance) < np.count_nonzero(plan.valid)
+    u_fit, v_fit = reconstruct(u, v, plan, keep)
+    error = np.hypot(u - u_fit, v - v_fit)[plan.valid]
+    assert np.isfinite(error).all()
+    assert error.max() <= tolerance + 1e-6
+
+
+def test_banded_plan_matches_a_single_band():
+    u, v = synthetic_front()
+    whole = plan_decimation(*as_data_arrays(u, v), u.shape[0], COORD_DIMS)
+    banded = plan_decimation(*as_data_arrays(u, v), u.shape[0], COORD_DIMS, band_rows=2 ** MAX_LEVEL)
+    for level, (errors, anchors) in whole.levels.items():
+        np.testing.assert_array_equal(banded.levels[level][0], errors)
+        np.testing.assert_array_equal(banded.levels[level][1], anchors)
+
+
+@pytest.mark.parametrize("budget", [500, 2000, 8000])
+def test_tolerance_for_budget_keeps_the_count_within_budget(budget):
+    u, v = synthetic_front()
+    plan = plan_decimation(*as_data_arrays(u, v), u.shape[0], COORD_DIMS)
+    tolerance = plan.tolerance_for_budget(budget)
+
+    assert plan.count(tolerance) <= budget
+    # The smallest such tolerance: a slightly tighter one exceeds the budget
+    assert plan.count(tolerance * 0.999) > budget
+    keep = plan.keep_levels(tolerance)
+    assert np.count_nonzero(plan.keep_mask(keep, 0, u.shape[0])) <= budget
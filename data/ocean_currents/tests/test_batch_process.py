@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+import batch_process
+from batch_process import process_validated_batch
+from process_currents_full import process_ocean_currents
+from synthetic_data import write_synthetic_currents
+
+
+def _inputs(tmp_path):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    write_synthetic_currents(str(inputs / "good.nc"), n_lat=20, n_lon=40, seed=0)
+    (inputs / "broken.nc").write_bytes(b"not a netcdf file")
+    return inputs
+
+
+def _leftovers(directory):
+    return [name for _, _, names in os.walk(directory) for name in names if name.endswith(".tmp")]
+
+
+def test_failing_file_is_quarantined_and_batch_continues(tmp_path):
+    inputs = _inputs(tmp_path)
+    output_dir = tmp_path / "out"
+    report = process_validated_batch([str(inputs)], str(output_dir), sample_factor=1, max_workers=1)
+
+    assert (report["processed"], report["quarantined"]) == (1, 1)
+    assert (output_dir / "good_processed.json").exists()
+    assert not (output_dir / "broken_processed.json").exists()
+    quarantined = [entry for entry in report["files"] if entry["status"] == "quarantined"][0]
+    # The input stays where it was; the quarantine only points at it
+    assert (inputs / "broken.nc").read_bytes() == b"not a netcdf file"
+    assert os.path.realpath(quarantined["quarantined"]) == str(inputs / "broken.nc")
+    saved = json.loads(open(quarantined["quarantined"] + ".report.json").read())
+    assert not saved["valid"] and saved["errors"]
+    assert saved["file"] == str(inputs / "broken.nc")
+    assert json.loads((output_dir / "batch_report.json").read_text()) == json.loads(json.dumps(report))
+    assert _leftovers(tmp_path) == []
+
+
+def test_failed_processing_keeps_the_previous_output(tmp_path, monkeypatch):
+    inputs = _inputs(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    (output_dir / "good_processed.json").write_text("previous run")
+
+    def fail(ds, netcdf_file, output_json, **params):
+        with open(f"{output_json}.{os.getpid()}.tmp", "w") as f:
+            f.write("partial")
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(batch_process, "process_dataset", fail)
+    report = process_validated_batch([str(inputs / "good.nc")], str(output_dir), max_workers=1)
+    assert report["quarantined"] == 1
+    assert "disk full" in report["files"][0]["errors"][-1]
+    assert (output_dir / "good_processed.json").read_text() == "previous run"
+
+
+def test_same_names_from_different_directories_do_not_collide(tmp_path):
+    paths = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "run.nc").write_bytes(name.encode())
+        paths.append(str(tmp_path / name / "run.nc"))
+    report = process_validated_batch(paths, str(tmp_path / "out"), max_workers=1)
+
+    destinations = [entry["quarantined"] for entry in report["files"]]
+    assert len(set(destinations)) == 2
+    assert sorted(open(path, "rb").read() for path in destinations) == [b"a", b"b"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_crashing_worker_quarantines_only_its_file(tmp_path, monkeypatch, workers):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    names = ["crash"] + [f"file{n}" for n in range(6)]
+    for name in names:
+        write_synthetic_currents(str(inputs / f"{name}.nc"), n_lat=20, n_lon=40, seed=0)
+    process_file = batch_process.process_validated_file
+    process_isolated = batch_process._process_isolated
+    isolated = []
+
+    def crash_on_one_file(netcdf_file, *args):
+        if os.path.basename(netcdf_file) == "crash.nc":
+            os._exit(1)
+        return process_file(netcdf_file, *args)
+
+    def record_isolated(task):
+        isolated.append(os.path.basename(task[0]))
+        return process_isolated(task)
+
+    # Worker processes are forked, so they inherit the patch
+    monkeypatch.setattr(batch_process, "process_validated_file", crash_on_one_file)
+    monkeypatch.setattr(batch_process, "_process_isolated", record_isolated)
+    report = process_validated_batch([str(inputs)], str(tmp_path / "out"), sample_factor=1, max_workers=workers)
+
+    status = {entry["file"]: entry["status"] for entry in report["files"]}
+    assert status == dict({f"{name}.nc": "processed" for name in names}, **{"crash.nc": "quarantined"})
+    assert "BrokenProcessPool" in report["files"][0]["errors"][0]
+    assert (inputs / "crash.nc").exists()
+    # Only files running next to the crash are retried on their own; the rest stay in the shared pool
+    assert "crash.nc" in isolated and len(isolated) <= workers + 1
+
+
+def test_shards_are_contiguous_and_cover_every_slice():
+    slices = [(t, d) for t in range(5) for d in range(2)]
+    shards = batch_process.shard_slices(slices, 3)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert [item for shard in shards for item in shard] == slices
+    assert batch_process.shard_slices(slices[:2], 8) == [[(0, 0)], [(0, 1)]]
+
+
+def test_forecast_run_is_the_same_with_one_or_two_workers(tmp_path):
+    path = str(tmp_path / "run.nc")
+    write_synthetic_currents(path, n_time=3, n_depth=2, n_lat=20, n_lon=40, seed=4)
+    outputs = {}
+    for workers in (1, 2):
+        output_dir = tmp_path / f"workers_{workers}"
+        manifest = batch_process.process_forecast_run(path, str(output_dir), sample_factor=2, max_workers=workers)
+        del manifest["generated"]
+        files = {entry["file"]: (output_dir / entry["file"]).read_bytes() for entry in manifest["slices"]}
+        outputs[workers] = (manifest, files)
+
+    assert outputs[1] == outputs[2]
+    manifest, files = outputs[1]
+    assert [(e["time_index"], e["depth_index"]) for e in manifest["slices"]] == [(t, d) for t in range(3)
+                                                                                 for d in range(2)]
+    # Each slice, read through its depth's ocean index, matches a plain full read of that slice
+    for entry in manifest["slices"]:
+        expected = str(tmp_path / "single.json")
+        process_ocean_currents(path, expected, sample_factor=2, depth_layer=entry["depth_index"],
+                               time_index=entry["time_index"], binary_encoding=None, ocean_index=False)
+        assert json.loads(files[entry["file"]]) == json.load(open(expected))
+        assert entry["points"] == len(json.loads(files[entry["file"]]))
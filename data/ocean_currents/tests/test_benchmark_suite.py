@@ -0,0 +1,29 @@
+import os
+
+from benchmark_suite import compare_results, run_case, write_benchmark_file
+
+
+def _entry(seconds, rss=100.0, output_bytes=1000):
+    return {"case": "process", "size": "small", "shape": [1, 1, 180, 360], "sample_factor": 5,
+            "wall_seconds": seconds, "peak_rss_mb": rss, "output_bytes": output_bytes}
+
+
+def test_run_case_reports_points_and_cleans_up(tmp_path):
+    netcdf_file = str(tmp_path / "bench.nc")
+    write_benchmark_file(netcdf_file, (1, 1, 24, 48))
+    output_dir = tmp_path / "outputs"
+    output_dir.mkdir()
+    result = run_case('process', netcdf_file, 4, str(output_dir))
+    assert result["points"] > 0 and result["output_bytes"] > 0
+    assert result["wall_seconds"] > 0 and result["peak_rss_mb"] > 0
+    assert os.listdir(output_dir) == []
+
+
+def test_regressions_need_a_relative_and_an_absolute_slowdown():
+    baseline = {"results": [_entry(10.0)]}
+    assert not compare_results(baseline, {"results": [_entry(10.5)]})[0]["regression"]
+    assert compare_results(baseline, {"results": [_entry(12.0)]})[0]["regression"]
+    # Tiny cases: a large ratio under MIN_REGRESSION_SECONDS is noise
+    assert not compare_results({"results": [_entry(0.05)]}, {"results": [_entry(0.1)]})[0]["regression"]
+    row = compare_results(baseline, {"results": [_entry(10.0, rss=150.0, output_bytes=900)]})[0]
+    assert row["regression"] and row["output_changed"]
@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from binary_format import grid_coordinates, read_grid_binary, write_currents_binary
+from process_currents_full import process_ocean_currents
+from synthetic_data import make_synthetic_currents, write_synthetic_currents
+
+
+def _slab():
+    rng = np.random.default_rng(0)
+    lats = -10.0 + 0.25 * np.arange(30)
+    lons = 60.0 + 0.25 * np.arange(40)
+    u = rng.normal(0, 0.5, (30, 40)).astype(np.float32)
+    v = rng.normal(0, 0.5, (30, 40)).astype(np.float32)
+    u[:5, :5] = np.nan
+    v[:5, :5] = np.nan
+    return lats, lons, u, v
+
+
+def test_float32_round_trip(tmp_path):
+    lats, lons, u, v = _slab()
+    path = str(tmp_path / "slab.bin")
+    write_currents_binary(path, u, v, lats, lons, attrs={"time": "2025-10-01 00:00:00"})
+    header, arrays = read_grid_binary(path)
+    read_lats, read_lons = grid_coordinates(header)
+    np.testing.assert_allclose(read_lats, lats)
+    np.testing.assert_allclose(read_lons, lons)
+    valid = arrays['mask'].astype(bool)
+    np.testing.assert_array_equal(valid, np.isfinite(u))
+    np.testing.assert_array_equal(arrays['u'][valid], u[valid])
+    np.testing.assert_array_equal(arrays['v'][valid], v[valid])
+    assert header["attrs"]["time"] == "2025-10-01 00:00:00"
+
+
+def test_int16_round_trip_within_quantization_step(tmp_path):
+    lats, lons, u, v = _slab()
+    path = str(tmp_path / "slab.bin")
+    write_currents_binary(path, u, v, lats, lons, encoding='int16')
+    header, arrays = read_grid_binary(path, decode=True)
+    valid = np.isfinite(u)
+    assert np.isnan(arrays['u'][~valid]).all()
+    for name, values in (('u', u), ('v', v)):
+        scale = next(entry["scale"] for entry in header["variables"] if entry["name"] == name)
+        assert np.abs(arrays[name][valid] - values[valid]).max() <= scale
+
+
+def test_processed_binary_matches_json(tmp_path):
+    path = write_synthetic_currents(str(tmp_path / "a.nc"), n_lat=40, n_lon=60)
+    output = str(tmp_path / "out.json")
+    process_ocean_currents(path, output, sample_factor=2)
+    with open(output) as f:
+        records = json.load(f)
+    _, arrays = read_grid_binary(str(tmp_path / "out.bin"))
+    assert int(arrays['mask'].sum()) == len(records)
+
+
+@pytest.mark.parametrize("encoding", ["float32", "int16"])
+def test_irregular_grid_skips_binary_but_keeps_json(tmp_path, monkeypatch, encoding):
+    ds = make_synthetic_currents(n_lat=20, n_lon=30, land_fraction=0)
+    lats = ds.latitude.values.copy()
+    lats[10:] += 0.5
+    path = str(tmp_path / "irregular.nc")
+    ds.assign_coords(latitude=lats).to_netcdf(path)
+    monkeypatch.chdir(tmp_path)
+    output = str(tmp_path / "out.json")
+    assert len(process_ocean_currents(path, output, sample_factor=1, binary_encoding=encoding)) == 20 * 30
+    assert os.path.exists(output)
+    assert not os.path.exists(str(tmp_path / "out.bin"))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_no_binary_leaves_no_stray_files(tmp_path, monkeypatch):
+    path = write_synthetic_currents(str(tmp_path / "a.nc"), n_lat=20, n_lon=30)
+    monkeypatch.chdir(tmp_path)
+    process_ocean_currents(path, str(tmp_path / "out.json"), sample_factor=1, binary_encoding=None)
+    assert sorted(name for name in os.listdir(tmp_path) if name != "ocean_index") == ["a.nc", "out.json"]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from chunked_io import (
+    WORKING_COPIES,
+    band_rows_for_budget,
+    disk_chunk_sizes,
+    fused_statistics,
+    open_chunked_dataset,
+    plan_chunks,
+)
+from synthetic_data import make_synthetic_currents
+
+DISK_CHUNKS = (1, 1, 16, 32)
+
+
+def _write_chunked(path, **kwargs):
+    ds = make_synthetic_currents(**kwargs)
+    encoding = {name: {"chunksizes": DISK_CHUNKS} for name in ("uo", "vo")}
+    ds.to_netcdf(path, encoding=encoding)
+    return path
+
+
+@pytest.mark.parametrize("budget_mb", [0.05, 1, 512])
+def test_plan_is_disk_aligned_and_within_budget(tmp_path, budget_mb):
+    path = _write_chunked(str(tmp_path / "chunked.nc"), n_time=6, n_depth=2, n_lat=96, n_lon=128, seed=0)
+    with xr.open_dataset(path) as ds:
+        disk = disk_chunk_sizes(ds, "uo")
+        sizes = dict(ds["uo"].sizes)
+        chunks, workers = plan_chunks(ds, ["uo", "vo"], budget_mb)
+        itemsize = ds["uo"].dtype.itemsize
+
+    assert disk == dict(zip(("time", "depth", "latitude", "longitude"), DISK_CHUNKS))
+    for dim, length in chunks.items():
+        assert length == sizes[dim] or length % disk[dim] == 0
+    chunk_bytes = int(np.prod(list(chunks.values()))) * 2 * WORKING_COPIES * itemsize
+    # Never below one disk chunk, so the budget only binds above that size
+    smallest = int(np.prod(DISK_CHUNKS)) * 2 * WORKING_COPIES * itemsize
+    assert workers >= 1
+    assert chunk_bytes * workers <= max(budget_mb * 2 ** 20, smallest)
+
+
+def test_contiguous_file_is_planned_one_slab_per_step(tmp_path):
+    path = str(tmp_path / "contiguous.nc")
+    make_synthetic_currents(n_time=3, n_lat=20, n_lon=30).to_netcdf(path)
+    with xr.open_dataset(path) as ds:
+        assert disk_chunk_sizes(ds, "uo") == {}
+        chunks, _ = plan_chunks(ds, ["uo"], memory_budget_mb=0.001)
+    assert chunks["latitude"] >= 1 and chunks["longitude"] == 30 and chunks["depth"] == 1
+
+
+def test_fused_statistics_match_plain_reductions(tmp_path):
+    path = _write_chunked(str(tmp_path / "chunked.nc"), n_time=4, n_lat=48, n_lon=64, seed=1)
+    ds, workers = open_chunked_dataset(path, ["uo"], memory_budget_mb=0.1)
+    with ds, xr.open_dataset(path) as plain:
+        for name in ("uo", "vo"):
+            stats = fused_statistics(ds[name], workers)
+            assert stats["min"] == float(plain[name].min())
+            assert stats["max"] == float(plain[name].max())
+            assert stats["mean"] == pytest.approx(float(plain[name].mean()), rel=1e-6)
+
+
+def test_band_rows_fit_the_budget():
+    rows = band_rows_for_budget(4320, memory_budget_mb=64)
+    assert rows * 4320 * 2 * WORKING_COPIES * 8 <= 64 * 2 ** 20 < (rows + 1) * 4320 * 2 * WORKING_COPIES * 8
+    assert band_rows_for_budget(10 ** 9, memory_budget_mb=1) == 1
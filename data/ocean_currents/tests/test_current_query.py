@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from current_query import CurrentField, ScatteredCurrentField
+from currents_engine import compute_currents
+
+
+def _field():
+    rng = np.random.default_rng(0)
+    lats = np.arange(-10.0, 10.0, 0.5)
+    lons = np.arange(60.0, 80.0, 0.5)
+    u = rng.normal(0, 0.4, (len(lats), len(lons)))
+    v = rng.normal(0, 0.4, (len(lats), len(lons)))
+    u[:3, :3] = np.nan
+    return lats, lons, u, v
+
+
+def test_query_directions_match_processed_output():
+    lats, lons, u, v = _field()
+    points = CurrentField(lats, lons, u, v).points()
+    processed = compute_currents(u, v, lats, lons)
+    assert (points['direction'] >= 0).all() and (points['direction'] < 360).all()
+    np.testing.assert_allclose(points['direction'], processed['direction'])
+    np.testing.assert_allclose(points['speed'], processed['speed'])
+
+
+def test_sampled_directions_are_in_range():
+    lats, lons, u, v = _field()
+    sampled = CurrentField(lats, lons, u, v).sample(np.array([0.25, -5.1, 3.3]), np.array([70.25, 65.4, 77.7]))
+    direction = sampled['direction'][np.isfinite(sampled['direction'])]
+    assert len(direction) and ((direction >= 0) & (direction < 360)).all()
+
+
+def test_bilinear_sampling_is_exact_on_a_linear_field():
+    lats = np.arange(-10.0, 10.0, 0.5)
+    lons = np.arange(60.0, 80.0, 0.25)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing='ij')
+    field = CurrentField(lats, lons, 0.1 + 0.02 * lat_grid - 0.01 * lon_grid, -0.3 + 0.005 * lon_grid)
+
+    rng = np.random.default_rng(1)
+    query_lats = rng.uniform(-10.0, lats[-1], 200)
+    query_lons = rng.uniform(60.0, lons[-1], 200)
+    sampled = field.sample(query_lats, query_lons)
+    np.testing.assert_allclose(sampled['u'], 0.1 + 0.02 * query_lats - 0.01 * query_lons, atol=1e-12)
+    np.testing.assert_allclose(sampled['v'], -0.3 + 0.005 * query_lons, atol=1e-12)
+    # Outside a regional grid there is no value
+    assert np.isnan(field.sample(np.array([0.0, 15.0]), np.array([59.0, 70.0]))['u']).all()
+
+
+def test_global_grid_wraps_across_the_dateline():
+    lats = np.arange(-5.0, 6.0, 1.0)
+    lons = np.arange(-180.0, 180.0, 1.0)
+    u = np.tile(lons, (len(lats), 1))
+    field = CurrentField(lats, lons, u, np.zeros_like(u))
+    assert field.periodic
+
+    sampled = field.sample(np.zeros(4), np.array([179.5, 179.75, 180.25, 539.5]))
+    # Between 179E and 180W the interpolation blends the last and first columns
+    np.testing.assert_allclose(sampled['u'], [0.5 * (179 - 180), 0.25 * 179 + 0.75 * -180,
+                                              0.75 * -180 + 0.25 * -179, 0.5 * (179 - 180)])
+
+
+def test_coastal_points_take_the_nearest_ocean_cell():
+    lats = np.arange(0.0, 10.0, 1.0)
+    lons = np.arange(60.0, 70.0, 1.0)
+    u = np.tile(lons - 60.0, (len(lats), 1))
+    v = np.ones_like(u)
+    u[:, 5:] = np.nan
+    v[:, 5:] = np.nan
+    field = CurrentField(lats, lons, u, v)
+
+    sampled = field.sample(np.array([4.1, 4.1, 4.1]), np.array([64.2, 64.6, 68.0]))
+    # Next to the coast: the nearest valid cell, (4N, 64E)
+    np.testing.assert_allclose(sampled['u'][:2], [4.0, 4.0])
+    np.testing.assert_allclose(sampled['v'][:2], [1.0, 1.0])
+    # Farther inland than max_gap_km: land
+    assert np.isnan(sampled['u'][2])
+    nearest = field.nearest(np.array([4.1]), np.array([68.0]))
+    assert nearest['u'][0] == 4.0 and nearest['distance_km'][0] > field.max_gap_km
+
+
+def test_scattered_points_are_blended_by_inverse_distance():
+    # Four points on a small square around (0, 70), one farther away
+    lats = np.array([-0.1, -0.1, 0.1, 0.1, 0.35])
+    lons = np.array([69.9, 70.1, 69.9, 70.1, 70.3])
+    u = np.array([1.0, 2.0, 3.0, 4.0, 100.0])
+    v = np.zeros(5)
+    field = CurrentField.from_records([{"lat": a, "lon": b, "u": c, "v": d} for a, b, c, d in zip(lats, lons, u, v)])
+    assert isinstance(field, ScatteredCurrentField)
+
+    sampled = field.sample(np.array([0.0, 0.1, 0.0, 20.0]), np.array([70.0, 70.1, 69.9, 70.0]))
+    # The centre is equidistant from the four square points
+    assert sampled['u'][0] == pytest.approx(2.5)
+    # An exact hit takes the point value
+    assert sampled['u'][1] == pytest.approx(4.0)
+    # Between two points, the nearer pair dominates the farther pair
+    d_near, d_far = 0.1, np.hypot(0.2, 0.1)
+    weights = np.array([1 / d_near ** 2, 1 / d_near ** 2, 1 / d_far ** 2, 1 / d_far ** 2])
+    expected = (weights * np.array([1.0, 3.0, 2.0, 4.0])).sum() / weights.sum()
+    assert sampled['u'][2] == pytest.approx(expected, rel=1e-3)
+    # Nothing within max_gap_km
+    assert np.isnan(sampled['u'][3])
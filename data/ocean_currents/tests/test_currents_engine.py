@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from benchmark_extraction import extract_points_loop
+from currents_engine import (
+    build_records,
+    compute_currents,
+    extract_slab,
+    find_current_variables,
+    identify_coord_dims,
+    select_slice,
+)
+from process_currents_full import process_ocean_currents
+from synthetic_data import write_synthetic_currents
+
+# Wide enough to run past 180E, so the longitude filter drops columns
+GRID = {"n_lat": 40, "n_lon": 120, "step": 0.5, "lat_origin": -10.0, "lon_origin": 150.0, "seed": 5}
+
+
+def _assert_same_records(expected, actual):
+    assert len(actual) == len(expected) > 0
+    assert {record["type"] for record in actual} == {"current"}
+    for key in ("lat", "lon", "u", "v", "speed", "direction"):
+        np.testing.assert_allclose([record[key] for record in actual], [record[key] for record in expected],
+                                   rtol=1e-12, atol=0)
+
+
+def _loop_records(path, sample_factor):
+    with xr.open_dataset(path) as ds:
+        u_var, v_var = find_current_variables(ds)
+        coord_dims = identify_coord_dims(ds, u_var)
+        u_data = select_slice(ds[u_var], coord_dims).load()
+        v_data = select_slice(ds[v_var], coord_dims).load()
+        lats, lons = ds[coord_dims['lat']].values, ds[coord_dims['lon']].values
+        records = extract_points_loop(u_data, v_data, lats, lons, sample_factor)
+        u, v, sampled_lats, sampled_lons = extract_slab(u_data, v_data, lats, lons, coord_dims, sample_factor)
+    return records, build_records(compute_currents(u, v, sampled_lats, sampled_lons))
+
+
+@pytest.mark.parametrize("sample_factor", [1, 3])
+def test_engine_matches_per_point_loop(tmp_path, sample_factor):
+    path = str(tmp_path / "currents.nc")
+    write_synthetic_currents(path, **GRID)
+    expected, actual = _loop_records(path, sample_factor)
+    assert max(record["lon"] for record in expected) <= 180
+    _assert_same_records(expected, actual)
+
+
+def test_processed_json_matches_per_point_loop(tmp_path):
+    path = str(tmp_path / "currents.nc")
+    write_synthetic_currents(path, **GRID)
+    output = str(tmp_path / "out.json")
+    process_ocean_currents(path, output, sample_factor=2, binary_encoding=None)
+    with open(output) as f:
+        records = json.load(f)
+    expected, _ = _loop_records(path, 2)
+    _assert_same_records(expected, records)
@@ -0,0 +1,186 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from binary_format import grid_coordinates, read_grid_binary, write_currents_binary
+from currents_engine import compute_currents
+from data_service import DataService, SlabCache
+
+
+async def _exchange(service, request):
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), body
+
+
+def _service(tmp_path):
+    (tmp_path / "tiles" / "currents" / "0" / "0").mkdir(parents=True)
+    (tmp_path / "tiles" / "currents" / "0" / "0" / "0.bin").write_bytes(b"tile")
+    # Outside the tile directory, one level up from a layer
+    (tmp_path / "0" / "0").mkdir(parents=True)
+    (tmp_path / "0" / "0" / "0.bin").write_bytes(b"secret")
+    return DataService([str(tmp_path / "data")], tiles_dir=str(tmp_path / "tiles"))
+
+
+def test_tile_is_served(tmp_path):
+    status, body = asyncio.run(_exchange(_service(tmp_path), b"GET /tiles/currents/0/0/0.bin HTTP/1.0\r\n\r\n"))
+    assert (status, body) == (200, b"tile")
+
+
+@pytest.mark.parametrize("layer", ["..", "%2e%2e", "."])
+def test_tile_layer_cannot_leave_the_tile_directory(tmp_path, layer):
+    request = f"GET /tiles/{layer}/0/0/0.bin HTTP/1.0\r\n\r\n".encode()
+    status, body = asyncio.run(_exchange(_service(tmp_path), request))
+    assert status == 400
+    assert b"secret" not in body
+
+
+@pytest.mark.parametrize("length, status", [("abc", 400), ("-5", 400), ("100000000", 413)])
+def test_bad_content_length(tmp_path, length, status):
+    request = f"GET /stats HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode()
+    answered, body = asyncio.run(_exchange(_service(tmp_path), request))
+    assert answered == status
+    assert "error" in json.loads(body)
+
+
+def _write_slabs(data_dir):
+    """
+    Two 6-hourly current slabs on a 1 degree grid, with some land.
+    """
+    data_dir.mkdir()
+    rng = np.random.default_rng(4)
+    lats = np.arange(-10.0, 10.0, 1.0)
+    lons = np.arange(60.0, 100.0, 1.0)
+    slabs = {}
+    for hour in (0, 6):
+        u = rng.normal(0, 0.4, (20, 40)).astype(np.float32)
+        v = rng.normal(0, 0.4, (20, 40)).astype(np.float32)
+        u[:4, :6] = v[:4, :6] = np.nan
+        time = f"2025-09-01T{hour:02d}:00:00"
+        write_currents_binary(str(data_dir / f"currents_{hour:02d}.bin"), u, v, lats, lons,
+                              attrs={"type": "current", "time": time})
+        slabs[time] = (u, v)
+    return lats, lons, slabs
+
+
+async def _requests(service, *requests):
+    """
+    Send requests over one keep-alive connection; (status, headers, body) each.
+    """
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    responses = []
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for target, headers in requests:
+            lines = [f"GET {target} HTTP/1.1", "Host: test"] + [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+            response_headers = dict(line.split(": ", 1) for line in head[1:] if ": " in line)
+            body = await reader.readexactly(int(response_headers["Content-Length"]))
+            responses.append((int(head[0].split(" ")[1]), response_headers, body))
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+    return responses
+
+
+def test_query_returns_the_points_inside_the_bbox(tmp_path):
+    lats, lons, slabs = _write_slabs(tmp_path / "data")
+    service = DataService([str(tmp_path / "data")])
+    [(status, _, body)] = asyncio.run(_requests(
+        service, ("/query?layer=currents&bbox=62,-9,70,-2&time=2025-09-01T06:00/", {})))
+    assert status == 200
+    document = json.loads(body)
+    [slab] = document["slabs"]
+    assert slab["time"] == "2025-09-01T06:00:00"
+
+    rows = (lats >= -9) & (lats <= -2)
+    cols = (lons >= 62) & (lons <= 70)
+    u, v = slabs["2025-09-01T06:00:00"]
+    expected = compute_currents(u[rows][:, cols], v[rows][:, cols], lats[rows], lons[cols])
+    assert slab["count"] == len(slab["records"]) == len(expected["lat"]) > 0
+    for name in ("lat", "lon", "u", "v", "speed"):
+        np.testing.assert_allclose([record[name] for record in slab["records"]], expected[name])
+
+
+def test_slab_serves_the_file_or_a_window(tmp_path):
+    _write_slabs(tmp_path / "data")
+    service = DataService([str(tmp_path / "data")])
+    (status, headers, body), (_, _, window) = asyncio.run(_requests(
+        service, ("/slab?layer=currents", {}), ("/slab?layer=currents&bbox=70,0,79.5,5&stride=2", {})))
+    assert status == 200 and headers["Content-Type"] == "application/octet-stream"
+    # The latest slab, sent as stored
+    assert body == (tmp_path / "data" / "currents_06.bin").read_bytes()
+
+    path = tmp_path / "window.bin"
+    path.write_bytes(window)
+    header, arrays = read_grid_binary(str(path))
+    lats, lons = grid_coordinates(header)
+    np.testing.assert_allclose(lats, [0, 2, 4])
+    np.testing.assert_allclose(lons, [70, 72, 74, 76, 78])
+    assert header["attrs"]["time"] == "2025-09-01T06:00:00"
+
+
+def test_etag_revalidation_and_gzip_negotiation(tmp_path):
+    _write_slabs(tmp_path / "data")
+    service = DataService([str(tmp_path / "data")])
+    target = "/query?layer=currents"
+    plain, compressed = asyncio.run(_requests(service, (target, {}), (target, {"Accept-Encoding": "gzip, br"})))
+    status, headers, body = plain
+    assert status == 200 and "Content-Encoding" not in headers
+    assert compressed[1]["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed[2]) == body
+    assert compressed[1]["ETag"] == headers["ETag"]
+
+    # A matching ETag is answered without a body; a rewritten slab changes it
+    [(status, revalidated, body)] = asyncio.run(_requests(service, (target, {"If-None-Match": headers["ETag"]})))
+    assert (status, body) == (304, b"")
+    assert revalidated["ETag"] == headers["ETag"]
+    _write_slabs(tmp_path / "data2")
+    os.replace(tmp_path / "data2" / "currents_00.bin", tmp_path / "data" / "currents_00.bin")
+    service.catalog.last_scan = None
+    [(status, changed, _)] = asyncio.run(_requests(service, (target, {"If-None-Match": headers["ETag"]})))
+    assert status == 200 and changed["ETag"] != headers["ETag"]
+
+
+def test_slab_cache_access_counts_are_bounded_under_threads(tmp_path):
+    _write_slabs(tmp_path / "data")
+    path = str(tmp_path / "data" / "currents_00.bin")
+    cache = SlabCache(max_bytes=2 ** 20, hot_hits=3, max_tracked=8)
+
+    def read(version):
+        for _ in range(2):
+            cache.get(path, (version, 0))
+
+    threads = [threading.Thread(target=read, args=(version,)) for version in range(64)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache.accesses) == 8
+    assert set(cache.accesses.values()) <= {1, 2}
+    assert cache.hot.stats()["entries"] == 0
+
+    # A third read of a tracked slab makes it hot and forgets its count
+    key = next(iter(cache.accesses))
+    for _ in range(3 - cache.accesses[key]):
+        cache.get(*key)
+    assert key not in cache.accesses and cache.hot.stats()["entries"] == 1
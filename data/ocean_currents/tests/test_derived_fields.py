@@ -0,0 +1,70 @@
+import numpy as np
+
+from currents_engine import identify_coord_dims
+from derived_fields import EARTH_RADIUS_M, derive_currents, divergence, iter_derived_bands, relative_vorticity
+from synthetic_data import make_synthetic_currents
+
+OMEGA = 1e-5
+
+
+def rotation_about_x_axis(lats, lons):
+    """
+    Solid-body rotation about the axis through (0N, 0E): vorticity is
+    2 omega cos(lat) cos(lon) and divergence is zero.
+    """
+    phi = np.radians(lats)[:, None]
+    lam = np.radians(lons)[None, :]
+    u = -OMEGA * EARTH_RADIUS_M * np.sin(phi) * np.cos(lam)
+    v = OMEGA * EARTH_RADIUS_M * np.sin(lam) * np.ones_like(phi)
+    return u, v, 2 * OMEGA * np.cos(phi) * np.cos(lam)
+
+
+def test_solid_body_rotation_matches_the_analytic_fields():
+    lats = np.arange(-80.0, 80.01, 0.5)
+    lons = np.arange(-180.0, 180.0, 0.5)
+    u, v, expected = rotation_about_x_axis(lats, lons)
+
+    vorticity = relative_vorticity(u, v, lats, lons)
+    div = divergence(u, v, lats, lons)
+    # Interior rows use central differences; the seam column is periodic
+    inner = slice(1, -1)
+    np.testing.assert_allclose(vorticity[inner], expected[inner], rtol=0, atol=1e-4 * 2 * OMEGA)
+    np.testing.assert_allclose(div[inner], 0.0, atol=1e-4 * OMEGA)
+
+
+def test_zonal_rotation_gives_twice_the_rate_times_sin_lat():
+    lats = np.arange(-60.0, 60.01, 0.25)
+    lons = np.arange(10.0, 40.0, 0.25)
+    u = OMEGA * EARTH_RADIUS_M * np.cos(np.radians(lats))[:, None] * np.ones(len(lons))
+    v = np.zeros_like(u)
+    vorticity = relative_vorticity(u, v, lats, lons)
+    expected = 2 * OMEGA * np.sin(np.radians(lats))[:, None] * np.ones(len(lons))
+    np.testing.assert_allclose(vorticity[1:-1], expected[1:-1], rtol=0, atol=1e-4 * 2 * OMEGA)
+    np.testing.assert_allclose(divergence(u, v, lats, lons), 0.0, atol=1e-12)
+
+
+def test_bands_with_a_halo_match_a_single_band():
+    ds = make_synthetic_currents(n_lat=53, n_lon=64, land_fraction=0.2, seed=7)
+    coord_dims = identify_coord_dims(ds, 'uo')
+
+    def assemble(band_rows, sample_factor):
+        out = {}
+        for out_rows, fields in iter_derived_bands(ds, ['uo', 'vo'], derive_currents, coord_dims, 0,
+                                                   sample_factor=sample_factor, band_rows=band_rows):
+            for name, values in fields.items():
+                out.setdefault(name, []).append((out_rows, values))
+        n_rows = len(range(0, ds.sizes['latitude'], sample_factor))
+        grids = {}
+        for name, bands in out.items():
+            grid = np.full((n_rows, bands[0][1].shape[1]), -1.0)
+            for rows, values in bands:
+                grid[rows] = values
+            grids[name] = grid
+        return grids
+
+    for sample_factor in (1, 3):
+        whole = assemble(None, sample_factor)
+        banded = assemble(7, sample_factor)
+        for name in ('u', 'v', 'vorticity', 'divergence'):
+            np.testing.assert_array_equal(banded[name], whole[name])
+        assert np.isfinite(whole['vorticity']).any() and np.isnan(whole['vorticity']).any()
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+from fetch_orchestrator import SyntheticClient, fetch_dataset, plan_shards
+
+REQUEST = {
+    "dataset_id": "synthetic",
+    "variables": ["uo", "vo"],
+    "minimum_longitude": 60.0,
+    "maximum_longitude": 75.0,
+    "minimum_latitude": -5.0,
+    "maximum_latitude": 10.0,
+    "start_datetime": "2025-09-01T00:00:00",
+    "end_datetime": "2025-09-03T00:00:00",
+}
+SPLITS = {"shard_days": 1, "lat_splits": 2, "lon_splits": 3}
+
+
+def _shard_cells(shard, ds):
+    return ds.sel(time=slice(shard["start_datetime"], shard["end_datetime"]),
+                  latitude=slice(shard["minimum_latitude"], shard["maximum_latitude"]),
+                  longitude=slice(shard["minimum_longitude"], shard["maximum_longitude"]))["uo"].size
+
+
+def test_shards_partition_the_request():
+    shards = plan_shards(REQUEST, **SPLITS)
+    assert len(shards) == 2 * 2 * 3
+    assert len({shard["id"] for shard in shards}) == len(shards)
+    ds = SyntheticClient(REQUEST).dataset()
+    # Grid points on shard boundaries (every whole degree and 6 h step) belong to one shard only
+    assert sum(_shard_cells(shard, ds) for shard in shards) == ds["uo"].size
+
+
+def test_merged_download_matches_the_source(tmp_path):
+    client = SyntheticClient(REQUEST)
+    output = str(tmp_path / "merged.nc")
+    summary = fetch_dataset(REQUEST, str(tmp_path / "work"), output, client=client, max_workers=2, **SPLITS)
+    assert (summary["fetched"], summary["failed"], summary["output"]) == (12, 0, output)
+    with xr.open_dataset(output) as merged:
+        expected = client.dataset()
+        for name in ("uo", "vo"):
+            np.testing.assert_array_equal(merged[name].values, expected[name].values)
+        assert merged["uo"].encoding["chunksizes"][0] == 1
+
+
+def test_resume_fetches_only_the_failed_shard(tmp_path):
+    work_dir = str(tmp_path / "work")
+    output = str(tmp_path / "merged.nc")
+    failing = plan_shards(REQUEST, **SPLITS)[4]["id"]
+
+    summary = fetch_dataset(REQUEST, work_dir, output, client=SyntheticClient(REQUEST, fail_shards=[failing]),
+                            max_workers=2, attempts=1, **SPLITS)
+    assert (summary["fetched"], summary["failed"], summary["output"]) == (11, 1, None)
+    assert not os.path.exists(output)
+    done = {name: os.stat(os.path.join(work_dir, name)).st_mtime_ns
+            for name in os.listdir(work_dir) if name.startswith("shard_")}
+    assert len(done) == 11 and not any(name.endswith(".part") for name in done)
+
+    summary = fetch_dataset(REQUEST, work_dir, output, client=SyntheticClient(REQUEST), max_workers=2, **SPLITS)
+    assert (summary["skipped"], summary["fetched"], summary["failed"]) == (11, 1, 0)
+    assert {name: os.stat(os.path.join(work_dir, name)).st_mtime_ns for name in done} == done
+    assert summary["output"] == output
+
+
+def test_changed_request_starts_afresh(tmp_path):
+    work_dir = str(tmp_path / "work")
+    fetch_dataset(REQUEST, work_dir, str(tmp_path / "a.nc"), client=SyntheticClient(REQUEST), max_workers=2,
+                  **SPLITS)
+    summary = fetch_dataset(REQUEST, work_dir, str(tmp_path / "b.nc"), client=SyntheticClient(REQUEST),
+                            max_workers=2, shard_days=2, lat_splits=1, lon_splits=1)
+    assert (summary["skipped"], summary["fetched"]) == (0, 1)
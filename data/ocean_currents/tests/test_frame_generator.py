@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from frame_generator import generate_frames, interpolation_weights
+from synthetic_data import write_synthetic_currents
+from tile_pyramid import load_layer_fields
+from timeseries_format import TimeSeriesReader
+
+# Uneven spacing, so the cubic tangents use different step lengths
+SOURCE_SECONDS = np.array([0.0, 6.0, 12.0, 24.0, 30.0]) * 3600
+
+
+@pytest.mark.parametrize("method", ["linear", "cubic"])
+def test_weights_pass_through_source_steps_and_sum_to_one(method):
+    frames = np.linspace(SOURCE_SECONDS[0], SOURCE_SECONDS[-1], 61)
+    weights = interpolation_weights(SOURCE_SECONDS, frames, method)
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+
+    at_steps = interpolation_weights(SOURCE_SECONDS, SOURCE_SECONDS, method)
+    np.testing.assert_allclose(at_steps, np.eye(len(SOURCE_SECONDS)), atol=1e-12)
+
+
+def test_cubic_reproduces_a_quadratic_in_time_on_even_steps():
+    # Catmull-Rom is exact for quadratics on evenly spaced interior intervals
+    source = np.arange(6) * 6 * 3600.0
+    frames = np.linspace(source[1], source[-2], 37)
+    values = (source / 3600.0) ** 2
+    interpolated = interpolation_weights(source, frames, 'cubic') @ values
+    np.testing.assert_allclose(interpolated, (frames / 3600.0) ** 2, rtol=1e-9)
+
+
+def test_cubic_frames_hit_the_source_steps(tmp_path):
+    netcdf_file = str(tmp_path / "run.nc")
+    write_synthetic_currents(netcdf_file, n_time=4, n_lat=20, n_lon=30, seed=5)
+    output = str(tmp_path / "frames.aqts")
+    stats = generate_frames(netcdf_file, output, frame_interval='2h', method='cubic', workers=1)
+    assert stats["frames"] == 10
+
+    with xr.open_dataset(netcdf_file) as ds, TimeSeriesReader(output) as reader:
+        for time_index, valid_time in enumerate(pd.to_datetime(ds.time.values)):
+            expected, _, _ = load_layer_fields(ds, 'currents', time_index)
+            decoded = reader.read_step(valid_time.isoformat())
+            for name in ('u', 'v'):
+                tolerance = reader.variables[name]["scale"] / 2 + 1e-6
+                np.testing.assert_array_equal(np.isnan(decoded[name]), np.isnan(expected[name]))
+                np.testing.assert_allclose(decoded[name], expected[name], rtol=0, atol=tolerance)
+
+
+@pytest.mark.parametrize("method", ["linear", "cubic"])
+def test_parallel_rendering_writes_the_same_bytes(tmp_path, method):
+    netcdf_file = str(tmp_path / "run.nc")
+    write_synthetic_currents(netcdf_file, n_time=5, n_lat=24, n_lon=36, seed=6)
+    outputs = {}
+    for workers in (1, 2):
+        outputs[workers] = str(tmp_path / f"frames_{workers}.aqts")
+        stats = generate_frames(netcdf_file, outputs[workers], frame_interval='30min', method=method,
+                                keyframe_interval=8, workers=workers)
+        assert stats["workers"] == workers and stats["frames"] == 49
+    with open(outputs[1], 'rb') as f, open(outputs[2], 'rb') as g:
+        assert f.read() == g.read()
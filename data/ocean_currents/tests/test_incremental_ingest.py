@@ -0,0 +1,51 @@
+import os
+
+from incremental_ingest import TimeIndexedStore, ingest
+from synthetic_data import make_synthetic_currents, write_synthetic_currents
+
+
+def _slab_versions(store_dir):
+    return {os.path.join(root, name): os.stat(os.path.join(root, name)).st_mtime_ns
+            for root, _, names in os.walk(store_dir) for name in names if name.endswith(".bin")}
+
+
+def test_second_ingest_writes_nothing(tmp_path):
+    inputs = tmp_path / "inputs"
+    write_synthetic_currents(str(inputs / "glo12_fcst_R20250901.nc"), n_time=3, n_lat=20, n_lon=40)
+    store_dir = str(tmp_path / "store")
+
+    first = ingest([str(inputs)], store_dir, sample_factor=2)
+    assert (first["files"], first["steps"]) == (1, 3)
+    versions = _slab_versions(store_dir)
+    second = ingest([str(inputs)], store_dir, sample_factor=2)
+    assert (second["files"], second["steps"]) == (0, 0)
+    assert _slab_versions(store_dir) == versions
+
+
+def test_depth_levels_do_not_overwrite_each_other(tmp_path):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    # Same valid times, different depth levels, in separate files and in one file
+    for name, depth in (("surface_R20250901.nc", 0.5), ("deep_R20250901.nc", 100.0)):
+        ds = make_synthetic_currents(n_time=2, n_lat=20, n_lon=40)
+        ds.assign_coords(depth=[depth]).to_netcdf(str(inputs / name))
+    store_dir = str(tmp_path / "store")
+
+    summary = ingest([str(inputs)], store_dir, sample_factor=2)
+    assert summary["steps"] == 4
+    store = TimeIndexedStore(store_dir)
+    assert sorted(store.layers["currents"]) == ["0.5m", "100m"]
+    assert len(_slab_versions(store_dir)) == 4
+    assert ingest([str(inputs)], store_dir, sample_factor=2)["steps"] == 0
+
+
+def test_each_depth_index_of_a_file_is_kept(tmp_path):
+    inputs = tmp_path / "inputs"
+    write_synthetic_currents(str(inputs / "glo12_fcst_R20250901.nc"), n_time=2, n_depth=2, n_lat=20, n_lon=40)
+    store_dir = str(tmp_path / "store")
+    for depth_index in (0, 1):
+        assert ingest([str(inputs)], store_dir, sample_factor=2, depth_index=depth_index)["steps"] == 2
+    for depth_index in (0, 1):
+        assert ingest([str(inputs)], store_dir, sample_factor=2, depth_index=depth_index)["steps"] == 0
+    assert len(TimeIndexedStore(store_dir).layers["currents"]) == 2
+    assert len(_slab_versions(store_dir)) == 4
@@ -0,0 +1,60 @@
+import glob
+import json
+import os
+
+import numpy as np
+import xarray as xr
+
+from instrumentation import LOG_ENV, METRICS_ENV
+from process_currents_full import process_ocean_currents
+from synthetic_data import write_synthetic_currents
+
+
+def test_metrics_file_has_stage_durations_and_point_counts(tmp_path, monkeypatch):
+    netcdf_file = str(tmp_path / "run.nc")
+    # Columns past 180E are counted as out of range, land as NaN
+    write_synthetic_currents(netcdf_file, n_lat=20, n_lon=30, step=1.0, lat_origin=-10.0, lon_origin=165.0,
+                             land_fraction=0.25, seed=8)
+    metrics_dir = str(tmp_path / "metrics")
+    log_path = str(tmp_path / "run.log")
+    monkeypatch.setenv(METRICS_ENV, metrics_dir)
+    monkeypatch.setenv(LOG_ENV, log_path)
+
+    output_json = str(tmp_path / "run.json")
+    points = process_ocean_currents(netcdf_file, output_json, sample_factor=2, ocean_index=False,
+                                    return_data=False)
+
+    [metrics_file] = glob.glob(os.path.join(metrics_dir, "process_ocean_currents_*.json"))
+    with open(metrics_file) as f:
+        document = json.load(f)
+    assert document["status"] == "ok"
+    for stage in ("open", "prepare", "read", "compute", "write_json", "write_binary"):
+        assert document["stages"][stage] >= 0.0
+
+    with xr.open_dataset(netcdf_file) as ds:
+        u = ds.uo.values[0, 0, ::2, ::2]
+        lons = ds.longitude.values[::2]
+    finite = np.isfinite(u)
+    counters = document["counters"]
+    assert counters["points"] == points == int(finite[:, lons <= 180].sum())
+    assert counters["skipped_nan"] == int((~finite).sum())
+    assert counters["skipped_range"] == int(finite[:, lons > 180].sum()) > 0
+    assert counters["bytes_written"] == os.path.getsize(output_json) + os.path.getsize(output_json[:-5] + ".bin")
+
+    with open(log_path) as f:
+        events = [json.loads(line)["event"] for line in f]
+    assert events[0] == "run_started" and events[-1] == "run_finished"
+
+
+def test_failed_run_is_recorded_as_an_error(tmp_path, monkeypatch):
+    netcdf_file = str(tmp_path / "broken.nc")
+    with open(netcdf_file, 'w') as f:
+        f.write("not a netcdf file")
+    metrics_file = str(tmp_path / "metrics.json")
+    monkeypatch.setenv(METRICS_ENV, metrics_file)
+
+    assert process_ocean_currents(netcdf_file, str(tmp_path / "out.json")) == []
+    with open(metrics_file) as f:
+        document = json.load(f)
+    assert document["status"] == "error"
+    assert "open" in document["stages"]
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from binary_format import grid_coordinates, read_grid_binary
+from joint_product import process_joint_product, shared_grid
+from synthetic_data import GLO12_STEP, write_synthetic_currents, write_synthetic_temperature
+
+ROW_OFFSET, COL_OFFSET = 5, 7
+
+
+def _write_offset_pair(tmp_path):
+    """
+    Currents on one grid and temperature on a grid shifted by whole cells,
+    starting two 6-hourly steps later.
+    """
+    currents_file = str(tmp_path / "currents.nc")
+    temperature_file = str(tmp_path / "temperature.nc")
+    write_synthetic_currents(currents_file, n_time=4, n_lat=40, n_lon=50, lat_origin=-10.0, lon_origin=20.0,
+                             seed=1)
+    write_synthetic_temperature(temperature_file, n_time=4, n_lat=30, n_lon=60,
+                                lat_origin=-10.0 + ROW_OFFSET * GLO12_STEP,
+                                lon_origin=20.0 + COL_OFFSET * GLO12_STEP, seed=2, start="2025-09-01 12:00")
+    return currents_file, temperature_file
+
+
+def test_shared_grid_crops_to_the_overlap():
+    lats = -10.0 + GLO12_STEP * np.arange(40)
+    lons = 20.0 + GLO12_STEP * np.arange(50)
+    grid = shared_grid(lats, lons, lats[ROW_OFFSET:ROW_OFFSET + 30] + 1e-4, lons[COL_OFFSET:], sample_factor=2)
+    assert grid["rows"] == slice(ROW_OFFSET, ROW_OFFSET + 30, 2)
+    assert grid["cols"] == slice(COL_OFFSET, 50, 2)
+    np.testing.assert_array_equal(grid["lat_index"], np.arange(0, 30, 2))
+    np.testing.assert_array_equal(grid["lon_index"], np.arange(0, 50 - COL_OFFSET, 2))
+    np.testing.assert_array_equal(grid["lats"], lats[ROW_OFFSET:ROW_OFFSET + 30:2])
+
+
+def test_joint_slabs_align_offset_grids_times_and_land(tmp_path):
+    currents_file, temperature_file = _write_offset_pair(tmp_path)
+    output_dir = str(tmp_path / "joint")
+    manifest = process_joint_product(currents_file, temperature_file, output_dir, sample_factor=1)
+
+    # Only the valid times present in both files
+    assert [step["time"] for step in manifest["steps"]] == ["2025-09-01T12:00:00", "2025-09-01T18:00:00"]
+    assert manifest["grid"]["nlat"] == 30 and manifest["grid"]["nlon"] == 50 - COL_OFFSET
+
+    with xr.open_dataset(currents_file) as currents, xr.open_dataset(temperature_file) as temperature:
+        for position, step in enumerate(manifest["steps"]):
+            header, arrays = read_grid_binary(os.path.join(output_dir, step["file"]))
+            lats, lons = grid_coordinates(header)
+            np.testing.assert_allclose(lats, currents.latitude.values[ROW_OFFSET:ROW_OFFSET + 30], atol=1e-5)
+            np.testing.assert_allclose(lons, currents.longitude.values[COL_OFFSET:], atol=1e-5)
+
+            current_time = 2 + position
+            u = currents.uo.values[current_time, 0, ROW_OFFSET:ROW_OFFSET + 30, COL_OFFSET:]
+            v = currents.vo.values[current_time, 0, ROW_OFFSET:ROW_OFFSET + 30, COL_OFFSET:]
+            thetao = temperature.thetao.values[position, 0, :, :50 - COL_OFFSET]
+            assert pd.Timestamp(temperature.time.values[position]) == pd.Timestamp(step["time"])
+
+            # One land mask: cells where all three variables are present
+            valid = np.isfinite(u) & np.isfinite(v) & np.isfinite(thetao)
+            assert valid.sum() == step["valid_cells"]
+            assert (valid != np.isfinite(thetao)).any() and (valid != np.isfinite(u)).any()
+            np.testing.assert_array_equal(arrays["mask"].astype(bool), valid)
+            np.testing.assert_array_equal(arrays["u"][valid], u[valid])
+            np.testing.assert_array_equal(arrays["v"][valid], v[valid])
+            np.testing.assert_array_equal(arrays["thetao"][valid], thetao[valid])
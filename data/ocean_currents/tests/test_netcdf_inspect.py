@@ -0,0 +1,19 @@
+import json
+
+from netcdf_inspect import report_netcdf
+from synthetic_data import write_synthetic_currents
+
+
+def test_json_to_stdout_is_the_only_output(tmp_path, capsys):
+    path = str(tmp_path / "currents.nc")
+    write_synthetic_currents(path, n_lat=20, n_lon=40, seed=0)
+    report = report_netcdf(path, json_path='-')
+    assert json.loads(capsys.readouterr().out) == json.loads(json.dumps(report))
+
+
+def test_json_file_keeps_the_text_report(tmp_path, capsys):
+    path = str(tmp_path / "currents.nc")
+    write_synthetic_currents(path, n_lat=20, n_lon=40, seed=0)
+    report_netcdf(path, json_path=str(tmp_path / "report.json"))
+    assert "NetCDF File:" in capsys.readouterr().out
+    assert json.loads((tmp_path / "report.json").read_text())["file"]
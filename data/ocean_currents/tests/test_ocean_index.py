@@ -0,0 +1,23 @@
+import json
+
+from process_currents_full import process_ocean_currents
+from synthetic_data import write_synthetic_currents
+
+
+def _points(netcdf_file, output_json, **kwargs):
+    process_ocean_currents(netcdf_file, str(output_json), sample_factor=1, binary_encoding=None, **kwargs)
+    with open(output_json) as f:
+        return len(json.load(f))
+
+
+def test_index_matches_full_read(tmp_path):
+    path = write_synthetic_currents(str(tmp_path / "a.nc"), n_lat=40, n_lon=60, seed=1)
+    assert _points(path, tmp_path / "indexed.json") == _points(path, tmp_path / "plain.json", ocean_index=False)
+
+
+def test_same_grid_with_different_land_gets_its_own_index(tmp_path):
+    # Same coordinates, different land masks: the index of the first file must not be reused for the second
+    first = write_synthetic_currents(str(tmp_path / "a.nc"), n_lat=40, n_lon=60, seed=1)
+    second = write_synthetic_currents(str(tmp_path / "b.nc"), n_lat=40, n_lon=60, seed=2, land_fraction=0.1)
+    _points(first, tmp_path / "a.json")
+    assert _points(second, tmp_path / "b.json") == _points(second, tmp_path / "b_plain.json", ocean_index=False)
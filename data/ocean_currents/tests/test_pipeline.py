@@ -0,0 +1,55 @@
+import json
+import os
+import types
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import process_currents_full
+from process_currents_full import run_pipeline, stats_path_for
+from synthetic_data import write_synthetic_currents
+
+
+def test_stats_sidecar_describes_the_full_resolution_slab(tmp_path):
+    path = str(tmp_path / "run.nc")
+    write_synthetic_currents(path, n_lat=20, n_lon=40, seed=1)
+    output = str(tmp_path / "out.json")
+    summary = run_pipeline(path, output, sample_factor=2, binary_encoding=None)
+
+    with open(stats_path_for(output)) as f:
+        sidecar = json.load(f)
+    assert sidecar["statistics"] == json.loads(json.dumps(summary["statistics"]))
+    with open(output) as f:
+        assert sidecar["points"] == len(json.load(f))
+    assert sidecar["grid"] == {"nlat": 20, "nlon": 40, "sample_factor": 2}
+    assert {"open", "describe", "read", "write_json"} <= set(sidecar["timings"])
+
+    with xr.open_dataset(path) as ds:
+        for name in ("uo", "vo"):
+            values = ds[name].isel(time=0, depth=0).values.astype(np.float64)
+            stats = sidecar["statistics"][name]
+            assert stats["count"] + stats["nan_count"] == values.size
+            assert stats["nan_count"] == int(np.isnan(values).sum())
+            assert stats["min"] == pytest.approx(np.nanmin(values))
+            assert stats["max"] == pytest.approx(np.nanmax(values))
+            assert stats["mean"] == pytest.approx(np.nanmean(values))
+
+
+def test_failed_sidecar_write_keeps_the_previous_one(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.nc")
+    write_synthetic_currents(path, n_lat=20, n_lon=40, seed=1)
+    output = str(tmp_path / "out.json")
+    with open(stats_path_for(output), "w") as f:
+        f.write("previous")
+
+    def interrupted_dump(document, f, **kwargs):
+        f.write('{"source": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(process_currents_full, "json", types.SimpleNamespace(dump=interrupted_dump))
+    with pytest.raises(OSError):
+        run_pipeline(path, output, sample_factor=2, binary_encoding=None)
+    with open(stats_path_for(output)) as f:
+        assert f.read() == "previous"
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
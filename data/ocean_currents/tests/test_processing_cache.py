@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import processing_cache
+from processing_cache import ProcessingCache, cache_key, code_modules
+
+
+def test_code_version_covers_imported_helpers():
+    modules = set(code_modules())
+    assert {'process_currents_full.py', 'currents_engine.py', 'regions.py', 'slab_store.py', 'chunked_io.py',
+            'ocean_index.py', 'input_validation.py'} <= modules
+
+
+def _output(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(processing_cache.time, "time", lambda: next(clock))
+    cache = ProcessingCache(str(tmp_path / "cache"), max_bytes=100)
+    for key in ("a", "b"):
+        cache.store(key, {"json": _output(tmp_path / f"{key}.json", key * 40)})
+    # Using 'a' makes 'b' the least recently used entry
+    assert cache.restore("a", {"json": str(tmp_path / "restored.json")})
+    cache.store("c", {"json": _output(tmp_path / "c.json", "c" * 40)})
+
+    assert sorted(cache.index) == ["a", "c"]
+    assert not os.path.exists(os.path.join(cache.cache_dir, "b"))
+    assert not cache.restore("b", {"json": str(tmp_path / "restored.json")})
+    assert (tmp_path / "restored.json").read_text() == "a" * 40
+
+
+def test_changed_input_misses_the_cache(tmp_path):
+    input_file = tmp_path / "input.nc"
+    input_file.write_bytes(b"run 1")
+    params = {"sample_factor": 8}
+    key = cache_key(str(input_file), params)
+    assert cache_key(str(input_file), params) == key
+    assert cache_key(str(input_file), {"sample_factor": 4}) != key
+
+    cache = ProcessingCache(str(tmp_path / "cache"))
+    cache.store(key, {"json": _output(tmp_path / "out.json", "[]")})
+    input_file.write_bytes(b"run 2")
+    stat = os.stat(input_file)
+    os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changed = cache_key(str(input_file), params)
+    assert changed != key
+    assert not cache.restore(changed, {"json": str(tmp_path / "out.json")})
+
+
+def test_interrupted_restore_keeps_the_previous_output(tmp_path, monkeypatch):
+    cache = ProcessingCache(str(tmp_path / "cache"))
+    cache.store("k", {"json": _output(tmp_path / "source.json", "cached")})
+    destination = _output(tmp_path / "out.json", "previous")
+
+    def failing_copy(source, target):
+        with open(target, 'w') as f:
+            f.write("cach")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(processing_cache.shutil, "copyfile", failing_copy)
+    with pytest.raises(OSError):
+        cache.restore("k", {"json": destination})
+    assert (tmp_path / "out.json").read_text() == "previous"
+    assert sorted(os.listdir(tmp_path)) == ["cache", "out.json", "source.json"]
+
+
+def test_concurrent_caches_keep_each_others_entries(tmp_path):
+    first = ProcessingCache(str(tmp_path / "cache"))
+    second = ProcessingCache(str(tmp_path / "cache"))
+    first.store("a", {"json": _output(tmp_path / "a.json", "a")})
+    # second loaded its index before 'a' existed; storing must not drop it
+    second.store("b", {"json": _output(tmp_path / "b.json", "b")})
+
+    assert sorted(ProcessingCache(str(tmp_path / "cache")).index) == ["a", "b"]
+    assert first.restore("b", {"json": str(tmp_path / "restored.json")})
+    assert [name for name in os.listdir(first.cache_dir) if name.endswith(".tmp")] == []
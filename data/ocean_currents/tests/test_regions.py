@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import xarray as xr
+import xarray.backends.netCDF4_ as netcdf_backend
+
+from process_currents_full import process_ocean_currents
+from regions import polygon_mask, region_window
+from synthetic_data import write_synthetic_currents
+
+DATELINE_BOX = {"south": -4.0, "north": 4.0, "west": 170.0, "east": -170.0}
+
+
+def test_window_across_the_antimeridian():
+    lats = np.arange(-10.0, 10.5, 1.0)
+    lons = np.arange(-180.0, 180.0, 1.0)
+    rows, cols = region_window(lats, lons, DATELINE_BOX)
+    assert rows == slice(6, 15)
+    np.testing.assert_array_equal(lons[cols], np.r_[170.0:180.0, -180.0:-169.0])
+
+    # The same box given with an east edge past 180, and on a 0..360 grid
+    _, same = region_window(lats, lons, dict(DATELINE_BOX, east=190.0))
+    np.testing.assert_array_equal(same, cols)
+    _, cols_360 = region_window(lats, np.arange(0.0, 360.0, 1.0), DATELINE_BOX)
+    assert cols_360 == slice(170, 191)
+
+    # A box that does not cross it is still a plain slice
+    assert region_window(lats, lons, {"south": 0.0, "north": 1.0, "west": 10.0, "east": 12.5})[1] == slice(190, 193)
+
+
+def test_even_odd_rule_leaves_holes_out():
+    lats = np.arange(0.5, 10.0, 1.0)
+    lons = np.arange(0.5, 10.0, 1.0)
+    outer = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    hole = [[3, 3], [7, 3], [7, 7], [3, 7], [3, 3]]
+    mask = polygon_mask(lats, lons, [outer, hole])
+
+    expected = np.ones((10, 10), dtype=bool)
+    expected[3:7, 3:7] = False
+    np.testing.assert_array_equal(mask, expected)
+    # Rings across the antimeridian are given with longitudes past 180
+    wrapped = polygon_mask(lats, np.array([175.5, 179.5, -179.5, -175.5, -160.0]),
+                           [[[175, 0], [185, 0], [185, 10], [175, 10], [175, 0]]])
+    np.testing.assert_array_equal(wrapped[0], [True, True, True, True, False])
+
+
+def test_region_reads_only_its_hyperslab_across_the_antimeridian(tmp_path, monkeypatch):
+    netcdf_file = str(tmp_path / "global.nc")
+    write_synthetic_currents(netcdf_file, n_lat=30, n_lon=360, step=1.0, lat_origin=-15.0, lon_origin=-180.0,
+                             land_fraction=0.2, seed=3)
+    reads = []
+    getitem = netcdf_backend.NetCDF4ArrayWrapper._getitem
+
+    def counting_getitem(self, key):
+        array = getitem(self, key)
+        if array.ndim == 4 or (array.ndim == 2 and array.size > 1):
+            reads.append(array.size)
+        return array
+
+    monkeypatch.setattr(netcdf_backend.NetCDF4ArrayWrapper, "_getitem", counting_getitem)
+    output_json = str(tmp_path / "dateline.json")
+    points = process_ocean_currents(netcdf_file, output_json, sample_factor=1, binary_encoding=None,
+                                    ocean_index=False, return_data=False,
+                                    region={"name": "dateline", "bounds": DATELINE_BOX})
+    monkeypatch.undo()
+
+    # Data reads cover the 9 x 21 window only, never the global slab
+    assert reads and max(reads) <= 9 * 21
+    with open(output_json) as f:
+        records = json.load(f)
+    assert len(records) == points > 0
+    with xr.open_dataset(netcdf_file) as ds:
+        slab = ds.uo.isel(time=0, depth=0)
+        inside = slab.where((abs(slab.latitude) <= 4) & (abs(slab.longitude) >= 170), drop=True)
+        assert points == int(np.isfinite(inside.values).sum())
+    assert all(abs(record["lon"]) >= 170 and abs(record["lat"]) <= 4 for record in records)
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+from process_currents_full import process_ocean_currents
+from slab_store import convert_to_store, find_store, open_source, store_path_for
+from synthetic_data import write_synthetic_currents
+
+
+def test_store_round_trips_the_source_and_is_dropped_when_stale(tmp_path):
+    netcdf_file = str(tmp_path / "currents.nc")
+    write_synthetic_currents(netcdf_file, n_time=2, n_depth=2, n_lat=40, n_lon=70, seed=4)
+    plain_json = str(tmp_path / "plain.json")
+    process_ocean_currents(netcdf_file, plain_json, sample_factor=3, binary_encoding=None, ocean_index=False)
+
+    store_path = convert_to_store(netcdf_file, target_chunk_bytes=4096)
+    assert store_path == store_path_for(netcdf_file)
+    assert find_store(netcdf_file) == store_path
+
+    ds, _, path = open_source(netcdf_file)
+    with ds, xr.open_dataset(netcdf_file) as source:
+        assert path == store_path
+        for name in ('uo', 'vo'):
+            np.testing.assert_array_equal(ds[name].values, source[name].values)
+        np.testing.assert_array_equal(ds['latitude'].values, source['latitude'].values)
+
+    store_json = str(tmp_path / "store.json")
+    process_ocean_currents(netcdf_file, store_json, sample_factor=3, binary_encoding=None, ocean_index=False)
+    with open(plain_json, 'rb') as f, open(store_json, 'rb') as g:
+        assert f.read() == g.read()
+
+    # A re-downloaded source no longer matches the recorded fingerprint
+    write_synthetic_currents(netcdf_file, n_time=2, n_depth=2, n_lat=40, n_lon=70, seed=5)
+    stat = os.stat(netcdf_file)
+    os.utime(netcdf_file, (stat.st_atime, stat.st_mtime + 10))
+    assert find_store(netcdf_file) is None
+    ds, _, path = open_source(netcdf_file)
+    with ds:
+        assert path == netcdf_file
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from streaming_writer import CurrentsRecordWriter
+
+COLUMNS = ('lat', 'lon', 'u', 'v', 'speed', 'direction')
+
+
+def _fields(n, seed=0):
+    rng = np.random.default_rng(seed)
+    fields = {name: rng.normal(0, 50, n) for name in COLUMNS}
+    fields['lat'] = np.round(fields['lat'], 3)
+    fields['speed'][:3] = [0.0, -0.0, 1e-300][:n]
+    return fields
+
+
+def _records(fields):
+    return [dict({name: float(fields[name][i]) for name in COLUMNS}, type="current")
+            for i in range(len(fields['lat']))]
+
+
+@pytest.mark.parametrize("batch_rows", [7, 100000])
+def test_json_is_byte_identical_to_json_dumps(tmp_path, batch_rows):
+    parts = [_fields(25, seed=1), _fields(0), _fields(13, seed=2)]
+    path = tmp_path / "out.json"
+    with CurrentsRecordWriter(str(path), batch_rows=batch_rows) as writer:
+        for part in parts:
+            writer.write(part)
+    expected = json.dumps([record for part in parts for record in _records(part)])
+    assert path.read_text() == expected
+    assert writer.count == 38
+
+
+def test_non_finite_values_are_written_as_json_dumps_does(tmp_path):
+    fields = _fields(6)
+    fields['u'][1] = np.nan
+    fields['v'][2] = np.inf
+    fields['direction'][3] = -np.inf
+    path = tmp_path / "out.json"
+    with CurrentsRecordWriter(str(path)) as writer:
+        writer.write(fields)
+    assert path.read_text() == json.dumps(_records(fields))
+    assert "NaN" in path.read_text() and "-Infinity" in path.read_text()
+
+
+def test_empty_output_is_an_empty_list(tmp_path):
+    path = tmp_path / "out.json"
+    with CurrentsRecordWriter(str(path)) as writer:
+        writer.write(_fields(0))
+    assert path.read_text() == json.dumps([])
+
+
+def test_ndjson_writes_one_json_dumps_record_per_line(tmp_path):
+    fields = _fields(10)
+    fields['u'][4] = np.nan
+    path = tmp_path / "out.ndjson"
+    with CurrentsRecordWriter(str(path), output_format='ndjson', batch_rows=3) as writer:
+        writer.write(fields)
+    assert path.read_text() == "".join(json.dumps(record) + "\n" for record in _records(fields))
+
+
+@pytest.mark.parametrize("output_format", ["json", "ndjson"])
+def test_gzip_output_decompresses_to_the_plain_bytes(tmp_path, output_format):
+    fields = _fields(20)
+    with CurrentsRecordWriter(str(tmp_path / "plain"), output_format=output_format) as writer:
+        writer.write(fields)
+    with CurrentsRecordWriter(str(tmp_path / "packed.gz"), output_format=output_format) as writer:
+        writer.write(fields)
+    with gzip.open(tmp_path / "packed.gz", "rb") as f:
+        assert f.read() == (tmp_path / "plain").read_bytes()
+
+
+def test_failed_write_keeps_the_previous_output(tmp_path):
+    path = tmp_path / "out.json"
+    path.write_text("previous")
+    with pytest.raises(RuntimeError):
+        with CurrentsRecordWriter(str(path)) as writer:
+            writer.write(_fields(5))
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
@@ -0,0 +1,15 @@
+import numpy as np
+
+from current_query import CurrentField
+from streamlines import FieldSequence, build_zoom_level
+
+
+def test_speed_of_lines_crossing_the_dateline():
+    # Uniform 1 m/s eastward flow on a global grid: seeds near 180E cross the dateline
+    lats = np.arange(-60.0, 60.5, 0.5)
+    lons = np.arange(-180.0, 180.0, 0.5)
+    u = np.ones((len(lats), len(lons)))
+    field = CurrentField(lats, lons, u, np.zeros_like(u))
+    level = build_zoom_level(FieldSequence([field]), field, zoom=3, min_zoom=3, bounds={'south': -10, 'north': 10, 'west': 170, 'east': 179.5})
+    assert level["lines"]
+    np.testing.assert_allclose(level["speed"], 1.0, rtol=0.02)
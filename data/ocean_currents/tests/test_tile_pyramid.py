@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from binary_format import read_grid_header
+from tile_pyramid import TILE_SCHEME, build_levels, build_tile_pyramid, load_layer_fields, write_pyramid
+from synthetic_data import make_synthetic_currents, write_synthetic_currents
+
+
+def test_same_data_under_a_new_name_rewrites_no_tiles(tmp_path):
+    first = str(tmp_path / "run_1.nc")
+    write_synthetic_currents(first, n_lat=60, n_lon=120, seed=0)
+    second = str(tmp_path / "run_2.nc")
+    shutil.copy(first, second)
+    output_dir = str(tmp_path / "tiles")
+
+    stats = build_tile_pyramid(first, output_dir, tile_size=32)
+    assert stats["written"] > 0
+    stats = build_tile_pyramid(second, output_dir, tile_size=32)
+    assert stats["written"] == 0 and stats["unchanged"] > 0
+
+    with open(os.path.join(output_dir, "pyramid.json")) as f:
+        assert json.load(f)["attrs"]["source"] == "run_2.nc"
+    assert [name for _, _, names in os.walk(output_dir) for name in names if name.endswith(".tmp")] == []
+
+
+def test_strided_read_matches_striding_the_full_read():
+    ds = make_synthetic_currents(n_lat=45, n_lon=91, seed=3)
+    full, lats, lons = load_layer_fields(ds, 'currents')
+    fields, sampled_lats, sampled_lons = load_layer_fields(ds, 'currents', sample_factor=4)
+    np.testing.assert_array_equal(sampled_lats, lats[::4])
+    np.testing.assert_array_equal(sampled_lons, lons[::4])
+    for name in ('u', 'v'):
+        np.testing.assert_array_equal(fields[name], full[name][::4, ::4])
+
+
+def test_tiles_are_addressed_by_grid_index(tmp_path):
+    netcdf_file = str(tmp_path / "currents.nc")
+    write_synthetic_currents(netcdf_file, n_lat=40, n_lon=100, step=1.0, lat_origin=-30.0, lon_origin=0.0,
+                             land_fraction=0, seed=1)
+    output_dir = str(tmp_path / "tiles")
+    build_tile_pyramid(netcdf_file, output_dir, tile_size=32)
+
+    with open(os.path.join(output_dir, "pyramid.json")) as f:
+        index = json.load(f)
+    assert index["scheme"] == TILE_SCHEME
+    # 100 columns need two doublings to fit one 32-cell tile, so zoom 0 is a single tile
+    assert [level["zoom"] for level in index["levels"]] == [0, 1, 2]
+    assert [level["tiles"] for level in index["levels"]] == [[1, 1], [2, 1], [4, 2]]
+    # At the native zoom, y counts rows from the grid origin northward and x columns eastward
+    assert read_grid_header(os.path.join(output_dir, "2", "0", "0.bin"))["grid"]["lat0"] == -30.0
+    grid = read_grid_header(os.path.join(output_dir, "2", "3", "1.bin"))["grid"]
+    assert (grid["lat0"], grid["lon0"], grid["nlat"], grid["nlon"]) == (2.0, 96.0, 8, 4)
+
+
+def test_coarse_latitudes_past_the_pole_are_clamped(tmp_path):
+    # 50 rows up to 90N: the coarsest blocks are padded past the pole
+    ds = make_synthetic_currents(n_lat=50, n_lon=100, step=1.0, lat_origin=41.0, land_fraction=0, seed=2)
+    fields, lats, lons = load_layer_fields(ds, 'currents')
+    assert lats[-1] == 90.0
+    levels = build_levels(fields, lats, lons, tile_size=16)
+
+    coarse = levels[0]
+    assert coarse['factor'] == 8
+    assert coarse['lat0'] + coarse['dlat'] * (len(coarse['lats']) - 1) > 90.0
+    assert coarse['lats'].max() == 90.0
+    for level in levels:
+        assert np.all((level['lats'] >= -90.0) & (level['lats'] <= 90.0))
+        # Full blocks keep their true centres
+        np.testing.assert_allclose(level['lats'][:-1],
+                                   level['lat0'] + level['dlat'] * np.arange(len(level['lats']) - 1))
+
+    output_dir = str(tmp_path / "tiles")
+    write_pyramid(levels, output_dir, tile_size=16)
+    with open(os.path.join(output_dir, "pyramid.json")) as f:
+        index = json.load(f)
+    assert index["levels"][0]["lat_range"] == [44.5, 90.0]
+    assert index["levels"][-1]["lat_range"] == [41.0, 90.0]
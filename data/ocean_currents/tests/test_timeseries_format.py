@@ -0,0 +1,56 @@
+import zlib
+
+import numpy as np
+import xarray as xr
+
+from synthetic_data import write_synthetic_currents
+from tile_pyramid import load_layer_fields
+from timeseries_format import TimeSeriesReader, encode_timeseries, merge_timeseries
+
+
+def test_round_trip_within_quantization_step(tmp_path):
+    path = str(tmp_path / "run.nc")
+    write_synthetic_currents(path, n_time=7, n_lat=30, n_lon=50, seed=2)
+    output = str(tmp_path / "run.aqts")
+    encode_timeseries(path, output, sample_factor=2, keyframe_interval=3)
+
+    with xr.open_dataset(path) as ds, TimeSeriesReader(output) as reader:
+        assert len(reader.times) == 7
+        lats, lons = reader.coordinates()
+        # Backwards, so every delta step has to find its keyframe again
+        for step in reversed(range(7)):
+            expected, expected_lats, expected_lons = load_layer_fields(ds, 'currents', step, sample_factor=2)
+            decoded = reader.read_step(step)
+            for name in ('u', 'v'):
+                tolerance = reader.variables[name]["scale"] / 2 + 1e-6
+                np.testing.assert_array_equal(np.isnan(decoded[name]), np.isnan(expected[name]))
+                np.testing.assert_allclose(decoded[name], expected[name], rtol=0, atol=tolerance)
+    np.testing.assert_allclose(lats, expected_lats)
+    np.testing.assert_allclose(lons, expected_lons)
+
+
+def test_public_chunk_access_and_reset(tmp_path):
+    path = str(tmp_path / "run.nc")
+    write_synthetic_currents(path, n_time=4, n_lat=20, n_lon=30, seed=3)
+    output = str(tmp_path / "run.aqts")
+    encode_timeseries(path, output, keyframe_interval=2)
+
+    with TimeSeriesReader(output) as reader:
+        offset, nbytes, _ = reader.steps[1]["chunks"]["u"]
+        chunk = reader.read_chunk(offset, nbytes)
+        assert len(chunk) == nbytes and zlib.decompress(chunk)
+        first = reader.read_step(1)
+        reader.reset()
+        again = reader.read_step(1)
+        for name in first:
+            np.testing.assert_array_equal(first[name], again[name])
+
+    # Merging copies the chunks through read_chunk without decoding them
+    merged = str(tmp_path / "merged.aqts")
+    assert merge_timeseries([output, output], merged) == 8
+    with TimeSeriesReader(output) as reader, TimeSeriesReader(merged) as joined:
+        for step in range(8):
+            expected = reader.read_step(step % 4)
+            decoded = joined.read_step(step)
+            for name in expected:
+                np.testing.assert_array_equal(decoded[name], expected[name])
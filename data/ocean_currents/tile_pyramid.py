@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import argparse
+import hashlib
+import json
+import math
+import os
+
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+    select_slice,
+)
+from binary_format import encode_grid_binary, regular_axis
+
+# Cells per tile edge at every zoom level
+TILE_SIZE = 256
+
+# Layers the tiler knows how to build
+LAYERS = ('currents', 'temperature')
+
+# Tile addressing recorded in pyramid.json. Tiles index the source grid, not
+# a web map projection: zoom 0 is the coarsest level whose grid fits in one
+# tile, each zoom above it doubles the resolution up to the native grid, and
+# tile (x, y) covers columns x*tile_size.. and rows y*tile_size.. of its
+# level, counted from the grid origin (eastward and northward on an
+# ascending grid). This is not slippy-map (XYZ/TMS) tiling.
+TILE_SCHEME = "grid-index"
+
+
+def load_layer_fields(ds, layer, time_index=0, depth_index=0, sample_factor=1):
+    """
+    Read the 2-D fields of a layer for one (time, depth) slice.
+
+    The stride is applied in the selection, so only every sample_factor-th
+    row and column is read and converted; memory follows the output size.
+
+    Args:
+        ds (xarray.Dataset): Opened dataset
+        layer (str): 'currents' (u/v) or 'temperature' (thetao)
+        time_index (int): Index of the time step to tile
+        depth_index (int): Index of the depth level to tile
+        sample_factor (int): Read every nth latitude and longitude
+
+    Returns:
+        tuple: (fields, lats, lons) where fields maps output variable names to
+               float64 arrays shaped (len(lats), len(lons))
+    """
+    if layer == 'currents':
+        u_var, v_var = find_current_variables(ds)
+        if u_var is None or v_var is None:
+            raise ValueError("Could not find ocean current velocity variables in the dataset")
+        sources = {'u': u_var, 'v': v_var}
+    elif layer == 'temperature':
+        t_var = find_variable(ds, TEMPERATURE_NAMES)
+        if t_var is None:
+            raise ValueError("Could not find a sea water temperature variable in the dataset")
+        sources = {'thetao': t_var}
+    else:
+        raise ValueError(f"Unknown layer {layer!r}; expected one of {LAYERS}")
+
+    coord_dims = identify_coord_dims(ds, next(iter(sources.values())))
+    order = (coord_dims['lat'], coord_dims['lon'])
+    stride = {dim: slice(None, None, sample_factor) for dim in order}
+    fields = {}
+    for name, var in sources.items():
+        data = select_slice(ds[var], coord_dims, time_index, depth_index).isel(stride).transpose(*order)
+        fields[name] = data.values.astype(np.float64)
+    lats = ds[coord_dims['lat']].values[::sample_factor].astype(np.float64)
+    lons = ds[coord_dims['lon']].values[::sample_factor].astype(np.float64)
+    return fields, lats, lons
+
+
+def block_sum(array, factor):
+    """
+    Sum non-overlapping factor x factor blocks of a 2-D array, padding the
+    trailing edge with zeros so partial blocks are kept.
+
+    Args:
+        array (numpy.ndarray): 2-D array
+        factor (int): Block edge length
+
+    Returns:
+        numpy.ndarray: Array of shape (ceil(ny/factor), ceil(nx/factor))
+    """
+    ny, nx = array.shape
+    out_y = -(-ny // factor)
+    out_x = -(-nx // factor)
+    padded = np.zeros((out_y * factor, out_x * factor), dtype=array.dtype)
+    padded[:ny, :nx] = array
+    return padded.reshape(out_y, factor, out_x, factor).sum(axis=(1, 3))
+
+
+def build_levels(fields, lats, lons, tile_size=TILE_SIZE):
+    """
+    Build every zoom level of the pyramid by exact block averaging.
+
+    The finest level is the native grid. Each coarser level halves the
+    resolution; it is computed in one vectorized pass from the running
+    per-cell sums and valid-cell counts of the level below, so the values
+    are true NaN-aware means over the native cells (not strided samples).
+
+    Args:
+        fields (dict): Variable name -> 2-D native grid
+        lats (numpy.ndarray): Native latitude axis (evenly spaced)
+        lons (numpy.ndarray): Native longitude axis (evenly spaced)
+        tile_size (int): Cells per tile edge
+
+    Returns:
+        list: One dict per zoom level, coarsest first, with 'zoom', 'factor',
+              'lats', 'lons', 'fields' and 'valid', plus the regular row axis
+              ('lat0', 'dlat') that 'lats' follows before clamping
+    """
+    lat0, dlat = regular_axis(lats, "Latitude")
+    lon0, dlon = regular_axis(lons, "Longitude")
+    ny, nx = next(iter(fields.values())).shape
+    max_zoom = max(0, math.ceil(math.log2(max(ny, nx) / tile_size)))
+
+    valid = np.ones((ny, nx), dtype=bool)
+    for values in fields.values():
+        valid &= np.isfinite(values)
+    counts = valid.astype(np.int64)
+    sums = {name: np.where(valid, values, 0.0) for name, values in fields.items()}
+
+    levels = []
+    factor = 1
+    for zoom in range(max_zoom, -1, -1):
+        if factor > 1:
+            counts = block_sum(counts, 2)
+            sums = {name: block_sum(total, 2) for name, total in sums.items()}
+        level_valid = counts > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            level_fields = {name: np.where(level_valid, total / counts, np.nan) for name, total in sums.items()}
+        # Block centres of the (possibly padded) coarse grid. On a grid that reaches a pole the centre of
+        # the padded edge block lies past it, so latitudes are clamped to the valid range
+        level_lat0 = lat0 + dlat * (factor - 1) / 2.0
+        level_lats = level_lat0 + dlat * factor * np.arange(counts.shape[0])
+        level_lons = lon0 + dlon * ((factor - 1) / 2.0 + factor * np.arange(counts.shape[1]))
+        levels.append({
+            'zoom': zoom,
+            'factor': factor,
+            'lats': np.clip(level_lats, -90.0, 90.0),
+            'lons': level_lons,
+            'lat0': level_lat0,
+            'dlat': dlat * factor,
+            'fields': level_fields,
+            'valid': level_valid,
+        })
+        factor *= 2
+    levels.reverse()
+    return levels
+
+
+def tile_hash(data):
+    """
+    Content hash used to decide whether a tile needs rewriting.
+    """
+    return hashlib.sha1(data).hexdigest()
+
+
+def _write_atomic(path, data, mode='wb'):
+    """
+    Write a file under a temporary name and rename it into place, so readers
+    (the data service) never see a half-written tile or index.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_pyramid(levels, output_dir, encoding='float32', attrs=None, tile_size=TILE_SIZE, source=None):
+    """
+    Cut every level into z/x/y tiles and write the ones whose content changed.
+
+    Tiles are stored as <output_dir>/<z>/<x>/<y>.bin in the binary grid
+    format and addressed by grid index (TILE_SCHEME), not slippy-map
+    tiling: z 0 is the coarsest level, whose grid fits in one tile, and
+    tile (x, y) holds columns x*tile_size.. and rows y*tile_size.. of its
+    level, so x counts eastward and y northward from the grid origin.
+    Tiles with no valid cells (all land) are not written. pyramid.json
+    records the scheme, the level geometry and the content hash of every
+    tile, and is compared against the previous run so unchanged tiles are
+    left untouched.
+
+    The binary format describes rows by origin and step, so a tile header
+    can place the last row of a coarse level past a pole; 'lat_range' in
+    pyramid.json gives the clamped extent of each level's rows.
+
+    Args:
+        levels (list): Output of build_levels
+        output_dir (str): Root directory of the pyramid
+        encoding (str): 'float32' or 'int16'
+        attrs (dict): Extra metadata stored in every tile header and pyramid.json
+        tile_size (int): Cells per tile edge
+        source (str): Name of the input file, recorded in pyramid.json only;
+                      in the tile headers it would change every tile's hash
+                      with each new forecast file
+
+    Returns:
+        dict: Counts of tiles 'written', 'unchanged' and 'removed'
+    """
+    index_path = os.path.join(output_dir, "pyramid.json")
+    previous = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            previous = json.load(f).get("tiles", {})
+
+    tiles = {}
+    stats = {'written': 0, 'unchanged': 0, 'removed': 0}
+    level_index = []
+    for level in levels:
+        zoom = level['zoom']
+        ny, nx = level['valid'].shape
+        n_tiles_y = -(-ny // tile_size)
+        n_tiles_x = -(-nx // tile_size)
+        level_index.append({
+            "zoom": zoom,
+            "factor": level['factor'],
+            "lat0": float(level['lat0']),
+            "lon0": float(level['lons'][0]),
+            "dlat": float(level['dlat']) if ny > 1 else None,
+            "dlon": float(level['lons'][1] - level['lons'][0]) if nx > 1 else None,
+            "lat_range": [float(level['lats'].min()), float(level['lats'].max())],
+            "shape": [ny, nx],
+            "tiles": [n_tiles_x, n_tiles_y],
+        })
+        # Tile headers need an evenly spaced axis, so rows are described by the unclamped block centres
+        grid_lats = level['lat0'] + level['dlat'] * np.arange(ny)
+
+        for y in range(n_tiles_y):
+            rows = slice(y * tile_size, (y + 1) * tile_size)
+            for x in range(n_tiles_x):
+                cols = slice(x * tile_size, (x + 1) * tile_size)
+                valid = level['valid'][rows, cols]
+                if not valid.any():
+                    continue
+                key = f"{zoom}/{x}/{y}"
+                data = encode_grid_binary(
+                    grid_lats[rows], level['lons'][cols],
+                    {name: values[rows, cols] for name, values in level['fields'].items()},
+                    valid=valid, encoding=encoding,
+                    attrs=dict(attrs or {}, z=zoom, x=x, y=y),
+                )
+                digest = tile_hash(data)
+                tiles[key] = digest
+                path = os.path.join(output_dir, str(zoom), str(x), f"{y}.bin")
+                if previous.get(key) == digest and os.path.exists(path):
+                    stats['unchanged'] += 1
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _write_atomic(path, data)
+                stats['written'] += 1
+
+    # Drop tiles that existed last time but are now empty or out of range
+    for key in previous:
+        if key not in tiles:
+            zoom, x, y = key.split('/')
+            path = os.path.join(output_dir, zoom, x, f"{y}.bin")
+            if os.path.exists(path):
+                os.remove(path)
+            stats['removed'] += 1
+
+    index = {
+        "scheme": TILE_SCHEME,
+        "tile_size": tile_size,
+        "encoding": encoding,
+        "attrs": dict(attrs or {}, source=source) if source else attrs or {},
+        "levels": level_index,
+        "tiles": tiles,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    _write_atomic(index_path, json.dumps(index, indent=1), mode='w')
+    return stats
+
+
+def build_tile_pyramid(netcdf_file, output_dir, layer='currents', time_index=0, depth_index=0,
+                       encoding='float32', tile_size=TILE_SIZE):
+    """
+    Generate (or refresh) a z/x/y tile pyramid for one layer of a NetCDF file.
+
+    Args:
+        netcdf_file (str): Path to the currents (uo/vo) or temperature (thetao) file
+        output_dir (str): Root directory of the pyramid
+        layer (str): 'currents' or 'temperature'
+        time_index (int): Index of the time step to tile
+        depth_index (int): Index of the depth level to tile
+        encoding (str): 'float32' or 'int16'
+        tile_size (int): Cells per tile edge
+
+    Returns:
+        dict: Counts of tiles 'written', 'unchanged' and 'removed'
+    """
+    if not os.path.exists(netcdf_file):
+        raise FileNotFoundError(f"NetCDF file not found: {netcdf_file}")
+
+    with xr.open_dataset(netcdf_file) as ds:
+        fields, lats, lons = load_layer_fields(ds, layer, time_index, depth_index)
+
+    levels = build_levels(fields, lats, lons, tile_size)
+    print(f"Built {len(levels)} zoom levels for {layer} from a {len(lats)}x{len(lons)} grid")
+
+    attrs = {"layer": layer, "time_index": time_index, "depth_index": depth_index}
+    stats = write_pyramid(levels, output_dir, encoding=encoding, attrs=attrs, tile_size=tile_size,
+                          source=os.path.basename(netcdf_file))
+    print(f"Tiles written: {stats['written']}, unchanged: {stats['unchanged']}, removed: {stats['removed']}")
+    return stats
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    tiles_root = os.path.join(script_dir, "..", "..", "public", "data", "tiles")
+
+    parser = argparse.ArgumentParser(description="Build a multi-resolution tile pyramid")
+    parser.add_argument("netcdf_file", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--layer", choices=LAYERS, default="currents")
+    parser.add_argument("--output-dir", default=None, help="Default: public/data/tiles/<layer>")
+    parser.add_argument("--time-index", type=int, default=0)
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--encoding", choices=["float32", "int16"], default="float32")
+    args = parser.parse_args()
+
+    build_tile_pyramid(args.netcdf_file, args.output_dir or os.path.join(tiles_root, args.layer),
+                       layer=args.layer, time_index=args.time_index, depth_index=args.depth_index,
+                       encoding=args.encoding)
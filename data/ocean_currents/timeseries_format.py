@@ -0,0 +1,591 @@
+#!/usr/bin/env python
+import xarray as xr
+import numpy as np
+import argparse
+import json
+import os
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+
+from binary_format import INT16_FILL, regular_axis
+from currents_engine import (
+    TEMPERATURE_NAMES,
+    detect_layer,
+    compute_currents,
+    find_current_variables,
+    find_variable,
+    identify_coord_dims,
+)
+from streaming_writer import CurrentsRecordWriter
+from tile_pyramid import load_layer_fields
+
+# File layout
+# -----------
+#   bytes 0-3   magic b"AQTS"
+#   bytes 4-7   uint32 (little endian) format version
+#   bytes 8-11  uint32 reserved (0)
+#   chunks      one zlib-compressed, byte-shuffled block per (step, variable)
+#   index       UTF-8 JSON: grid, variables (scale/add_offset/fill), times and
+#               the offset/size/dtype of every chunk
+#   trailer     uint64 (little endian) length of the index, then b"AQTS"
+#
+# Every variable is quantized to int16 fixed point with one scale/add_offset
+# for the whole run. Steps are grouped; the first step of a group is stored
+# as is (a keyframe), the others as the difference from their keyframe. Any
+# step is therefore decoded from at most two chunks, without touching the
+# rest of the run.
+
+MAGIC = b"AQTS"
+FORMAT_VERSION = 1
+PREFIX_SIZE = 12
+TRAILER_SIZE = 12
+
+# Steps per keyframe group (8 six-hourly steps: two days)
+DEFAULT_KEYFRAME_INTERVAL = 8
+
+# zlib level 1: most of the gain of higher levels at several times the speed
+DEFAULT_COMPRESSION_LEVEL = 1
+
+# Coarsest quantization step allowed per variable (m/s for currents, degC for
+# temperature); a wider value range than 65534 steps cover coarsens it
+DEFAULT_PRECISION = {'u': 0.001, 'v': 0.001, 'thetao': 0.001}
+
+# Steps written as JSON to measure the baseline size in storage_report
+JSON_SAMPLE_STEPS = 4
+
+
+def _shuffle(data):
+    """
+    Group the bytes of fixed-size integers by significance (all low bytes,
+    then all high bytes); small deltas then compress far better.
+    """
+    return data.view(np.uint8).reshape(-1, data.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(raw, dtype, shape):
+    itemsize = np.dtype(dtype).itemsize
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(shape)
+
+
+def quantization_params(low, high, precision=None):
+    """
+    int16 scale and add_offset covering [low, high].
+
+    Args:
+        low, high (float): Value range of the variable over the whole run
+        precision (float): Coarsest acceptable step; used when the range
+            would give an even finer one (coarser steps compress better)
+
+    Returns:
+        tuple: (scale, add_offset)
+    """
+    add_offset = (high + low) / 2.0
+    # -32767..32767 carries data, -32768 is reserved for the fill value
+    scale = (high - low) / 65534.0 or 1.0
+    if precision is not None:
+        scale = max(scale, precision)
+    return scale, add_offset
+
+
+def quantize(values, scale, add_offset):
+    """
+    Quantize a float array to int32 fixed point; NaN becomes INT16_FILL.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    quantized = np.full(values.shape, INT16_FILL, dtype=np.int32)
+    quantized[valid] = np.clip(np.round((values[valid] - add_offset) / scale), -32767, 32767)
+    return quantized
+
+
+def dequantize(quantized, scale, add_offset):
+    """
+    Inverse of quantize, to float32 with NaN at the fill value.
+    """
+    values = quantized.astype(np.float32) * np.float32(scale) + np.float32(add_offset)
+    values[quantized == INT16_FILL] = np.nan
+    return values
+
+
+def _write_prefix(f):
+    f.write(MAGIC + np.array([FORMAT_VERSION, 0], dtype='<u4').tobytes())
+
+
+def _write_index(f, index):
+    index_bytes = json.dumps(index).encode('utf-8')
+    f.write(index_bytes)
+    f.write(np.array([len(index_bytes)], dtype='<u8').tobytes() + MAGIC)
+
+
+class TimeSeriesWriter:
+    """
+    Append the steps of a run, in time order, to a time-series file.
+
+    The file is written under a temporary name and renamed into place by
+    close(), so readers never see a partial file.
+
+    Usage:
+        with TimeSeriesWriter(path, lats, lons, quantization) as writer:
+            for time, fields in steps:
+                writer.write_step(time, fields)
+    """
+
+    def __init__(self, path, lats, lons, quantization, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 level=DEFAULT_COMPRESSION_LEVEL, attrs=None):
+        """
+        Args:
+            path (str): Output file
+            lats, lons (numpy.ndarray): Evenly spaced grid axes
+            quantization (dict): Variable name -> (scale, add_offset)
+            keyframe_interval (int): Steps per keyframe group
+            level (int): zlib compression level
+            attrs (dict): Extra JSON-serializable metadata stored in the index
+        """
+        lat0, dlat = regular_axis(lats, "Latitude")
+        lon0, dlon = regular_axis(lons, "Longitude")
+        self.path = path
+        self.shape = (len(lats), len(lons))
+        self.grid = {"lat0": lat0, "dlat": dlat, "nlat": self.shape[0],
+                     "lon0": lon0, "dlon": dlon, "nlon": self.shape[1]}
+        self.quantization = quantization
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.attrs = attrs or {}
+        self.steps = []
+        self._keyframe = None
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        _write_prefix(self._file)
+
+    def write_step(self, valid_time, fields):
+        """
+        Quantize, delta-encode and compress one step.
+
+        Args:
+            valid_time (str): ISO valid time of the step
+            fields (dict): Variable name -> 2-D array on the writer's grid
+        """
+        position = len(self.steps)
+        is_keyframe = position % self.keyframe_interval == 0
+        if is_keyframe:
+            self._keyframe = {}
+        chunks = {}
+        for name, (scale, add_offset) in self.quantization.items():
+            values = np.asarray(fields[name])
+            if values.shape != self.shape:
+                raise ValueError(f"Variable {name} has shape {values.shape}, expected {self.shape}")
+            quantized = quantize(values, scale, add_offset)
+            if is_keyframe:
+                self._keyframe[name] = quantized
+                data = quantized.astype('<i2')
+            else:
+                delta = quantized - self._keyframe[name]
+                # Deltas of -32767..32767 values can need 17 bits; most steps fit in 16
+                fits = delta.min(initial=0) >= -32768 and delta.max(initial=0) <= 32767
+                data = delta.astype('<i2' if fits else '<i4')
+            raw = zlib.compress(_shuffle(np.ascontiguousarray(data)), self.level)
+            chunks[name] = [self._file.tell(), len(raw), data.dtype.str]
+            self._file.write(raw)
+        self.steps.append({"time": valid_time, "keyframe": position - position % self.keyframe_interval,
+                           "chunks": chunks})
+
+    def close(self):
+        """
+        Write the index and trailer and move the file into place.
+        """
+        if self._file is None:
+            return
+        index = {
+            "grid": self.grid,
+            "variables": [{"name": name, "scale": scale, "add_offset": add_offset, "fill": INT16_FILL}
+                          for name, (scale, add_offset) in self.quantization.items()],
+            "keyframe_interval": self.keyframe_interval,
+            "compression": {"codec": "zlib", "level": self.level, "shuffle": True},
+            "attrs": self.attrs,
+            "steps": self.steps,
+        }
+        _write_index(self._file, index)
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class TimeSeriesReader:
+    """
+    Random access to the steps of a time-series file.
+
+    Only the index is read on open. read_step decompresses the step's own
+    chunk and, for a delta step, its keyframe; the last keyframe is kept,
+    so playing a run forwards decodes one chunk per variable and step.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(PREFIX_SIZE)
+            if prefix[:4] != MAGIC:
+                raise ValueError(f"{path} is not an AquaNova time-series file")
+            version = int(np.frombuffer(prefix[4:8], dtype='<u4')[0])
+            if version > FORMAT_VERSION:
+                raise ValueError(f"{path} uses format version {version}, newer than supported {FORMAT_VERSION}")
+            f.seek(-TRAILER_SIZE, os.SEEK_END)
+            trailer = f.read(TRAILER_SIZE)
+            if trailer[8:] != MAGIC:
+                raise ValueError(f"{path} is truncated (no index trailer)")
+            index_length = int(np.frombuffer(trailer[:8], dtype='<u8')[0])
+            f.seek(-TRAILER_SIZE - index_length, os.SEEK_END)
+            self.index = json.loads(f.read(index_length).decode('utf-8'))
+        self.grid = self.index["grid"]
+        self.shape = (self.grid["nlat"], self.grid["nlon"])
+        self.variables = {entry["name"]: entry for entry in self.index["variables"]}
+        self.steps = self.index["steps"]
+        self.times = [step["time"] for step in self.steps]
+        self._file = open(path, 'rb')
+        self._keyframe = (None, {})
+
+    def coordinates(self):
+        """
+        (lats, lons) of the grid, as float64 arrays.
+        """
+        grid = self.grid
+        return (grid["lat0"] + grid["dlat"] * np.arange(grid["nlat"]),
+                grid["lon0"] + grid["dlon"] * np.arange(grid["nlon"]))
+
+    def step_index(self, valid_time):
+        """
+        Position of a valid time (ISO string or anything pandas parses).
+        """
+        wanted = pd.Timestamp(valid_time)
+        for position, step_time in enumerate(self.times):
+            if pd.Timestamp(step_time) == wanted:
+                return position
+        raise KeyError(f"{valid_time} is not a step of {self.path}")
+
+    def read_chunk(self, offset, nbytes):
+        """
+        Raw bytes of the file at an offset, e.g. a compressed chunk listed in
+        the index (merge_timeseries copies chunks this way).
+        """
+        self._file.seek(offset)
+        return self._file.read(nbytes)
+
+    def reset(self):
+        """
+        Forget the cached keyframe, so the next read decodes from scratch.
+        """
+        self._keyframe = (None, {})
+
+    def _chunk(self, position, name):
+        offset, nbytes, dtype = self.steps[position]["chunks"][name]
+        return _unshuffle(zlib.decompress(self.read_chunk(offset, nbytes)), dtype, self.shape)
+
+    def _keyframe_values(self, position, name):
+        cached_position, values = self._keyframe
+        if cached_position != position:
+            values = {}
+            self._keyframe = (position, values)
+        if name not in values:
+            values[name] = self._chunk(position, name).astype(np.int32)
+        return values[name]
+
+    def read_quantized(self, step, names=None):
+        """
+        int32 fixed-point values of one step (INT16_FILL where missing).
+
+        Args:
+            step (int or str): Step position or valid time
+            names (list): Variables to read (default: all)
+
+        Returns:
+            dict: Variable name -> (nlat, nlon) int32 array
+        """
+        position = step if isinstance(step, (int, np.integer)) else self.step_index(step)
+        keyframe = self.steps[position]["keyframe"]
+        result = {}
+        for name in names or self.variables:
+            base = self._keyframe_values(keyframe, name)
+            if position == keyframe:
+                result[name] = base.copy()
+            else:
+                result[name] = base + self._chunk(position, name)
+        return result
+
+    def read_step(self, step, names=None):
+        """
+        Decoded float32 fields of one step, NaN where missing.
+
+        Args:
+            step (int or str): Step position or valid time
+            names (list): Variables to read (default: all)
+
+        Returns:
+            dict: Variable name -> (nlat, nlon) float32 array
+        """
+        quantized = self.read_quantized(step, names)
+        return {name: dequantize(values, self.variables[name]["scale"], self.variables[name]["add_offset"])
+                for name, values in quantized.items()}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def merge_timeseries(part_paths, output_path, attrs=None):
+    """
+    Concatenate time-series files into one, copying the compressed chunks.
+
+    The parts must share grid, quantization and keyframe interval, and every
+    part but the last must hold whole keyframe groups, so parts written in
+    parallel join without decoding or re-encoding anything.
+
+    Args:
+        part_paths (list): Time-series files, in time order
+        output_path (str): File to write (under a temporary name, then renamed)
+        attrs (dict): Metadata of the merged file (default: the first part's)
+
+    Returns:
+        int: Number of steps written
+    """
+    steps = []
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            _write_prefix(out)
+            first = None
+            for n, path in enumerate(part_paths):
+                with TimeSeriesReader(path) as reader:
+                    index = reader.index
+                    if first is None:
+                        first = index
+                    elif any(index[key] != first[key] for key in ("grid", "variables", "keyframe_interval")):
+                        raise ValueError(f"{path} does not share the grid, quantization and keyframe "
+                                         f"interval of {part_paths[0]}")
+                    if n < len(part_paths) - 1 and len(reader.steps) % index["keyframe_interval"]:
+                        raise ValueError(f"{path} ends inside a keyframe group ({len(reader.steps)} steps)")
+                    base = len(steps)
+                    for step in reader.steps:
+                        chunks = {}
+                        for name, (offset, nbytes, dtype) in step["chunks"].items():
+                            chunks[name] = [out.tell(), nbytes, dtype]
+                            out.write(reader.read_chunk(offset, nbytes))
+                        steps.append({"time": step["time"], "keyframe": step["keyframe"] + base, "chunks": chunks})
+            if first is None:
+                raise ValueError("No time-series parts to merge")
+            _write_index(out, dict(first, attrs=first["attrs"] if attrs is None else attrs, steps=steps))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(steps)
+
+
+def step_times(ds, layer):
+    """
+    ISO valid times of the steps of a layer ([None] for a file without a time axis).
+    """
+    reference = find_current_variables(ds)[0] if layer == 'currents' else find_variable(ds, TEMPERATURE_NAMES)
+    time_dim = identify_coord_dims(ds, reference).get('time')
+    if time_dim is None:
+        return [None]
+    return [t.strftime('%Y-%m-%dT%H:%M:%S') for t in pd.to_datetime(ds[time_dim].values)]
+
+
+def encode_timeseries(netcdf_file, output_path, depth_index=0, sample_factor=1,
+                      keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, level=DEFAULT_COMPRESSION_LEVEL,
+                      precision=None):
+    """
+    Store every time step of a currents (u/v) or temperature (thetao) file.
+
+    The file is read twice, one step at a time: first for the value range
+    of each variable over the run (which fixes the quantization), then to
+    encode the steps.
+
+    Args:
+        netcdf_file (str): Path to the NetCDF file
+        output_path (str): Time-series file to write
+        depth_index (int): Index of the depth level to store
+        sample_factor (int): Factor by which to sample data (to reduce data size)
+        keyframe_interval (int): Steps per keyframe group
+        level (int): zlib compression level
+        precision (dict): Coarsest quantization step per variable
+            (default: DEFAULT_PRECISION)
+
+    Returns:
+        dict: Layer, step count, bytes written and the quantization used
+    """
+    if not os.path.exists(netcdf_file):
+        raise FileNotFoundError(f"NetCDF file not found: {netcdf_file}")
+    precision = DEFAULT_PRECISION if precision is None else precision
+
+    with xr.open_dataset(netcdf_file) as ds:
+        layer = detect_layer(ds)
+        if layer is None:
+            raise ValueError("Could not find current or temperature variables in the dataset")
+        times = step_times(ds, layer)
+        print(f"Encoding {len(times)} {layer} step(s) from {os.path.basename(netcdf_file)}")
+
+        def sampled_step(time_index):
+            return load_layer_fields(ds, layer, time_index, depth_index, sample_factor)
+
+        ranges = {}
+        for time_index in range(len(times)):
+            fields, lats, lons = sampled_step(time_index)
+            for name, values in fields.items():
+                low, high = ranges.get(name, (np.inf, -np.inf))
+                ranges[name] = (min(low, float(np.nanmin(values))), max(high, float(np.nanmax(values))))
+        quantization = {name: quantization_params(low, high, precision.get(name))
+                        for name, (low, high) in ranges.items()}
+
+        attrs = {"layer": layer, "source": os.path.basename(netcdf_file), "depth_index": depth_index,
+                 "sample_factor": sample_factor}
+        with TimeSeriesWriter(output_path, lats, lons, quantization, keyframe_interval, level, attrs) as writer:
+            for time_index, valid_time in enumerate(times):
+                fields, _, _ = sampled_step(time_index)
+                writer.write_step(valid_time, fields)
+
+    n_bytes = os.path.getsize(output_path)
+    print(f"Time series saved to {output_path} ({n_bytes} bytes)")
+    return {"layer": layer, "steps": len(times), "bytes": n_bytes,
+            "quantization": {name: {"scale": scale, "add_offset": add_offset}
+                             for name, (scale, add_offset) in quantization.items()}}
+
+
+def _json_step_bytes(layer, fields, lats, lons, path):
+    """
+    Size of one step written as the processed JSON output.
+    """
+    if layer == 'currents':
+        columns, record_type = compute_currents(fields['u'], fields['v'], lats, lons), "current"
+        names = ('lat', 'lon', 'u', 'v', 'speed', 'direction')
+    else:
+        rows, cols = np.nonzero(np.isfinite(fields['thetao']))
+        columns = {"lat": lats[rows], "lon": lons[cols], "thetao": fields['thetao'][rows, cols]}
+        names, record_type = ('lat', 'lon', 'thetao'), "temperature"
+    with CurrentsRecordWriter(path, columns=names, record_type=record_type) as writer:
+        writer.write(columns)
+    return os.path.getsize(path)
+
+
+def storage_report(netcdf_file, timeseries_path, depth_index=0, json_sample_steps=JSON_SAMPLE_STEPS):
+    """
+    Compare a time-series file with the JSON output and raw float32 for the
+    same steps, and time random-access decoding.
+
+    The JSON size is measured by writing json_sample_steps evenly spaced
+    steps as processed JSON (at the file's sample factor) and scaling to the
+    whole run. Decode latency is measured per step with a cold keyframe
+    cache (true random access) and for a forward pass (playback).
+
+    Returns:
+        dict: Sizes, ratios, decode latencies and the largest absolute
+              quantization error of each variable over the sampled steps
+    """
+    reader = TimeSeriesReader(timeseries_path)
+    attrs = reader.index["attrs"]
+    sample_factor = attrs.get("sample_factor", 1)
+    layer = attrs["layer"]
+    n_steps = len(reader.times)
+    n_cells = reader.shape[0] * reader.shape[1]
+
+    sample = sorted(set(np.linspace(0, n_steps - 1, min(json_sample_steps, n_steps)).round().astype(int)))
+    json_bytes = 0
+    max_error = {name: 0.0 for name in reader.variables}
+    with xr.open_dataset(netcdf_file) as ds, tempfile.TemporaryDirectory() as tmp_dir:
+        for position in sample:
+            fields, lats, lons = load_layer_fields(ds, layer, int(position), depth_index, sample_factor)
+            json_bytes += _json_step_bytes(layer, fields, lats, lons, os.path.join(tmp_dir, "step.json"))
+            decoded = reader.read_step(int(position))
+            for name, values in fields.items():
+                error = np.abs(decoded[name].astype(np.float64) - values)
+                if np.any(np.isfinite(error)):
+                    max_error[name] = max(max_error[name], float(np.nanmax(error)))
+    json_bytes = json_bytes * n_steps / len(sample)
+
+    random_ms = []
+    for position in range(n_steps):
+        reader.reset()
+        start = time.perf_counter()
+        reader.read_step(position)
+        random_ms.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for position in range(n_steps):
+        reader.read_step(position)
+    sequential_ms = (time.perf_counter() - start) * 1000 / n_steps
+    reader.close()
+
+    ts_bytes = os.path.getsize(timeseries_path)
+    raw_bytes = n_steps * len(reader.variables) * n_cells * 4
+    report = {
+        "steps": n_steps,
+        "grid": [reader.shape[0], reader.shape[1]],
+        "timeseries_bytes": ts_bytes,
+        "json_bytes_estimated": int(json_bytes),
+        "float32_bytes": raw_bytes,
+        "ratio_vs_json": json_bytes / ts_bytes,
+        "ratio_vs_float32": raw_bytes / ts_bytes,
+        "decode_ms_random": {"mean": float(np.mean(random_ms)), "p50": float(np.median(random_ms)),
+                             "max": float(np.max(random_ms))},
+        "decode_ms_sequential": sequential_ms,
+        "max_abs_error": max_error,
+        "quantization_step": {name: entry["scale"] for name, entry in reader.variables.items()},
+    }
+    print(f"{n_steps} steps of {reader.shape[0]}x{reader.shape[1]} {layer}:")
+    print(f"  time series {ts_bytes / 2 ** 20:.2f} MiB, JSON ~{json_bytes / 2 ** 20:.2f} MiB "
+          f"({report['ratio_vs_json']:.1f}x), float32 {raw_bytes / 2 ** 20:.2f} MiB ({report['ratio_vs_float32']:.1f}x)")
+    print(f"  decode per step: {report['decode_ms_random']['mean']:.2f} ms random access, "
+          f"{sequential_ms:.2f} ms sequential")
+    print("  max abs error: " + ", ".join(f"{name} {error:.5f}" for name, error in max_error.items()))
+    return report
+
+
+if __name__ == "__main__":
+    # Get the directory of the script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Store all time steps of a run as a compressed time series")
+    parser.add_argument("netcdf_file", nargs="?",
+                        default=os.path.join(script_dir, "glo12_rg_6h-i_20251002-06h_3D-uovo_fcst_R20250923.nc"))
+    parser.add_argument("--output", default=None, help="Default: <netcdf_file without .nc>.aqts")
+    parser.add_argument("--depth-index", type=int, default=0)
+    parser.add_argument("--sample-factor", type=int, default=1)
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    parser.add_argument("--level", type=int, default=DEFAULT_COMPRESSION_LEVEL)
+    parser.add_argument("--report", action="store_true", help="Compare against JSON and time decoding")
+    parser.add_argument("--report-file", default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.netcdf_file)[0] + ".aqts"
+    encode_timeseries(args.netcdf_file, output, depth_index=args.depth_index, sample_factor=args.sample_factor,
+                      keyframe_interval=args.keyframe_interval, level=args.level)
+    if args.report or args.report_file:
+        report = storage_report(args.netcdf_file, output, depth_index=args.depth_index)
+        if args.report_file:
+            with open(args.report_file, 'w') as f:
+                json.dump(report, f, indent=2)